@@ -3,7 +3,9 @@ from django.contrib.auth.models import User
 from import_export import resources
 from import_export.admin import ImportExportModelAdmin
 from .models import Section, ServiceProvider, ServiceRequest, ServiceRequestLog, Report, CompletionReport, PurchaseOrder, InventoryOrder
-from .models import UserProfile
+from .models import UserProfile, TechnicianLoad, InboxCounter, Task, TaskResult, EscalationRule, Escalation
+from .models import PendingNotification, NotificationStat, ClientWrite, MaintenanceSchedule, MaintenanceOccurrence
+from .models import Blob, Attachment, AttachmentUpload
 # Register your models here.
 
 # User Resource for import/export
@@ -37,7 +39,9 @@ class SectionAdmin(ImportExportModelAdmin):
 
 @admin.register(UserProfile)
 class UserProfileAdmin(ImportExportModelAdmin):
-    list_display = ['user', 'phone']
+    list_display = ['user', 'phone', 'notification_mode']
+    list_editable = ['notification_mode']
+    list_filter = ['notification_mode']
     search_fields = ['user__username', 'phone']
     
     # Disable logging to avoid compatibility issue with Django 5.x
@@ -47,7 +51,8 @@ class UserProfileAdmin(ImportExportModelAdmin):
 
 @admin.register(ServiceProvider)
 class ServiceProviderAdmin(ImportExportModelAdmin):
-    list_display = ['name']
+    list_display = ['name', 'auto_assign']
+    list_filter = ['auto_assign']
     
     # Disable logging to avoid compatibility issue with Django 5.x
     def generate_log_entries(self, result, request):
@@ -65,11 +70,98 @@ class ServiceRequestAdmin(ImportExportModelAdmin):
         """Override to skip logging due to Django 5.x compatibility issue"""
         pass
 
+@admin.register(TechnicianLoad)
+class TechnicianLoadAdmin(admin.ModelAdmin):
+    list_display = ['user', 'service_provider', 'open_count', 'completed_count']
+    list_filter = ['service_provider']
+    search_fields = ['user__username']
+    readonly_fields = ['open_count', 'completed_count', 'turnaround_seconds']
+
+@admin.register(InboxCounter)
+class InboxCounterAdmin(admin.ModelAdmin):
+    list_display = ['scope', 'owner_id', 'assignee_id', 'bucket', 'count']
+    list_filter = ['scope', 'bucket']
+    readonly_fields = ['count']
+
+@admin.register(EscalationRule)
+class EscalationRuleAdmin(admin.ModelAdmin):
+    list_display = ['status', 'after_hours', 'section', 'service_provider', 'notify', 'active']
+    list_filter = ['status', 'notify', 'active']
+
+@admin.register(Escalation)
+class EscalationAdmin(admin.ModelAdmin):
+    list_display = ['service_request', 'rule', 'status_changed_at', 'recipients', 'created_at']
+    list_filter = ['rule']
+    raw_id_fields = ['service_request']
+
+@admin.register(PendingNotification)
+class PendingNotificationAdmin(admin.ModelAdmin):
+    list_display = ['phone', 'summary', 'created_at']
+    search_fields = ['phone']
+
+@admin.register(NotificationStat)
+class NotificationStatAdmin(admin.ModelAdmin):
+    list_display = ['day', 'immediate', 'buffered', 'digests', 'saved']
+    readonly_fields = ['day', 'immediate', 'buffered', 'digests']
+
+@admin.register(ClientWrite)
+class ClientWriteAdmin(admin.ModelAdmin):
+    list_display = ['client_id', 'kind', 'user', 'object_id', 'created_at']
+    list_filter = ['kind']
+    search_fields = ['client_id', 'user__username']
+    readonly_fields = ['client_id', 'kind', 'user', 'object_id', 'created_at']
+
+@admin.register(MaintenanceSchedule)
+class MaintenanceScheduleAdmin(admin.ModelAdmin):
+    list_display = ['title', 'section', 'service_provider', 'frequency', 'interval', 'next_run_at', 'last_run_at', 'active']
+    list_filter = ['frequency', 'active', 'service_provider']
+    search_fields = ['title']
+    readonly_fields = ['next_run_at', 'last_run_at']
+
+@admin.register(MaintenanceOccurrence)
+class MaintenanceOccurrenceAdmin(admin.ModelAdmin):
+    list_display = ['schedule', 'due_at', 'service_request', 'created_at']
+    raw_id_fields = ['service_request']
+    readonly_fields = ['schedule', 'due_at', 'run', 'service_request', 'created_at']
+
+@admin.register(Blob)
+class BlobAdmin(admin.ModelAdmin):
+    list_display = ['sha256', 'size', 'content_type', 'thumbnails_ready', 'created_at']
+    list_filter = ['content_type', 'thumbnails_ready']
+    search_fields = ['sha256']
+    readonly_fields = ['sha256', 'size', 'content_type', 'thumbnails_ready', 'created_at']
+
+@admin.register(Attachment)
+class AttachmentAdmin(admin.ModelAdmin):
+    list_display = ['name', 'service_request', 'kind', 'uploaded_by', 'created_at']
+    list_filter = ['kind']
+    raw_id_fields = ['service_request', 'completion_report', 'blob']
+    readonly_fields = ['uploaded_by', 'created_at']
+
+@admin.register(AttachmentUpload)
+class AttachmentUploadAdmin(admin.ModelAdmin):
+    list_display = ['name', 'service_request', 'size', 'uploaded_by', 'updated_at']
+    raw_id_fields = ['service_request', 'completion_report']
+    readonly_fields = ['size', 'uploaded_by', 'created_at', 'updated_at']
+
+@admin.register(Task)
+class TaskAdmin(admin.ModelAdmin):
+    list_display = ['name', 'status', 'attempts', 'max_attempts', 'run_at', 'locked_by', 'created_at']
+    list_filter = ['status', 'name']
+    readonly_fields = ['attempts', 'locked_by', 'locked_until', 'last_error', 'created_at']
+
+@admin.register(TaskResult)
+class TaskResultAdmin(admin.ModelAdmin):
+    list_display = ['name', 'task_id', 'status', 'attempts', 'worker', 'created_at', 'finished_at']
+    list_filter = ['status', 'name']
+    search_fields = ['name', 'error']
+
 @admin.register(ServiceRequestLog)
 class ServiceRequestLogAdmin(ImportExportModelAdmin):
-    list_display = ['service_request', 'created_by', 'created_at']
-    list_filter = ['created_at']
-    search_fields = ['service_request__title', 'comment']
+    list_display = ['service_request', 'event', 'old_status', 'new_status', 'created_by', 'created_at']
+    list_filter = ['event', 'created_at']
+    search_fields = ['service_request__title', 'note']
+    list_select_related = ['service_request', 'created_by']
     
     # Disable logging to avoid compatibility issue with Django 5.x
     def generate_log_entries(self, result, request):
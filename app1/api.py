@@ -0,0 +1,376 @@
+from collections import defaultdict
+from functools import wraps
+from types import SimpleNamespace
+
+from django.db.models import Q
+from django.http import JsonResponse
+from django.utils.dateparse import parse_datetime
+from django.views.decorators.http import require_GET
+
+from .archive import ARCHIVE_DB, archive_enabled
+from .audit import render_log
+from .models import (
+    CompletionReport, InventoryOrder, PurchaseOrder, Report, ServiceRequest, ServiceRequestLog,
+    ServiceRequestLogArchive,
+)
+from .refcache import user_provider_ids, user_section_ids
+from .replica import replica_reads
+
+
+# JSON API mounted under api/v1/. Rows are read with .values() so a query only
+# selects the columns of the fields= a client asked for; include= adds related
+# rows of the returned requests with one query per relation, whatever the
+# number of requests. Changing what a field means needs a new version.
+
+VERSION = 'v1'
+PAGE_SIZE = 50
+MAX_PAGE_SIZE = 200
+MAX_BATCH = 200
+
+
+class ApiError(Exception):
+    def __init__(self, message, status=400):
+        super().__init__(message)
+        self.status = status
+
+
+def _display(model, field='status'):
+    labels = dict(model._meta.get_field(field).choices)
+    return (field,), lambda row: labels.get(row[field], row[field])
+
+
+class Resource:
+    """The fields a client may ask for and the ORM lookups that read them."""
+
+    def __init__(self, models, fields, default, request_path, computed=None):
+        # logs live in two tables, the archived rows keep their ids
+        self.models = models
+        self.fields = fields
+        # name -> (lookups the value is computed from, function of the row)
+        self.computed = computed or {}
+        self.default = default
+        # path from a row to its service request, '' for the requests themselves
+        self.request_path = request_path
+        self.request_lookup = f'{request_path}id'
+
+    def parse_fields(self, value):
+        if not value:
+            return list(self.default)
+        names = list(dict.fromkeys(name.strip() for name in value.split(',') if name.strip()))
+        unknown = [name for name in names if name not in self.fields and name not in self.computed]
+        if unknown:
+            raise ApiError(f'حقول غير معروفة: {", ".join(unknown)}')
+        return names
+
+    def rows(self, queryset, names, limit=None):
+        """(raw values, output) pairs; raw values also hold the row's id and request id."""
+        lookups = ['id', self.request_lookup]
+        for name in names:
+            lookups += self.computed[name][0] if name in self.computed else [self.fields[name]]
+        values = queryset.values(*dict.fromkeys(lookups))
+        if limit is not None:
+            values = values[:limit]
+        return [
+            (row, {
+                name: self.computed[name][1](row) if name in self.computed else row[self.fields[name]]
+                for name in names
+            })
+            for row in values
+        ]
+
+    def visible(self, user):
+        if user.is_staff:
+            return Q()
+        path = self.request_path
+        return (
+            Q(**{f'{path}section__in': user_section_ids(user.id)})
+            | Q(**{f'{path}service_provider__in': user_provider_ids(user.id)})
+            | Q(**{f'{path}created_by': user.id})
+            | Q(**{f'{path}assigned_to': user.id})
+        )
+
+
+def _log_text(row):
+    return render_log(SimpleNamespace(
+        event=row['event'], note=row['note'], old_status=row['old_status'], new_status=row['new_status'],
+    ))
+
+
+REQUEST = Resource(
+    (ServiceRequest,),
+    {
+        'id': 'id',
+        'title': 'title',
+        'description': 'description',
+        'status': 'status',
+        'section': 'section_id',
+        'section_name': 'section__name',
+        'service_provider': 'service_provider_id',
+        'service_provider_name': 'service_provider__name',
+        'created_by': 'created_by_id',
+        'created_by_name': 'created_by__username',
+        'assigned_to': 'assigned_to_id',
+        'assigned_to_name': 'assigned_to__username',
+        'created_at': 'created_at',
+        'updated_at': 'updated_at',
+        'status_changed_at': 'status_changed_at',
+        # summary columns, see app1.summary
+        'report_count': 'report_count',
+        'has_completion_report': 'has_completion_report',
+        'purchase_order_status': 'purchase_order_status',
+        'inventory_order_status': 'inventory_order_status',
+        'last_activity_at': 'last_activity_at',
+        'log_count': 'log_count',
+    },
+    ('id', 'title', 'status', 'section', 'service_provider', 'assigned_to', 'created_at', 'updated_at'),
+    '',
+    computed={'status_display': _display(ServiceRequest)},
+)
+
+REPORT = Resource(
+    (Report,),
+    {
+        'id': 'id',
+        'request': 'service_request_id',
+        'title': 'title',
+        'description': 'description',
+        'needs_outsourcing': 'needs_outsourcing',
+        'needs_items': 'needs_items',
+        'created_by': 'created_by_id',
+        'created_by_name': 'created_by__username',
+        'created_at': 'created_at',
+    },
+    ('id', 'request', 'title', 'needs_outsourcing', 'needs_items', 'created_at'),
+    'service_request__',
+)
+
+COMPLETION_REPORT = Resource(
+    (CompletionReport,),
+    {
+        'id': 'id',
+        'request': 'service_request_id',
+        'title': 'title',
+        'description': 'description',
+        'created_by': 'created_by_id',
+        'created_by_name': 'created_by__username',
+        'created_at': 'created_at',
+    },
+    ('id', 'request', 'title', 'created_at'),
+    'service_request__',
+)
+
+
+ORDER_FIELDS = {
+    'id': 'id',
+    'report': 'report_id',
+    'request': 'report__service_request_id',
+    'refrence_number': 'refrence_number',
+    'status': 'status',
+    'created_by': 'created_by_id',
+    'created_at': 'created_at',
+}
+ORDER_DEFAULT = ('id', 'report', 'request', 'refrence_number', 'status', 'created_at')
+
+PURCHASE_ORDER = Resource(
+    (PurchaseOrder,), ORDER_FIELDS, ORDER_DEFAULT, 'report__service_request__',
+    computed={'status_display': _display(PurchaseOrder)},
+)
+
+INVENTORY_ORDER = Resource(
+    (InventoryOrder,), ORDER_FIELDS, ORDER_DEFAULT, 'report__service_request__',
+    computed={'status_display': _display(InventoryOrder)},
+)
+
+LOG = Resource(
+    (ServiceRequestLogArchive, ServiceRequestLog),
+    {
+        'id': 'id',
+        'request': 'service_request_id',
+        'event': 'event',
+        'old_status': 'old_status',
+        'new_status': 'new_status',
+        'note': 'note',
+        'created_by': 'created_by_id',
+        'created_by_name': 'created_by__username',
+        'created_at': 'created_at',
+    },
+    ('id', 'request', 'event', 'text', 'created_by', 'created_at'),
+    'service_request__',
+    computed={
+        'event_display': _display(ServiceRequestLog, 'event'),
+        'text': (('event', 'note', 'old_status', 'new_status'), _log_text),
+    },
+)
+
+INCLUDES = {
+    'reports': REPORT,
+    'completion_reports': COMPLETION_REPORT,
+    'purchase_orders': PURCHASE_ORDER,
+    'inventory_orders': INVENTORY_ORDER,
+    'logs': LOG,
+}
+
+
+# --- helpers -----------------------------------------------------------------
+
+def _manager(model, db):
+    # None lets the router pick the primary or the replica
+    return model.objects if db is None else model.objects.using(db)
+
+
+def _ids(value, limit):
+    try:
+        ids = list(dict.fromkeys(int(part) for part in value.split(',') if part.strip()))
+    except ValueError:
+        raise ApiError('المعرفات يجب أن تكون أرقاماً')
+    if len(ids) > limit:
+        raise ApiError(f'الحد الأقصى {limit} معرفاً في الطلب الواحد')
+    return ids
+
+
+def _int(request, name, default=None):
+    value = request.GET.get(name, '')
+    if not value:
+        return default
+    try:
+        return int(value)
+    except ValueError:
+        raise ApiError(f'{name} يجب أن يكون رقماً')
+
+
+def _includes(request):
+    names = [name.strip() for name in request.GET.get('include', '').split(',') if name.strip()]
+    unknown = [name for name in names if name not in INCLUDES]
+    if unknown:
+        raise ApiError(f'علاقات غير معروفة: {", ".join(unknown)}')
+    return {name: INCLUDES[name].parse_fields(request.GET.get(f'fields[{name}]')) for name in names}
+
+
+def _attach(rows, includes, db):
+    """Add the included relations to request rows, one query per relation and table."""
+    ids = [raw['id'] for raw, _ in rows]
+    for name, names in includes.items():
+        resource = INCLUDES[name]
+        related = defaultdict(list)
+        if ids:
+            for model in resource.models:
+                queryset = _manager(model, db).filter(**{f'{resource.request_lookup}__in': ids}).order_by('id')
+                for raw, item in resource.rows(queryset, names):
+                    related[raw[resource.request_lookup]].append(item)
+        for raw, item in rows:
+            item[name] = related[raw['id']]
+
+
+def _page(request, resource, querysets, names):
+    """Newest first, the next page continues below the last id of this one."""
+    limit = max(1, min(_int(request, 'limit', PAGE_SIZE), MAX_PAGE_SIZE))
+    before = _int(request, 'before')
+    rows = []
+    for queryset in querysets:
+        if before is not None:
+            queryset = queryset.filter(id__lt=before)
+        rows += resource.rows(queryset.order_by('-id'), names, limit + 1)
+    rows.sort(key=lambda pair: pair[0]['id'], reverse=True)
+    next_url = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        query = request.GET.copy()
+        query['before'] = rows[-1][0]['id']
+        next_url = f'{request.path}?{query.urlencode()}'
+    return rows, next_url
+
+
+def api_view(view):
+    @wraps(view)
+    def wrapper(request, *args, **kwargs):
+        if not request.user.is_authenticated:
+            return JsonResponse({'error': 'يجب تسجيل الدخول'}, status=401)
+        try:
+            return JsonResponse({'version': VERSION, **view(request, *args, **kwargs)})
+        except ApiError as e:
+            return JsonResponse({'error': str(e)}, status=e.status)
+
+    return replica_reads(require_GET(wrapper))
+
+
+# --- requests ----------------------------------------------------------------
+
+def _read_requests(request, ids):
+    """Visible requests by id from the hot tables, then the archive, in a fixed number of queries."""
+    names = REQUEST.parse_fields(request.GET.get('fields'))
+    includes = _includes(request)
+    found = {}
+    for db in [None, ARCHIVE_DB] if archive_enabled() else [None]:
+        missing = [id for id in ids if id not in found]
+        if not missing:
+            break
+        queryset = _manager(ServiceRequest, db).filter(REQUEST.visible(request.user), id__in=missing)
+        rows = REQUEST.rows(queryset, names)
+        _attach(rows, includes, db)
+        found.update((raw['id'], item) for raw, item in rows)
+    return [found[id] for id in ids if id in found], [id for id in ids if id not in found]
+
+
+@api_view
+def request_list(request):
+    queryset = ServiceRequest.objects.filter(REQUEST.visible(request.user))
+    if request.GET.get('status'):
+        queryset = queryset.filter(status__in=request.GET['status'].split(','))
+    for name in ('section', 'service_provider'):
+        if request.GET.get(name):
+            queryset = queryset.filter(**{f'{name}_id': _int(request, name)})
+    assigned_to = request.GET.get('assigned_to', '')
+    if assigned_to == 'unassigned':
+        queryset = queryset.filter(assigned_to__isnull=True)
+    elif assigned_to:
+        queryset = queryset.filter(assigned_to_id=_int(request, 'assigned_to'))
+    if request.GET.get('updated_since'):
+        updated_since = parse_datetime(request.GET['updated_since'])
+        if updated_since is None:
+            raise ApiError('updated_since يجب أن يكون تاريخاً بصيغة ISO 8601')
+        queryset = queryset.filter(updated_at__gte=updated_since)
+
+    includes = _includes(request)
+    rows, next_url = _page(request, REQUEST, [queryset], REQUEST.parse_fields(request.GET.get('fields')))
+    _attach(rows, includes, None)
+    return {'data': [item for _, item in rows], 'next': next_url}
+
+
+@api_view
+def request_detail(request, id):
+    data, _ = _read_requests(request, [id])
+    if not data:
+        raise ApiError('الطلب غير موجود', status=404)
+    return {'data': data[0]}
+
+
+@api_view
+def request_batch(request):
+    """Up to MAX_BATCH requests by id: ?ids=1,2,3, returned in that order."""
+    ids = _ids(request.GET.get('ids', ''), MAX_BATCH)
+    data, missing = _read_requests(request, ids)
+    return {'data': data, 'missing': missing}
+
+
+# --- reports, orders and logs -------------------------------------------------
+
+def _list_view(resource):
+    @api_view
+    def view(request):
+        queryset_filter = resource.visible(request.user)
+        if request.GET.get('request'):
+            queryset_filter &= Q(**{f'{resource.request_lookup}__in': _ids(request.GET['request'], MAX_BATCH)})
+        if request.GET.get('status') and 'status' in resource.fields:
+            queryset_filter &= Q(status__in=request.GET['status'].split(','))
+        querysets = [model.objects.filter(queryset_filter) for model in resource.models]
+        rows, next_url = _page(request, resource, querysets, resource.parse_fields(request.GET.get('fields')))
+        return {'data': [item for _, item in rows], 'next': next_url}
+
+    return view
+
+
+report_list = _list_view(REPORT)
+completion_report_list = _list_view(COMPLETION_REPORT)
+purchase_order_list = _list_view(PURCHASE_ORDER)
+inventory_order_list = _list_view(INVENTORY_ORDER)
+log_list = _list_view(LOG)
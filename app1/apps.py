@@ -4,3 +4,7 @@ from django.apps import AppConfig
 class App1Config(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'app1'
+
+    def ready(self):
+        # tasks registers the @task functions the run_tasks workers look up by name
+        from . import signals, tasks  # noqa: F401
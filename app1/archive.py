@@ -0,0 +1,128 @@
+from datetime import timedelta
+
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.management import call_command
+from django.db import transaction
+from django.http import Http404
+from django.utils import timezone
+
+from .models import (
+    Attachment, Blob, CompletionReport, InventoryOrder, PurchaseOrder, Report, Section, ServiceProvider,
+    ServiceRequest, ServiceRequestLog, ServiceRequestLogArchive,
+)
+
+
+# completed requests are moved to this database by the archive_requests command
+ARCHIVE_DB = getattr(settings, 'ARCHIVE_DATABASE', 'archive')
+
+
+def archive_enabled():
+    return ARCHIVE_DB in settings.DATABASES
+
+
+def get_service_request(id, queryset=None):
+    """Load a request from the hot tables, falling back to the archive for old completed ones.
+
+    Related managers of the returned instance read from the same database,
+    use ``.using(service_request._state.db)`` for other queries about it.
+    """
+    queryset = ServiceRequest.objects.all() if queryset is None else queryset
+    service_request = queryset.filter(id=id).first()
+    if service_request is None and archive_enabled():
+        service_request = queryset.using(ARCHIVE_DB).filter(id=id).first()
+    if service_request is None:
+        raise Http404('الطلب غير موجود')
+    return service_request
+
+
+def is_archived(service_request):
+    return service_request._state.db == ARCHIVE_DB
+
+
+def archivable_requests(months):
+    # updated_at is bumped by mark_as_complete, so it is the completion time of a completed request
+    cutoff = timezone.now() - timedelta(days=30 * months)
+    return ServiceRequest.objects.filter(status='completed', updated_at__lt=cutoff)
+
+
+def prepare_archive():
+    call_command('migrate', database=ARCHIVE_DB, verbosity=0, interactive=False)
+
+
+def _copy_referenced(model, ids, fields):
+    # only the listed columns are copied, e.g. no password hashes for users
+    rows = [model(**row) for row in model.objects.filter(id__in=ids).values('id', *fields)]
+    if rows:
+        # refresh rows copied by earlier runs, e.g. a renamed section
+        model.objects.using(ARCHIVE_DB).bulk_create(
+            rows, update_conflicts=True, unique_fields=['id'], update_fields=fields
+        )
+
+
+def _copy_rows(rows):
+    """Insert rows into the archive as they are, overwriting the copies an interrupted run left."""
+    model = type(rows[0])
+    fields = [field for field in model._meta.concrete_fields if not field.primary_key]
+    # bulk_create stamps auto_now and auto_now_add fields with the current time
+    stamped = [
+        field.attname for field in fields if getattr(field, 'auto_now', False) or getattr(field, 'auto_now_add', False)
+    ]
+    original = [[getattr(row, name) for name in stamped] for row in rows]
+    archive = model.objects.using(ARCHIVE_DB)
+    archive.bulk_create(
+        rows, update_conflicts=True, unique_fields=['id'], update_fields=[field.name for field in fields]
+    )
+    if stamped:
+        for row, values in zip(rows, original):
+            for name, value in zip(stamped, values):
+                setattr(row, name, value)
+        archive.bulk_update(rows, stamped)
+
+
+def archive_requests(request_ids):
+    """Copy the requests and everything hanging off them to the archive, then delete them.
+
+    The two databases cannot share a transaction: the archive is written and
+    committed first, so a run interrupted between the two steps only leaves
+    copies behind, which the next run overwrites with the current rows before
+    it deletes them.
+    """
+    requests = list(ServiceRequest.objects.filter(id__in=request_ids))
+    if not requests:
+        return 0
+    request_ids = [r.id for r in requests]
+    reports = list(Report.objects.filter(service_request_id__in=request_ids))
+    report_ids = [r.id for r in reports]
+    completion_reports = list(CompletionReport.objects.filter(service_request_id__in=request_ids))
+    purchase_orders = list(PurchaseOrder.objects.filter(report_id__in=report_ids))
+    inventory_orders = list(InventoryOrder.objects.filter(report_id__in=report_ids))
+    logs = list(ServiceRequestLog.objects.filter(service_request_id__in=request_ids))
+    archived_logs = list(ServiceRequestLogArchive.objects.filter(service_request_id__in=request_ids))
+    attachments = list(Attachment.objects.filter(service_request_id__in=request_ids))
+
+    user_ids = set()
+    for r in requests:
+        user_ids.update([r.created_by_id, r.updated_by_id, r.assigned_to_id])
+    for rows in (reports, completion_reports, purchase_orders, inventory_orders, logs, archived_logs):
+        user_ids.update(row.created_by_id for row in rows)
+    user_ids.update(attachment.uploaded_by_id for attachment in attachments)
+    user_ids.discard(None)
+
+    with transaction.atomic(using=ARCHIVE_DB):
+        _copy_referenced(User, user_ids, ['username', 'first_name', 'last_name', 'email', 'is_active'])
+        _copy_referenced(Section, {r.section_id for r in requests}, ['name'])
+        _copy_referenced(ServiceProvider, {r.service_provider_id for r in requests}, ['name'])
+        # the files stay in the blob store, shared with the requests that are not archived
+        _copy_referenced(Blob, {a.blob_id for a in attachments}, ['sha256', 'size', 'content_type', 'thumbnails_ready'])
+        # parents before children
+        for rows in (
+            requests, reports, completion_reports, purchase_orders, inventory_orders, logs, archived_logs, attachments,
+        ):
+            if rows:
+                _copy_rows(rows)
+
+    with transaction.atomic():
+        # cascades to the reports, orders, logs and attachments
+        ServiceRequest.objects.filter(id__in=request_ids).delete()
+    return len(request_ids)
@@ -0,0 +1,181 @@
+from datetime import timedelta
+
+from django.conf import settings
+from django.db.models import Count, DurationField, F, OuterRef, Subquery, Sum
+from django.db.models.functions import Coalesce, Greatest
+from django.utils import timezone
+
+from .audit import log_event
+from .models import LogEvent, ServiceRequest, ServiceRequestLog, ServiceRequestLogArchive, TechnicianLoad, User
+
+
+# lower score wins; override with AUTO_ASSIGN_WEIGHTS in settings
+DEFAULT_WEIGHTS = {
+    'open_load': 10.0,           # per open request already assigned
+    'section_affinity': 5.0,     # subtracted, scaled by the share of recent work in this section
+    'turnaround_hours': 0.1,     # per hour of average completion time
+}
+AFFINITY_WINDOW_DAYS = 90
+ASSIGNMENT_EVENTS = (LogEvent.ASSIGNED, LogEvent.AUTO_ASSIGNED)
+
+
+def _weights():
+    return {**DEFAULT_WEIGHTS, **getattr(settings, 'AUTO_ASSIGN_WEIGHTS', {})}
+
+
+# --- load counters -----------------------------------------------------------
+
+def _load_key(provider_id, user_id, status):
+    if user_id is None or status == 'completed':
+        return None
+    return (provider_id, user_id)
+
+
+def _bump(provider_id, user_id, **deltas):
+    updates = {
+        field: Greatest(F(field) + delta, 0) if delta < 0 else F(field) + delta
+        for field, delta in deltas.items()
+    }
+    if not TechnicianLoad.objects.filter(service_provider_id=provider_id, user_id=user_id).update(**updates):
+        load, _ = TechnicianLoad.objects.get_or_create(service_provider_id=provider_id, user_id=user_id)
+        TechnicianLoad.objects.filter(pk=load.pk).update(**updates)
+
+
+def assigned_at():
+    """Expression for when a request got its current assignee, the start of its turnaround.
+
+    That is the latest assignment in its log, archived logs included, or its
+    creation for a request assigned when it was made.
+    """
+    def latest(model):
+        rows = model.objects.filter(service_request=OuterRef('pk'), event__in=ASSIGNMENT_EVENTS)
+        return Subquery(rows.order_by('-created_at').values('created_at')[:1])
+
+    return Coalesce(latest(ServiceRequestLog), latest(ServiceRequestLogArchive), F('created_at'))
+
+
+def snapshot(service_request):
+    # read from __dict__ so deferred fields are not loaded just for this
+    values = service_request.__dict__
+    return (
+        values.get('service_provider_id'),
+        values.get('assigned_to_id'),
+        values.get('status'),
+    )
+
+
+def update_load(service_request, old, created=False):
+    """Apply the change between the loaded and saved state of a request to the counters."""
+    old_provider, old_user, old_status = old if not created else (None, None, None)
+    new_provider, new_user, new_status = snapshot(service_request)
+    old_key = _load_key(old_provider, old_user, old_status)
+    new_key = _load_key(new_provider, new_user, new_status)
+
+    if old_key != new_key:
+        if old_key:
+            _bump(*old_key, open_count=-1)
+        if new_key:
+            _bump(*new_key, open_count=1)
+
+    if new_status == 'completed' and old_status != 'completed' and new_user is not None and not created:
+        started = (
+            ServiceRequest.objects.using(service_request._state.db).filter(pk=service_request.pk)
+            .annotate(assigned_at=assigned_at()).values_list('assigned_at', flat=True).get()
+        )
+        turnaround = max(int((timezone.now() - started).total_seconds()), 0)
+        _bump(new_provider, new_user, completed_count=1, turnaround_seconds=turnaround)
+
+
+def release_load(service_request):
+    key = _load_key(*snapshot(service_request))
+    if key:
+        _bump(*key, open_count=-1)
+
+
+def rebuild_loads(service_provider_ids=None):
+    """Recount the counters from ServiceRequest, for first deploy or to repair drift."""
+    requests = ServiceRequest.objects.filter(assigned_to__isnull=False)
+    loads = TechnicianLoad.objects.all()
+    if service_provider_ids is not None:
+        requests = requests.filter(service_provider_id__in=service_provider_ids)
+        loads = loads.filter(service_provider_id__in=service_provider_ids)
+
+    totals = {}
+    open_counts = requests.exclude(status='completed').values('service_provider_id', 'assigned_to_id').annotate(n=Count('id'))
+    for row in open_counts:
+        totals.setdefault((row['service_provider_id'], row['assigned_to_id']), {})['open_count'] = row['n']
+    # updated_at of a completed request is the closest record of its completion time
+    completed = (
+        requests.filter(status='completed').annotate(assigned_at=assigned_at())
+        .values('service_provider_id', 'assigned_to_id')
+        .annotate(n=Count('id'), turnaround=Sum(F('updated_at') - F('assigned_at'), output_field=DurationField()))
+    )
+    for row in completed:
+        counters = totals.setdefault((row['service_provider_id'], row['assigned_to_id']), {})
+        counters['completed_count'] = row['n']
+        counters['turnaround_seconds'] = int(row['turnaround'].total_seconds()) if row['turnaround'] else 0
+
+    loads.update(open_count=0, completed_count=0, turnaround_seconds=0)
+    for (provider_id, user_id), counters in totals.items():
+        _bump(provider_id, user_id, **counters)
+    return len(totals)
+
+
+# --- picking -----------------------------------------------------------------
+
+def score_candidates(service_request, candidate_ids):
+    """Return {user_id: score} for the candidates of a request, lower is better."""
+    weights = _weights()
+    loads = {
+        load.user_id: load
+        for load in TechnicianLoad.objects.filter(
+            service_provider_id=service_request.service_provider_id, user_id__in=candidate_ids
+        )
+    }
+    since = timezone.now() - timedelta(days=AFFINITY_WINDOW_DAYS)
+    section_work = dict(
+        ServiceRequest.objects.filter(
+            service_provider_id=service_request.service_provider_id,
+            section_id=service_request.section_id,
+            assigned_to_id__in=candidate_ids,
+            created_at__gte=since,
+        ).values_list('assigned_to_id').annotate(n=Count('id'))
+    )
+    total_section_work = sum(section_work.values()) or 1
+
+    scores = {}
+    for user_id in candidate_ids:
+        load = loads.get(user_id)
+        score = weights['open_load'] * (load.open_count if load else 0)
+        score -= weights['section_affinity'] * section_work.get(user_id, 0) / total_section_work
+        average = load.average_turnaround if load else None
+        if average is not None:
+            score += weights['turnaround_hours'] * average / 3600
+        scores[user_id] = score
+    return scores
+
+
+def pick_assignee(service_request):
+    candidate_ids = list(
+        User.objects.filter(serviceprovider=service_request.service_provider_id, is_active=True)
+        .values_list('id', flat=True)
+    )
+    if not candidate_ids:
+        return None
+    scores = score_candidates(service_request, candidate_ids)
+    user_id = min(candidate_ids, key=lambda pk: (scores[pk], pk))
+    return User.objects.select_related('profile').get(pk=user_id)
+
+
+def auto_assign(service_request, actor):
+    """Assign a new request when its provider has auto_assign enabled, returns the assignee."""
+    if service_request.assigned_to_id or not service_request.service_provider.auto_assign:
+        return None
+    user = pick_assignee(service_request)
+    if user is None:
+        return None
+    service_request.assigned_to = user
+    service_request.save(update_fields=['assigned_to', 'updated_at'])
+    # log
+    log_event(service_request, LogEvent.AUTO_ASSIGNED, actor, target=user, note=user.username)
+    return user
@@ -0,0 +1,306 @@
+import re
+import uuid
+from datetime import timedelta
+from io import BytesIO
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.http import FileResponse, HttpResponse, HttpResponseNotModified, StreamingHttpResponse
+from django.utils import timezone
+
+from . import tasks
+from .archive import ARCHIVE_DB, archive_enabled
+from .blobstore import READ_SIZE, get_blob_store
+from .models import Attachment, AttachmentUpload, Blob
+from .refcache import user_provider_ids, user_section_ids
+
+
+# Before and after photos of a request, taken on the technicians' phones.
+#
+# Uploads are resumable and sent in chunks: POST starts an AttachmentUpload,
+# every PATCH appends the chunk at Upload-Offset, read from the request body in
+# small blocks straight to the blob store, and after a dropped connection HEAD
+# tells where to carry on. The chunk reaching the announced size completes the
+# upload: its sha256 names the blob, so the same photo is stored once however
+# often it is attached, and a task writes the thumbnails in the background.
+#
+# Attachments are served with their digest as ETag and honour Range requests,
+# so a large photo can be fetched in pieces or resumed.
+
+MAX_SIZE = getattr(settings, 'ATTACHMENT_MAX_SIZE', 25 * 1024 * 1024)
+# the chunk size the client is asked to send, one PATCH must fit in a request
+CHUNK_SIZE = getattr(settings, 'ATTACHMENT_CHUNK_SIZE', 1024 * 1024)
+# uploads that received nothing for this long are removed by clean_attachment_uploads
+UPLOAD_EXPIRY_HOURS = getattr(settings, 'ATTACHMENT_UPLOAD_EXPIRY_HOURS', 24)
+# longest a single PATCH may take on a slow mobile link, the chunk lock is held that long at most
+CHUNK_TIMEOUT = getattr(settings, 'ATTACHMENT_CHUNK_TIMEOUT', 10 * 60)
+THUMBNAIL_SIZES = (320, 1280)
+CACHE_CONTROL = 'private, max-age=31536000, immutable'
+
+# magic numbers of the accepted photo formats
+SIGNATURES = [
+    (b'\xff\xd8\xff', 'image/jpeg'),
+    (b'\x89PNG\r\n\x1a\n', 'image/png'),
+    (b'GIF87a', 'image/gif'),
+    (b'GIF89a', 'image/gif'),
+]
+
+
+class UploadError(Exception):
+    def __init__(self, message, status=400, offset=None):
+        super().__init__(message)
+        self.message = message
+        self.status = status
+        # the bytes received, for the client to continue from
+        self.offset = offset
+
+
+def sniff(head):
+    """The content type of a photo from its first bytes, None for anything else."""
+    if head[:4] == b'RIFF' and head[8:12] == b'WEBP':
+        return 'image/webp'
+    for signature, content_type in SIGNATURES:
+        if head.startswith(signature):
+            return content_type
+    return None
+
+
+def can_access(user, service_request):
+    """The requester, the managers of the request's section and provider and staff see its photos."""
+    if not user.is_authenticated:
+        return False
+    return (
+        user.is_staff
+        or service_request.created_by_id == user.id
+        or service_request.service_provider_id in user_provider_ids(user.id)
+        or service_request.section_id in user_section_ids(user.id)
+    )
+
+
+def thumbnail_key(digest, size):
+    return f'{digest}_{size}.jpg'
+
+
+def get_attachment(id):
+    """The attachment with its blob and request, from the archive when its request was archived."""
+    queryset = Attachment.objects.select_related('blob', 'service_request')
+    attachment = queryset.filter(id=id).first()
+    if attachment is None and archive_enabled():
+        attachment = queryset.using(ARCHIVE_DB).filter(id=id).first()
+    return attachment
+
+
+# --- uploads -----------------------------------------------------------------
+
+def start_upload(user, service_request, name, size, kind=Attachment.BEFORE, completion_report=None):
+    if kind not in dict(Attachment.KINDS):
+        raise UploadError('نوع الصورة غير معروف')
+    if not 0 < size <= MAX_SIZE:
+        raise UploadError(f'حجم الصورة يجب ألا يتجاوز {MAX_SIZE // (1024 * 1024)} ميجابايت', status=413)
+    if completion_report is not None and completion_report.service_request_id != service_request.id:
+        raise UploadError('تقرير الإنجاز لا يخص هذا الطلب')
+    return AttachmentUpload.objects.create(
+        service_request=service_request,
+        completion_report=completion_report,
+        kind=kind,
+        name=name[:255] or 'photo',
+        size=size,
+        uploaded_by=user,
+    )
+
+
+def received(upload):
+    return get_blob_store().received(upload.pk)
+
+
+def receive_chunk(upload, offset, stream, length):
+    """Append a chunk sent at offset, returns (received, attachment once complete else None)."""
+    store = get_blob_store()
+    lock_key = f'attachment-upload:{upload.pk}'
+    # two requests appending to one part file would interleave their bytes; the
+    # token keeps a request whose lock expired from releasing the next one's
+    token = uuid.uuid4().hex
+    if not cache.add(lock_key, token, CHUNK_TIMEOUT):
+        raise UploadError('جزء آخر من الصورة قيد الرفع', status=409, offset=store.received(upload.pk))
+    try:
+        received = store.received(upload.pk)
+        if offset != received:
+            raise UploadError('موضع الجزء لا يطابق ما تم استلامه', status=409, offset=received)
+        if received + length > upload.size:
+            raise UploadError('الجزء يتجاوز حجم الصورة', status=413, offset=received)
+        received += store.append(upload.pk, stream, length)
+        if received < upload.size:
+            AttachmentUpload.objects.filter(pk=upload.pk).update(updated_at=timezone.now())
+            return received, None
+        return received, complete_upload(upload)
+    finally:
+        if cache.get(lock_key) == token:
+            cache.delete(lock_key)
+
+
+def cancel_upload(upload):
+    get_blob_store().discard(upload.pk)
+    upload.delete()
+
+
+def complete_upload(upload):
+    store = get_blob_store()
+    content_type = sniff(store.read_head(upload.pk, 16))
+    if content_type is None:
+        cancel_upload(upload)
+        raise UploadError('الملف ليس صورة (JPEG أو PNG أو WebP أو GIF)', status=415)
+    digest = store.digest(upload.pk)
+    with transaction.atomic():
+        blob, _ = Blob.objects.get_or_create(
+            sha256=digest, defaults={'size': upload.size, 'content_type': content_type}
+        )
+        # the file goes in place before the row commits: nothing reads a blob file
+        # without its row, and one left by a rollback is reused by the next upload
+        # of the same photo or removed by clean_blobs
+        store.commit(upload.pk, digest)
+        attachment = Attachment.objects.create(
+            service_request_id=upload.service_request_id,
+            completion_report_id=upload.completion_report_id,
+            blob=blob,
+            kind=upload.kind,
+            name=upload.name,
+            uploaded_by_id=upload.uploaded_by_id,
+        )
+        upload.delete()
+        if not blob.thumbnails_ready:
+            tasks.process_attachment.delay(blob.id)
+    return attachment
+
+
+def process_blob(blob_id):
+    """Write the thumbnails of a blob, run by the process_attachment task."""
+    # Pillow is only needed by the task processing uploads, not at web worker startup
+    from PIL import Image, ImageOps
+
+    blob = Blob.objects.filter(pk=blob_id).first()
+    if not blob or blob.thumbnails_ready:
+        return
+    store = get_blob_store()
+    with store.open(blob.sha256) as f:
+        image = Image.open(f)
+        # a JPEG is decoded at the smallest scale still larger than the biggest thumbnail
+        image.draft('RGB', (THUMBNAIL_SIZES[-1], THUMBNAIL_SIZES[-1]))
+        image.load()
+        image = ImageOps.exif_transpose(image)
+        if image.mode != 'RGB':
+            image = image.convert('RGB')
+    for size in THUMBNAIL_SIZES:
+        thumbnail = image.copy()
+        thumbnail.thumbnail((size, size), Image.LANCZOS)
+        buffer = BytesIO()
+        thumbnail.save(buffer, 'JPEG', quality=85, optimize=True, progressive=True)
+        store.save(thumbnail_key(blob.sha256, size), buffer.getvalue())
+    Blob.objects.filter(pk=blob_id).update(thumbnails_ready=True)
+
+
+def clean_uploads(dry_run=False):
+    """Remove the uploads that received nothing for UPLOAD_EXPIRY_HOURS, returns their number."""
+    store = get_blob_store()
+    cutoff = timezone.now() - timedelta(hours=UPLOAD_EXPIRY_HOURS)
+    rows = AttachmentUpload.objects.filter(updated_at__lt=cutoff).values_list('id', flat=True)
+    expired = {str(upload_id) for upload_id in rows}
+    # part files whose upload row went with its request
+    expired.update(store.stale_uploads(UPLOAD_EXPIRY_HOURS * 3600))
+    if not dry_run:
+        AttachmentUpload.objects.filter(id__in=expired).delete()
+        for upload_id in expired:
+            store.discard(upload_id)
+    return len(expired)
+
+
+def clean_blobs(dry_run=False):
+    """Remove the blob files without a Blob row, left by rolled back uploads, returns their number.
+
+    Only files older than UPLOAD_EXPIRY_HOURS are looked at, an upload still
+    completing has its row by then.
+    """
+    store = get_blob_store()
+    keys = store.stale_blobs(UPLOAD_EXPIRY_HOURS * 3600)
+    # thumbnails are named after the digest of their blob
+    digests = sorted({key[:64] for key in keys})
+    known = set()
+    databases = ['default', ARCHIVE_DB] if archive_enabled() else ['default']
+    for start in range(0, len(digests), 500):
+        batch = digests[start:start + 500]
+        for using in databases:
+            known.update(Blob.objects.using(using).filter(sha256__in=batch).values_list('sha256', flat=True))
+    orphans = [key for key in keys if key[:64] not in known]
+    if not dry_run:
+        for key in orphans:
+            store.delete(key)
+    return len(orphans)
+
+
+# --- serving -----------------------------------------------------------------
+
+RANGE = re.compile(r'^bytes=(\d*)-(\d*)$')
+
+
+def byte_range(header, size):
+    """(start, end) of a single Range header, None to send the whole file, 'invalid' when unsatisfiable."""
+    match = RANGE.match(header.strip())
+    if not match or match.groups() == ('', ''):
+        # several ranges or a syntax error: the whole file, as RFC 9110 allows
+        return None
+    first, last = match.groups()
+    if first == '':
+        # the last n bytes
+        start, end = max(size - int(last), 0), size - 1
+    else:
+        start, end = int(first), min(int(last), size - 1) if last else size - 1
+    if start >= size or start > end:
+        return 'invalid'
+    return start, end
+
+
+def _read(f, length):
+    try:
+        while length > 0:
+            chunk = f.read(min(READ_SIZE, length))
+            if not chunk:
+                break
+            length -= len(chunk)
+            yield chunk
+    finally:
+        f.close()
+
+
+def serve(request, attachment, size=None):
+    """The photo, or its thumbnail of the given size once written, honouring Range and If-None-Match."""
+    blob = attachment.blob
+    key, content_type = blob.sha256, blob.content_type
+    if size and blob.thumbnails_ready:
+        key, content_type = thumbnail_key(blob.sha256, size), 'image/jpeg'
+    etag = f'"{key}"'
+    if etag in request.headers.get('If-None-Match', ''):
+        response = HttpResponseNotModified()
+        response['ETag'] = etag
+        return response
+
+    store = get_blob_store()
+    total = store.size(key)
+    requested = None
+    if 'Range' in request.headers and request.headers.get('If-Range', etag) == etag:
+        requested = byte_range(request.headers['Range'], total)
+    if requested == 'invalid':
+        response = HttpResponse(status=416)
+        response['Content-Range'] = f'bytes */{total}'
+    elif requested is None:
+        response = FileResponse(store.open(key), content_type=content_type, filename=attachment.name)
+    else:
+        start, end = requested
+        f = store.open(key)
+        f.seek(start)
+        response = StreamingHttpResponse(_read(f, end - start + 1), status=206, content_type=content_type)
+        response['Content-Range'] = f'bytes {start}-{end}/{total}'
+        response['Content-Length'] = end - start + 1
+    response['Accept-Ranges'] = 'bytes'
+    response['ETag'] = etag
+    response['Cache-Control'] = CACHE_CONTROL
+    return response
@@ -0,0 +1,86 @@
+from .models import (
+    CompletionReport, InventoryOrder, LogEvent, LogTarget, PurchaseOrder, Report, ServiceRequest,
+    ServiceRequestLog, ServiceRequestLogArchive, User,
+)
+
+
+EVENT_TEXT = {
+    LogEvent.NOTE: '{note}',
+    LogEvent.CREATED: 'تم إنشاء طلب جديد',
+    LogEvent.ASSIGNED: 'تم تعيين الطلب الى المستخدم {note}',
+    LogEvent.AUTO_ASSIGNED: 'تم تعيين الطلب تلقائياً الى المستخدم {note}',
+    LogEvent.REPORT_CREATED: 'تم إنشاء تقرير جديد',
+    LogEvent.OUTSOURCE_REPORT_CREATED: 'تم انشاء تقرير احتياج خدمة خارجية',
+    LogEvent.COMPLETION_REPORT_CREATED: 'تم إنشاء تقرير إنجاز',
+    LogEvent.COMPLETION_REPORT_EDITED: 'تم تعديل تقرير إنجاز',
+    LogEvent.PURCHASE_ORDER_CREATED: 'تم إنشاء طلب شراء',
+    LogEvent.PURCHASE_ORDER_EDITED: 'تم تعديل طلب الشراء',
+    LogEvent.PURCHASE_ORDER_STATUS: 'تم تعديل حالة طلب الشراء الى {new_status}',
+    LogEvent.INVENTORY_ORDER_CREATED: 'تم إنشاء طلب مخزني',
+    LogEvent.INVENTORY_ORDER_EDITED: 'تم تعديل طلب مخزني',
+    LogEvent.INVENTORY_ORDER_STATUS: 'تم تعديل حالة طلب مخزني الى {new_status}',
+    LogEvent.STATUS_CHANGED: 'تم تعديل حالة الطلب الى {new_status}',
+    LogEvent.REOPENED: 'تم اعادة حالة الطلب الى قيد العمل: {note}',
+    LogEvent.COMPLETED: 'تم اكمال الطلب',
+}
+
+TARGET_TYPES = {
+    ServiceRequest: LogTarget.SERVICE_REQUEST,
+    User: LogTarget.USER,
+    Report: LogTarget.REPORT,
+    CompletionReport: LogTarget.COMPLETION_REPORT,
+    PurchaseOrder: LogTarget.PURCHASE_ORDER,
+    InventoryOrder: LogTarget.INVENTORY_ORDER,
+}
+
+# which status choices the old/new status of an event refer to
+STATUS_MODELS = {
+    LogEvent.PURCHASE_ORDER_STATUS: PurchaseOrder,
+    LogEvent.INVENTORY_ORDER_STATUS: InventoryOrder,
+}
+
+
+def _status_label(event, status):
+    if not status:
+        return ''
+    model = STATUS_MODELS.get(event, ServiceRequest)
+    return dict(model._meta.get_field('status').choices).get(status, status)
+
+
+def render_log(log):
+    template = EVENT_TEXT.get(log.event, '{note}')
+    return template.format(
+        note=log.note,
+        old_status=_status_label(log.event, log.old_status),
+        new_status=_status_label(log.event, log.new_status),
+    )
+
+
+def log_event(service_request, event, actor, target=None, old_status='', new_status='', note=''):
+    if target is None:
+        target = service_request
+    return ServiceRequestLog.objects.create(
+        service_request=service_request,
+        event=event,
+        target_type=TARGET_TYPES[type(target)],
+        target_id=target.pk,
+        old_status=old_status or '',
+        new_status=new_status or '',
+        note=note or '',
+        created_by=actor,
+    )
+
+
+def request_logs(service_request):
+    """Archived and current log rows of a request, oldest first."""
+    # an archived request has its logs in the archive database too
+    db = service_request._state.db
+    archived = list(
+        ServiceRequestLogArchive.objects.using(db).filter(service_request=service_request)
+        .select_related('created_by').order_by('created_at')
+    )
+    current = list(
+        ServiceRequestLog.objects.using(db).filter(service_request=service_request)
+        .select_related('created_by').order_by('created_at', 'id')
+    )
+    return archived + current
@@ -0,0 +1,144 @@
+import hashlib
+import os
+import time
+from functools import lru_cache
+
+from django.conf import settings
+from django.utils.module_loading import import_string
+
+
+# Attachments are kept in a blob store, each file under the sha256 of its
+# content, so a photo uploaded twice is stored once and a stored file never
+# changes. LocalBlobStore keeps them on the local disk and stands in for an
+# object store; another backend only has to provide the same methods and be
+# named by ATTACHMENT_BLOB_STORE.
+#
+# An upload is appended to a part file of its own and moved to its key in one
+# rename once complete, readers never see half a file. The file is moved before
+# the transaction creating its Blob row commits, so a row never names a missing
+# file; a rolled back upload leaves a file without a row instead, which
+# clean_attachment_uploads removes later.
+
+# bytes read from a request body or a file at a time
+READ_SIZE = 64 * 1024
+
+
+class LocalBlobStore:
+    def __init__(self, location=None):
+        self.location = location or getattr(
+            settings, 'ATTACHMENT_ROOT', os.path.join(settings.MEDIA_ROOT, 'attachments')
+        )
+
+    def path(self, key):
+        # shard by the first two hex chars so the directory stays small
+        return os.path.join(self.location, 'blobs', key[:2], key)
+
+    def part_path(self, upload_id):
+        return os.path.join(self.location, 'parts', f'{upload_id}.part')
+
+    # --- uploads -------------------------------------------------------------
+
+    def received(self, upload_id):
+        """Bytes of the upload written so far."""
+        try:
+            return os.path.getsize(self.part_path(upload_id))
+        except FileNotFoundError:
+            return 0
+
+    def append(self, upload_id, stream, length):
+        """Copy at most length bytes of stream to the end of the upload, returns the bytes written."""
+        path = self.part_path(upload_id)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        written = 0
+        with open(path, 'ab') as f:
+            while written < length:
+                chunk = stream.read(min(READ_SIZE, length - written))
+                if not chunk:
+                    break
+                f.write(chunk)
+                written += len(chunk)
+        return written
+
+    def read_head(self, upload_id, size):
+        with open(self.part_path(upload_id), 'rb') as f:
+            return f.read(size)
+
+    def digest(self, upload_id):
+        sha = hashlib.sha256()
+        with open(self.part_path(upload_id), 'rb') as f:
+            for chunk in iter(lambda: f.read(READ_SIZE), b''):
+                sha.update(chunk)
+        return sha.hexdigest()
+
+    def commit(self, upload_id, key):
+        """Move a complete upload to key; when the blob exists already the upload is dropped."""
+        path = self.path(key)
+        if os.path.exists(path):
+            self.discard(upload_id)
+            # a blob file is only removed once it is old and has no row, see stale_blobs
+            os.utime(path)
+            return False
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        os.replace(self.part_path(upload_id), path)
+        return True
+
+    def discard(self, upload_id):
+        try:
+            os.remove(self.part_path(upload_id))
+        except FileNotFoundError:
+            pass
+
+    def stale_uploads(self, seconds):
+        """Ids of the uploads that received nothing for the given seconds."""
+        directory = os.path.join(self.location, 'parts')
+        if not os.path.isdir(directory):
+            return []
+        cutoff = time.time() - seconds
+        return [
+            entry.name[:-len('.part')] for entry in os.scandir(directory)
+            if entry.name.endswith('.part') and entry.stat().st_mtime < cutoff
+        ]
+
+    # --- blobs ---------------------------------------------------------------
+
+    def stale_blobs(self, seconds):
+        """Keys of the blobs and thumbnails not written for the given seconds."""
+        directory = os.path.join(self.location, 'blobs')
+        if not os.path.isdir(directory):
+            return []
+        cutoff = time.time() - seconds
+        return [
+            entry.name for shard in os.scandir(directory) if shard.is_dir()
+            for entry in os.scandir(shard.path) if entry.stat().st_mtime < cutoff
+        ]
+
+    def delete(self, key):
+        try:
+            os.remove(self.path(key))
+        except FileNotFoundError:
+            pass
+
+    def exists(self, key):
+        return os.path.exists(self.path(key))
+
+    def size(self, key):
+        return os.path.getsize(self.path(key))
+
+    def open(self, key):
+        return open(self.path(key), 'rb')
+
+    def save(self, key, data):
+        """Store derived bytes, e.g. a thumbnail, under key unless they exist."""
+        path = self.path(key)
+        if os.path.exists(path):
+            return
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        temporary = f'{path}.{os.getpid()}.tmp'
+        with open(temporary, 'wb') as f:
+            f.write(data)
+        os.replace(temporary, path)
+
+
+@lru_cache(maxsize=None)
+def get_blob_store():
+    return import_string(getattr(settings, 'ATTACHMENT_BLOB_STORE', 'app1.blobstore.LocalBlobStore'))()
@@ -0,0 +1,77 @@
+from django.conf import settings
+from django.db.models import F, Window
+from django.db.models.functions import RowNumber
+from django.template.defaultfilters import truncatechars
+from django.urls import reverse
+from django.utils.formats import date_format
+
+from .projections import request_rows
+
+
+# The board of requests_board shows the requests of a provider in one column
+# per status. All columns are read by one query: ROW_NUMBER() numbers the
+# requests of each status newest first and only the first PAGE_SIZE + 1 of
+# every column are returned, the extra one tells the column has more. "Load
+# more" reads a single column after the id of its last card (keyset, no
+# OFFSET). The column totals come from the InboxCounter rows, see app1.inbox.
+#
+# Dragging a card runs the transition path of its current and new status, as
+# the buttons of the request page do; the paths that ask for a report or a
+# note open their form instead.
+
+COLUMNS = ('pending', 'in_progress', 'under_review', 'completed')
+PAGE_SIZE = getattr(settings, 'BOARD_PAGE_SIZE', 20)
+
+# (from, to): 'direct' runs the transition in place, a url name opens its form
+MOVES = {
+    ('pending', 'in_progress'): 'request_detail',  # the first report starts the work
+    ('in_progress', 'under_review'): 'direct',
+    ('under_review', 'in_progress'): 'mark_as_in_progress',
+}
+
+
+def allowed_moves():
+    """{from: [to, ...]}, for the page to mark the columns a card can be dropped on."""
+    moves = {status: [] for status in COLUMNS}
+    for old, new in MOVES:
+        moves[old].append(new)
+    return moves
+
+
+def card(service_request):
+    assignee = service_request.assigned_to
+    return {
+        'id': service_request.id,
+        'title': service_request.title,
+        'description': truncatechars(service_request.description_snippet, 80),
+        'section': service_request.section.name,
+        'assignee': (assignee.get_full_name() or assignee.username) if assignee else '',
+        'status': service_request.status,
+        'created_at': date_format(service_request.created_at, 'Y-m-d H:i'),
+        'url': reverse('request_detail', args=[service_request.id]),
+    }
+
+
+def _page(cards, page_size):
+    # the cursor is the id of the last card shown, None when nothing follows it
+    return {'cards': cards[:page_size], 'cursor': cards[page_size - 1]['id'] if len(cards) > page_size else None}
+
+
+def columns(queryset, page_size=PAGE_SIZE):
+    """{status: {'cards': [...], 'cursor': id or None}} of every column, in one query."""
+    ranked = request_rows(queryset, with_assignee=True).annotate(
+        column_rank=Window(RowNumber(), partition_by=F('status'), order_by=F('id').desc())
+    )
+    cards = {status: [] for status in COLUMNS}
+    for service_request in ranked.filter(column_rank__lte=page_size + 1).order_by('status', '-id'):
+        cards.setdefault(service_request.status, []).append(card(service_request))
+    return {status: _page(column, page_size) for status, column in cards.items()}
+
+
+def column_page(queryset, status, before=None, page_size=PAGE_SIZE):
+    """The next cards of one column, older than the card with id before."""
+    queryset = queryset.filter(status=status)
+    if before:
+        queryset = queryset.filter(id__lt=before)
+    rows = request_rows(queryset, with_assignee=True).order_by('-id')[:page_size + 1]
+    return _page([card(service_request) for service_request in rows], page_size)
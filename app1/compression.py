@@ -0,0 +1,136 @@
+import re
+
+from django.conf import settings
+from django.middleware.gzip import GZipMiddleware
+from django.utils.cache import patch_vary_headers
+from django.utils.text import compress_string
+
+try:
+    import brotli
+except ImportError:  # optional, responses are gzipped without it
+    brotli = None
+
+
+COMPRESS_MIN_SIZE = getattr(settings, 'COMPRESS_MIN_SIZE', 1024)
+HTML_MINIFY = getattr(settings, 'HTML_MINIFY', True)
+
+# BREACH needs a secret and attacker controlled text in the same compressed
+# body. Django masks the CSRF token differently in every response and pads
+# gzip output with random bytes; on top of that a page that rendered the token
+# is sent uncompressed when the request carries free text that could be
+# reflected next to it. These parameters only take ids and choice keys.
+COMPRESS_SAFE_QUERY_PARAMS = getattr(settings, 'COMPRESS_SAFE_QUERY_PARAMS', ('filter', 'assigned_to', 'page'))
+COMPRESS_EXCLUDE_URL_NAMES = getattr(settings, 'COMPRESS_EXCLUDE_URL_NAMES', ('login', 'password_change'))
+
+re_accepts_br = re.compile(r'\bbr\b')
+re_accepts_gzip = re.compile(r'\bgzip\b')
+re_safe_value = re.compile(r'^[\w-]{0,40}$')
+# photos and other binary files are compressed already; streamed files are
+# left alone too, a Range answer counts offsets in the uncompressed bytes
+re_compressible_type = re.compile(r'^(text/|application/(json|javascript|xml|manifest\+json)|image/svg\+xml)')
+
+
+def reflects_input(request):
+    if request.method not in ('GET', 'HEAD'):
+        return True
+    for key, values in request.GET.lists():
+        if key not in COMPRESS_SAFE_QUERY_PARAMS:
+            return True
+        if not all(re_safe_value.match(value) for value in values):
+            return True
+    return False
+
+
+def compressible(response):
+    return not response.streaming and bool(re_compressible_type.match(response.get('Content-Type', '')))
+
+
+def breach_exposed(request, response):
+    url_name = request.resolver_match.url_name if request.resolver_match else None
+    if url_name in COMPRESS_EXCLUDE_URL_NAMES:
+        return True
+    # the flag get_token() sets is cleared again by CsrfViewMiddleware, look for the token itself
+    return b'csrfmiddlewaretoken' in response.content and reflects_input(request)
+
+
+class CompressionMiddleware(GZipMiddleware):
+    """Brotli or gzip for text responses above COMPRESS_MIN_SIZE, skipping BREACH exposed pages."""
+
+    def process_response(self, request, response):
+        if response.has_header('Content-Encoding') or not compressible(response):
+            return response
+        if len(response.content) < COMPRESS_MIN_SIZE:
+            return response
+        patch_vary_headers(response, ('Accept-Encoding',))
+        if breach_exposed(request, response):
+            return response
+
+        accept = request.META.get('HTTP_ACCEPT_ENCODING', '')
+        if brotli is not None and re_accepts_br.search(accept):
+            compressed, encoding = brotli.compress(response.content, quality=5), 'br'
+        elif re_accepts_gzip.search(accept):
+            compressed = compress_string(response.content, max_random_bytes=self.max_random_bytes)
+            encoding = 'gzip'
+        else:
+            return response
+        if len(compressed) >= len(response.content):
+            return response
+
+        response.content = compressed
+        response.headers['Content-Length'] = str(len(compressed))
+        etag = response.get('ETag')
+        if etag and etag.startswith('"'):
+            response.headers['ETag'] = 'W/' + etag
+        response.headers['Content-Encoding'] = encoding
+        return response
+
+
+# --- minification ------------------------------------------------------------
+
+# whitespace is significant in these, they are copied through as they are
+re_raw_blocks = re.compile(r'(<(pre|textarea|script|style)\b.*?</\2\s*>)', re.IGNORECASE | re.DOTALL)
+# conditional comments are kept
+re_comment = re.compile(r'<!--(?!\[if).*?-->', re.DOTALL)
+re_line_break = re.compile(r'[ \t\r\f\v]*\n\s*')
+re_spaces = re.compile(r'[ \t\r\f\v]{2,}')
+
+
+def minify_html(html):
+    """Drop comments, indentation and blank lines; a run of whitespace stays one space or newline.
+
+    Only whitespace between words is touched and never removed entirely, so the
+    rendered text, including the spacing of mixed Arabic/Latin runs, is unchanged.
+    """
+    parts = re_raw_blocks.split(html)
+    out = []
+    # split() yields text, raw block, tag name, text, ...
+    for i in range(0, len(parts), 3):
+        text = re_comment.sub('', parts[i])
+        text = re_line_break.sub('\n', text)
+        out.append(re_spaces.sub(' ', text))
+        if i + 1 < len(parts):
+            out.append(parts[i + 1])
+    return ''.join(out)
+
+
+class HtmlMinifyMiddleware:
+    """Minify rendered HTML pages before CompressionMiddleware sees them."""
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        response = self.get_response(request)
+        if (
+            not HTML_MINIFY
+            or response.streaming
+            or response.status_code != 200
+            or response.has_header('Content-Encoding')
+            or not response.get('Content-Type', '').startswith('text/html')
+        ):
+            return response
+        charset = response.charset
+        response.content = minify_html(response.content.decode(charset)).encode(charset)
+        if response.has_header('Content-Length'):
+            response.headers['Content-Length'] = str(len(response.content))
+        return response
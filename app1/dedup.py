@@ -0,0 +1,143 @@
+import hashlib
+import re
+import struct
+import unicodedata
+from datetime import timedelta
+
+from django.conf import settings
+from django.utils import timezone
+
+
+# --- normalization -----------------------------------------------------------
+
+ARABIC_DIACRITICS = re.compile('[\u0610-\u061a\u064b-\u065f\u0670\u06d6-\u06ed\u0640]')  # tashkeel and tatweel
+ARABIC_LETTER_VARIANTS = str.maketrans({
+    'أ': 'ا', 'إ': 'ا', 'آ': 'ا', 'ٱ': 'ا',  # alef forms
+    'ى': 'ي', 'ئ': 'ي', 'ی': 'ي',           # ya forms, incl. Persian ya
+    'ؤ': 'و', 'ة': 'ه', 'ک': 'ك',
+    **{chr(0x0660 + d): str(d) for d in range(10)},  # Arabic-Indic digits
+    **{chr(0x06F0 + d): str(d) for d in range(10)},  # Eastern Arabic-Indic digits
+})
+WHITESPACE = re.compile(r'\s+')
+
+
+def normalize_text(text):
+    """Fold the spelling differences that do not change the meaning of a request."""
+    # NFKC folds Arabic presentation forms into the plain letters
+    text = unicodedata.normalize('NFKC', text or '').casefold()
+    text = ARABIC_DIACRITICS.sub('', text)
+    text = text.translate(ARABIC_LETTER_VARIANTS)
+    text = ''.join(
+        ' ' if unicodedata.category(ch)[0] in 'PS' else ch
+        for ch in text
+    )
+    return WHITESPACE.sub(' ', text).strip()
+
+
+def request_content_hash(title, description, section_id, service_provider_id, created_by_id):
+    key = '\x1f'.join([
+        normalize_text(title), normalize_text(description),
+        str(section_id), str(service_provider_id), str(created_by_id),
+    ])
+    return hashlib.sha256(key.encode('utf-8')).hexdigest()
+
+
+# the fields the fingerprints are made of, save() refreshes them only when one changed
+CONTENT_FIELDS = ('title', 'description', 'section_id', 'service_provider_id', 'created_by_id')
+
+
+def content_snapshot(service_request):
+    # read from __dict__ so deferred fields are not loaded just for this
+    values = service_request.__dict__
+    return tuple(values.get(field) for field in CONTENT_FIELDS)
+
+
+# --- MinHash -----------------------------------------------------------------
+
+MINHASH_PERMUTATIONS = 64
+SHINGLE_SIZE = 4
+_MAX_HASH = (1 << 32) - 1
+
+
+def shingles(text):
+    text = normalize_text(text)
+    if len(text) <= SHINGLE_SIZE:
+        return {text} if text else set()
+    return {text[i:i + SHINGLE_SIZE] for i in range(len(text) - SHINGLE_SIZE + 1)}
+
+
+def minhash_signature(text):
+    """Return the signature as packed uint32 values, 4 bytes per bin.
+
+    One-permutation hashing: every shingle is hashed once, the low bits pick
+    a bin and each bin keeps its minimum, so the cost does not grow with the
+    number of bins. Empty bins borrow from the next filled one.
+    """
+    bins = [None] * MINHASH_PERMUTATIONS
+    for s in shingles(text):
+        h = int.from_bytes(hashlib.blake2b(s.encode('utf-8'), digest_size=8).digest(), 'little')
+        index = h % MINHASH_PERMUTATIONS
+        value = (h // MINHASH_PERMUTATIONS) & _MAX_HASH
+        if bins[index] is None or value < bins[index]:
+            bins[index] = value
+    filled = [i for i, value in enumerate(bins) if value is not None]
+    if not filled:
+        return b''
+    for i, value in enumerate(bins):
+        if value is None:
+            donor = next((j for j in filled if j > i), filled[0])
+            bins[i] = bins[donor]
+    return struct.pack(f'<{MINHASH_PERMUTATIONS}I', *bins)
+
+
+def similarity(signature_a, signature_b):
+    """Estimated Jaccard similarity of the shingle sets behind two signatures."""
+    if not signature_a or not signature_b or len(signature_a) != len(signature_b):
+        return 0.0
+    a = struct.unpack(f'<{MINHASH_PERMUTATIONS}I', signature_a)
+    b = struct.unpack(f'<{MINHASH_PERMUTATIONS}I', signature_b)
+    return sum(x == y for x, y in zip(a, b)) / MINHASH_PERMUTATIONS
+
+
+def request_signature(title, description):
+    return minhash_signature(f'{title} {description}')
+
+
+# --- lookups -----------------------------------------------------------------
+
+def duplicate_window():
+    return timedelta(days=getattr(settings, 'DUPLICATE_REQUEST_WINDOW_DAYS', 30))
+
+
+def find_duplicate(content_hash):
+    from .models import ServiceRequest
+    # served by the (content_hash, created_at) index
+    return ServiceRequest.objects.filter(
+        content_hash=content_hash,
+        created_at__gte=timezone.now() - duplicate_window(),
+    ).only('id', 'title').first()
+
+
+def find_near_duplicates(signature, section_id, service_provider_id, limit=3):
+    """Open requests of the same section and provider whose text is similar enough."""
+    from .models import ServiceRequest
+    if not signature or not getattr(settings, 'NEAR_DUPLICATE_DETECTION', True):
+        return []
+    threshold = getattr(settings, 'NEAR_DUPLICATE_THRESHOLD', 0.6)
+    candidates = (
+        ServiceRequest.objects.filter(
+            section_id=section_id,
+            service_provider_id=service_provider_id,
+            created_at__gte=timezone.now() - duplicate_window(),
+        )
+        .exclude(status='completed')
+        .exclude(minhash=None)
+        .values_list('id', 'title', 'minhash')
+    )
+    matches = []
+    for pk, title, candidate in candidates.iterator():
+        score = similarity(signature, bytes(candidate))
+        if score >= threshold:
+            matches.append({'id': pk, 'title': title, 'similarity': score})
+    matches.sort(key=lambda m: m['similarity'], reverse=True)
+    return matches[:limit]
@@ -0,0 +1,167 @@
+from collections import defaultdict
+from datetime import timedelta
+
+from django.db import transaction
+from django.db.models import F
+from django.utils import timezone
+
+from . import refcache
+from .models import Escalation, EscalationRule, ServiceRequest, UserProfile
+from .notifications import REQUEST_URL, list_message, notify
+
+
+# Every open request carries next_escalation_at, the time the earliest rule
+# for its current status is due. A tick only reads the indexed rows whose time
+# came, however many requests are open, records the rules that fired and moves
+# next_escalation_at on to the following rule.
+
+STATUS_LABELS = dict(ServiceRequest._meta.get_field('status').choices)
+# columns a tick needs, the due query reads nothing else
+FIELDS = ('id', 'title', 'status', 'section_id', 'service_provider_id', 'assigned_to_id', 'status_changed_at')
+
+
+def status_changed(service_request):
+    # _load_snapshot is the state the request was loaded with, see app1.signals;
+    # a request loaded without its status cannot tell and keeps its schedule
+    loaded_status = service_request._load_snapshot[2]
+    return loaded_status is not None and service_request.status != loaded_status
+
+
+def applies(rule, service_request):
+    return (
+        rule.status == service_request.status
+        and rule.section_id in (None, service_request.section_id)
+        and rule.service_provider_id in (None, service_request.service_provider_id)
+    )
+
+
+def fire_time(rule, service_request):
+    return service_request.status_changed_at + timedelta(hours=rule.after_hours)
+
+
+def next_rule_hours(service_request, rules, after=None):
+    """after_hours of the earliest applicable rule due after the given time."""
+    hours = [
+        rule.after_hours for rule in rules
+        if applies(rule, service_request) and (after is None or fire_time(rule, service_request) > after)
+    ]
+    return min(hours, default=None)
+
+
+def next_escalation(service_request, rules, after=None):
+    hours = next_rule_hours(service_request, rules, after)
+    return None if hours is None else service_request.status_changed_at + timedelta(hours=hours)
+
+
+def schedule(service_request):
+    """Called by ServiceRequest.save() when the request enters a status."""
+    service_request.status_changed_at = timezone.now()
+    service_request.next_escalation_at = next_escalation(service_request, refcache.escalation_rules())
+
+
+def reschedule(batch_size=1000):
+    """Recompute next_escalation_at of every open request, after the rules changed."""
+    rules = list(EscalationRule.objects.filter(active=True))
+    open_requests = ServiceRequest.objects.exclude(status='completed').only(*FIELDS).order_by('id')
+    groups = defaultdict(list)
+    last_id = 0
+    while True:
+        batch = list(open_requests.filter(id__gt=last_id)[:batch_size])
+        if not batch:
+            break
+        last_id = batch[-1].id
+        for service_request in batch:
+            # rules that are already due fire on the next tick, unless they fired before
+            groups[service_request.status, next_rule_hours(service_request, rules)].append(service_request.id)
+
+    changed = 0
+    for (status, hours), ids in groups.items():
+        value = None if hours is None else F('status_changed_at') + timedelta(hours=hours)
+        for start in range(0, len(ids), batch_size):
+            # the status filter leaves requests alone that moved on meanwhile, their save() scheduled them
+            changed += ServiceRequest.objects.filter(
+                id__in=ids[start:start + batch_size], status=status
+            ).update(next_escalation_at=value)
+    return changed
+
+
+# --- ticks -------------------------------------------------------------------
+
+def _recipients(rule, service_request, assignee_phones):
+    if rule.notify == EscalationRule.ASSIGNEE:
+        phone = assignee_phones.get(service_request.assigned_to_id)
+        return [phone] if phone else []
+    if rule.notify == EscalationRule.SECTION:
+        return refcache.section_manager_phones(service_request.section_id)
+    return refcache.provider_manager_phones(service_request.service_provider_id)
+
+
+def reminder_message(lines):
+    return list_message(f'تذكير: {len(lines)} طلبات متأخرة', lines)
+
+
+def _line(service_request, now):
+    hours = int((now - service_request.status_changed_at).total_seconds() // 3600)
+    label = STATUS_LABELS.get(service_request.status, service_request.status)
+    return f'- {service_request.title} ({label} منذ {hours} ساعة): {REQUEST_URL.format(id=service_request.id)}'
+
+
+def tick(now=None, batch_size=1000, dry_run=False):
+    """Fire the due rules, one reminder per recipient listing all of its requests.
+
+    Returns the number of due requests, escalations recorded and reminders sent.
+    """
+    now = now or timezone.now()
+    rules = list(EscalationRule.objects.filter(active=True))
+    due = list(
+        ServiceRequest.objects.filter(next_escalation_at__lte=now)
+        .only(*FIELDS, 'next_escalation_at').order_by('next_escalation_at')
+    )
+    reminders = defaultdict(list)
+    escalations = 0
+    for start in range(0, len(due), batch_size):
+        batch = due[start:start + batch_size]
+        fired = set(
+            Escalation.objects.filter(service_request__in=batch)
+            .values_list('service_request_id', 'rule_id', 'status_changed_at')
+        )
+        assignee_phones = dict(
+            UserProfile.objects.filter(user_id__in={r.assigned_to_id for r in batch if r.assigned_to_id})
+            .values_list('user_id', 'phone')
+        )
+        new = []
+        next_hours = defaultdict(list)
+        for service_request in batch:
+            for rule in rules:
+                if not applies(rule, service_request) or fire_time(rule, service_request) > now:
+                    continue
+                if (service_request.id, rule.id, service_request.status_changed_at) in fired:
+                    continue
+                phones = _recipients(rule, service_request, assignee_phones)
+                for phone in phones:
+                    reminders[phone].append(_line(service_request, now))
+                new.append(Escalation(
+                    service_request=service_request, rule=rule,
+                    status_changed_at=service_request.status_changed_at, recipients=len(phones),
+                ))
+            next_hours[next_rule_hours(service_request, rules, after=now)].append(service_request.id)
+        escalations += len(new)
+        if dry_run:
+            continue
+        with transaction.atomic():
+            # ignore_conflicts: a tick running at the same time recorded it already
+            Escalation.objects.bulk_create(new, ignore_conflicts=True)
+            # one UPDATE per rule offset instead of one per request; a request whose
+            # status changed meanwhile got a later time from its save() and is left alone
+            still_due = ServiceRequest.objects.filter(next_escalation_at__lte=now)
+            for hours, ids in next_hours.items():
+                value = None if hours is None else F('status_changed_at') + timedelta(hours=hours)
+                still_due.filter(id__in=ids).update(next_escalation_at=value)
+
+    if not dry_run:
+        for phone, lines in reminders.items():
+            # a repeated line is the same request reached by two rules
+            lines = list(dict.fromkeys(lines))
+            # recipients in digest mode find the overdue requests in their next digest
+            notify(phone, reminder_message(lines), '\n'.join(lines), queued=True)
+    return len(due), escalations, len(reminders)
@@ -0,0 +1,75 @@
+import json
+import random
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs
+
+
+class FakeGateway:
+    """Local stand-in for the WhatsApp gateway that injects latency and faults.
+
+    latency is added to every answer, error_rate of the messages get a 500 and
+    hang_rate of them no answer for hang seconds, longer than the client's read timeout.
+    """
+
+    def __init__(self, host='127.0.0.1', port=0, latency=0.0, error_rate=0.0, hang_rate=0.0, hang=30.0):
+        self.latency = latency
+        self.error_rate = error_rate
+        self.hang_rate = hang_rate
+        self.hang = hang
+        self.received = []
+        self.server = ThreadingHTTPServer((host, port), self._handler())
+        self.server.daemon_threads = True
+        self._thread = None
+
+    @property
+    def url(self):
+        host, port = self.server.server_address[:2]
+        return f'http://{host}:{port}/AWE/Api/index.php'
+
+    def _handler(self):
+        gateway = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_POST(self):
+                body = self.rfile.read(int(self.headers.get('Content-Length') or 0)).decode()
+                fields = {key: values[0] for key, values in parse_qs(body).items()}
+                time.sleep(gateway.latency)
+                fault = random.random()
+                if fault < gateway.hang_rate:
+                    time.sleep(gateway.hang)
+                    return
+                if fault < gateway.hang_rate + gateway.error_rate:
+                    self._answer(500, {'status': 'error'})
+                    return
+                gateway.received.append(fields)
+                self._answer(200, {'status': 'sent', 'to': fields.get('To')})
+
+            def _answer(self, code, payload):
+                content = json.dumps(payload).encode()
+                self.send_response(code)
+                self.send_header('Content-Type', 'application/json')
+                self.send_header('Content-Length', str(len(content)))
+                self.end_headers()
+                self.wfile.write(content)
+
+            def log_message(self, format, *args):
+                pass
+
+        return Handler
+
+    def start(self):
+        self._thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc_info):
+        self.stop()
@@ -28,6 +28,7 @@ class InventoryOrderForm(forms.ModelForm):
 class ServiceRequestLogForm(forms.ModelForm):
     class Meta:
         model = ServiceRequestLog
-        fields = ['comment']
+        fields = ['note']
+        labels = {'note': 'تفاصيل المشكلة'}
 
 
@@ -0,0 +1,254 @@
+import threading
+import time
+import uuid
+from collections import Counter, deque
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.exceptions import ImproperlyConfigured
+
+
+# URL and credentials have no defaults, the client refuses to send without them
+DEFAULTS = {
+    'URL': '',
+    'USER': '',
+    'PASSWORD': '',
+    'CONNECT_TIMEOUT': 3,
+    'READ_TIMEOUT': 10,
+    'RATE_PER_MINUTE': 30,
+    'BURST': 5,
+    'FAILURE_THRESHOLD': 5,
+    'RESET_SECONDS': 60,
+}
+
+
+class GatewayError(Exception):
+    pass
+
+
+class GatewayUnavailable(GatewayError):
+    """Nothing was sent: the circuit is open or the rate limit is used up."""
+
+
+class RateLimit:
+    """A token bucket shared by all processes: rate calls per second on average, bursts of up to capacity.
+
+    The quota is the provider's, so the bucket lives in the shared cache as
+    (tokens, time of the last refill). A take refills it at rate per second up
+    to capacity and removes one token, under a short lock claimed with
+    cache.add, so two workers never spend the same token and no burst ever
+    exceeds capacity.
+    """
+
+    # longest a process holds the bucket, a lock of a dead worker is given up after that
+    LOCK_SECONDS = 2
+
+    def __init__(self, rate, capacity, key='gateway:rate'):
+        self.rate = rate
+        self.capacity = capacity
+        self.key = key
+        self.lock_key = f'{key}:lock'
+        # an untouched bucket fills up in this time, afterwards a missing one is the same as a full one
+        self.expiry = int(capacity / rate) + 60
+
+    def _tokens(self, now):
+        tokens, stamp = cache.get(self.key) or (self.capacity, now)
+        return min(self.capacity, tokens + max(now - stamp, 0) * self.rate)
+
+    def available(self):
+        """Whether a call could be taken now, without taking it."""
+        return self._tokens(time.time()) >= 1
+
+    def _try_take(self):
+        """(taken, seconds until the next token), None when another process holds the bucket."""
+        token = uuid.uuid4().hex
+        if not cache.add(self.lock_key, token, self.LOCK_SECONDS):
+            return None
+        try:
+            now = time.time()
+            tokens = self._tokens(now)
+            taken = tokens >= 1
+            if taken:
+                tokens -= 1
+            cache.set(self.key, (tokens, now), self.expiry)
+            return taken, (1 - tokens) / self.rate if tokens < 1 else 0
+        finally:
+            if cache.get(self.lock_key) == token:
+                cache.delete(self.lock_key)
+
+    def take(self, timeout=0):
+        """Take a call, waiting up to timeout seconds for a token; False when none came."""
+        deadline = time.monotonic() + timeout
+        while True:
+            result = self._try_take()
+            if result is None:
+                # the bucket is only held for a cache round trip
+                time.sleep(0.01)
+                continue
+            taken, wait = result
+            if taken:
+                return True
+            if time.monotonic() + wait > deadline:
+                return False
+            time.sleep(wait)
+
+
+class CircuitBreaker:
+    """Opens after threshold failures in a row; after reset_seconds one trial call goes through.
+
+    The state lives in the shared cache, so every worker stops calling a gateway
+    that is down as soon as one of them noticed. Once reset_seconds passed the
+    circuit is half open: the first caller claims the trial with cache.add and
+    every other one is turned away until the trial succeeded (closed) or failed
+    (open again).
+    """
+
+    def __init__(self, threshold, reset_seconds, key='gateway:circuit'):
+        self.threshold = threshold
+        self.reset_seconds = reset_seconds
+        self.failures_key = f'{key}:failures'
+        self.open_until_key = f'{key}:open_until'
+        self.trial_key = f'{key}:trial'
+
+    def state(self):
+        """'closed', 'open' or 'half_open' (a trial call can be claimed), claiming nothing."""
+        open_until = cache.get(self.open_until_key)
+        if open_until is None:
+            return 'closed'
+        if time.time() < open_until or cache.get(self.trial_key):
+            return 'open'
+        return 'half_open'
+
+    def allow(self):
+        """Whether to make a call now; in the half open state this claims the single trial call."""
+        state = self.state()
+        if state == 'closed':
+            return True
+        # a trial whose worker died is given up after reset_seconds
+        return state == 'half_open' and cache.add(self.trial_key, True, self.reset_seconds)
+
+    def is_open(self):
+        return self.state() == 'open'
+
+    def success(self):
+        cache.delete_many([self.failures_key, self.open_until_key, self.trial_key])
+
+    def failure(self):
+        cache.add(self.failures_key, 0, None)
+        try:
+            failures = cache.incr(self.failures_key)
+        except ValueError:
+            failures = 1
+        if failures >= self.threshold:
+            cache.set(self.open_until_key, time.time() + self.reset_seconds, None)
+            # half open: the first failed trial call opens the circuit again
+            cache.set(self.failures_key, self.threshold - 1, None)
+            cache.delete(self.trial_key)
+
+
+class GatewayClient:
+    def __init__(self, url, user, password, connect_timeout, read_timeout, rate_per_minute, burst,
+                 failure_threshold, reset_seconds, breaker_key='gateway:circuit', rate_key='gateway:rate'):
+        self.url = url
+        self.user = user
+        self.password = password
+        self.timeout = (connect_timeout, read_timeout)
+        # the provider's quota, shared by the web and run_tasks processes
+        self.rate_limit = RateLimit(rate_per_minute / 60, burst, rate_key)
+        self.breaker = CircuitBreaker(failure_threshold, reset_seconds, breaker_key)
+        # keeps the connection to the gateway open between messages; requests is
+        # imported here, not at module level, so web workers don't load it at startup
+        import requests
+        self.session = requests.Session()
+        self._stats = Counter()
+        self._latencies = deque(maxlen=200)
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_settings(cls, **overrides):
+        config = {**DEFAULTS, **getattr(settings, 'WHATSAPP_GATEWAY', {}), **overrides}
+        return cls(
+            config['URL'], config['USER'], config['PASSWORD'], config['CONNECT_TIMEOUT'], config['READ_TIMEOUT'],
+            config['RATE_PER_MINUTE'], config['BURST'], config['FAILURE_THRESHOLD'], config['RESET_SECONDS'],
+            config.get('BREAKER_KEY', 'gateway:circuit'), config.get('RATE_KEY', 'gateway:rate'),
+        )
+
+    def missing_settings(self):
+        return [name for name, value in (('URL', self.url), ('USER', self.user), ('PASSWORD', self.password)) if not value]
+
+    def check_configured(self):
+        missing = self.missing_settings()
+        if missing:
+            raise ImproperlyConfigured(
+                f'WhatsApp gateway is not configured: set {", ".join(missing)} of WHATSAPP_GATEWAY '
+                f'(environment {", ".join("WHATSAPP_GATEWAY_" + name for name in missing)})'
+            )
+
+    def _count(self, name, started=None):
+        with self._lock:
+            self._stats[name] += 1
+            if started is not None:
+                self._latencies.append(time.monotonic() - started)
+
+    def available(self):
+        """Whether a message could go out now: the circuit is not open and the rate limit has room."""
+        return self.breaker.state() != 'open' and self.rate_limit.available()
+
+    def send(self, number, message, wait=0):
+        """Post one message, waiting up to wait seconds for the rate limit."""
+        self.check_configured()
+        if self.breaker.is_open():
+            self._count('rejected_open')
+            raise GatewayUnavailable('Gateway circuit is open')
+        if not self.rate_limit.take(timeout=wait):
+            self._count('rate_limited')
+            raise GatewayUnavailable('Gateway rate limit reached')
+        # claimed last, so a trial call is not held while waiting for the rate limit
+        if not self.breaker.allow():
+            self._count('rejected_open')
+            raise GatewayUnavailable('Gateway circuit is open')
+        import requests
+
+        started = time.monotonic()
+        try:
+            response = self.session.post(self.url, timeout=self.timeout, data={
+                'User': self.user,
+                'Pass': self.password,
+                'Method': 'Chat',
+                'To': str(number),
+                'Body': str(message),
+            })
+            response.raise_for_status()
+            result = response.json()
+        except (requests.RequestException, ValueError) as e:
+            self._count('errors', started)
+            self.breaker.failure()
+            raise GatewayError(str(e)) from e
+        self._count('sent', started)
+        self.breaker.success()
+        return result
+
+    def stats(self):
+        """Counters and latencies of this process."""
+        with self._lock:
+            latencies = sorted(self._latencies)
+            counts = dict(self._stats)
+        percentile = lambda p: round(latencies[int(p * (len(latencies) - 1))] * 1000, 1) if latencies else None
+        return {
+            **{name: counts.get(name, 0) for name in ('sent', 'errors', 'rejected_open', 'rate_limited')},
+            'latency_ms': {'p50': percentile(0.5), 'p95': percentile(0.95), 'max': percentile(1)},
+            'circuit': self.breaker.state(),
+            'configured': not self.missing_settings(),
+        }
+
+
+_client = None
+_client_lock = threading.Lock()
+
+
+def get_client():
+    global _client
+    with _client_lock:
+        if _client is None:
+            _client = GatewayClient.from_settings()
+        return _client
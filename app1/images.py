@@ -0,0 +1,101 @@
+import hashlib
+import logging
+from io import BytesIO
+
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+
+logger = logging.getLogger(__name__)
+
+
+# square thumbnail sizes in pixels, small enough for avatars and their 2x/4x variants
+THUMBNAIL_SIZES = (48, 96, 192)
+THUMBNAIL_FORMATS = [('webp', 'WEBP'), ('jpg', 'JPEG')]
+THUMBNAIL_DIR = 'profile_thumbs'
+ORIGINAL_DIR = 'profile_images'
+
+
+def content_hash(data):
+    return hashlib.sha256(data).hexdigest()
+
+
+def original_name(digest):
+    return f'{ORIGINAL_DIR}/{digest}.jpg'
+
+
+def thumbnail_name(digest, size, ext='jpg'):
+    # shard by the first two hex chars so the directory stays small
+    return f'{THUMBNAIL_DIR}/{digest[:2]}/{digest}_{size}.{ext}'
+
+
+def _encode(image, fmt):
+    buffer = BytesIO()
+    if fmt == 'JPEG':
+        image.save(buffer, fmt, quality=85, optimize=True, progressive=True)
+    else:
+        image.save(buffer, fmt, quality=80, method=4)
+    return buffer.getvalue()
+
+
+def _save(name, data):
+    if not default_storage.exists(name):
+        default_storage.save(name, ContentFile(data))
+
+
+def normalize_image(data):
+    """Apply the EXIF orientation and return an RGB image without any metadata."""
+    # Pillow is only needed by the task processing uploads, not at web worker startup
+    from PIL import Image, ImageOps
+
+    image = Image.open(BytesIO(data))
+    image = ImageOps.exif_transpose(image)
+    if image.mode != 'RGB':
+        image = image.convert('RGB')
+    return image
+
+
+def generate_thumbnails(image, digest):
+    from PIL import Image, ImageOps
+
+    for size in THUMBNAIL_SIZES:
+        # the jpg is written after the webp, so its presence means both variants exist
+        if default_storage.exists(thumbnail_name(digest, size, 'jpg')):
+            continue
+        thumb = ImageOps.fit(image, (size, size), Image.LANCZOS)
+        for ext, fmt in THUMBNAIL_FORMATS:
+            _save(thumbnail_name(digest, size, ext), _encode(thumb, fmt))
+
+
+def process_profile_image(profile_id):
+    from .models import UserProfile
+
+    profile = UserProfile.objects.filter(pk=profile_id).first()
+    if not profile or not profile.image:
+        return
+    uploaded_name = profile.image.name
+    if profile.image_hash and uploaded_name == original_name(profile.image_hash):
+        return
+
+    with profile.image.open('rb') as f:
+        data = f.read()
+    digest = content_hash(data)
+
+    # derived files are keyed by the hash of the upload, so re-uploading the same picture is free
+    if not default_storage.exists(original_name(digest)):
+        try:
+            image = normalize_image(data)
+        except OSError:
+            # Pillow raises an OSError for files it cannot read, a retry would read the same bytes
+            logger.warning('profile %s: %s is not a readable image', profile_id, uploaded_name)
+            return
+        _save(original_name(digest), _encode(image, 'JPEG'))
+        generate_thumbnails(image, digest)
+    elif not default_storage.exists(thumbnail_name(digest, THUMBNAIL_SIZES[-1])):
+        with default_storage.open(original_name(digest), 'rb') as f:
+            generate_thumbnails(normalize_image(f.read()), digest)
+
+    # update() skips post_save, so this does not schedule the job again
+    UserProfile.objects.filter(pk=profile_id).update(image=original_name(digest), image_hash=digest)
+    if uploaded_name != original_name(digest):
+        default_storage.delete(uploaded_name)
+
@@ -0,0 +1,205 @@
+from collections import Counter
+
+from django.db import transaction
+from django.db.models import Count, F
+
+from .models import InboxCounter, PurchaseOrder, ServiceRequest
+
+
+# every request counts in 'all' and its status bucket, plus 'supplied' while
+# one of its purchase orders is supplied
+ALL = 'all'
+SUPPLIED = 'supplied'
+KEY_FIELDS = ('scope', 'owner_id', 'assignee_id', 'bucket')
+
+
+# --- keys --------------------------------------------------------------------
+
+def snapshot(service_request):
+    # read from __dict__ so deferred fields are not loaded just for this
+    values = service_request.__dict__
+    return (
+        values.get('service_provider_id'),
+        values.get('section_id'),
+        values.get('assigned_to_id'),
+        values.get('status'),
+    )
+
+
+def request_keys(state, supplied, buckets=None):
+    provider_id, section_id, assignee_id, status = state
+    if buckets is None:
+        buckets = [ALL, status] + ([SUPPLIED] if supplied else [])
+    keys = []
+    for bucket in buckets:
+        keys.append((InboxCounter.PROVIDER, provider_id, 0, bucket))
+        keys.append((InboxCounter.SECTION, section_id, 0, bucket))
+        if assignee_id:
+            keys.append((InboxCounter.PROVIDER, provider_id, assignee_id, bucket))
+    return keys
+
+
+def _bump(keys, delta, using='default'):
+    counters = InboxCounter.objects.using(using)
+    for key in keys:
+        lookup = dict(zip(KEY_FIELDS, key))
+        if delta < 0:
+            counters.filter(count__gt=0, **lookup).update(count=F('count') + delta)
+        elif not counters.filter(**lookup).update(count=F('count') + delta):
+            counter, _ = counters.get_or_create(**lookup)
+            counters.filter(pk=counter.pk).update(count=F('count') + delta)
+
+
+def is_supplied(service_request_id, exclude_order=None, using='default'):
+    orders = PurchaseOrder.objects.using(using).filter(
+        report__service_request_id=service_request_id, status=SUPPLIED
+    )
+    if exclude_order is not None:
+        orders = orders.exclude(pk=exclude_order)
+    return orders.exists()
+
+
+# --- signal handlers ---------------------------------------------------------
+
+def update_counters(service_request, old, created=False):
+    using = service_request._state.db
+    new = snapshot(service_request)
+    if created:
+        # a new request has no purchase orders yet
+        _bump(request_keys(new, False), 1, using)
+        return
+    if old == new:
+        return
+    supplied = is_supplied(service_request.pk, using=using)
+    old_keys = set(request_keys(old, supplied))
+    new_keys = set(request_keys(new, supplied))
+    _bump(old_keys - new_keys, -1, using)
+    _bump(new_keys - old_keys, 1, using)
+
+
+def requests_created(service_requests, using='default'):
+    """update_counters for new requests inserted with bulk_create, one UPDATE per counter."""
+    counts = Counter(key for request in service_requests for key in request_keys(snapshot(request), False))
+    for key, count in counts.items():
+        _bump([key], count, using)
+
+
+def _deletion(origin):
+    # the signals of one delete() call, cascades included, share the same origin
+    return origin.__dict__.setdefault('_inbox_deletion', {'requests': set(), 'released': set()})
+
+
+def request_deleting(service_request, origin):
+    # the purchase orders are gone by the time post_delete runs
+    service_request._inbox_supplied = is_supplied(service_request.pk, using=service_request._state.db)
+    _deletion(origin)['requests'].add(service_request.pk)
+
+
+def request_deleted(service_request):
+    supplied = getattr(service_request, '_inbox_supplied', False)
+    _bump(request_keys(snapshot(service_request), supplied), -1, service_request._state.db)
+
+
+def _supplied_changed(order, service_request_id, delta):
+    using = order._state.db
+    # only the first supplied order adds the request and only the last one removes it
+    if is_supplied(service_request_id, exclude_order=order.pk, using=using):
+        return
+    service_request = ServiceRequest.objects.using(using).only(
+        'service_provider_id', 'section_id', 'assigned_to_id', 'status'
+    ).get(pk=service_request_id)
+    _bump(request_keys(snapshot(service_request), True, buckets=[SUPPLIED]), delta, using)
+
+
+def purchase_order_saved(order, old_status, created=False):
+    was_supplied = old_status == SUPPLIED and not created
+    if was_supplied == (order.status == SUPPLIED):
+        return
+    service_request_id = order.report.service_request_id
+    _supplied_changed(order, service_request_id, 1 if order.status == SUPPLIED else -1)
+
+
+def purchase_order_deleting(order):
+    order._inbox_request_id = order.report.service_request_id
+
+
+def purchase_order_deleted(order, origin):
+    if order.status != SUPPLIED:
+        return
+    deletion = _deletion(origin)
+    service_request_id = order._inbox_request_id
+    # deleted requests are taken care of by request_deleted
+    if service_request_id in deletion['requests'] or service_request_id in deletion['released']:
+        return
+    deletion['released'].add(service_request_id)
+    _supplied_changed(order, service_request_id, -1)
+
+
+# --- reading and repair ------------------------------------------------------
+
+def expected_counters(requests, supplied_request_ids):
+    """Count the requests from scratch, {key: count} with the keys of request_keys."""
+    totals = Counter()
+    fields = ['service_provider_id', 'section_id', 'assigned_to_id', 'status']
+    querysets = [(requests, None), (requests.filter(id__in=supplied_request_ids), SUPPLIED)]
+    for queryset, bucket in querysets:
+        for row in queryset.values(*fields).annotate(n=Count('id')).order_by():
+            state = tuple(row[f] for f in fields)
+            buckets = [bucket] if bucket else [ALL, row['status']]
+            for key in request_keys(state, False, buckets=buckets):
+                totals[key] += row['n']
+    return totals
+
+
+def supplied_request_ids(using='default'):
+    return PurchaseOrder.objects.using(using).filter(status=SUPPLIED).values('report__service_request_id')
+
+
+def reconcile(dry_run=False, using='default'):
+    """Compare the counters with a fresh count and fix them, returns the drifted keys."""
+    with transaction.atomic(using=using):
+        expected = expected_counters(ServiceRequest.objects.using(using), supplied_request_ids(using))
+        stored = {
+            tuple(getattr(c, f) for f in KEY_FIELDS): c
+            for c in InboxCounter.objects.using(using).select_for_update()
+        }
+        drift = {}
+        for key in expected.keys() | stored.keys():
+            counter = stored.get(key)
+            current = counter.count if counter else 0
+            if current != expected.get(key, 0):
+                drift[key] = (current, expected.get(key, 0))
+        if dry_run:
+            return drift
+        counters = InboxCounter.objects.using(using)
+        counters.filter(pk__in=[c.pk for key, c in stored.items() if key not in expected]).delete()
+        changed = []
+        for key in drift.keys() & expected.keys() & stored.keys():
+            stored[key].count = expected[key]
+            changed.append(stored[key])
+        counters.bulk_update(changed, ['count'])
+        counters.bulk_create([
+            InboxCounter(**dict(zip(KEY_FIELDS, key)), count=expected[key])
+            for key in expected.keys() - stored.keys()
+        ])
+    return drift
+
+
+def counter_totals(scope, owner_ids):
+    """Sum the counters of the owners in one indexed query, {(assignee_id, bucket): count}."""
+    totals = Counter()
+    rows = InboxCounter.objects.filter(scope=scope, owner_id__in=owner_ids).values_list('assignee_id', 'bucket', 'count')
+    for assignee_id, bucket, count in rows:
+        totals[assignee_id, bucket] += count
+    return totals
+
+
+def bucket_counts(totals, assignee=None):
+    """Counts per bucket for one assignee id, 'unassigned' or everyone when None."""
+    counts = Counter()
+    for (assignee_id, bucket), count in totals.items():
+        if assignee == 'unassigned':
+            counts[bucket] += count if assignee_id == 0 else -count
+        elif assignee_id == (assignee or 0):
+            counts[bucket] += count
+    return counts
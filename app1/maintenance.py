@@ -0,0 +1,248 @@
+import calendar
+import uuid
+from collections import defaultdict
+from datetime import date, datetime, timedelta
+
+from django.core.exceptions import ValidationError
+from django.db import transaction
+from django.utils import timezone
+
+from . import assignment, escalation, inbox, refcache, summary, tasks
+from .models import (
+    LogEvent, LogTarget, MaintenanceOccurrence, MaintenanceSchedule, Section, ServiceProvider, ServiceRequest,
+    ServiceRequestLog,
+)
+from .notifications import list_message, summary_line
+
+
+# Routine inspections are raised by the generate_maintenance_requests command
+# from MaintenanceSchedule rows, a subset of RRULE: FREQ daily, weekly or
+# monthly, INTERVAL, BYDAY, BYMONTHDAY and UNTIL (ends_at). Every schedule
+# carries next_run_at, so a run only reads the indexed rows whose time came.
+#
+# A run claims each due occurrence by inserting its MaintenanceOccurrence row
+# with ignore_conflicts; the unique (schedule, due_at) lets one of two
+# overlapping runs win and only the rows carrying this run's id get a request.
+# The requests and their logs are written with bulk_create, which skips save()
+# and the signals, so the fingerprints, escalation schedule, inbox counters and
+# summary columns are filled in here. The requests start unassigned; providers
+# with auto_assign get theirs assigned one by one, like a request made by hand.
+
+WEEKDAYS = ('MO', 'TU', 'WE', 'TH', 'FR', 'SA', 'SU')
+# the longest gap between two occurrences, per INTERVAL
+SPANS = {
+    MaintenanceSchedule.DAILY: timedelta(days=1),
+    MaintenanceSchedule.WEEKLY: timedelta(weeks=1),
+    MaintenanceSchedule.MONTHLY: timedelta(days=31),
+}
+
+
+def weekdays(schedule, start):
+    days = {WEEKDAYS.index(code) for code in _codes(schedule.by_weekday) if code in WEEKDAYS}
+    return sorted(days) or [start.weekday()]
+
+
+def _codes(value):
+    return [code.strip().upper() for code in value.split(',') if code.strip()]
+
+
+def validate(schedule):
+    errors = {}
+    if any(code not in WEEKDAYS for code in _codes(schedule.by_weekday)):
+        errors['by_weekday'] = 'ايام الاسبوع تكتب بالصيغة MO,TU,WE,TH,FR,SA,SU'
+    if schedule.by_month_day is not None and not 1 <= abs(schedule.by_month_day) <= 31:
+        errors['by_month_day'] = 'يوم الشهر من 1 الى 31، او -1 لآخر يوم في الشهر'
+    if schedule.interval < 1:
+        errors['interval'] = 'التكرار يجب ان يكون 1 او اكثر'
+    if schedule.ends_at and schedule.starts_at and schedule.ends_at < schedule.starts_at:
+        errors['ends_at'] = 'تاريخ الانتهاء قبل تاريخ البداية'
+    if errors:
+        raise ValidationError(errors)
+
+
+# --- occurrences -------------------------------------------------------------
+
+def _month_day(schedule, start, year, month):
+    last = calendar.monthrange(year, month)[1]
+    day = schedule.by_month_day or start.day
+    if day < 0:
+        day = last + day + 1
+    # a day the month does not have falls on its last day
+    return date(year, month, min(max(day, 1), last))
+
+
+def _period_days(schedule, start, n):
+    """Dates of the n-th period counted from the one of start, in order."""
+    step = n * schedule.interval
+    if schedule.frequency == MaintenanceSchedule.DAILY:
+        return [start.date() + timedelta(days=step)]
+    if schedule.frequency == MaintenanceSchedule.WEEKLY:
+        monday = start.date() - timedelta(days=start.weekday()) + timedelta(weeks=step)
+        return [monday + timedelta(days=day) for day in weekdays(schedule, start)]
+    year, month = divmod(start.year * 12 + start.month - 1 + step, 12)
+    return [_month_day(schedule, start, year, month + 1)]
+
+
+def _periods_before(schedule, start, moment):
+    """Whole periods from the one of start to the one of moment."""
+    if schedule.frequency == MaintenanceSchedule.DAILY:
+        units = (moment.date() - start.date()).days
+    elif schedule.frequency == MaintenanceSchedule.WEEKLY:
+        units = (moment.date() - start.date() + timedelta(days=start.weekday())).days // 7
+    else:
+        units = (moment.year - start.year) * 12 + moment.month - start.month
+    return units // schedule.interval
+
+
+def occurrences(schedule, after=None):
+    """Occurrences from starts_at to ends_at in order, only those later than after when given."""
+    start = timezone.localtime(schedule.starts_at)
+    # jump to the period before the one of after instead of walking there
+    n = max(_periods_before(schedule, start, timezone.localtime(after)) - 1, 0) if after else 0
+    while True:
+        for day in _period_days(schedule, start, n):
+            moment = timezone.make_aware(datetime.combine(day, start.time()))
+            if moment < schedule.starts_at or (after and moment <= after):
+                continue
+            if schedule.ends_at and moment > schedule.ends_at:
+                return
+            yield moment
+        n += 1
+
+
+def next_occurrence(schedule, after=None):
+    """Called by MaintenanceSchedule.save(), None once the schedule ended."""
+    return next(occurrences(schedule, after), None)
+
+
+def due_occurrence(schedule, now):
+    """(due_at, following) of a schedule whose next_run_at came.
+
+    Occurrences missed while no run happened are skipped, only the latest one
+    since last_run_at is raised; due_at is None when there is none, following
+    once the schedule ended.
+    """
+    # one span back holds an occurrence, the walk never starts further away
+    after = now - SPANS[schedule.frequency] * schedule.interval
+    if schedule.last_run_at:
+        after = max(after, schedule.last_run_at)
+    due_at = following = None
+    for moment in occurrences(schedule, after):
+        if moment > now:
+            following = moment
+            break
+        due_at = moment
+    return due_at, following
+
+
+# --- runs --------------------------------------------------------------------
+
+def _new_request(schedule):
+    service_request = ServiceRequest(
+        title=schedule.title,
+        description=schedule.description,
+        section_id=schedule.section_id,
+        service_provider_id=schedule.service_provider_id,
+        created_by=schedule.created_by,
+        updated_by=schedule.created_by,
+    )
+    # what save() would have done
+    service_request.refresh_fingerprints()
+    escalation.schedule(service_request)
+    return service_request
+
+
+def _raise(batch, times, run):
+    """Insert the occurrences of batch that no other run raised, returns their new requests."""
+    # ignore_conflicts: an overlapping run raised it already, this run's rows carry its id
+    MaintenanceOccurrence.objects.bulk_create(
+        [
+            MaintenanceOccurrence(schedule=schedule, due_at=times[schedule.id][0], run=run)
+            for schedule in batch if times[schedule.id][0]
+        ],
+        ignore_conflicts=True,
+    )
+    claimed = dict(
+        MaintenanceOccurrence.objects.filter(run=run, schedule__in=batch).values_list('schedule_id', 'id')
+    )
+    schedules = [schedule for schedule in batch if schedule.id in claimed]
+    requests = ServiceRequest.objects.bulk_create([_new_request(schedule) for schedule in schedules])
+    ServiceRequestLog.objects.bulk_create([
+        ServiceRequestLog(
+            service_request=service_request, event=LogEvent.CREATED, target_type=LogTarget.SERVICE_REQUEST,
+            target_id=service_request.pk, new_status=service_request.status, created_by=service_request.created_by,
+        )
+        for service_request in requests
+    ])
+    request_ids = [service_request.pk for service_request in requests]
+    summary.refresh(['log_count', 'last_activity_at'], pk__in=request_ids)
+    inbox.requests_created(requests)
+    MaintenanceOccurrence.objects.bulk_update(
+        [
+            MaintenanceOccurrence(id=claimed[schedule.id], service_request_id=service_request.pk)
+            for schedule, service_request in zip(schedules, requests)
+        ],
+        ['service_request'],
+    )
+    return requests
+
+
+def generate(now=None, batch_size=500, dry_run=False):
+    """Raise the due occurrences, one message per manager listing all of their new requests.
+
+    Returns the number of due schedules, requests created and messages sent.
+    """
+    now = now or timezone.now()
+    run = uuid.uuid4()
+    due = list(
+        MaintenanceSchedule.objects.filter(active=True, next_run_at__lte=now)
+        .select_related('created_by').order_by('next_run_at', 'id')
+    )
+    section_names = dict(Section.objects.values_list('id', 'name'))
+    auto_assign_providers = {provider.id: provider for provider in ServiceProvider.objects.filter(auto_assign=True)}
+    messages = defaultdict(list)
+    created = 0
+    for start in range(0, len(due), batch_size):
+        batch = due[start:start + batch_size]
+        times = {schedule.id: due_occurrence(schedule, now) for schedule in batch}
+        if dry_run:
+            raised = set(
+                MaintenanceOccurrence.objects.filter(
+                    schedule__in=batch, due_at__in={due_at for due_at, _ in times.values()}
+                ).values_list('schedule_id', 'due_at')
+            )
+            created += sum(
+                times[schedule.id][0] is not None and (schedule.id, times[schedule.id][0]) not in raised
+                for schedule in batch
+            )
+            continue
+        with transaction.atomic():
+            requests = _raise(batch, times, run)
+            # one UPDATE per due time and following occurrence instead of one per schedule
+            groups = defaultdict(list)
+            for schedule in batch:
+                groups[times[schedule.id]].append(schedule.id)
+            for (due_at, following), ids in groups.items():
+                # a schedule saved meanwhile with a later time is left alone, one
+                # with nothing new due keeps its last_run_at
+                MaintenanceSchedule.objects.filter(id__in=ids, next_run_at__lte=now).update(
+                    **({'last_run_at': due_at} if due_at else {}), next_run_at=following
+                )
+        created += len(requests)
+
+        for service_request in requests:
+            section = section_names.get(service_request.section_id, '')
+            for phone in refcache.provider_manager_phones(service_request.service_provider_id):
+                messages[phone].append(summary_line(section, service_request))
+            provider = auto_assign_providers.get(service_request.service_provider_id)
+            if provider is None:
+                continue
+            service_request.service_provider = provider
+            assignee = assignment.auto_assign(service_request, service_request.created_by)
+            assignee_profile = getattr(assignee, 'profile', None)
+            if assignee_profile:
+                messages[assignee_profile.phone].append(summary_line(f'{section} - تم تعيينه اليك', service_request))
+
+    for phone, lines in messages.items():
+        tasks.send_whatsapp.delay(phone, list_message('طلبات صيانة دورية جديدة', list(dict.fromkeys(lines))))
+    return len(due), created, len(messages)
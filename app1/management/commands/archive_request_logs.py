@@ -0,0 +1,45 @@
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.utils import timezone
+
+from app1.models import ServiceRequestLog, ServiceRequestLogArchive
+
+
+ARCHIVED_FIELDS = [
+    'id', 'service_request_id', 'event', 'target_type', 'target_id',
+    'old_status', 'new_status', 'note', 'created_at', 'created_by_id',
+]
+
+
+class Command(BaseCommand):
+    help = 'Move request log rows older than --days into ServiceRequestLogArchive'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--days', type=int, default=365)
+        parser.add_argument('--batch-size', type=int, default=5000)
+        parser.add_argument('--dry-run', action='store_true')
+
+    def handle(self, *args, **options):
+        cutoff = timezone.now() - timedelta(days=options['days'])
+        # served by the created_at index
+        old_logs = ServiceRequestLog.objects.filter(created_at__lt=cutoff)
+        if options['dry_run']:
+            self.stdout.write(f'{old_logs.count()} log rows older than {cutoff:%Y-%m-%d} would be archived')
+            return
+
+        moved = 0
+        while True:
+            with transaction.atomic():
+                rows = list(old_logs.order_by('id').values(*ARCHIVED_FIELDS)[:options['batch_size']])
+                if not rows:
+                    break
+                # ignore_conflicts keeps a rerun after an interrupted batch safe
+                ServiceRequestLogArchive.objects.bulk_create(
+                    [ServiceRequestLogArchive(**row) for row in rows], ignore_conflicts=True
+                )
+                ServiceRequestLog.objects.filter(id__in=[row['id'] for row in rows]).delete()
+            moved += len(rows)
+            self.stdout.write(f'archived {moved} rows')
+        self.stdout.write(self.style.SUCCESS(f'Archived {moved} log rows older than {cutoff:%Y-%m-%d}'))
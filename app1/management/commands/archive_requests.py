@@ -0,0 +1,36 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+
+from app1.archive import archivable_requests, archive_enabled, archive_requests, prepare_archive
+
+
+class Command(BaseCommand):
+    help = 'Move requests completed more than --months ago, with their reports, orders and logs, to the archive database'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--months', type=int, default=6)
+        parser.add_argument('--batch-size', type=int, default=200)
+        parser.add_argument('--dry-run', action='store_true')
+        parser.add_argument('--vacuum', action='store_true', help='Run VACUUM afterwards to shrink the SQLite file')
+
+    def handle(self, *args, **options):
+        if not archive_enabled():
+            raise CommandError('No archive database configured, see ARCHIVE_DATABASE in settings')
+        requests = archivable_requests(options['months'])
+        if options['dry_run']:
+            self.stdout.write(f'{requests.count()} completed requests would be archived')
+            return
+
+        prepare_archive()
+        moved = 0
+        while True:
+            ids = list(requests.order_by('id').values_list('id', flat=True)[:options['batch_size']])
+            if not ids:
+                break
+            moved += archive_requests(ids)
+            self.stdout.write(f'archived {moved} requests')
+
+        if options['vacuum'] and moved and connection.vendor == 'sqlite':
+            with connection.cursor() as cursor:
+                cursor.execute('VACUUM')
+        self.stdout.write(self.style.SUCCESS(f'Archived {moved} completed requests'))
@@ -0,0 +1,85 @@
+import random
+import time
+
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from app1.dedup import find_duplicate, find_near_duplicates, request_content_hash, request_signature
+from app1.models import Section, ServiceProvider, ServiceRequest
+
+
+WORDS = ['التكييف', 'لا', 'يعمل', 'في', 'الصالة', 'الرئيسية', 'تسريب', 'مياه', 'الحمام', 'الإنارة',
+         'مكسورة', 'الباب', 'الملعب', 'صيانة', 'عاجلة', 'المسبح', 'المضخة', 'الكهرباء', 'مقطوعة', 'غرفة']
+
+
+class Rollback(Exception):
+    pass
+
+
+def sentence(length):
+    return ' '.join(random.choice(WORDS) for _ in range(length))
+
+
+class Command(BaseCommand):
+    help = 'Benchmark the duplicate checks of create_service_request on a large table, rows are rolled back'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--rows', type=int, default=100000)
+        parser.add_argument('--lookups', type=int, default=200)
+        parser.add_argument('--seed', type=int, default=1)
+
+    def handle(self, *args, **options):
+        random.seed(options['seed'])
+        try:
+            with transaction.atomic():
+                self.run(options)
+                raise Rollback()
+        except Rollback:
+            pass
+
+    def run(self, options):
+        user = User.objects.create(username='__bench_dedup')
+        sections = [Section.objects.create(name=f'bench-{i}') for i in range(20)]
+        providers = [ServiceProvider.objects.create(name=f'bench-{i}') for i in range(5)]
+
+        started = time.perf_counter()
+        batch = []
+        for _ in range(options['rows']):
+            service_request = ServiceRequest(
+                title=sentence(4), description=sentence(25),
+                section=random.choice(sections), service_provider=random.choice(providers),
+                status=random.choice(['pending', 'in_progress', 'completed', 'completed']),
+                created_by=user, updated_by=user,
+            )
+            service_request.refresh_fingerprints()
+            batch.append(service_request)
+            if len(batch) == 5000:
+                ServiceRequest.objects.bulk_create(batch)
+                batch = []
+        ServiceRequest.objects.bulk_create(batch)
+        self.stdout.write(f'seeded {options["rows"]} rows in {time.perf_counter() - started:.1f}s')
+
+        probes = list(
+            ServiceRequest.objects.order_by('?').values(
+                'title', 'description', 'section_id', 'service_provider_id'
+            )[:options['lookups']]
+        )
+
+        def measure(label, check):
+            t0 = time.perf_counter()
+            for probe in probes:
+                check(probe)
+            per_lookup = (time.perf_counter() - t0) / len(probes) * 1000
+            self.stdout.write(f'{label:<28} {per_lookup:8.2f} ms/lookup')
+
+        measure('exact filter (old)', lambda p: ServiceRequest.objects.filter(
+            title=p['title'], description=p['description'], section_id=p['section_id'],
+            service_provider_id=p['service_provider_id'], created_by=user,
+        ).exists())
+        measure('content hash index', lambda p: find_duplicate(request_content_hash(
+            p['title'], p['description'], p['section_id'], p['service_provider_id'], user.id,
+        )))
+        measure('near-duplicate MinHash', lambda p: find_near_duplicates(
+            request_signature(p['title'] + '!', p['description']), p['section_id'], p['service_provider_id'],
+        ))
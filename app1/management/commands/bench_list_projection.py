@@ -0,0 +1,133 @@
+import gc
+import time
+import tracemalloc
+
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+
+from app1.models import PurchaseOrder, Report, ServiceRequest
+from app1.projections import purchase_order_rows, request_rows
+from app1.refcache import user_provider_ids, user_section_ids
+
+
+def _status_kb(name):
+    with open('/proc/self/status') as status:
+        for line in status:
+            if line.startswith(name + ':'):
+                return int(line.split()[1])
+    return None
+
+
+def reset_peak_rss():
+    """Reset the RSS high-water mark (Linux), False where that is not possible."""
+    try:
+        with open('/proc/self/clear_refs', 'w') as clear_refs:
+            clear_refs.write('5')
+        return True
+    except OSError:
+        return False
+
+
+class Command(BaseCommand):
+    help = 'Compare rows per second and peak memory of the list querysets loading whole rows and the lean projections'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--user', help='Username whose lists are read, defaults to the first manager of a provider')
+        parser.add_argument('--seed', type=int, default=0,
+                            help='Add this many requests with a report and purchase order first, rolled back at the end')
+        parser.add_argument('--description-size', type=int, default=2000,
+                            help='Characters of the seeded request and report descriptions')
+        parser.add_argument('--repeat', type=int, default=3)
+
+    def handle(self, *args, **options):
+        if options['user']:
+            user = User.objects.filter(username=options['user']).first()
+        else:
+            user = User.objects.filter(serviceprovider__isnull=False).order_by('id').first()
+        if user is None:
+            raise CommandError('No such user')
+        with transaction.atomic():
+            if options['seed']:
+                self.seed(user, options['seed'], options['description_size'])
+            self.run(user, options['repeat'])
+            transaction.set_rollback(True)
+
+    def seed(self, user, count, size):
+        section_id = next(iter(user_section_ids(user.id)), None)
+        provider_id = next(iter(user_provider_ids(user.id)), None)
+        if section_id is None or provider_id is None:
+            raise CommandError(f'{user.username} manages no section or no service provider')
+        text = ('وصف طويل للطلب ' * (size // 15 + 1))[:size]
+        # bulk_create skips the signals, the counters never see these rows
+        requests = ServiceRequest.objects.bulk_create([
+            ServiceRequest(
+                title=f'[bench] {i}', description=text, section_id=section_id, service_provider_id=provider_id,
+                created_by=user, updated_by=user, assigned_to=user, purchase_order_status='approved',
+            )
+            for i in range(count)
+        ], batch_size=500)
+        reports = Report.objects.bulk_create([
+            Report(title=f'[bench] {r.id}', description=text, service_request=r, created_by=user) for r in requests
+        ], batch_size=500)
+        PurchaseOrder.objects.bulk_create([
+            PurchaseOrder(report=report, refrence_number='bench', status='approved', created_by=user)
+            for report in reports
+        ], batch_size=500)
+        self.stdout.write(f'Seeded {count} requests with {size} character descriptions')
+
+    def lists(self, user):
+        sections = user_section_ids(user.id)
+        providers = user_provider_ids(user.id)
+        mine = ServiceRequest.objects.filter(section__in=sections).order_by('-id')
+        to_me = ServiceRequest.objects.filter(service_provider__in=providers).order_by('-id')
+        orders = PurchaseOrder.objects.filter(status__in=['approved', 'supplied']).order_by('-created_at')
+
+        def request_row(request, description, assignee):
+            values = (request.id, request.title, description[:60], request.section.name, request.status, request.created_at)
+            if assignee and request.assigned_to:
+                values += (request.assigned_to.get_full_name() or request.assigned_to.username,)
+            return values
+
+        def order_row(order):
+            return order.id, order.refrence_number, order.get_status_display(), order.created_at, order.report.service_request_id
+
+        return [
+            ('my_request', 'whole rows', mine.select_related('section'),
+             lambda r: request_row(r, r.description, False)),
+            ('my_request', 'lean', request_rows(mine),
+             lambda r: request_row(r, r.description_snippet, False)),
+            ('requests_to_me', 'whole rows', to_me.select_related('section', 'assigned_to'),
+             lambda r: request_row(r, r.description, True)),
+            ('requests_to_me', 'lean', request_rows(to_me, with_assignee=True),
+             lambda r: request_row(r, r.description_snippet, True)),
+            ('purchase_order_list', 'whole rows', orders.select_related('report'), order_row),
+            ('purchase_order_list', 'lean', purchase_order_rows(orders), order_row),
+        ]
+
+    def measure(self, queryset, row):
+        gc.collect()
+        rss_before = _status_kb('VmRSS')
+        can_reset = reset_peak_rss()
+        tracemalloc.start()
+        started = time.perf_counter()
+        # the rows stay referenced until the end, like a template context
+        rows = [row(obj) for obj in queryset.all()]
+        elapsed = time.perf_counter() - started
+        heap_peak = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+        rss_peak = _status_kb('VmHWM') - rss_before if can_reset and rss_before is not None else None
+        return len(rows), elapsed, heap_peak, rss_peak
+
+    def run(self, user, repeat):
+        self.stdout.write(f'{"list":<22}{"variant":<12}{"rows":>7}{"rows/s":>11}{"heap MB":>10}{"RSS MB":>9}')
+        for name, variant, queryset, row in self.lists(user):
+            results = [self.measure(queryset, row) for _ in range(repeat)]
+            rows = results[0][0]
+            best = min(r[1] for r in results)
+            heap = max(r[2] for r in results) / 2 ** 20
+            rss = [r[3] for r in results if r[3] is not None]
+            rss_text = f'{max(rss) / 1024:.1f}' if rss else '-'
+            self.stdout.write(
+                f'{name:<22}{variant:<12}{rows:>7}{rows / best if best else 0:>11.0f}{heap:>10.1f}{rss_text:>9}'
+            )
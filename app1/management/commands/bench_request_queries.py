@@ -0,0 +1,59 @@
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test import Client
+from django.test.utils import CaptureQueriesContext, override_settings
+from django.urls import reverse
+
+from app1 import refcache
+
+
+PAGES = ['home', 'my_request', 'requests_to_me', 'create_service_request', 'purchase_order_list']
+
+
+class Command(BaseCommand):
+    help = 'Count the DB round trips of authenticated pages with database sessions and a cold cache vs the shared cache'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--user', help='Username to browse as, defaults to the first manager of a provider')
+        parser.add_argument('--repeat', type=int, default=5, help='Requests per page and mode')
+
+    def handle(self, *args, **options):
+        if options['user']:
+            user = User.objects.filter(username=options['user']).first()
+        else:
+            user = User.objects.filter(serviceprovider__isnull=False, is_active=True).first()
+        if user is None:
+            raise CommandError('No user to browse as')
+
+        modes = [
+            ('db sessions, cold cache', 'django.contrib.sessions.backends.db', True),
+            ('cached_db sessions, warm cache', 'django.contrib.sessions.backends.cached_db', False),
+        ]
+        results = {}
+        for label, engine, cold in modes:
+            with override_settings(SESSION_ENGINE=engine, ALLOWED_HOSTS=['*']):
+                client = Client()
+                client.force_login(user)
+                for page in PAGES:
+                    client.get(reverse(page))  # the first hit fills the cache
+                    queries = 0
+                    for _ in range(options['repeat']):
+                        if cold:
+                            # only the reference data goes cold, sessions and the other
+                            # entries of the shared cache are left alone
+                            refcache.invalidate()
+                        with CaptureQueriesContext(connection) as captured:
+                            client.get(reverse(page))
+                        queries += len(captured)
+                    results[label, page] = queries / options['repeat']
+
+        self.stdout.write(f'{"page":<26}' + ''.join(f'{label:>34}' for label, _, _ in modes) + f'{"saved":>8}')
+        total_saved = 0
+        for page in PAGES:
+            before, after = (results[label, page] for label, _, _ in modes)
+            total_saved += before - after
+            self.stdout.write(f'{page:<26}{before:>34.1f}{after:>34.1f}{before - after:>8.1f}')
+        self.stdout.write(self.style.SUCCESS(
+            f'{total_saved / len(PAGES):.1f} round trips saved per authenticated page on average'
+        ))
@@ -0,0 +1,71 @@
+import time
+
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+from django.test import Client
+from django.test.utils import override_settings
+from django.urls import reverse
+
+from app1.models import PurchaseOrder, ServiceRequest
+
+
+COMPRESSION_MIDDLEWARE = ('app1.compression.CompressionMiddleware', 'app1.compression.HtmlMinifyMiddleware')
+
+
+class Command(BaseCommand):
+    help = 'Compare bytes on the wire and render time of the main pages without and with minification/compression'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--user', help='Username to browse as, defaults to the first manager of a provider')
+        parser.add_argument('--repeat', type=int, default=10, help='Requests per page and mode')
+        parser.add_argument('--encoding', default='br, gzip', help='Accept-Encoding sent by the client')
+
+    def pages(self):
+        pages = [reverse('home'), reverse('my_request'), reverse('requests_to_me'), reverse('purchase_order_list')]
+        service_request = ServiceRequest.objects.order_by('-id').first()
+        if service_request is not None:
+            pages.append(reverse('request_detail', args=[service_request.id]))
+        if PurchaseOrder.objects.exists():
+            pages.append(reverse('requests_to_me') + '?filter=supplied')
+        return pages
+
+    def measure(self, client, url, repeat, encoding):
+        elapsed = 0
+        for _ in range(repeat):
+            start = time.perf_counter()
+            response = client.get(url, HTTP_ACCEPT_ENCODING=encoding)
+            elapsed += time.perf_counter() - start
+        return len(response.content), response.get('Content-Encoding', '-'), elapsed / repeat * 1000
+
+    def handle(self, *args, **options):
+        if options['user']:
+            user = User.objects.filter(username=options['user']).first()
+        else:
+            user = User.objects.filter(serviceprovider__isnull=False, is_active=True).first()
+        if user is None:
+            raise CommandError('No user to browse as')
+
+        plain = [m for m in settings.MIDDLEWARE if m not in COMPRESSION_MIDDLEWARE]
+        results = {}
+        for label, middleware in (('plain', plain), ('compressed', settings.MIDDLEWARE)):
+            with override_settings(MIDDLEWARE=middleware, ALLOWED_HOSTS=['*']):
+                client = Client()
+                client.force_login(user)
+                for url in self.pages():
+                    client.get(url)  # warm the template and reference caches
+                    results[label, url] = self.measure(client, url, options['repeat'], options['encoding'])
+
+        self.stdout.write(f'{"page":<34}{"plain":>10}{"sent":>10}{"enc":>6}{"ratio":>8}{"plain ms":>10}{"ms":>8}')
+        total_plain = total_sent = 0
+        for url in self.pages():
+            plain_size, _, plain_ms = results['plain', url]
+            sent, encoding, ms = results['compressed', url]
+            total_plain += plain_size
+            total_sent += sent
+            self.stdout.write(
+                f'{url:<34}{plain_size:>10}{sent:>10}{encoding:>6}{sent / plain_size:>8.1%}{plain_ms:>10.1f}{ms:>8.1f}'
+            )
+        self.stdout.write(self.style.SUCCESS(
+            f'{total_plain} -> {total_sent} bytes, {1 - total_sent / total_plain:.1%} less on the wire'
+        ))
@@ -0,0 +1,21 @@
+from django.core.management.base import BaseCommand
+
+from app1.attachments import UPLOAD_EXPIRY_HOURS, clean_blobs, clean_uploads
+
+
+class Command(BaseCommand):
+    help = (
+        f'Remove the photo uploads that received nothing for {UPLOAD_EXPIRY_HOURS} hours '
+        '(ATTACHMENT_UPLOAD_EXPIRY_HOURS) with their part files, and the photo files no attachment '
+        'refers to that rolled back uploads left behind'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--dry-run', action='store_true', help='Only report what would be removed')
+
+    def handle(self, *args, **options):
+        removed = clean_uploads(dry_run=options['dry_run'])
+        verb = 'Would remove' if options['dry_run'] else 'Removed'
+        self.stdout.write(f'{verb} {removed} stale uploads')
+        removed = clean_blobs(dry_run=options['dry_run'])
+        self.stdout.write(f'{verb} {removed} orphaned photo files')
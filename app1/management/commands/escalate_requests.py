@@ -0,0 +1,41 @@
+import time
+
+from django.core.cache import cache
+from django.core.management.base import BaseCommand
+
+from app1.escalation import reschedule, tick
+
+
+LOCK_KEY = 'escalation:tick'
+
+
+class Command(BaseCommand):
+    help = 'Remind the managers of requests that stayed in a status longer than their escalation rules allow'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--interval', type=float, default=0,
+                            help='Keep ticking every INTERVAL seconds instead of once')
+        parser.add_argument('--dry-run', action='store_true', help='Only report what would fire')
+        parser.add_argument('--reschedule', action='store_true',
+                            help='Recompute the next escalation of every open request first')
+
+    def handle(self, *args, **options):
+        if options['reschedule']:
+            self.stdout.write(f'Rescheduled {reschedule()} open requests')
+        while True:
+            started = time.monotonic()
+            # two overlapping ticks would send the same reminders twice
+            if cache.add(LOCK_KEY, True, 10 * 60):
+                try:
+                    due, escalations, reminders = tick(dry_run=options['dry_run'])
+                finally:
+                    cache.delete(LOCK_KEY)
+                self.stdout.write(
+                    f'{due} due requests, {escalations} escalations, {reminders} reminders '
+                    f'in {(time.monotonic() - started) * 1000:.0f} ms'
+                )
+            else:
+                self.stdout.write('Another tick is running, skipped')
+            if not options['interval']:
+                break
+            time.sleep(options['interval'])
@@ -0,0 +1,60 @@
+import json
+import time
+
+from django.core.management.base import BaseCommand
+
+from app1.fake_gateway import FakeGateway
+from app1.gateway import GatewayClient, GatewayError, GatewayUnavailable
+
+
+class Command(BaseCommand):
+    help = (
+        'Run a local fake WhatsApp gateway with injected latency and faults; point '
+        'WHATSAPP_GATEWAY_URL at it, or use --drill to send messages through the client'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--port', type=int, default=8070)
+        parser.add_argument('--latency', type=float, default=0.0, help='Seconds added to every answer')
+        parser.add_argument('--error-rate', type=float, default=0.0, help='Share of messages answered with a 500')
+        parser.add_argument('--hang-rate', type=float, default=0.0,
+                            help='Share of messages left without an answer past the read timeout')
+        parser.add_argument('--drill', type=int, default=0,
+                            help='Send this many messages through the gateway client and print its counters')
+        parser.add_argument('--wait', type=float, default=0.0,
+                            help='Seconds a drill message may wait for the rate limit')
+
+    def handle(self, *args, **options):
+        gateway = FakeGateway(
+            port=0 if options['drill'] else options['port'], latency=options['latency'],
+            error_rate=options['error_rate'], hang_rate=options['hang_rate'],
+        )
+        if not options['drill']:
+            self.stdout.write(f'Fake gateway on {gateway.url}, Ctrl+C to stop')
+            try:
+                gateway.server.serve_forever()
+            except KeyboardInterrupt:
+                gateway.server.server_close()
+            return
+
+        with gateway:
+            # a breaker and rate limit of its own, the drill must not open the real circuit or use up the quota
+            client = GatewayClient.from_settings(
+                URL=gateway.url, USER='drill', PASSWORD='drill', BREAKER_KEY='gateway:drill', RATE_KEY='gateway:drill:rate',
+            )
+            client.breaker.success()
+            started = time.monotonic()
+            outcomes = {'sent': 0, 'failed': 0, 'unavailable': 0}
+            for number in range(options['drill']):
+                try:
+                    client.send(number, 'drill', wait=options['wait'])
+                    outcomes['sent'] += 1
+                except GatewayUnavailable:
+                    outcomes['unavailable'] += 1
+                except GatewayError:
+                    outcomes['failed'] += 1
+            elapsed = time.monotonic() - started
+            stats = client.stats()
+            client.breaker.success()
+        self.stdout.write(f'{options["drill"]} messages in {elapsed:.1f} s: {outcomes}')
+        self.stdout.write(json.dumps(stats, indent=2))
@@ -0,0 +1,39 @@
+import time
+
+from django.core.cache import cache
+from django.core.management.base import BaseCommand
+
+from app1.maintenance import generate
+
+
+LOCK_KEY = 'maintenance:generate'
+
+
+class Command(BaseCommand):
+    help = 'Raise the preventive maintenance requests whose schedules are due'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--interval', type=float, default=0,
+                            help='Keep generating every INTERVAL seconds instead of once')
+        parser.add_argument('--batch-size', type=int, default=500, help='Schedules raised per transaction')
+        parser.add_argument('--dry-run', action='store_true', help='Only report what would be raised')
+
+    def handle(self, *args, **options):
+        while True:
+            started = time.monotonic()
+            # the occurrence rows keep overlapping runs from raising a request twice,
+            # the lock spares them the work
+            if cache.add(LOCK_KEY, True, 10 * 60):
+                try:
+                    due, created, messages = generate(batch_size=options['batch_size'], dry_run=options['dry_run'])
+                finally:
+                    cache.delete(LOCK_KEY)
+                self.stdout.write(
+                    f'{due} due schedules, {created} requests, {messages} messages '
+                    f'in {(time.monotonic() - started) * 1000:.0f} ms'
+                )
+            else:
+                self.stdout.write('Another run is generating, skipped')
+            if not options['interval']:
+                break
+            time.sleep(options['interval'])
@@ -0,0 +1,112 @@
+import json
+import os
+import statistics
+import subprocess
+import sys
+from importlib import import_module
+
+from django.conf import settings
+from django.contrib.auth import BACKEND_SESSION_KEY, HASH_SESSION_KEY, SESSION_KEY
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+from django.urls import reverse
+
+
+# Runs in a fresh interpreter, the way Passenger starts a worker after a
+# restart: load the application, optionally warm it up, then time two requests
+# straight through the WSGI callable. argv: path, host, cookie, warm.
+# The child is a plain script with no command stdout to write to, so it
+# print()s its timings as one JSON line; start_worker() parses the last line
+# of its stdout, after anything the application itself printed.
+WORKER = '''
+import json, sys, time
+started = time.perf_counter()
+from project.wsgi import application
+booted = time.perf_counter()
+path, host, cookie, warm = sys.argv[1:]
+if warm == '1':
+    from app1.warmup import warmup
+    warmup()
+warmed = time.perf_counter()
+
+def request():
+    environ = {
+        'REQUEST_METHOD': 'GET', 'PATH_INFO': path, 'QUERY_STRING': '', 'SERVER_NAME': host,
+        'SERVER_PORT': '443', 'HTTP_HOST': host, 'HTTP_COOKIE': cookie, 'HTTP_ACCEPT_ENCODING': 'identity',
+        'wsgi.url_scheme': 'https', 'wsgi.input': __import__('io').BytesIO(), 'wsgi.errors': sys.stderr,
+        'wsgi.multithread': False, 'wsgi.multiprocess': True, 'wsgi.run_once': False, 'wsgi.version': (1, 0),
+    }
+    status = []
+    begin = time.perf_counter()
+    body = application(environ, lambda s, headers, exc_info=None: status.append(s))
+    chunks = iter(body)
+    next(chunks, b'')
+    first_byte = time.perf_counter() - begin
+    for chunk in chunks:
+        pass
+    getattr(body, 'close', lambda: None)()
+    return status[0], first_byte
+
+first_status, first = request()
+second_status, second = request()
+print(json.dumps({
+    'boot': booted - started, 'warmup': warmed - booted, 'first': first, 'second': second,
+    'status': first_status, 'second_status': second_status,
+}))
+'''
+
+
+class Command(BaseCommand):
+    help = 'Time a new worker from start to the first byte of its first response, without and with the warmup'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--user', help='Username to request the page as, defaults to the first manager of a provider')
+        parser.add_argument('--path', help='Page to request, defaults to the home page')
+        parser.add_argument('--runs', type=int, default=5, help='Fresh workers started per mode')
+
+    def login(self, options):
+        if options['user']:
+            user = User.objects.filter(username=options['user']).first()
+        else:
+            user = User.objects.filter(serviceprovider__isnull=False).order_by('id').first()
+        if user is None:
+            raise CommandError('No such user')
+        session = import_module(settings.SESSION_ENGINE).SessionStore()
+        session[SESSION_KEY] = str(user.pk)
+        session[BACKEND_SESSION_KEY] = settings.AUTHENTICATION_BACKENDS[0]
+        session[HASH_SESSION_KEY] = user.get_session_auth_hash()
+        session.create()
+        return session
+
+    def start_worker(self, path, host, cookie, warm):
+        result = subprocess.run(
+            [sys.executable, '-c', WORKER, path, host, cookie, '1' if warm else '0'],
+            cwd=settings.BASE_DIR, env=os.environ.copy(), capture_output=True, text=True,
+        )
+        if result.returncode:
+            raise CommandError(result.stderr[-2000:])
+        return json.loads(result.stdout.strip().splitlines()[-1])
+
+    def handle(self, *args, **options):
+        path = options['path'] or reverse('home')
+        host = next((host for host in settings.ALLOWED_HOSTS if '/' not in host and host != '*'), 'localhost')
+        session = self.login(options)
+        cookie = f'{settings.SESSION_COOKIE_NAME}={session.session_key}'
+        try:
+            self.stdout.write(f'{path} as {options["user"] or "the first provider manager"}, median of {options["runs"]} workers')
+            self.stdout.write(f'{"mode":<8}{"boot":>9}{"warmup":>9}{"1st TTFB":>10}{"2nd TTFB":>10}{"restart to 1st byte":>21}')
+            for warm in (False, True):
+                runs = [self.start_worker(path, host, cookie, warm) for _ in range(options['runs'])]
+                if runs[0]['status'] != runs[0]['second_status'] or not runs[0]['status'].startswith('200'):
+                    self.stderr.write(f'{path} answered {runs[0]["status"]} then {runs[0]["second_status"]}')
+
+                def median(key):
+                    return statistics.median(run[key] for run in runs) * 1000
+
+                total = statistics.median(run['boot'] + run['warmup'] + run['first'] for run in runs) * 1000
+                self.stdout.write(
+                    f'{"warm" if warm else "cold":<8}{median("boot"):>7.0f}ms{median("warmup"):>7.0f}ms'
+                    f'{median("first"):>8.0f}ms{median("second"):>8.0f}ms{total:>19.0f}ms'
+                )
+        finally:
+            session.delete()
@@ -0,0 +1,19 @@
+from django.core.management.base import BaseCommand
+
+from app1.images import process_profile_image
+from app1.models import UserProfile
+
+
+class Command(BaseCommand):
+    help = 'Normalize profile images and generate their thumbnails'
+
+    def handle(self, *args, **options):
+        profiles = UserProfile.objects.exclude(image='').exclude(image__isnull=True).values_list('pk', flat=True)
+        count = 0
+        for profile_id in profiles.iterator():
+            try:
+                process_profile_image(profile_id)
+                count += 1
+            except Exception as e:
+                self.stderr.write(f'Profile {profile_id} failed: {e}')
+        self.stdout.write(self.style.SUCCESS(f'Processed {count} profile images'))
@@ -0,0 +1,61 @@
+import os
+import re
+import subprocess
+import sys
+from collections import Counter
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+
+IMPORTTIME_LINE = re.compile(r'import time:\s+(\d+) \|\s+(\d+) \|( *)(\S+)')
+
+
+def import_times(code):
+    """Run code in a fresh interpreter under -X importtime, returns [(module, self_us, cumulative_us, depth)]."""
+    result = subprocess.run(
+        [sys.executable, '-X', 'importtime', '-c', code],
+        cwd=settings.BASE_DIR, env=os.environ.copy(), capture_output=True, text=True,
+    )
+    if result.returncode:
+        raise CommandError(result.stderr[-2000:])
+    rows = []
+    for line in result.stderr.splitlines():
+        match = IMPORTTIME_LINE.match(line)
+        if match:
+            rows.append((match[4], int(match[1]), int(match[2]), len(match[3]) // 2))
+    return rows
+
+
+class Command(BaseCommand):
+    help = 'Report the slowest imports of a new Passenger worker, from passenger_wsgi.py up to its first request'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--limit', type=int, default=25)
+        parser.add_argument('--depth', type=int, default=1,
+                            help='Nesting depth of the imports listed, 0 for what the worker imports itself')
+        parser.add_argument('--no-warmup', action='store_true',
+                            help='Only load the WSGI application, without the warmup of passenger_wsgi.py')
+
+    def handle(self, *args, **options):
+        code = 'from project.wsgi import application'
+        if not options['no_warmup']:
+            # what the worker imports before its first request, views and admin included
+            code += '\nfrom app1.warmup import warmup\nwarmup()'
+        rows = import_times(code)
+        limit = options['limit']
+        total = sum(row[1] for row in rows)
+        self.stdout.write(f'{len(rows)} modules imported in {total / 1000:.0f} ms\n')
+
+        self.stdout.write('Slowest imports, including what they import:')
+        listed = [row for row in rows if row[3] <= options['depth']]
+        for module, own, cumulative, depth in sorted(listed, key=lambda row: -row[2])[:limit]:
+            self.stdout.write(f'{cumulative / 1000:>9.1f} ms {own / 1000:>8.1f} ms self  {module}')
+
+        packages = Counter()
+        for module, own, cumulative, depth in rows:
+            packages[module.split('.')[0]] += own
+        # the self time of project.wsgi is mostly django.setup(), not imports
+        self.stdout.write('\nTime per top-level package:')
+        for package, own in packages.most_common(limit):
+            self.stdout.write(f'{own / 1000:>9.1f} ms {own / total:>6.1%}  {package}')
@@ -0,0 +1,17 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from app1.assignment import rebuild_loads
+
+
+class Command(BaseCommand):
+    help = 'Recount TechnicianLoad counters from the service requests'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--provider', type=int, action='append', dest='providers',
+                            help='Only rebuild this service provider id (repeatable)')
+
+    def handle(self, *args, **options):
+        with transaction.atomic():
+            count = rebuild_loads(options['providers'])
+        self.stdout.write(self.style.SUCCESS(f'Rebuilt {count} technician counters'))
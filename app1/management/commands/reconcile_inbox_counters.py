@@ -0,0 +1,17 @@
+from django.core.management.base import BaseCommand
+
+from app1.inbox import reconcile
+
+
+class Command(BaseCommand):
+    help = 'Recount the InboxCounter badge counters from the service requests and fix any drift'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--dry-run', action='store_true', help='Only report the drifted counters')
+
+    def handle(self, *args, **options):
+        drift = reconcile(dry_run=options['dry_run'])
+        for (scope, owner_id, assignee_id, bucket), (stored, expected) in sorted(drift.items()):
+            self.stdout.write(f'{scope} {owner_id} assignee={assignee_id} {bucket}: {stored} -> {expected}')
+        verb = 'Found' if options['dry_run'] else 'Fixed'
+        self.stdout.write(self.style.SUCCESS(f'{verb} {len(drift)} drifted counters'))
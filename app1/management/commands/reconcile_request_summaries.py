@@ -0,0 +1,19 @@
+from django.core.management.base import BaseCommand
+
+from app1.summary import reconcile
+
+
+class Command(BaseCommand):
+    help = 'Recompute the summary columns of the service requests (report_count, order statuses, ...) and fix any drift'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--dry-run', action='store_true', help='Only report the drifted requests')
+        parser.add_argument('--batch-size', type=int, default=1000)
+        parser.add_argument('--database', default='default', help='e.g. archive for the archived requests')
+
+    def handle(self, *args, **options):
+        drifted = reconcile(batch_size=options['batch_size'], dry_run=options['dry_run'], using=options['database'])
+        if drifted:
+            self.stdout.write('Requests: ' + ', '.join(map(str, drifted)))
+        verb = 'Found' if options['dry_run'] else 'Fixed'
+        self.stdout.write(self.style.SUCCESS(f'{verb} {len(drifted)} drifted requests'))
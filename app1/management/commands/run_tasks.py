@@ -0,0 +1,66 @@
+import multiprocessing
+import signal
+
+from django.core.management.base import BaseCommand
+from django.db import connections
+
+from app1 import taskqueue
+
+
+def work(options):
+    stopping = []
+    # finish the running task on SIGTERM/Ctrl-C, the claimed ones go back to the queue
+    signal.signal(signal.SIGTERM, lambda *_: stopping.append(True))
+    signal.signal(signal.SIGINT, lambda *_: stopping.append(True))
+    return taskqueue.work(
+        burst=options['burst'],
+        batch=options['batch'],
+        sleep=options['sleep'],
+        should_stop=lambda: bool(stopping),
+    )
+
+
+class Command(BaseCommand):
+    help = 'Run queued background tasks, e.g. from cron every minute with --burst on the shared host'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--processes', type=int, default=1, help='Worker processes claiming tasks side by side')
+        parser.add_argument('--burst', action='store_true', help='Exit once the queue is empty instead of waiting for tasks')
+        parser.add_argument('--batch', type=int, default=1, help='Tasks claimed per round trip')
+        parser.add_argument('--sleep', type=float, default=1.0, help='Seconds between polls of an empty queue')
+
+    def handle(self, *args, **options):
+        purged = taskqueue.purge_results()
+        if purged:
+            self.stdout.write(f'Purged {purged} results older than {taskqueue.RESULT_DAYS} days')
+
+        options = {key: options[key] for key in ('processes', 'burst', 'batch', 'sleep')}
+        if options['processes'] <= 1:
+            done = work(options)
+        else:
+            done = self.fork(options)
+        self.stdout.write(self.style.SUCCESS(f'Ran {done} tasks'))
+
+    def fork(self, options):
+        # children must not share the parent's database connection
+        connections.close_all()
+        context = multiprocessing.get_context('fork')
+        results = context.SimpleQueue()
+        workers = [
+            context.Process(target=lambda: results.put(work(options)))
+            for _ in range(options['processes'])
+        ]
+        for process in workers:
+            process.start()
+
+        def stop(signum, frame):
+            for process in workers:
+                if process.is_alive():
+                    process.terminate()
+
+        signal.signal(signal.SIGTERM, stop)
+        signal.signal(signal.SIGINT, stop)
+        for process in workers:
+            process.join()
+        return sum(results.get() for process in workers if process.exitcode == 0)
+
@@ -0,0 +1,79 @@
+import random
+import time
+
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from app1.assignment import auto_assign
+from app1.models import Section, ServiceProvider, ServiceRequest, TechnicianLoad
+
+
+class Rollback(Exception):
+    pass
+
+
+class Command(BaseCommand):
+    help = 'Benchmark auto-assignment on a synthetic workload, all rows are rolled back'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--providers', type=int, default=5)
+        parser.add_argument('--technicians', type=int, default=10, help='Technicians per provider')
+        parser.add_argument('--sections', type=int, default=20)
+        parser.add_argument('--requests', type=int, default=2000)
+        parser.add_argument('--complete-ratio', type=float, default=0.5,
+                            help='Chance that an open request is completed after each new one')
+        parser.add_argument('--seed', type=int, default=1)
+
+    def handle(self, *args, **options):
+        random.seed(options['seed'])
+        try:
+            with transaction.atomic():
+                self.simulate(options)
+                raise Rollback()
+        except Rollback:
+            pass
+
+    def simulate(self, options):
+        requester = User.objects.create(username='__simulate_requester')
+        sections = [Section.objects.create(name=f'sim-section-{i}') for i in range(options['sections'])]
+        providers = []
+        for p in range(options['providers']):
+            provider = ServiceProvider.objects.create(name=f'sim-provider-{p}', auto_assign=True)
+            technicians = User.objects.bulk_create([
+                User(username=f'__simulate_{p}_{t}') for t in range(options['technicians'])
+            ])
+            provider.manager.add(*technicians)
+            providers.append(provider)
+
+        open_requests = []
+        timings = []
+        started = time.perf_counter()
+        for _ in range(options['requests']):
+            service_request = ServiceRequest.objects.create(
+                title='sim', description='sim',
+                section=random.choice(sections),
+                service_provider=random.choice(providers),
+                created_by=requester, updated_by=requester,
+            )
+            t0 = time.perf_counter()
+            auto_assign(service_request, requester)
+            timings.append(time.perf_counter() - t0)
+            open_requests.append(service_request)
+            if open_requests and random.random() < options['complete_ratio']:
+                done = open_requests.pop(random.randrange(len(open_requests)))
+                done.status = 'completed'
+                done.save()
+        elapsed = time.perf_counter() - started
+
+        timings.sort()
+        loads = list(
+            TechnicianLoad.objects.filter(service_provider__in=providers).values_list('open_count', flat=True)
+        )
+        self.stdout.write(f'requests:        {len(timings)}')
+        self.stdout.write(f'throughput:      {len(timings) / elapsed * 60:.0f} requests/minute (incl. create and completion)')
+        self.stdout.write(f'assign p50:      {timings[len(timings) // 2] * 1000:.2f} ms')
+        self.stdout.write(f'assign p99:      {timings[int(len(timings) * 0.99)] * 1000:.2f} ms')
+        self.stdout.write(f'open load:       min {min(loads)} / max {max(loads)} per technician')
+        recounted = ServiceRequest.objects.filter(service_provider__in=providers).exclude(status='completed').count()
+        self.stdout.write(f'counter drift:   {recounted - sum(loads)}')
@@ -0,0 +1,38 @@
+import sqlite3
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections
+
+from app1.replica import REPLICA_DB, replica_enabled
+
+
+class Command(BaseCommand):
+    help = 'Copy the primary SQLite database onto the replica, a local stand-in for real replication'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--interval', type=float, default=0,
+                            help='Keep copying every INTERVAL seconds instead of once')
+
+    def handle(self, *args, **options):
+        if not replica_enabled():
+            raise CommandError('No replica database configured, see DJANGO_REPLICA_DB in settings')
+        primary, replica = connections['default'], connections[REPLICA_DB]
+        if primary.vendor != 'sqlite' or replica.vendor != 'sqlite':
+            raise CommandError('Only SQLite is copied here, use the replication of the database server')
+
+        while True:
+            started = time.monotonic()
+            source = sqlite3.connect(primary.settings_dict['NAME'])
+            target = sqlite3.connect(replica.settings_dict['NAME'])
+            try:
+                # the backup API copies a consistent snapshot while the primary stays writable
+                with target:
+                    source.backup(target)
+            finally:
+                source.close()
+                target.close()
+            self.stdout.write(f'replica synced in {(time.monotonic() - started) * 1000:.0f} ms')
+            if not options['interval']:
+                break
+            time.sleep(options['interval'])
@@ -0,0 +1,43 @@
+from importlib import import_module
+
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.contrib.sessions.models import Session
+from django.core.management.base import BaseCommand
+from django.db.models import Q
+from django.utils import timezone
+
+from app1.models import ServiceProvider
+from app1.refcache import (
+    all_service_providers, provider_manager_phones, user_provider_ids, user_sections,
+)
+
+
+class Command(BaseCommand):
+    help = 'Fill the shared cache with reference data and the live sessions, e.g. after a deploy or cache flush'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--no-sessions', action='store_true', help='Only warm the reference data')
+
+    def handle(self, *args, **options):
+        all_service_providers()
+        for provider_id in ServiceProvider.objects.values_list('id', flat=True):
+            provider_manager_phones(provider_id)
+        manager_ids = list(
+            User.objects.filter(Q(section__isnull=False) | Q(serviceprovider__isnull=False), is_active=True)
+            .distinct().values_list('id', flat=True)
+        )
+        for user_id in manager_ids:
+            user_sections(user_id)
+            user_provider_ids(user_id)
+        self.stdout.write(f'reference data of {len(manager_ids)} managers cached')
+
+        store = import_module(settings.SESSION_ENGINE).SessionStore
+        if options['no_sessions'] or not hasattr(store, 'cache_key_prefix'):
+            return
+        sessions = 0
+        for key in Session.objects.filter(expire_date__gt=timezone.now()).values_list('session_key', flat=True).iterator():
+            # loading a cached_db session writes it to the cache
+            store(session_key=key).load()
+            sessions += 1
+        self.stdout.write(self.style.SUCCESS(f'{sessions} sessions cached'))
@@ -0,0 +1,37 @@
+from django.db import migrations
+
+
+# auth_user belongs to django.contrib.auth, so the indexes used by the
+# assign_to_user prefix search are created here with vendor specific SQL.
+USER_SEARCH_COLUMNS = ['username', 'first_name', 'last_name']
+
+
+def create_indexes(apps, schema_editor):
+    vendor = schema_editor.connection.vendor
+    for column in USER_SEARCH_COLUMNS:
+        name = f'app1_auth_user_{column}_prefix'
+        if vendor == 'sqlite':
+            # LIKE is case-insensitive on SQLite and only uses NOCASE indexes
+            schema_editor.execute(f'CREATE INDEX IF NOT EXISTS {name} ON auth_user ({column} COLLATE NOCASE)')
+        elif vendor == 'postgresql':
+            # istartswith compiles to UPPER(col) LIKE UPPER(%s)
+            schema_editor.execute(f'CREATE INDEX IF NOT EXISTS {name} ON auth_user (UPPER({column}) varchar_pattern_ops)')
+
+
+def drop_indexes(apps, schema_editor):
+    if schema_editor.connection.vendor not in ('sqlite', 'postgresql'):
+        return
+    for column in USER_SEARCH_COLUMNS:
+        schema_editor.execute(f'DROP INDEX IF EXISTS app1_auth_user_{column}_prefix')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('app1', '0003_userprofile_image_hash'),
+        ('auth', '0012_alter_user_first_name_max_length'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_indexes, drop_indexes),
+    ]
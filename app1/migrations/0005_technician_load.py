@@ -0,0 +1,53 @@
+# Generated by Django 5.1.15 on 2026-10-19 12:46
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import Count
+
+
+def count_open_load(apps, schema_editor):
+    ServiceRequest = apps.get_model('app1', 'ServiceRequest')
+    TechnicianLoad = apps.get_model('app1', 'TechnicianLoad')
+    db = schema_editor.connection.alias
+    rows = (
+        ServiceRequest.objects.using(db).filter(assigned_to__isnull=False)
+        .exclude(status='completed')
+        .values('service_provider_id', 'assigned_to_id')
+        .annotate(n=Count('id'))
+    )
+    TechnicianLoad.objects.using(db).bulk_create([
+        TechnicianLoad(service_provider_id=row['service_provider_id'], user_id=row['assigned_to_id'], open_count=row['n'])
+        for row in rows
+    ])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('app1', '0004_auth_user_prefix_indexes'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='serviceprovider',
+            name='auto_assign',
+            field=models.BooleanField(default=False),
+        ),
+        migrations.CreateModel(
+            name='TechnicianLoad',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('open_count', models.PositiveIntegerField(default=0)),
+                ('completed_count', models.PositiveIntegerField(default=0)),
+                ('turnaround_seconds', models.PositiveBigIntegerField(default=0)),
+                ('service_provider', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='technician_loads', to='app1.serviceprovider')),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='technician_loads', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'unique_together': {('service_provider', 'user')},
+            },
+        ),
+        migrations.RunPython(count_open_load, migrations.RunPython.noop),
+    ]
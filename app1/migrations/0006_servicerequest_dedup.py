@@ -0,0 +1,109 @@
+# Generated by Django 5.1.15 on 2026-10-19 12:48
+
+import hashlib
+import re
+import struct
+import unicodedata
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+# A frozen copy of the fingerprints of app1.dedup as they were when this
+# migration was written, so it gives the same result whatever dedup becomes.
+ARABIC_DIACRITICS = re.compile('[\u0610-\u061a\u064b-\u065f\u0670\u06d6-\u06ed\u0640]')
+ARABIC_LETTER_VARIANTS = str.maketrans({
+    'أ': 'ا', 'إ': 'ا', 'آ': 'ا', 'ٱ': 'ا',
+    'ى': 'ي', 'ئ': 'ي', 'ی': 'ي',
+    'ؤ': 'و', 'ة': 'ه', 'ک': 'ك',
+    **{chr(0x0660 + d): str(d) for d in range(10)},
+    **{chr(0x06F0 + d): str(d) for d in range(10)},
+})
+WHITESPACE = re.compile(r'\s+')
+MINHASH_PERMUTATIONS = 64
+SHINGLE_SIZE = 4
+MAX_HASH = (1 << 32) - 1
+
+
+def normalize_text(text):
+    text = unicodedata.normalize('NFKC', text or '').casefold()
+    text = ARABIC_DIACRITICS.sub('', text)
+    text = text.translate(ARABIC_LETTER_VARIANTS)
+    text = ''.join(' ' if unicodedata.category(ch)[0] in 'PS' else ch for ch in text)
+    return WHITESPACE.sub(' ', text).strip()
+
+
+def request_content_hash(title, description, section_id, service_provider_id, created_by_id):
+    key = '\x1f'.join([
+        normalize_text(title), normalize_text(description),
+        str(section_id), str(service_provider_id), str(created_by_id),
+    ])
+    return hashlib.sha256(key.encode('utf-8')).hexdigest()
+
+
+def request_signature(title, description):
+    text = normalize_text(f'{title} {description}')
+    if len(text) <= SHINGLE_SIZE:
+        shingles = {text} if text else set()
+    else:
+        shingles = {text[i:i + SHINGLE_SIZE] for i in range(len(text) - SHINGLE_SIZE + 1)}
+    bins = [None] * MINHASH_PERMUTATIONS
+    for s in shingles:
+        h = int.from_bytes(hashlib.blake2b(s.encode('utf-8'), digest_size=8).digest(), 'little')
+        index = h % MINHASH_PERMUTATIONS
+        value = (h // MINHASH_PERMUTATIONS) & MAX_HASH
+        if bins[index] is None or value < bins[index]:
+            bins[index] = value
+    filled = [i for i, value in enumerate(bins) if value is not None]
+    if not filled:
+        return b''
+    for i, value in enumerate(bins):
+        if value is None:
+            bins[i] = bins[next((j for j in filled if j > i), filled[0])]
+    return struct.pack(f'<{MINHASH_PERMUTATIONS}I', *bins)
+
+
+def backfill_fingerprints(apps, schema_editor):
+    ServiceRequest = apps.get_model('app1', 'ServiceRequest')
+    db = schema_editor.connection.alias
+    batch = []
+    for service_request in ServiceRequest.objects.using(db).only(
+        'title', 'description', 'section_id', 'service_provider_id', 'created_by_id'
+    ).iterator(chunk_size=1000):
+        service_request.content_hash = request_content_hash(
+            service_request.title, service_request.description, service_request.section_id,
+            service_request.service_provider_id, service_request.created_by_id,
+        )
+        service_request.minhash = request_signature(service_request.title, service_request.description)
+        batch.append(service_request)
+        if len(batch) >= 1000:
+            ServiceRequest.objects.using(db).bulk_update(batch, ['content_hash', 'minhash'])
+            batch = []
+    if batch:
+        ServiceRequest.objects.using(db).bulk_update(batch, ['content_hash', 'minhash'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('app1', '0005_technician_load'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='servicerequest',
+            name='content_hash',
+            field=models.CharField(blank=True, editable=False, max_length=64),
+        ),
+        migrations.AddField(
+            model_name='servicerequest',
+            name='minhash',
+            field=models.BinaryField(blank=True, null=True),
+        ),
+        migrations.AddIndex(
+            model_name='servicerequest',
+            index=models.Index(fields=['content_hash', 'created_at'], name='servicerequest_dedup_idx'),
+        ),
+        migrations.RunPython(backfill_fingerprints, migrations.RunPython.noop),
+    ]
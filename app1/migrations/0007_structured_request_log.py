@@ -0,0 +1,175 @@
+# Generated by Django 5.1.15 on 2026-10-19 12:54
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+# the sentences the views used to store, frozen here so later changes to
+# app1.audit do not change how old rows are read
+LEGACY_COMMENTS = {
+    'تم إنشاء طلب جديد': (1, '', ''),
+    'تم إنشاء تقرير جديد': (4, '', ''),
+    'تم انشاء تقرير احتياج خدمة خارجية': (5, '', ''),
+    'تم إنشاء تقرير إنجاز': (6, '', ''),
+    'تم تعديل تقرير إنجاز': (7, '', ''),
+    'تم إنشاء طلب شراء': (8, '', ''),
+    'تم تعديل طلب الشراء': (9, '', ''),
+    'تم تعديل حالة طلب الشراء الى جاهز للشراء': (10, '', 'approved'),
+    'تم تعديل حالة طلب الشراء الى قيد الاعتماد': (10, '', 'approved'),
+    'تم تعديل حالة طلب الشراء الى تم الاستخدام': (10, '', 'used'),
+    'تم إنشاء طلب مخزني': (11, '', ''),
+    'تم تعديل طلب مخزني': (12, '', ''),
+    'تم تعديل حالة طلب مخزني الى تم الاستخدام': (13, '', 'used'),
+    'تم تعديل حالة طلب مخزني الى قيد العمل': (13, '', 'pending'),
+    'تم تعديل حالة الطلب الى قيد المراجعة': (14, 'in_progress', 'under_review'),
+    'تم اكمال الطلب': (16, '', 'completed'),
+}
+LEGACY_PREFIXES = [
+    ('تم تعيين الطلب تلقائياً الى المستخدم ', 3, ''),
+    ('تم تعيين الطلب الى المستخدم ', 2, ''),
+    ('تم اعادة حالة الطلب الى قيد العمل: ', 15, 'in_progress'),
+]
+ASSIGN_EVENTS = (2, 3)
+USER_TARGET = 1
+
+RENDERED = {event: text for text, (event, _, new_status) in LEGACY_COMMENTS.items() if event not in (10, 13)}
+RENDERED.update({(10, 'approved'): 'تم تعديل حالة طلب الشراء الى جاهز للشراء',
+                 (10, 'used'): 'تم تعديل حالة طلب الشراء الى تم الاستخدام',
+                 (13, 'used'): 'تم تعديل حالة طلب مخزني الى تم الاستخدام',
+                 (13, 'pending'): 'تم تعديل حالة طلب مخزني الى قيد العمل'})
+
+
+def parse_comment(comment):
+    comment = (comment or '').strip()
+    if comment in LEGACY_COMMENTS:
+        event, old_status, new_status = LEGACY_COMMENTS[comment]
+        return event, old_status, new_status, ''
+    for prefix, event, new_status in LEGACY_PREFIXES:
+        if comment.startswith(prefix):
+            return event, '', new_status, comment[len(prefix):]
+    return 0, '', '', comment
+
+
+def backfill_events(apps, schema_editor):
+    ServiceRequestLog = apps.get_model('app1', 'ServiceRequestLog')
+    User = apps.get_model(*settings.AUTH_USER_MODEL.split('.'))
+    db = schema_editor.connection.alias
+    user_ids = dict(User.objects.using(db).values_list('username', 'id'))
+    batch = []
+    for log in ServiceRequestLog.objects.using(db).only('comment').iterator(chunk_size=2000):
+        log.event, log.old_status, log.new_status, log.note = parse_comment(log.comment)
+        if log.event in ASSIGN_EVENTS and log.note in user_ids:
+            log.target_type, log.target_id = USER_TARGET, user_ids[log.note]
+        batch.append(log)
+        if len(batch) >= 2000:
+            ServiceRequestLog.objects.using(db).bulk_update(batch, ['event', 'old_status', 'new_status', 'note', 'target_type', 'target_id'])
+            batch = []
+    if batch:
+        ServiceRequestLog.objects.using(db).bulk_update(batch, ['event', 'old_status', 'new_status', 'note', 'target_type', 'target_id'])
+
+
+def restore_comments(apps, schema_editor):
+    ServiceRequestLog = apps.get_model('app1', 'ServiceRequestLog')
+    prefixes = {event: prefix for prefix, event, _ in LEGACY_PREFIXES}
+    db = schema_editor.connection.alias
+    batch = []
+    for log in ServiceRequestLog.objects.using(db).iterator(chunk_size=2000):
+        if log.event in prefixes:
+            log.comment = prefixes[log.event] + log.note
+        else:
+            log.comment = RENDERED.get((log.event, log.new_status)) or RENDERED.get(log.event) or log.note
+        batch.append(log)
+        if len(batch) >= 2000:
+            ServiceRequestLog.objects.using(db).bulk_update(batch, ['comment'])
+            batch = []
+    if batch:
+        ServiceRequestLog.objects.using(db).bulk_update(batch, ['comment'])
+
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('app1', '0006_servicerequest_dedup'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ServiceRequestLogArchive',
+            fields=[
+                ('event', models.PositiveSmallIntegerField(choices=[(0, 'ملاحظة'), (1, 'إنشاء الطلب'), (2, 'تعيين الطلب'), (3, 'تعيين تلقائي'), (4, 'إنشاء تقرير'), (5, 'إنشاء تقرير خدمة خارجية'), (6, 'إنشاء تقرير إنجاز'), (7, 'تعديل تقرير إنجاز'), (8, 'إنشاء طلب شراء'), (9, 'تعديل طلب شراء'), (10, 'تغيير حالة طلب شراء'), (11, 'إنشاء طلب مخزني'), (12, 'تعديل طلب مخزني'), (13, 'تغيير حالة طلب مخزني'), (14, 'تغيير حالة الطلب'), (15, 'إعادة الطلب الى قيد العمل'), (16, 'اكمال الطلب')], default=0)),
+                ('target_type', models.PositiveSmallIntegerField(choices=[(0, 'طلب'), (1, 'مستخدم'), (2, 'تقرير'), (3, 'تقرير إنجاز'), (4, 'طلب شراء'), (5, 'طلب مخزني')], default=0)),
+                ('target_id', models.PositiveBigIntegerField(blank=True, null=True)),
+                ('old_status', models.CharField(blank=True, max_length=20)),
+                ('new_status', models.CharField(blank=True, max_length=20)),
+                ('note', models.TextField(blank=True)),
+                ('id', models.BigIntegerField(primary_key=True, serialize=False)),
+                ('created_at', models.DateTimeField()),
+            ],
+        ),
+        migrations.AddField(
+            model_name='servicerequestlog',
+            name='event',
+            field=models.PositiveSmallIntegerField(choices=[(0, 'ملاحظة'), (1, 'إنشاء الطلب'), (2, 'تعيين الطلب'), (3, 'تعيين تلقائي'), (4, 'إنشاء تقرير'), (5, 'إنشاء تقرير خدمة خارجية'), (6, 'إنشاء تقرير إنجاز'), (7, 'تعديل تقرير إنجاز'), (8, 'إنشاء طلب شراء'), (9, 'تعديل طلب شراء'), (10, 'تغيير حالة طلب شراء'), (11, 'إنشاء طلب مخزني'), (12, 'تعديل طلب مخزني'), (13, 'تغيير حالة طلب مخزني'), (14, 'تغيير حالة الطلب'), (15, 'إعادة الطلب الى قيد العمل'), (16, 'اكمال الطلب')], default=0),
+        ),
+        migrations.AddField(
+            model_name='servicerequestlog',
+            name='new_status',
+            field=models.CharField(blank=True, max_length=20),
+        ),
+        migrations.AddField(
+            model_name='servicerequestlog',
+            name='note',
+            field=models.TextField(blank=True),
+        ),
+        migrations.AddField(
+            model_name='servicerequestlog',
+            name='old_status',
+            field=models.CharField(blank=True, max_length=20),
+        ),
+        migrations.AddField(
+            model_name='servicerequestlog',
+            name='target_id',
+            field=models.PositiveBigIntegerField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='servicerequestlog',
+            name='target_type',
+            field=models.PositiveSmallIntegerField(choices=[(0, 'طلب'), (1, 'مستخدم'), (2, 'تقرير'), (3, 'تقرير إنجاز'), (4, 'طلب شراء'), (5, 'طلب مخزني')], default=0),
+        ),
+        migrations.RunPython(backfill_events, restore_comments),
+        # the default only matters when the migration is reversed and the column is re-added
+        migrations.AlterField(
+            model_name='servicerequestlog',
+            name='comment',
+            field=models.TextField(default=''),
+        ),
+        migrations.RemoveField(
+            model_name='servicerequestlog',
+            name='comment',
+        ),
+        migrations.AddIndex(
+            model_name='servicerequestlog',
+            index=models.Index(fields=['service_request', 'created_at'], name='requestlog_request_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='servicerequestlog',
+            index=models.Index(fields=['created_at'], name='requestlog_created_idx'),
+        ),
+        migrations.AddField(
+            model_name='servicerequestlogarchive',
+            name='created_by',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to=settings.AUTH_USER_MODEL),
+        ),
+        migrations.AddField(
+            model_name='servicerequestlogarchive',
+            name='service_request',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='archived_logs', to='app1.servicerequest'),
+        ),
+        migrations.AddIndex(
+            model_name='servicerequestlogarchive',
+            index=models.Index(fields=['service_request', 'created_at'], name='logarchive_request_idx'),
+        ),
+    ]
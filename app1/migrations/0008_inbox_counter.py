@@ -0,0 +1,61 @@
+# Generated by Django 5.1.15 on 2026-10-19 13:00
+
+from collections import Counter
+
+from django.db import migrations, models
+from django.db.models import Count
+
+
+# A frozen copy of the count of app1.inbox as it was when this migration was
+# written: every request counts in 'all' and its status bucket, for its
+# provider and section, and for its provider and assignee; plus 'supplied'
+# while one of its purchase orders is supplied.
+ALL = 'all'
+SUPPLIED = 'supplied'
+FIELDS = ['service_provider_id', 'section_id', 'assigned_to_id', 'status']
+
+
+def count_inbox(apps, schema_editor):
+    ServiceRequest = apps.get_model('app1', 'ServiceRequest')
+    PurchaseOrder = apps.get_model('app1', 'PurchaseOrder')
+    InboxCounter = apps.get_model('app1', 'InboxCounter')
+    db = schema_editor.connection.alias
+    requests = ServiceRequest.objects.using(db)
+    supplied = PurchaseOrder.objects.using(db).filter(status=SUPPLIED).values('report__service_request_id')
+    totals = Counter()
+    for queryset, bucket in [(requests, None), (requests.filter(id__in=supplied), SUPPLIED)]:
+        for row in queryset.values(*FIELDS).annotate(n=Count('id')).order_by():
+            for name in [bucket] if bucket else [ALL, row['status']]:
+                totals['provider', row['service_provider_id'], 0, name] += row['n']
+                totals['section', row['section_id'], 0, name] += row['n']
+                if row['assigned_to_id']:
+                    totals['provider', row['service_provider_id'], row['assigned_to_id'], name] += row['n']
+    InboxCounter.objects.using(db).bulk_create([
+        InboxCounter(scope=scope, owner_id=owner_id, assignee_id=assignee_id, bucket=name, count=count)
+        for (scope, owner_id, assignee_id, name), count in totals.items()
+    ])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('app1', '0007_structured_request_log'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='InboxCounter',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('scope', models.CharField(choices=[('provider', 'جهة خدمية'), ('section', 'قسم')], max_length=10)),
+                ('owner_id', models.PositiveIntegerField()),
+                ('assignee_id', models.PositiveIntegerField(default=0)),
+                ('bucket', models.CharField(max_length=20)),
+                ('count', models.PositiveIntegerField(default=0)),
+            ],
+            options={
+                'unique_together': {('scope', 'owner_id', 'assignee_id', 'bucket')},
+            },
+        ),
+        migrations.RunPython(count_inbox, migrations.RunPython.noop),
+    ]
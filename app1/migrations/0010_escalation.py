@@ -0,0 +1,69 @@
+# Generated by Django 5.1.15 on 2026-10-19 13:18
+
+import django.db.models.deletion
+import django.utils.timezone
+from django.db import migrations, models
+from django.db.models import F, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+
+# LogTarget.SERVICE_REQUEST when this migration was written
+SERVICE_REQUEST_TARGET = 0
+
+
+def backfill_status_changed_at(apps, schema_editor):
+    ServiceRequest = apps.get_model('app1', 'ServiceRequest')
+    ServiceRequestLog = apps.get_model('app1', 'ServiceRequestLog')
+    db = schema_editor.connection.alias
+    # the last log row that moved the request into its current status
+    entered = ServiceRequestLog.objects.using(db).filter(
+        service_request=OuterRef('pk'), target_type=SERVICE_REQUEST_TARGET, new_status=OuterRef('status')
+    ).order_by('-created_at').values('created_at')[:1]
+    ServiceRequest.objects.using(db).update(status_changed_at=Coalesce(Subquery(entered), F('created_at')))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('app1', '0009_task_queue'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='servicerequest',
+            name='next_escalation_at',
+            field=models.DateTimeField(blank=True, db_index=True, editable=False, null=True),
+        ),
+        migrations.AddField(
+            model_name='servicerequest',
+            name='status_changed_at',
+            field=models.DateTimeField(default=django.utils.timezone.now, editable=False),
+        ),
+        migrations.CreateModel(
+            name='EscalationRule',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('status', models.CharField(choices=[('pending', 'قيد الانتظار'), ('in_progress', 'قيد التنفيذ'), ('under_review', 'قيد المراجعة')], max_length=100)),
+                ('after_hours', models.PositiveIntegerField()),
+                ('notify', models.CharField(choices=[('provider', 'مدراء الجهة الخدمية'), ('section', 'مدراء القسم'), ('assignee', 'المسؤول عن الطلب')], default='provider', max_length=10)),
+                ('active', models.BooleanField(default=True)),
+                ('section', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, to='app1.section')),
+                ('service_provider', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, to='app1.serviceprovider')),
+            ],
+        ),
+        migrations.CreateModel(
+            name='Escalation',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('status_changed_at', models.DateTimeField()),
+                ('recipients', models.PositiveSmallIntegerField(default=0)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('service_request', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='escalations', to='app1.servicerequest')),
+                ('rule', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='escalations', to='app1.escalationrule')),
+            ],
+            options={
+                'unique_together': {('service_request', 'rule', 'status_changed_at')},
+            },
+        ),
+        migrations.RunPython(backfill_status_changed_at, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,37 @@
+# Generated by Django 5.1.15 on 2026-10-19 13:23
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('app1', '0010_escalation'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='NotificationStat',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('day', models.DateField(unique=True)),
+                ('immediate', models.PositiveIntegerField(default=0)),
+                ('buffered', models.PositiveIntegerField(default=0)),
+                ('digests', models.PositiveIntegerField(default=0)),
+            ],
+        ),
+        migrations.CreateModel(
+            name='PendingNotification',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('phone', models.CharField(db_index=True, max_length=100)),
+                ('summary', models.TextField()),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+            ],
+        ),
+        migrations.AddField(
+            model_name='userprofile',
+            name='notification_mode',
+            field=models.CharField(choices=[('immediate', 'فوري'), ('digest', 'ملخص دوري')], default='immediate', max_length=10),
+        ),
+    ]
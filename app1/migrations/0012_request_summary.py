@@ -0,0 +1,99 @@
+# Generated by Django 5.1.15 on 2026-10-19 13:35
+
+import django.utils.timezone
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import Case, Count, Exists, F, OuterRef, Subquery, Value, When
+from django.db.models.functions import Coalesce
+
+
+# A frozen copy of app1.summary.expressions as it was when this migration was
+# written, built from the historical models.
+PURCHASE_ORDER_STATUSES = ('supplied', 'approved', 'used')
+INVENTORY_ORDER_STATUSES = ('pending', 'used')
+
+
+def backfill_summary(apps, schema_editor):
+    def model(name):
+        return apps.get_model('app1', name)
+
+    def count(name):
+        rows = model(name).objects.filter(service_request=OuterRef('pk')).order_by()
+        return Coalesce(Subquery(rows.values('service_request').annotate(n=Count('pk')).values('n')), 0)
+
+    def order_status(name, statuses):
+        return Case(
+            *[
+                When(Exists(model(name).objects.filter(report__service_request=OuterRef('pk'), status=status)),
+                     then=Value(status))
+                for status in statuses
+            ],
+            default=Value(''),
+        )
+
+    def last_log(name):
+        rows = model(name).objects.filter(service_request=OuterRef('pk')).order_by('-created_at')
+        return Subquery(rows.values('created_at')[:1])
+
+    model('ServiceRequest').objects.using(schema_editor.connection.alias).update(
+        report_count=count('Report'),
+        has_completion_report=Exists(model('CompletionReport').objects.filter(service_request=OuterRef('pk'))),
+        purchase_order_status=order_status('PurchaseOrder', PURCHASE_ORDER_STATUSES),
+        inventory_order_status=order_status('InventoryOrder', INVENTORY_ORDER_STATUSES),
+        last_activity_at=Coalesce(last_log('ServiceRequestLog'), last_log('ServiceRequestLogArchive'), F('created_at')),
+        log_count=count('ServiceRequestLog') + count('ServiceRequestLogArchive'),
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('app1', '0011_notification_digest'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='servicerequest',
+            name='has_completion_report',
+            field=models.BooleanField(default=False, editable=False),
+        ),
+        migrations.AddField(
+            model_name='servicerequest',
+            name='inventory_order_status',
+            field=models.CharField(blank=True, editable=False, max_length=20),
+        ),
+        migrations.AddField(
+            model_name='servicerequest',
+            name='last_activity_at',
+            field=models.DateTimeField(default=django.utils.timezone.now, editable=False),
+        ),
+        migrations.AddField(
+            model_name='servicerequest',
+            name='log_count',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='servicerequest',
+            name='purchase_order_status',
+            field=models.CharField(blank=True, editable=False, max_length=20),
+        ),
+        migrations.AddField(
+            model_name='servicerequest',
+            name='report_count',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.AddIndex(
+            model_name='servicerequest',
+            index=models.Index(fields=['purchase_order_status', 'section'], name='servicerequest_po_section_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='servicerequest',
+            index=models.Index(fields=['purchase_order_status', 'service_provider'], name='servicerequest_po_provider_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='servicerequest',
+            index=models.Index(fields=['last_activity_at'], name='servicerequest_activity_idx'),
+        ),
+        migrations.RunPython(backfill_summary, migrations.RunPython.noop),
+    ]
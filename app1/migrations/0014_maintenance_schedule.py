@@ -0,0 +1,52 @@
+# Generated by Django 5.1.15 on 2026-10-19 13:56
+
+import django.db.models.deletion
+import django.utils.timezone
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('app1', '0013_client_write'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='MaintenanceSchedule',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('title', models.CharField(max_length=100)),
+                ('description', models.TextField()),
+                ('frequency', models.CharField(choices=[('daily', 'يومي'), ('weekly', 'أسبوعي'), ('monthly', 'شهري')], default='monthly', max_length=10)),
+                ('interval', models.PositiveSmallIntegerField(default=1)),
+                ('by_weekday', models.CharField(blank=True, max_length=20)),
+                ('by_month_day', models.SmallIntegerField(blank=True, null=True)),
+                ('starts_at', models.DateTimeField(default=django.utils.timezone.now)),
+                ('ends_at', models.DateTimeField(blank=True, null=True)),
+                ('active', models.BooleanField(default=True)),
+                ('last_run_at', models.DateTimeField(blank=True, editable=False, null=True)),
+                ('next_run_at', models.DateTimeField(blank=True, db_index=True, editable=False, null=True)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('created_by', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='maintenance_schedules', to=settings.AUTH_USER_MODEL)),
+                ('section', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='maintenance_schedules', to='app1.section')),
+                ('service_provider', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='maintenance_schedules', to='app1.serviceprovider')),
+            ],
+        ),
+        migrations.CreateModel(
+            name='MaintenanceOccurrence',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('due_at', models.DateTimeField()),
+                ('run', models.UUIDField(editable=False)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('service_request', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to='app1.servicerequest')),
+                ('schedule', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='occurrences', to='app1.maintenanceschedule')),
+            ],
+            options={
+                'unique_together': {('schedule', 'due_at')},
+            },
+        ),
+    ]
@@ -1,5 +1,8 @@
-from django.db import models
+import uuid
+
+from django.db import models, router, transaction
 from django.contrib.auth.models import User
+from django.utils import timezone
 
 # Create your models here.
 
@@ -15,14 +18,39 @@ class UserProfile(models.Model):
     user = models.OneToOneField(User, on_delete=models.CASCADE, related_name='profile')
     phone = models.CharField(max_length=100)
     image = models.ImageField(upload_to='profile_images', null=True, blank=True)
+    # sha256 of the uploaded file, set once app1.images has written the derived files
+    image_hash = models.CharField(max_length=64, blank=True, editable=False)
+    # digest: workflow messages are collected and sent as one summary, see app1.notifications
+    notification_mode = models.CharField(max_length=10, choices=[('immediate', 'فوري'), ('digest', 'ملخص دوري')], default='immediate')
 
     def __str__(self):
         return self.user.username
+
+    def thumbnail_url(self, size, ext='jpg'):
+        from .images import THUMBNAIL_SIZES, thumbnail_name
+        if not self.image:
+            return ''
+        if not self.image_hash:
+            # thumbnails are still being generated, fall back to the original
+            return self.image.url
+        size = next((s for s in THUMBNAIL_SIZES if s >= size), THUMBNAIL_SIZES[-1])
+        return self.image.storage.url(thumbnail_name(self.image_hash, size, ext))
+
+    def thumbnail_srcset(self, size, ext='jpg'):
+        from .images import THUMBNAIL_SIZES, thumbnail_name
+        if not self.image_hash:
+            return ''
+        return ', '.join(
+            f'{self.image.storage.url(thumbnail_name(self.image_hash, s, ext))} {s / size:g}x'
+            for s in THUMBNAIL_SIZES if s >= size
+        )
     
 
 class ServiceProvider(models.Model):
     name = models.CharField(max_length=100)
     manager = models.ManyToManyField(User)
+    # pick an assignee for new requests with app1.assignment instead of waiting for assign_to_user
+    auto_assign = models.BooleanField(default=False)
 
     def __str__(self):
         return self.name
@@ -30,6 +58,22 @@ class ServiceProvider(models.Model):
 
 
 
+class ServiceRequestQuerySet(models.QuerySet):
+    # the technician load and inbox counters follow these in the post_save handlers
+    COUNTED_FIELDS = {
+        'status', 'assigned_to', 'assigned_to_id', 'service_provider', 'service_provider_id', 'section', 'section_id',
+    }
+
+    def update(self, **kwargs):
+        counted = self.COUNTED_FIELDS & kwargs.keys()
+        if counted:
+            raise TypeError(
+                f'update() of {", ".join(sorted(counted))} would bypass the technician load and inbox counters, '
+                'save() each request instead'
+            )
+        return super().update(**kwargs)
+
+
 class ServiceRequest(models.Model):
     title = models.CharField(max_length=100)
     description = models.TextField()
@@ -41,21 +85,231 @@ class ServiceRequest(models.Model):
     created_by = models.ForeignKey(User, on_delete=models.CASCADE, related_name='created_by')
     updated_by = models.ForeignKey(User, on_delete=models.CASCADE, related_name='updated_by')
     assigned_to = models.ForeignKey(User, on_delete=models.CASCADE, related_name='assigned_to', null=True, blank=True)
+    # normalized fingerprints maintained in save(), see app1.dedup
+    content_hash = models.CharField(max_length=64, blank=True, editable=False)
+    minhash = models.BinaryField(null=True, blank=True, editable=False)
+    # maintained in save(): when the request entered its status and when the next
+    # escalation rule for it is due, see app1.escalation
+    status_changed_at = models.DateTimeField(default=timezone.now, editable=False)
+    next_escalation_at = models.DateTimeField(null=True, blank=True, editable=False, db_index=True)
+    # summary of the reports, orders and logs, kept by UPDATEs of their own in
+    # the transaction of each write, see app1.summary
+    report_count = models.PositiveIntegerField(default=0, editable=False)
+    has_completion_report = models.BooleanField(default=False, editable=False)
+    purchase_order_status = models.CharField(max_length=20, blank=True, editable=False)
+    inventory_order_status = models.CharField(max_length=20, blank=True, editable=False)
+    last_activity_at = models.DateTimeField(default=timezone.now, editable=False)
+    log_count = models.PositiveIntegerField(default=0, editable=False)
+
+    objects = ServiceRequestQuerySet.as_manager()
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['content_hash', 'created_at'], name='servicerequest_dedup_idx'),
+            models.Index(fields=['purchase_order_status', 'section'], name='servicerequest_po_section_idx'),
+            models.Index(fields=['purchase_order_status', 'service_provider'], name='servicerequest_po_provider_idx'),
+            models.Index(fields=['last_activity_at'], name='servicerequest_activity_idx'),
+        ]
 
     def __str__(self):
         return self.title
 
+    def refresh_fingerprints(self):
+        from .dedup import request_content_hash, request_signature
+        self.content_hash = request_content_hash(
+            self.title, self.description, self.section_id, self.service_provider_id, self.created_by_id
+        )
+        self.minhash = request_signature(self.title, self.description)
 
-class ServiceRequestLog(models.Model):
-    service_request = models.ForeignKey(ServiceRequest, on_delete=models.CASCADE)
-    comment = models.TextField()
+    def content_changed(self):
+        # _content_snapshot is the content the request was loaded with, see app1.signals
+        from .dedup import content_snapshot
+        return self._state.adding or content_snapshot(self) != self._content_snapshot
+
+    def save(self, *args, **kwargs):
+        update_fields = kwargs.get('update_fields')
+        fingerprinted = {'title', 'description', 'section', 'service_provider', 'created_by'}
+        if (update_fields is None or fingerprinted & set(update_fields)) and self.content_changed():
+            self.refresh_fingerprints()
+            if update_fields is not None:
+                kwargs['update_fields'] = set(update_fields) | {'content_hash', 'minhash'}
+        if update_fields is None or 'status' in update_fields:
+            from .escalation import status_changed, schedule
+            if self._state.adding or status_changed(self):
+                schedule(self)
+                if update_fields is not None:
+                    kwargs['update_fields'] = set(kwargs['update_fields']) | {'status_changed_at', 'next_escalation_at'}
+        if update_fields is None and not self._state.adding and not kwargs.get('force_insert'):
+            # an instance loaded before a report or log was added must not write
+            # its stale summary back, see app1.summary
+            from .summary import FIELDS as SUMMARY_FIELDS
+            deferred = self.get_deferred_fields()
+            kwargs['update_fields'] = [
+                field.name for field in self._meta.concrete_fields
+                if not field.primary_key and field.name not in SUMMARY_FIELDS and field.attname not in deferred
+            ]
+        adding = self._state.adding
+        # the post_save handlers update the load and inbox counters in the same transaction
+        with transaction.atomic(using=kwargs.get('using') or router.db_for_write(type(self), instance=self)):
+            super().save(*args, **kwargs)
+            if adding and self.last_activity_at != self.created_at:
+                # created_at is only set by the insert, a request without logs was last active then
+                type(self)._default_manager.using(self._state.db).filter(pk=self.pk).update(
+                    last_activity_at=self.created_at
+                )
+                self.last_activity_at = self.created_at
+
+
+class TechnicianLoad(models.Model):
+    # counters kept up to date by app1.assignment on every ServiceRequest save
+    service_provider = models.ForeignKey(ServiceProvider, on_delete=models.CASCADE, related_name='technician_loads')
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='technician_loads')
+    open_count = models.PositiveIntegerField(default=0)
+    completed_count = models.PositiveIntegerField(default=0)
+    turnaround_seconds = models.PositiveBigIntegerField(default=0)
+
+    class Meta:
+        unique_together = ('service_provider', 'user')
+
+    def __str__(self):
+        return f'{self.user.username} - {self.service_provider.name} ({self.open_count})'
+
+    @property
+    def average_turnaround(self):
+        if not self.completed_count:
+            return None
+        return self.turnaround_seconds / self.completed_count
+
+
+class InboxCounter(models.Model):
+    # badge counts of the request lists, kept up to date by app1.inbox on every ServiceRequest and PurchaseOrder save
+    PROVIDER = 'provider'
+    SECTION = 'section'
+    scope = models.CharField(max_length=10, choices=[(PROVIDER, 'جهة خدمية'), (SECTION, 'قسم')])
+    owner_id = models.PositiveIntegerField()
+    # 0 counts every request of the owner, otherwise only the ones assigned to this user
+    assignee_id = models.PositiveIntegerField(default=0)
+    bucket = models.CharField(max_length=20)
+    count = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        unique_together = ('scope', 'owner_id', 'assignee_id', 'bucket')
+
+    def __str__(self):
+        return f'{self.scope}:{self.owner_id}:{self.assignee_id} {self.bucket} ({self.count})'
+
+
+class EscalationRule(models.Model):
+    # a request left this many hours in the status reminds the managers of its section or provider
+    PROVIDER = 'provider'
+    SECTION = 'section'
+    ASSIGNEE = 'assignee'
+    status = models.CharField(max_length=100, choices=[('pending', 'قيد الانتظار'), ('in_progress', 'قيد التنفيذ'), ('under_review', 'قيد المراجعة')])
+    # empty for every section/provider, a rule for both needs both to match
+    section = models.ForeignKey(Section, on_delete=models.CASCADE, null=True, blank=True)
+    service_provider = models.ForeignKey(ServiceProvider, on_delete=models.CASCADE, null=True, blank=True)
+    after_hours = models.PositiveIntegerField()
+    notify = models.CharField(max_length=10, choices=[(PROVIDER, 'مدراء الجهة الخدمية'), (SECTION, 'مدراء القسم'), (ASSIGNEE, 'المسؤول عن الطلب')], default=PROVIDER)
+    active = models.BooleanField(default=True)
+
+    def __str__(self):
+        scope = self.section or self.service_provider or 'الكل'
+        return f'{self.get_status_display()} > {self.after_hours}h ({scope})'
+
+
+class Escalation(models.Model):
+    # one row per rule and stay in a status, so a threshold fires once
+    service_request = models.ForeignKey(ServiceRequest, on_delete=models.CASCADE, related_name='escalations')
+    rule = models.ForeignKey(EscalationRule, on_delete=models.CASCADE, related_name='escalations')
+    status_changed_at = models.DateTimeField()
+    recipients = models.PositiveSmallIntegerField(default=0)
     created_at = models.DateTimeField(auto_now_add=True)
-    created_by = models.ForeignKey(User, on_delete=models.CASCADE)
+
+    class Meta:
+        unique_together = ('service_request', 'rule', 'status_changed_at')
 
     def __str__(self):
-        return self.service_request.title + ' - ' + self.comment
-    
+        return f'{self.service_request_id} - {self.rule}'
+
+
+class LogEvent(models.IntegerChoices):
+    NOTE = 0, 'ملاحظة'
+    CREATED = 1, 'إنشاء الطلب'
+    ASSIGNED = 2, 'تعيين الطلب'
+    AUTO_ASSIGNED = 3, 'تعيين تلقائي'
+    REPORT_CREATED = 4, 'إنشاء تقرير'
+    OUTSOURCE_REPORT_CREATED = 5, 'إنشاء تقرير خدمة خارجية'
+    COMPLETION_REPORT_CREATED = 6, 'إنشاء تقرير إنجاز'
+    COMPLETION_REPORT_EDITED = 7, 'تعديل تقرير إنجاز'
+    PURCHASE_ORDER_CREATED = 8, 'إنشاء طلب شراء'
+    PURCHASE_ORDER_EDITED = 9, 'تعديل طلب شراء'
+    PURCHASE_ORDER_STATUS = 10, 'تغيير حالة طلب شراء'
+    INVENTORY_ORDER_CREATED = 11, 'إنشاء طلب مخزني'
+    INVENTORY_ORDER_EDITED = 12, 'تعديل طلب مخزني'
+    INVENTORY_ORDER_STATUS = 13, 'تغيير حالة طلب مخزني'
+    STATUS_CHANGED = 14, 'تغيير حالة الطلب'
+    REOPENED = 15, 'إعادة الطلب الى قيد العمل'
+    COMPLETED = 16, 'اكمال الطلب'
+
+
+class LogTarget(models.IntegerChoices):
+    SERVICE_REQUEST = 0, 'طلب'
+    USER = 1, 'مستخدم'
+    REPORT = 2, 'تقرير'
+    COMPLETION_REPORT = 3, 'تقرير إنجاز'
+    PURCHASE_ORDER = 4, 'طلب شراء'
+    INVENTORY_ORDER = 5, 'طلب مخزني'
+
+
+class BaseServiceRequestLog(models.Model):
+    # the sentence shown to users is rendered from event, see app1.audit
+    event = models.PositiveSmallIntegerField(choices=LogEvent.choices, default=LogEvent.NOTE)
+    target_type = models.PositiveSmallIntegerField(choices=LogTarget.choices, default=LogTarget.SERVICE_REQUEST)
+    target_id = models.PositiveBigIntegerField(null=True, blank=True)
+    old_status = models.CharField(max_length=20, blank=True)
+    new_status = models.CharField(max_length=20, blank=True)
+    note = models.TextField(blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        abstract = True
+
+    def __str__(self):
+        return self.service_request.title + ' - ' + self.text
+
+    @property
+    def text(self):
+        from .audit import render_log
+        return render_log(self)
+
 
+class ServiceRequestLog(BaseServiceRequestLog):
+    service_request = models.ForeignKey(ServiceRequest, on_delete=models.CASCADE)
+    created_by = models.ForeignKey(User, on_delete=models.CASCADE)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['service_request', 'created_at'], name='requestlog_request_idx'),
+            models.Index(fields=['created_at'], name='requestlog_created_idx'),
+        ]
+
+    def save(self, *args, **kwargs):
+        # keeps the request's summary columns in the same transaction
+        with transaction.atomic(using=kwargs.get('using') or router.db_for_write(type(self), instance=self)):
+            super().save(*args, **kwargs)
+
+
+class ServiceRequestLogArchive(BaseServiceRequestLog):
+    # rows moved out of ServiceRequestLog by the archive_request_logs command
+    id = models.BigIntegerField(primary_key=True)
+    service_request = models.ForeignKey(ServiceRequest, on_delete=models.CASCADE, related_name='archived_logs')
+    created_by = models.ForeignKey(User, on_delete=models.CASCADE, related_name='+')
+    created_at = models.DateTimeField()
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['service_request', 'created_at'], name='logarchive_request_idx'),
+        ]
 
 
 class Report(models.Model):
@@ -70,6 +324,11 @@ class Report(models.Model):
 
     def __str__(self):
         return self.title + ' - ' + self.service_request.title
+
+    def save(self, *args, **kwargs):
+        # keeps the request's summary columns in the same transaction
+        with transaction.atomic(using=kwargs.get('using') or router.db_for_write(type(self), instance=self)):
+            super().save(*args, **kwargs)
     
 
 class CompletionReport(models.Model):
@@ -81,6 +340,11 @@ class CompletionReport(models.Model):
 
     def __str__(self):
         return self.title + ' - ' + self.service_request.title
+
+    def save(self, *args, **kwargs):
+        # keeps the request's summary columns in the same transaction
+        with transaction.atomic(using=kwargs.get('using') or router.db_for_write(type(self), instance=self)):
+            super().save(*args, **kwargs)
     
 
 
@@ -94,6 +358,11 @@ class PurchaseOrder(models.Model):
 
     def __str__(self):
         return self.report.title 
+
+    def save(self, *args, **kwargs):
+        # keeps the supplied inbox counter and the request's summary in the same transaction
+        with transaction.atomic(using=kwargs.get('using') or router.db_for_write(type(self), instance=self)):
+            super().save(*args, **kwargs)
     
 
 class InventoryOrder(models.Model):
@@ -104,4 +373,203 @@ class InventoryOrder(models.Model):
     created_by = models.ForeignKey(User, on_delete=models.CASCADE)
 
     def __str__(self):
-        return self.report.title 
\ No newline at end of file
+        return self.report.title 
+
+    def save(self, *args, **kwargs):
+        # keeps the request's summary columns in the same transaction
+        with transaction.atomic(using=kwargs.get('using') or router.db_for_write(type(self), instance=self)):
+            super().save(*args, **kwargs)
+
+
+class Task(models.Model):
+    # queue of app1.taskqueue, a row only lives until its task finished or gave up
+    PENDING = 'pending'
+    RUNNING = 'running'
+    name = models.CharField(max_length=100)
+    args = models.JSONField(default=list)
+    kwargs = models.JSONField(default=dict)
+    status = models.CharField(max_length=10, choices=[(PENDING, 'بالانتظار'), (RUNNING, 'قيد التنفيذ')], default=PENDING)
+    attempts = models.PositiveSmallIntegerField(default=0)
+    max_attempts = models.PositiveSmallIntegerField(default=3)
+    run_at = models.DateTimeField()
+    # the worker holding a running task and until when, a crashed worker's tasks are claimed again after that
+    locked_by = models.CharField(max_length=100, blank=True)
+    locked_until = models.DateTimeField(null=True, blank=True)
+    last_error = models.TextField(blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        indexes = [models.Index(fields=['status', 'run_at'], name='app1_task_due_idx')]
+
+    def __str__(self):
+        return f'{self.name}#{self.pk} ({self.status})'
+
+
+class TaskResult(models.Model):
+    SUCCESS = 'success'
+    FAILURE = 'failure'
+    task_id = models.PositiveBigIntegerField(db_index=True)
+    name = models.CharField(max_length=100)
+    status = models.CharField(max_length=10, choices=[(SUCCESS, 'نجح'), (FAILURE, 'فشل')])
+    args = models.JSONField(default=list)
+    kwargs = models.JSONField(default=dict)
+    result = models.JSONField(null=True, blank=True)
+    error = models.TextField(blank=True)
+    attempts = models.PositiveSmallIntegerField()
+    worker = models.CharField(max_length=100, blank=True)
+    created_at = models.DateTimeField()
+    finished_at = models.DateTimeField(auto_now_add=True)
+
+    def __str__(self):
+        return f'{self.name}#{self.task_id} ({self.status})'
+
+
+class PendingNotification(models.Model):
+    # summaries waiting for the next digest of a recipient in digest mode
+    phone = models.CharField(max_length=100, db_index=True)
+    summary = models.TextField()
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    def __str__(self):
+        return f'{self.phone}: {self.summary[:50]}'
+
+
+class NotificationStat(models.Model):
+    # daily counters of app1.notifications, messages saved = buffered - digests
+    day = models.DateField(unique=True)
+    immediate = models.PositiveIntegerField(default=0)
+    buffered = models.PositiveIntegerField(default=0)
+    digests = models.PositiveIntegerField(default=0)
+
+    def __str__(self):
+        return f'{self.day}: {self.saved} saved'
+
+    @property
+    def saved(self):
+        return self.buffered - self.digests
+
+
+class ClientWrite(models.Model):
+    # a write queued by the offline mobile pages, keyed by the id the browser gave it, see app1/offline.py
+    REQUEST = 'request'
+    COMMENT = 'comment'
+    client_id = models.UUIDField(unique=True)
+    user = models.ForeignKey(User, on_delete=models.CASCADE)
+    kind = models.CharField(max_length=10, choices=[(REQUEST, 'طلب'), (COMMENT, 'ملاحظة')])
+    # the request created or commented on, also once it moved to the archive database
+    object_id = models.PositiveBigIntegerField(null=True, blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    def __str__(self):
+        return f'{self.kind} {self.client_id} ({self.object_id})'
+
+
+class MaintenanceSchedule(models.Model):
+    # a preventive maintenance request raised on a recurring, RRULE-like schedule, see app1/maintenance.py
+    DAILY = 'daily'
+    WEEKLY = 'weekly'
+    MONTHLY = 'monthly'
+    title = models.CharField(max_length=100)
+    description = models.TextField()
+    section = models.ForeignKey(Section, on_delete=models.CASCADE, related_name='maintenance_schedules')
+    service_provider = models.ForeignKey(ServiceProvider, on_delete=models.CASCADE, related_name='maintenance_schedules')
+    # requester of the generated requests
+    created_by = models.ForeignKey(User, on_delete=models.CASCADE, related_name='maintenance_schedules')
+    # FREQ and INTERVAL; BYDAY as 'MO,TH' for weekly, BYMONTHDAY for monthly (-1 is the last day),
+    # both default to the day of starts_at, whose time of day every occurrence keeps
+    frequency = models.CharField(max_length=10, choices=[(DAILY, 'يومي'), (WEEKLY, 'أسبوعي'), (MONTHLY, 'شهري')], default=MONTHLY)
+    interval = models.PositiveSmallIntegerField(default=1)
+    by_weekday = models.CharField(max_length=20, blank=True)
+    by_month_day = models.SmallIntegerField(null=True, blank=True)
+    starts_at = models.DateTimeField(default=timezone.now)
+    ends_at = models.DateTimeField(null=True, blank=True)
+    active = models.BooleanField(default=True)
+    # maintained in save() and by the generator: the last occurrence raised and
+    # the next one due, empty once the schedule ended
+    last_run_at = models.DateTimeField(null=True, blank=True, editable=False)
+    next_run_at = models.DateTimeField(null=True, blank=True, editable=False, db_index=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    def __str__(self):
+        return f'{self.title} ({self.get_frequency_display()})'
+
+    def clean(self):
+        from .maintenance import validate
+        validate(self)
+
+    def save(self, *args, **kwargs):
+        from .maintenance import next_occurrence
+        self.next_run_at = next_occurrence(self, after=self.last_run_at)
+        update_fields = kwargs.get('update_fields')
+        if update_fields is not None:
+            kwargs['update_fields'] = set(update_fields) | {'next_run_at'}
+        super().save(*args, **kwargs)
+
+
+class MaintenanceOccurrence(models.Model):
+    # one row per schedule and due time, so overlapping generator runs raise it once;
+    # run is the generator run that inserted the row
+    schedule = models.ForeignKey(MaintenanceSchedule, on_delete=models.CASCADE, related_name='occurrences')
+    due_at = models.DateTimeField()
+    run = models.UUIDField(editable=False)
+    # emptied when the request is deleted or archived, the occurrence still counts as raised
+    service_request = models.ForeignKey(ServiceRequest, on_delete=models.SET_NULL, null=True, blank=True, related_name='+')
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        unique_together = ('schedule', 'due_at')
+
+    def __str__(self):
+        return f'{self.schedule} - {self.due_at:%Y-%m-%d %H:%M}'
+
+
+class Blob(models.Model):
+    # a file kept once under the sha256 of its content in the blob store, see app1/blobstore.py;
+    # every attachment with the same content points at the same row
+    sha256 = models.CharField(max_length=64, unique=True)
+    size = models.PositiveBigIntegerField()
+    # sniffed from the first bytes, the type sent by the client is not trusted
+    content_type = models.CharField(max_length=100)
+    # set by the task writing the thumbnails, see app1/attachments.py
+    thumbnails_ready = models.BooleanField(default=False)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    def __str__(self):
+        return f'{self.sha256[:12]} ({self.size} bytes)'
+
+
+class Attachment(models.Model):
+    # a photo of a request, taken before the work or after it
+    BEFORE = 'before'
+    AFTER = 'after'
+    KINDS = [(BEFORE, 'قبل العمل'), (AFTER, 'بعد العمل')]
+    service_request = models.ForeignKey(ServiceRequest, on_delete=models.CASCADE, related_name='attachments')
+    # an after photo may belong to one of the request's completion reports
+    completion_report = models.ForeignKey(CompletionReport, on_delete=models.SET_NULL, null=True, blank=True, related_name='attachments')
+    blob = models.ForeignKey(Blob, on_delete=models.PROTECT, related_name='attachments')
+    kind = models.CharField(max_length=10, choices=KINDS, default=BEFORE)
+    # the file name on the uploading device
+    name = models.CharField(max_length=255)
+    uploaded_by = models.ForeignKey(User, on_delete=models.CASCADE, related_name='+')
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    def __str__(self):
+        return f'{self.service_request_id} - {self.name}'
+
+
+class AttachmentUpload(models.Model):
+    # a resumable upload in progress, its bytes so far are in the blob store's
+    # part file of the same id; deleted once the attachment is created
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    service_request = models.ForeignKey(ServiceRequest, on_delete=models.CASCADE, related_name='+')
+    completion_report = models.ForeignKey(CompletionReport, on_delete=models.CASCADE, null=True, blank=True, related_name='+')
+    kind = models.CharField(max_length=10, choices=Attachment.KINDS, default=Attachment.BEFORE)
+    name = models.CharField(max_length=255)
+    # announced when the upload starts, the last chunk completes it
+    size = models.PositiveBigIntegerField()
+    uploaded_by = models.ForeignKey(User, on_delete=models.CASCADE, related_name='+')
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f'{self.name} ({self.size} bytes)'
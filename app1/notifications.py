@@ -0,0 +1,141 @@
+import logging
+import threading
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import connection
+from django.db.models import F
+from django.utils import timezone
+
+from . import gateway, refcache
+from .models import NotificationStat, PendingNotification
+
+
+logger = logging.getLogger(__name__)
+
+
+# recipients in digest mode get one message per window listing everything that happened
+DIGEST_MINUTES = getattr(settings, 'NOTIFICATION_DIGEST_MINUTES', 15)
+# the scheduled digest holds its recipient's key until send_digest ran, the worker
+# may run much later than the window; a digest task lost for good is given up after this
+DIGEST_KEY_SECONDS = DIGEST_MINUTES * 60 + 6 * 3600
+HEADER = '*نظام صيانة النادي الترفيهي الرياضي* '
+REQUEST_URL = 'https://net.sportainmentclub.com/request_detail/{id}'
+# longer lists only tell how many more lines there are
+MAX_LINES = 20
+# seconds the task worker waits for the gateway rate limit before retrying later
+SEND_WAIT = 30
+
+
+def post_message(number, message):
+    """Send one WhatsApp message through the gateway, raises GatewayError when it fails."""
+    # task workers may wait a little for the rate limit, they are not holding up a page
+    return gateway.get_client().send(number, message, wait=SEND_WAIT)
+
+
+def send_message(number, message):
+    """Send without holding up the request; queued for the task worker when the gateway can't take it."""
+    from . import tasks
+
+    client = gateway.get_client()
+    if client.missing_settings():
+        # the task fails with the missing settings until they are set
+        logger.error('WhatsApp gateway is not configured, message to %s queued', number)
+        tasks.send_whatsapp.delay(number, message)
+        return
+    if not client.available():
+        # the circuit is open or the rate limit is used up, no thread would get through
+        tasks.send_whatsapp.schedule(client.breaker.reset_seconds, number, message)
+        return
+
+    def send():
+        try:
+            logger.info('Message to %s sent: %s', number, client.send(number, message))
+        except gateway.GatewayError as e:
+            logger.warning('Message to %s failed, queued: %s', number, e)
+            tasks.send_whatsapp.delay(number, message)
+        finally:
+            connection.close()
+
+    threading.Thread(target=send, daemon=True).start()
+
+
+def summary_line(text, service_request):
+    return f'- {text}: {service_request.title} {REQUEST_URL.format(id=service_request.id)}'
+
+
+def list_message(title, lines):
+    more = [f'و {len(lines) - MAX_LINES} أخرى'] if len(lines) > MAX_LINES else []
+    return '\n'.join([HEADER, title, *lines[:MAX_LINES], *more])
+
+
+def _count(**deltas):
+    counters = NotificationStat.objects
+    updates = {field: F(field) + delta for field, delta in deltas.items()}
+    day = timezone.localdate()
+    if not counters.filter(day=day).update(**updates):
+        stat, _ = counters.get_or_create(day=day)
+        counters.filter(pk=stat.pk).update(**updates)
+
+
+def _digest_key(number):
+    return f'notifications:digest:{number}'
+
+
+def notify(number, message, summary, queued=False):
+    """Send a workflow message now, or keep its one-line summary for the recipient's digest.
+
+    queued hands the message to the task worker instead of a thread, for
+    commands that exit before a thread would have sent it.
+    """
+    if not number:
+        return
+    from . import tasks
+
+    if str(number) not in refcache.digest_phones():
+        _count(immediate=1)
+        if queued:
+            tasks.send_whatsapp.delay(number, message)
+        else:
+            send_message(number, message)
+        return
+
+    PendingNotification.objects.create(phone=number, summary=summary)
+    _count(buffered=1)
+    # the first event of a window schedules the digest that sends all of them
+    if cache.add(_digest_key(number), True, DIGEST_KEY_SECONDS):
+        tasks.send_digest.schedule(DIGEST_MINUTES * 60, str(number))
+
+
+def send_digest(number):
+    from . import tasks
+
+    pending = list(PendingNotification.objects.filter(phone=number).order_by('id'))
+    if pending:
+        lines = list(dict.fromkeys(p.summary for p in pending))
+        post_message(number, list_message(f'ملخص التحديثات ({len(pending)})', lines))
+        PendingNotification.objects.filter(id__in=[p.id for p in pending]).delete()
+        _count(digests=1)
+    # the next event starts a new window; events that came in while this one was
+    # sent start it now, unless notify() claimed the key for them already
+    cache.delete(_digest_key(number))
+    if PendingNotification.objects.filter(phone=number).exists() and cache.add(
+        _digest_key(number), True, DIGEST_KEY_SECONDS
+    ):
+        tasks.send_digest.schedule(DIGEST_MINUTES * 60, number)
+    return len(pending)
+
+
+def stats(days=30):
+    rows = list(
+        NotificationStat.objects.filter(day__gt=timezone.localdate() - timedelta(days=days))
+        .order_by('day').values('day', 'immediate', 'buffered', 'digests')
+    )
+    totals = {field: sum(row[field] for row in rows) for field in ('immediate', 'buffered', 'digests')}
+    return {
+        **totals,
+        'saved': totals['buffered'] - totals['digests'],
+        'pending': PendingNotification.objects.count(),
+        'days': [{**row, 'day': row['day'].isoformat(), 'saved': row['buffered'] - row['digests']} for row in rows],
+    }
@@ -0,0 +1,86 @@
+import uuid
+
+from django.conf import settings
+from django.db import IntegrityError, transaction
+
+from .models import ClientWrite
+
+
+# The mobile pages (request_detail_sm, create_service_request) keep working
+# without a connection: static/js/offline_queue.js stores new requests and
+# comments in IndexedDB and sync_writes in app1.views replays them once the
+# phone is back online. Every write carries a UUID made in the browser, also
+# when it is posted with the normal form, and ClientWrite remembers what each
+# id produced. A write sent again because its response was lost returns the
+# first result instead of creating a second request.
+
+SYNC_BATCH_SIZE = getattr(settings, 'OFFLINE_SYNC_BATCH_SIZE', 50)
+# request pages the service worker keeps for offline reading, the oldest go first
+CACHED_PAGES = getattr(settings, 'OFFLINE_CACHED_PAGES', 30)
+# the app shell the service worker stores when it installs, next to the offline page
+SHELL_STATIC = (
+    'css/base.css', 'css/create_service_request.css', 'images/logo.png',
+    'js/base.js', 'js/create_service_request.js', 'js/offline.js', 'js/offline_queue.js',
+)
+SHELL_CDN = (
+    'https://cdn.jsdelivr.net/npm/bootstrap@5.3.0/dist/css/bootstrap.rtl.min.css',
+    'https://cdnjs.cloudflare.com/ajax/libs/font-awesome/6.4.0/css/all.min.css',
+    'https://cdnjs.cloudflare.com/ajax/libs/font-awesome/6.4.0/webfonts/fa-solid-900.woff2',
+    'https://cdn.jsdelivr.net/npm/bootstrap@5.3.0/dist/js/bootstrap.bundle.min.js',
+)
+
+
+class SyncError(Exception):
+    """A queued write that can never succeed, the client drops it and shows the message."""
+
+
+def parse_client_id(value):
+    try:
+        return uuid.UUID(str(value))
+    except ValueError:
+        return None
+
+
+def replayed(client_id, user, kind):
+    """object_id of the write already recorded under client_id, None if there is none."""
+    write = ClientWrite.objects.filter(client_id=client_id).first()
+    if write is None:
+        return None
+    if write.user_id != user.id or write.kind != kind:
+        raise SyncError('معرف العملية مستخدم لعملية اخرى')
+    return write.object_id
+
+
+def record(client_id, user, kind, apply):
+    """Run apply() once per client_id, returns (object_id, created).
+
+    apply() does the write and returns the id of the request it touched; it
+    runs in the transaction that records the id, so a failed write can be
+    sent again. Without a client_id it simply runs.
+    """
+    if client_id is None:
+        return apply(), True
+    earlier = replayed(client_id, user, kind)
+    if earlier is not None:
+        return earlier, False
+    with transaction.atomic():
+        try:
+            with transaction.atomic():
+                write = ClientWrite.objects.create(client_id=client_id, user=user, kind=kind)
+        except IntegrityError:
+            # the same write arrived twice at once and the other copy got there first
+            return ClientWrite.objects.get(client_id=client_id).object_id, False
+        write.object_id = apply()
+        write.save(update_fields=['object_id'])
+    return write.object_id, True
+
+
+def resolve_request_id(value, user):
+    """Id of a request given by its id or by the client id it was queued under."""
+    if str(value).isdigit():
+        return int(value)
+    client_id = parse_client_id(value)
+    object_id = client_id and replayed(client_id, user, ClientWrite.REQUEST)
+    if not object_id:
+        raise SyncError('الطلب غير موجود')
+    return object_id
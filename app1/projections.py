@@ -0,0 +1,29 @@
+from django.db.models.functions import Substr
+
+
+# Querysets of the list pages, reading only the columns their rows show. The
+# description is cut in the database, a list never needs more than a snippet;
+# the table cell and card truncate it further.
+
+SNIPPET_LENGTH = 200
+REQUEST_ROW_FIELDS = ('id', 'title', 'status', 'created_at', 'section', 'section__name')
+ASSIGNEE_FIELDS = ('assigned_to', 'assigned_to__username', 'assigned_to__first_name', 'assigned_to__last_name')
+PURCHASE_ORDER_ROW_FIELDS = ('id', 'refrence_number', 'status', 'created_at', 'report', 'report__service_request_id')
+
+
+def snippet(field='description', length=SNIPPET_LENGTH):
+    return Substr(field, 1, length)
+
+
+def request_rows(queryset, with_assignee=False):
+    """Rows of my_request and, with the assignee's name, requests_to_me."""
+    if with_assignee:
+        queryset = queryset.select_related('section', 'assigned_to').only(*REQUEST_ROW_FIELDS, *ASSIGNEE_FIELDS)
+    else:
+        queryset = queryset.select_related('section').only(*REQUEST_ROW_FIELDS)
+    return queryset.annotate(description_snippet=snippet())
+
+
+def purchase_order_rows(queryset):
+    # the report is only there for the link to its request, its description stays in the database
+    return queryset.select_related('report').only(*PURCHASE_ORDER_ROW_FIELDS)
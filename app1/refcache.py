@@ -0,0 +1,187 @@
+import threading
+import time
+from collections import Counter, OrderedDict
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import DEFAULT_DB_ALIAS, transaction
+
+from .models import EscalationRule, Section, ServiceProvider, UserProfile
+
+
+# Sections, providers and their managers almost never change, so they are
+# cached in two levels: a small LRU in each worker in front of the Django
+# cache shared by all workers. Every key carries the version of its
+# namespace, the signals in app1.signals bump it on any change so both
+# levels miss from then on and the old entries simply age out. Each worker
+# remembers the versions for VERSION_TTL seconds, so a local hit needs no
+# round trip to the shared cache; other workers see a change that much later.
+
+LOCAL_SIZE = getattr(settings, 'REFERENCE_CACHE_SIZE', 512)
+TIMEOUT = getattr(settings, 'REFERENCE_CACHE_TIMEOUT', 60 * 60)
+VERSION_TTL = getattr(settings, 'REFERENCE_CACHE_VERSION_TTL', 5)
+KEY_PREFIX = 'refdata'
+SECTIONS = 'sections'
+PROVIDERS = 'providers'
+ESCALATION = 'escalation'
+NAMESPACES = (SECTIONS, PROVIDERS, ESCALATION)
+
+_MISSING = object()
+
+
+class LRUCache:
+    def __init__(self, size):
+        self.size = size
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key, default=None):
+        with self._lock:
+            if key not in self._data:
+                return default
+            self._data.move_to_end(key)
+            return self._data[key]
+
+    def set(self, key, value):
+        with self._lock:
+            self._data[key] = value
+            self._data.move_to_end(key)
+            while len(self._data) > self.size:
+                self._data.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+    def __len__(self):
+        return len(self._data)
+
+
+_local = LRUCache(LOCAL_SIZE)
+# namespace: (version, monotonic time it is read again)
+_versions = {}
+_stats = Counter()
+
+
+def _version_key(namespace):
+    return f'{KEY_PREFIX}:{namespace}:version'
+
+
+def _version(namespace):
+    version, expires = _versions.get(namespace, (None, 0))
+    if time.monotonic() < expires:
+        return version
+    version = cache.get(_version_key(namespace))
+    if version is None:
+        # a lost version restarts from the clock, never from a number used before
+        cache.add(_version_key(namespace), int(time.time() * 1000), None)
+        version = cache.get(_version_key(namespace))
+    _versions[namespace] = (version, time.monotonic() + VERSION_TTL)
+    return version
+
+
+def _incr_version(namespace):
+    try:
+        cache.incr(_version_key(namespace))
+    except ValueError:
+        cache.set(_version_key(namespace), int(time.time() * 1000), None)
+    # the worker that made the change sees it at once
+    _versions.pop(namespace, None)
+
+
+def invalidate(namespaces=NAMESPACES):
+    """Make every worker miss the namespaces from now on, leaving the rest of the shared cache alone."""
+    for namespace in namespaces:
+        _incr_version(namespace)
+
+
+def clear_local():
+    """Forget this worker's entries and versions, e.g. after the shared cache was cleared."""
+    _local.clear()
+    _versions.clear()
+
+
+def bump(namespace):
+    # after the commit, or another worker could cache the old rows under the new version
+    transaction.on_commit(lambda: _incr_version(namespace))
+
+
+def cached(namespace, name, args, loader):
+    key = f'{KEY_PREFIX}:{namespace}:{_version(namespace)}:{name}:' + ':'.join(map(str, args))
+    value = _local.get(key, _MISSING)
+    if value is not _MISSING:
+        _stats['local_hits'] += 1
+        return value
+    value = cache.get(key, _MISSING)
+    if value is not _MISSING:
+        _stats['shared_hits'] += 1
+    else:
+        _stats['misses'] += 1
+        value = loader()
+        cache.set(key, value, TIMEOUT)
+    _local.set(key, value)
+    return value
+
+
+def stats():
+    """Hit/miss counters of this worker."""
+    lookups = sum(_stats.values())
+    return {
+        **{k: _stats[k] for k in ('local_hits', 'shared_hits', 'misses')},
+        'hit_rate': (lookups - _stats['misses']) / lookups if lookups else None,
+        'local_entries': len(_local),
+        'versions': {ns: cache.get(_version_key(ns)) for ns in NAMESPACES},
+    }
+
+
+# --- lookups -----------------------------------------------------------------
+# loaders read the primary, a lagging replica must not fill a fresh version
+
+def user_sections(user_id):
+    return cached(SECTIONS, 'user', [user_id], lambda: list(
+        Section.objects.using(DEFAULT_DB_ALIAS).filter(manager=user_id).only('id', 'name').order_by('id')
+    ))
+
+
+def user_section_ids(user_id):
+    return [section.id for section in user_sections(user_id)]
+
+
+def section_manager_phones(section_id):
+    return cached(SECTIONS, 'phones', [section_id], lambda: list(
+        UserProfile.objects.using(DEFAULT_DB_ALIAS).filter(user__section=section_id)
+        .order_by('user_id').values_list('phone', flat=True)
+    ))
+
+
+def all_service_providers():
+    return cached(PROVIDERS, 'all', [], lambda: list(
+        ServiceProvider.objects.using(DEFAULT_DB_ALIAS).order_by('id')
+    ))
+
+
+def user_provider_ids(user_id):
+    return cached(PROVIDERS, 'user', [user_id], lambda: list(
+        ServiceProvider.objects.using(DEFAULT_DB_ALIAS).filter(manager=user_id)
+        .order_by('id').values_list('id', flat=True)
+    ))
+
+
+def provider_manager_phones(provider_id):
+    return cached(PROVIDERS, 'phones', [provider_id], lambda: list(
+        UserProfile.objects.using(DEFAULT_DB_ALIAS).filter(user__serviceprovider=provider_id)
+        .order_by('user_id').values_list('phone', flat=True)
+    ))
+
+
+def digest_phones():
+    # a set, notify() checks every recipient against it
+    return cached(PROVIDERS, 'digest', [], lambda: set(
+        UserProfile.objects.using(DEFAULT_DB_ALIAS).filter(notification_mode='digest').values_list('phone', flat=True)
+    ))
+
+
+def escalation_rules():
+    return cached(ESCALATION, 'active', [], lambda: list(
+        EscalationRule.objects.using(DEFAULT_DB_ALIAS).filter(active=True).order_by('after_hours', 'id')
+    ))
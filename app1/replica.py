@@ -0,0 +1,91 @@
+import threading
+import time
+
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS
+
+
+# views marked with @replica_reads read from this database when it is configured
+REPLICA_DB = getattr(settings, 'REPLICA_DATABASE', 'replica')
+# seconds a session keeps reading from the primary after one of its requests wrote
+PIN_SECONDS = getattr(settings, 'REPLICA_PIN_SECONDS', 10)
+PIN_SESSION_KEY = '_replica_pinned_until'
+
+_local = threading.local()
+
+
+def replica_enabled():
+    return REPLICA_DB in settings.DATABASES
+
+
+def replica_reads(view):
+    """Mark a view that only reads, ReplicaMiddleware then serves its queries from the replica."""
+    view.replica_reads = True
+    return view
+
+
+def _is_replica_view(request, view_func):
+    if getattr(view_func, 'replica_reads', False):
+        return True
+    # exports of the import-export admin
+    url_name = request.resolver_match.url_name if request.resolver_match else ''
+    return bool(url_name) and url_name.endswith('_export')
+
+
+class ReplicaRouter:
+    def db_for_read(self, model, **hints):
+        instance = hints.get('instance')
+        # related rows of an archived request live next to it
+        if instance is not None and instance._state.db not in (None, DEFAULT_DB_ALIAS, REPLICA_DB):
+            return instance._state.db
+        # sessions are written on every login, a lagging copy would log users out
+        if getattr(_local, 'replica', False) and model._meta.app_label != 'sessions':
+            return REPLICA_DB
+        return None
+
+    def db_for_write(self, model, **hints):
+        if model._meta.app_label != 'sessions':
+            _local.wrote = True
+        instance = hints.get('instance')
+        if instance is not None and instance._state.db == REPLICA_DB:
+            return DEFAULT_DB_ALIAS
+        return None
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # the replica holds the same rows as the primary
+        if {obj1._state.db, obj2._state.db} <= {DEFAULT_DB_ALIAS, REPLICA_DB}:
+            return True
+        return None
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        # the replica is a copy of the primary, see sync_replica
+        if db == REPLICA_DB:
+            return False
+        return None
+
+
+class ReplicaMiddleware:
+    """Route @replica_reads views to the replica unless the session wrote recently."""
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        _local.wrote = False
+        try:
+            response = self.get_response(request)
+        finally:
+            _local.replica = False
+        if _local.wrote and hasattr(request, 'session'):
+            # read your own writes: the replica may not have them yet
+            request.session[PIN_SESSION_KEY] = time.time() + PIN_SECONDS
+        return response
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        if not replica_enabled() or not _is_replica_view(request, view_func):
+            return None
+        session = getattr(request, 'session', None)
+        if session is not None and session.get(PIN_SESSION_KEY, 0) > time.time():
+            return None
+        _local.replica = True
+        return None
@@ -0,0 +1,149 @@
+from django.contrib.auth.models import User
+from django.db.models.signals import m2m_changed, post_delete, post_init, post_save, pre_delete
+from django.dispatch import receiver
+
+from . import assignment, dedup, inbox, refcache, summary, tasks
+from .images import original_name
+from .models import (
+    CompletionReport, EscalationRule, InventoryOrder, PurchaseOrder, Report, Section, ServiceProvider, ServiceRequest,
+    ServiceRequestLog, UserProfile,
+)
+
+
+@receiver(post_save, sender=UserProfile)
+def process_uploaded_profile_image(sender, instance, **kwargs):
+    # only new uploads need work, processed images are stored under their hash
+    if instance.image and instance.image.name != original_name(instance.image_hash):
+        tasks.process_profile_image.delay(instance.pk)
+
+
+@receiver(post_init, sender=ServiceRequest)
+def remember_load_state(sender, instance, **kwargs):
+    instance._load_snapshot = assignment.snapshot(instance)
+    instance._inbox_snapshot = inbox.snapshot(instance)
+    instance._content_snapshot = dedup.content_snapshot(instance)
+
+
+@receiver(post_save, sender=ServiceRequest)
+def remember_content(sender, instance, **kwargs):
+    instance._content_snapshot = dedup.content_snapshot(instance)
+
+
+@receiver(post_save, sender=ServiceRequest)
+def update_technician_load(sender, instance, created, **kwargs):
+    assignment.update_load(instance, instance._load_snapshot, created=created)
+    instance._load_snapshot = assignment.snapshot(instance)
+
+
+@receiver(post_save, sender=ServiceRequest)
+def update_inbox_counters(sender, instance, created, **kwargs):
+    inbox.update_counters(instance, instance._inbox_snapshot, created=created)
+    instance._inbox_snapshot = inbox.snapshot(instance)
+
+
+@receiver(post_delete, sender=ServiceRequest)
+def release_technician_load(sender, instance, **kwargs):
+    assignment.release_load(instance)
+
+
+@receiver(pre_delete, sender=ServiceRequest)
+def prepare_inbox_release(sender, instance, origin, **kwargs):
+    inbox.request_deleting(instance, origin)
+
+
+@receiver(post_delete, sender=ServiceRequest)
+def release_inbox_counters(sender, instance, **kwargs):
+    inbox.request_deleted(instance)
+
+
+@receiver(post_init, sender=PurchaseOrder)
+def remember_order_status(sender, instance, **kwargs):
+    instance._inbox_status = instance.__dict__.get('status')
+
+
+@receiver(post_save, sender=PurchaseOrder)
+def update_supplied_counters(sender, instance, created, **kwargs):
+    inbox.purchase_order_saved(instance, instance._inbox_status, created=created)
+    instance._inbox_status = instance.status
+
+
+@receiver(pre_delete, sender=PurchaseOrder)
+def prepare_supplied_release(sender, instance, **kwargs):
+    inbox.purchase_order_deleting(instance)
+
+
+@receiver(post_delete, sender=PurchaseOrder)
+def release_supplied_counters(sender, instance, origin, **kwargs):
+    inbox.purchase_order_deleted(instance, origin)
+
+
+@receiver(post_save, sender=Report)
+def summarize_report_saved(sender, instance, created, **kwargs):
+    summary.report_changed(instance, created=created)
+
+
+@receiver(post_delete, sender=Report)
+def summarize_report_deleted(sender, instance, origin, **kwargs):
+    summary.report_changed(instance, origin=origin)
+
+
+@receiver(post_save, sender=CompletionReport)
+def summarize_completion_report_saved(sender, instance, created, **kwargs):
+    summary.completion_report_changed(instance, created=created)
+
+
+@receiver(post_delete, sender=CompletionReport)
+def summarize_completion_report_deleted(sender, instance, origin, **kwargs):
+    summary.completion_report_changed(instance, origin=origin)
+
+
+@receiver(post_save, sender=PurchaseOrder)
+@receiver(post_delete, sender=PurchaseOrder)
+def summarize_purchase_order(sender, instance, origin=None, **kwargs):
+    summary.order_changed(instance, 'purchase_order_status', origin)
+
+
+@receiver(post_save, sender=InventoryOrder)
+@receiver(post_delete, sender=InventoryOrder)
+def summarize_inventory_order(sender, instance, origin=None, **kwargs):
+    summary.order_changed(instance, 'inventory_order_status', origin)
+
+
+@receiver(post_save, sender=ServiceRequestLog)
+def summarize_log(sender, instance, created, **kwargs):
+    # log rows are only ever added, archive_request_logs moves them without signals
+    if created:
+        summary.log_added(instance)
+
+
+@receiver(post_save, sender=Section)
+@receiver(post_delete, sender=Section)
+@receiver(m2m_changed, sender=Section.manager.through)
+@receiver(post_save, sender=UserProfile)
+@receiver(post_delete, sender=UserProfile)
+def invalidate_sections(sender, **kwargs):
+    refcache.bump(refcache.SECTIONS)
+
+
+@receiver(post_save, sender=ServiceProvider)
+@receiver(post_delete, sender=ServiceProvider)
+@receiver(m2m_changed, sender=ServiceProvider.manager.through)
+@receiver(post_save, sender=UserProfile)
+@receiver(post_delete, sender=UserProfile)
+def invalidate_providers(sender, **kwargs):
+    refcache.bump(refcache.PROVIDERS)
+
+
+@receiver(post_delete, sender=User)
+def invalidate_user_references(sender, **kwargs):
+    # the cascade removes the manager rows without m2m_changed
+    refcache.bump(refcache.SECTIONS)
+    refcache.bump(refcache.PROVIDERS)
+
+
+@receiver(post_save, sender=EscalationRule)
+@receiver(post_delete, sender=EscalationRule)
+def reschedule_escalations(sender, **kwargs):
+    refcache.bump(refcache.ESCALATION)
+    # moving every open request to the new thresholds can take a while
+    tasks.reschedule_escalations.delay()
@@ -0,0 +1,78 @@
+import gzip
+
+from django.conf import settings
+from django.contrib.staticfiles.storage import ManifestStaticFilesStorage
+from django.core.files.base import ContentFile
+
+try:
+    import brotli
+except ImportError:  # optional, only the gzip copies are written without it
+    brotli = None
+
+
+COMPRESS_EXTENSIONS = ('.css', '.js', '.svg', '.json', '.txt', '.map')
+COMPRESS_MIN_SIZE = getattr(settings, 'STATIC_COMPRESS_MIN_SIZE', 256)
+
+# Apache serves STATIC_ROOT directly on the Passenger host: hashed names are
+# cached for a year and the .br/.gz copies are sent to clients that accept them
+HTACCESS = r'''# written by collectstatic, see app1/storage.py
+<IfModule mod_rewrite.c>
+    RewriteEngine On
+    RewriteCond %{HTTP:Accept-Encoding} \bbr\b
+    RewriteCond %{REQUEST_FILENAME}.br -s
+    RewriteRule ^(.+\.(?:css|js|svg))$ $1.br [L]
+    RewriteCond %{HTTP:Accept-Encoding} \bgzip\b
+    RewriteCond %{REQUEST_FILENAME}.gz -s
+    RewriteRule ^(.+\.(?:css|js|svg))$ $1.gz [L]
+    RewriteRule \.css\.(gz|br)$ - [T=text/css,E=no-gzip:1,E=no-brotli:1]
+    RewriteRule \.js\.(gz|br)$ - [T=text/javascript,E=no-gzip:1,E=no-brotli:1]
+    RewriteRule \.svg\.(gz|br)$ - [T=image/svg+xml,E=no-gzip:1,E=no-brotli:1]
+</IfModule>
+<IfModule mod_headers.c>
+    <FilesMatch "\.gz$">
+        Header set Content-Encoding gzip
+        Header append Vary Accept-Encoding
+    </FilesMatch>
+    <FilesMatch "\.br$">
+        Header set Content-Encoding br
+        Header append Vary Accept-Encoding
+    </FilesMatch>
+    <FilesMatch "\.[0-9a-f]{12}\.[A-Za-z0-9]+(\.gz|\.br)?$">
+        Header set Cache-Control "public, max-age=31536000, immutable"
+    </FilesMatch>
+</IfModule>
+'''
+
+
+class CompressedManifestStaticFilesStorage(ManifestStaticFilesStorage):
+    """Content-hashed static files plus precompressed .gz/.br copies of the text ones."""
+
+    def post_process(self, paths, dry_run=False, **options):
+        yield from super().post_process(paths, dry_run, **options)
+        if dry_run:
+            return
+        for name in sorted(set(self.hashed_files.values())):
+            if name.endswith(COMPRESS_EXTENSIONS):
+                for compressed in self.compress(name):
+                    yield name, compressed, True
+        self._replace('.htaccess', HTACCESS.encode())
+
+    def compress(self, name):
+        with self.open(name) as f:
+            content = f.read()
+        if len(content) < COMPRESS_MIN_SIZE:
+            return []
+        variants = [('.gz', gzip.compress(content, compresslevel=9, mtime=0))]
+        if brotli is not None:
+            variants.append(('.br', brotli.compress(content, quality=11)))
+        written = []
+        for suffix, data in variants:
+            # skip copies that barely shrink, e.g. already minified small files
+            if len(data) < len(content) * 0.95:
+                written.append(self._replace(name + suffix, data))
+        return written
+
+    def _replace(self, name, data):
+        if self.exists(name):
+            self.delete(name)
+        return self._save(name, ContentFile(data))
@@ -0,0 +1,122 @@
+from django.apps import apps
+from django.db import transaction
+from django.db.models import Case, Count, Exists, F, OuterRef, Subquery, Value, When
+from django.db.models.functions import Coalesce
+
+from .models import ServiceRequest
+
+
+# ServiceRequest keeps a summary of its reports, orders and logs so lists can
+# filter and render from its own row. Logs only ever add to it and bump the
+# counters with F(); every other change recomputes the affected column with one
+# UPDATE from subqueries, in the transaction of the write.
+
+FIELDS = (
+    'report_count', 'has_completion_report', 'purchase_order_status', 'inventory_order_status',
+    'last_activity_at', 'log_count',
+)
+# a request with several orders shows the status that needs attention first
+PURCHASE_ORDER_STATUSES = ('supplied', 'approved', 'used')
+INVENTORY_ORDER_STATUSES = ('pending', 'used')
+
+
+def expressions():
+    """{field: expression computing it from scratch}, for UPDATE and annotate."""
+    def model(name):
+        return apps.get_model('app1', name)
+
+    def count(name):
+        rows = model(name).objects.filter(service_request=OuterRef('pk')).order_by()
+        return Coalesce(Subquery(rows.values('service_request').annotate(n=Count('pk')).values('n')), 0)
+
+    def order_status(name, statuses):
+        return Case(
+            *[
+                When(Exists(model(name).objects.filter(report__service_request=OuterRef('pk'), status=status)),
+                     then=Value(status))
+                for status in statuses
+            ],
+            default=Value(''),
+        )
+
+    def last_log(name):
+        rows = model(name).objects.filter(service_request=OuterRef('pk')).order_by('-created_at')
+        return Subquery(rows.values('created_at')[:1])
+
+    return {
+        'report_count': count('Report'),
+        'has_completion_report': Exists(model('CompletionReport').objects.filter(service_request=OuterRef('pk'))),
+        'purchase_order_status': order_status('PurchaseOrder', PURCHASE_ORDER_STATUSES),
+        'inventory_order_status': order_status('InventoryOrder', INVENTORY_ORDER_STATUSES),
+        # archived log rows stay in the count, archiving only moves them
+        'last_activity_at': Coalesce(last_log('ServiceRequestLog'), last_log('ServiceRequestLogArchive'), F('created_at')),
+        'log_count': count('ServiceRequestLog') + count('ServiceRequestLogArchive'),
+    }
+
+
+def refresh(fields, using='default', **lookup):
+    """Recompute fields of the requests matching lookup, e.g. pk=1 or reports=2."""
+    all_expressions = expressions()
+    ServiceRequest.objects.using(using).filter(**lookup).update(**{field: all_expressions[field] for field in fields})
+
+
+# --- signal handlers ---------------------------------------------------------
+
+def _cascading(origin):
+    # the request itself is being deleted, nothing left to summarize
+    return isinstance(origin, ServiceRequest) or getattr(origin, 'model', None) is ServiceRequest
+
+
+def report_changed(report, created=False, origin=None):
+    if created:
+        ServiceRequest.objects.using(report._state.db).filter(pk=report.service_request_id).update(
+            report_count=F('report_count') + 1
+        )
+    elif not _cascading(origin):
+        refresh(['report_count'], report._state.db, pk=report.service_request_id)
+
+
+def completion_report_changed(completion_report, created=False, origin=None):
+    if created:
+        ServiceRequest.objects.using(completion_report._state.db).filter(
+            pk=completion_report.service_request_id
+        ).update(has_completion_report=True)
+    elif not _cascading(origin):
+        refresh(['has_completion_report'], completion_report._state.db, pk=completion_report.service_request_id)
+
+
+def order_changed(order, field, origin=None):
+    # the order's report is still there, also when the order goes with it
+    if not _cascading(origin):
+        refresh([field], order._state.db, reports=order.report_id)
+
+
+def log_added(log):
+    ServiceRequest.objects.using(log._state.db).filter(pk=log.service_request_id).update(
+        log_count=F('log_count') + 1, last_activity_at=log.created_at
+    )
+
+
+# --- repair ------------------------------------------------------------------
+
+def reconcile(batch_size=1000, dry_run=False, using='default'):
+    """Compare the summary columns with a fresh computation and fix them, returns the drifted ids."""
+    computed = expressions()
+    requests = ServiceRequest.objects.using(using)
+    drifted = []
+    last_id = 0
+    while True:
+        batch = list(
+            requests.filter(id__gt=last_id).order_by('id')
+            .annotate(**{f'expected_{field}': computed[field] for field in FIELDS})
+            .values('id', *FIELDS, *(f'expected_{field}' for field in FIELDS))[:batch_size]
+        )
+        if not batch:
+            break
+        last_id = batch[-1]['id']
+        ids = [row['id'] for row in batch if any(row[field] != row[f'expected_{field}'] for field in FIELDS)]
+        drifted += ids
+        if ids and not dry_run:
+            with transaction.atomic(using=using):
+                requests.filter(id__in=ids).update(**computed)
+    return drifted
@@ -0,0 +1,200 @@
+import json
+import os
+import socket
+import time
+import traceback
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import OperationalError, close_old_connections, connection, transaction
+from django.db.models import F, Q
+from django.utils import timezone
+
+from .models import Task, TaskResult
+
+
+# A small queue in the database for work a view should not wait for. Tasks are
+# enqueued in the view's transaction, so a worker (manage.py run_tasks) only
+# sees them once the view committed, and rolled back views enqueue nothing.
+# A task whose worker died runs again once its lease expired, so tasks must
+# be safe to run twice.
+
+# run tasks in the web process right after the commit instead, for development
+EAGER = getattr(settings, 'TASK_QUEUE_EAGER', False)
+# how long a worker owns a claimed task before another one may take it over
+LEASE_SECONDS = getattr(settings, 'TASK_LEASE_SECONDS', 5 * 60)
+# first retry after this many seconds, doubled on every further attempt
+RETRY_DELAY = getattr(settings, 'TASK_RETRY_DELAY', 30)
+RESULT_DAYS = getattr(settings, 'TASK_RESULT_DAYS', 30)
+
+_registry = {}
+
+
+class TaskFunction:
+    def __init__(self, func, name, max_attempts):
+        self.func = func
+        self.name = name
+        self.max_attempts = max_attempts
+
+    def __call__(self, *args, **kwargs):
+        return self.func(*args, **kwargs)
+
+    def delay(self, *args, **kwargs):
+        """Queue a call, the arguments must be JSON serializable (ids, not instances)."""
+        return enqueue(self.name, args, kwargs)
+
+    def schedule(self, countdown, *args, **kwargs):
+        return enqueue(self.name, args, kwargs, countdown=countdown)
+
+
+def task(func=None, *, name=None, max_attempts=3):
+    """Register a function as a task: @task or @task(max_attempts=5)."""
+    def register(func):
+        task_function = TaskFunction(func, name or f'{func.__module__}.{func.__name__}', max_attempts)
+        _registry[task_function.name] = task_function
+        return task_function
+
+    return register(func) if func is not None else register
+
+
+def enqueue(name, args=(), kwargs=None, countdown=0):
+    task_function = _registry[name]
+    if EAGER:
+        transaction.on_commit(lambda: task_function(*args, **(kwargs or {})))
+        return None
+    return Task.objects.create(
+        name=name,
+        args=list(args),
+        kwargs=kwargs or {},
+        max_attempts=task_function.max_attempts,
+        run_at=timezone.now() + timedelta(seconds=countdown),
+    )
+
+
+# --- claiming ----------------------------------------------------------------
+
+def _due(now):
+    # pending tasks whose time came, and running ones whose worker let the lease run out
+    return Task.objects.filter(
+        Q(status=Task.PENDING, run_at__lte=now) | Q(status=Task.RUNNING, locked_until__lt=now)
+    )
+
+
+def claim(worker, limit=1):
+    """Lease up to limit due tasks to this worker, no two workers get the same task."""
+    now = timezone.now()
+    lease = {
+        'status': Task.RUNNING,
+        'locked_by': worker,
+        'locked_until': now + timedelta(seconds=LEASE_SECONDS),
+        'attempts': F('attempts') + 1,
+    }
+    candidates = _due(now).order_by('run_at', 'id').values_list('id', flat=True)
+    if connection.features.has_select_for_update_skip_locked:
+        with transaction.atomic():
+            ids = list(candidates.select_for_update(skip_locked=True)[:limit])
+            Task.objects.filter(id__in=ids).update(**lease)
+    else:
+        # SQLite has no row locks but runs one write at a time: the UPDATE checks
+        # the row is still due, so of two workers racing for it only one changes it
+        ids = []
+        for task_id in candidates[:limit * 4]:
+            if _due(now).filter(id=task_id).update(**lease):
+                ids.append(task_id)
+                if len(ids) == limit:
+                    break
+    return list(Task.objects.filter(id__in=ids, locked_by=worker).order_by('run_at', 'id'))
+
+
+# --- running -----------------------------------------------------------------
+
+def _json_result(value):
+    try:
+        json.dumps(value)
+    except TypeError:
+        return repr(value)
+    return value
+
+
+def _finish(task, worker, status, result=None, error=''):
+    with transaction.atomic():
+        # a worker that overran its lease lost the task to another one, which records it
+        if not Task.objects.filter(pk=task.pk, locked_by=worker).delete()[0]:
+            return
+        TaskResult.objects.create(
+            task_id=task.pk,
+            name=task.name,
+            status=status,
+            args=task.args,
+            kwargs=task.kwargs,
+            result=_json_result(result),
+            error=error,
+            attempts=task.attempts,
+            worker=worker,
+            created_at=task.created_at,
+        )
+
+
+def run(task, worker):
+    """Run a claimed task, then record its result or put it back for a retry."""
+    task_function = _registry.get(task.name)
+    try:
+        if task_function is None:
+            raise LookupError(f'Unknown task {task.name}')
+        result = task_function(*task.args, **task.kwargs)
+    except Exception:
+        error = traceback.format_exc()
+        if task_function is not None and task.attempts < task.max_attempts:
+            Task.objects.filter(pk=task.pk, locked_by=worker).update(
+                status=Task.PENDING,
+                locked_by='',
+                locked_until=None,
+                last_error=error,
+                run_at=timezone.now() + timedelta(seconds=RETRY_DELAY * 2 ** (task.attempts - 1)),
+            )
+        else:
+            _finish(task, worker, TaskResult.FAILURE, error=error)
+        return False
+    _finish(task, worker, TaskResult.SUCCESS, result=result)
+    return True
+
+
+def worker_name():
+    return f'{socket.gethostname()}:{os.getpid()}'
+
+
+def work(worker=None, burst=False, batch=1, sleep=1.0, should_stop=lambda: False):
+    """Claim and run tasks until should_stop() or, with burst, until the queue is empty."""
+    worker = worker or worker_name()
+    done = 0
+    while not should_stop():
+        close_old_connections()
+        try:
+            tasks = claim(worker, batch)
+        except OperationalError:
+            # SQLite: another process held the write lock longer than the timeout
+            time.sleep(sleep)
+            continue
+        if not tasks:
+            if burst:
+                break
+            time.sleep(sleep)
+            continue
+        for i, claimed in enumerate(tasks):
+            if should_stop():
+                release(tasks[i:], worker)
+                break
+            run(claimed, worker)
+            done += 1
+    return done
+
+
+def release(tasks, worker):
+    """Hand claimed tasks that were not started back to the queue."""
+    Task.objects.filter(pk__in=[t.pk for t in tasks], locked_by=worker).update(
+        status=Task.PENDING, locked_by='', locked_until=None, attempts=F('attempts') - 1,
+    )
+
+
+def purge_results(days=RESULT_DAYS):
+    return TaskResult.objects.filter(finished_at__lt=timezone.now() - timedelta(days=days)).delete()[0]
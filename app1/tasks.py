@@ -0,0 +1,44 @@
+from . import images, notifications
+from .models import InventoryOrder, PurchaseOrder
+from .taskqueue import task
+
+
+@task
+def process_profile_image(profile_id):
+    images.process_profile_image(profile_id)
+
+
+# eight attempts wait out about an hour of gateway downtime
+@task(max_attempts=8)
+def send_whatsapp(number, message):
+    return notifications.post_message(number, message)
+
+
+@task(max_attempts=5)
+def send_digest(number):
+    return notifications.send_digest(number)
+
+
+@task
+def reschedule_escalations():
+    from .escalation import reschedule
+    return reschedule()
+
+
+@task
+def mark_orders_used(report_id):
+    """The purchase and inventory orders of a request under review have been used up."""
+    # saved one by one so the inbox counters see the purchase order leave 'supplied'
+    changed = 0
+    for model in (PurchaseOrder, InventoryOrder):
+        for order in model.objects.filter(report_id=report_id).exclude(status='used'):
+            order.status = 'used'
+            order.save()
+            changed += 1
+    return changed
+
+
+@task
+def process_attachment(blob_id):
+    from .attachments import process_blob
+    process_blob(blob_id)
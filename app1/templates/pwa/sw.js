@@ -0,0 +1,174 @@
+{% load static %}// Service worker of the mobile pages, rendered by app1.views.service_worker.
+// The shell is served from the cache; request pages are loaded from the
+// network and kept for offline reading; requests and comments posted without
+// a connection are queued (offline_queue.js) and replayed through the sync API.
+importScripts('{% static "js/offline_queue.js" %}');
+
+const VERSION = '{{ version }}';
+const SHELL_CACHE = 'club-shell-' + VERSION;
+const PAGES_CACHE = 'club-pages';
+const SHELL = {{ shell|safe }};
+const CDN_ORIGINS = {{ cdn_origins|safe }};
+const MAX_PAGES = {{ cached_pages }};
+const OFFLINE_URL = '{% url "offline" %}';
+const SYNC_URL = '{% url "sync_writes" %}';
+const SYNC_TAG = 'offline-writes';
+// a slower network counts as offline, the cached page is shown instead
+const NETWORK_TIMEOUT = 4000;
+
+function pathPattern(path) {
+  return new RegExp('^' + path.replace(/[.*+?^${}()|[\]\\]/g, '\\$&').replace('/0/', '/\\d+/') + '$');
+}
+
+const PAGES = {{ page_patterns|safe }}.map(pathPattern);
+const QUEUED_POSTS = Object.entries({{ queued_posts|safe }}).map(function (entry) {
+  return { pattern: pathPattern(entry[0]), type: entry[1] };
+});
+
+self.addEventListener('install', function (event) {
+  event.waitUntil(caches.open(SHELL_CACHE).then(function (cache) {
+    const requests = SHELL.map(function (url) {
+      return url.startsWith('http') ? new Request(url, { mode: 'no-cors' }) : url;
+    });
+    return cache.addAll(requests.concat([OFFLINE_URL]));
+  }).then(function () {
+    return self.skipWaiting();
+  }));
+});
+
+self.addEventListener('activate', function (event) {
+  event.waitUntil(caches.keys().then(function (names) {
+    return Promise.all(names.filter(function (name) {
+      return name.startsWith('club-shell-') && name !== SHELL_CACHE;
+    }).map(function (name) {
+      return caches.delete(name);
+    }));
+  }).then(function () {
+    return self.clients.claim();
+  }));
+});
+
+function trimPages(cache) {
+  return cache.keys().then(function (keys) {
+    // keys come back in insertion order, the oldest pages go first
+    return Promise.all(keys.slice(0, Math.max(keys.length - MAX_PAGES, 0)).map(function (key) {
+      return cache.delete(key);
+    }));
+  });
+}
+
+function networkFirst(request) {
+  const network = fetch(request).then(function (response) {
+    if (response.ok && !response.redirected) {
+      const copy = response.clone();
+      caches.open(PAGES_CACHE).then(function (cache) {
+        // re-inserting moves the page to the end, it is the most recent one now
+        return cache.delete(request).then(function () {
+          return cache.put(request, copy);
+        }).then(function () {
+          return trimPages(cache);
+        });
+      });
+    }
+    return response;
+  });
+  // the cached copy may answer first, a failure that comes later is not an error
+  network.catch(function () {});
+  const timeout = new Promise(function (resolve, reject) {
+    setTimeout(reject, NETWORK_TIMEOUT);
+  });
+  return Promise.race([network, timeout]).catch(function () {
+    return caches.match(request, { cacheName: PAGES_CACHE }).then(function (cached) {
+      return cached || network;
+    });
+  }).catch(function () {
+    return caches.match(OFFLINE_URL);
+  });
+}
+
+function cacheFirst(request) {
+  return caches.match(request).then(function (cached) {
+    return cached || fetch(request).then(function (response) {
+      if (response.ok || response.type === 'opaque') {
+        const copy = response.clone();
+        caches.open(SHELL_CACHE).then(function (cache) { cache.put(request, copy); });
+      }
+      return response;
+    });
+  });
+}
+
+// A form posted without a connection: queue it and show the offline page.
+function queuePost(request, type) {
+  const copy = request.clone();
+  return fetch(request).catch(function () {
+    return copy.formData().then(function (form) {
+      const data = Object.fromEntries(form.entries());
+      const path = new URL(copy.url).pathname;
+      if (type === 'comment') {
+        data.request = path.match(/\d+/)[0];
+      }
+      return self.OfflineQueue.add(type, data);
+    }).then(function () {
+      if (self.registration.sync) {
+        return self.registration.sync.register(SYNC_TAG).catch(function () {});
+      }
+    }).then(function () {
+      return Response.redirect(OFFLINE_URL + '?queued=1', 303);
+    });
+  });
+}
+
+self.addEventListener('fetch', function (event) {
+  const request = event.request;
+  const url = new URL(request.url);
+  const sameOrigin = url.origin === self.location.origin;
+
+  if (request.method === 'POST' && sameOrigin) {
+    const queued = QUEUED_POSTS.find(function (post) { return post.pattern.test(url.pathname); });
+    if (queued) {
+      event.respondWith(queuePost(request, queued.type));
+    }
+    return;
+  }
+  if (request.method !== 'GET') {
+    return;
+  }
+  if (request.mode === 'navigate' && sameOrigin) {
+    if (url.pathname === OFFLINE_URL) {
+      event.respondWith(caches.match(OFFLINE_URL).then(function (cached) { return cached || fetch(request); }));
+    } else if (PAGES.some(function (pattern) { return pattern.test(url.pathname); })) {
+      event.respondWith(networkFirst(request));
+    } else {
+      event.respondWith(fetch(request).catch(function () { return caches.match(OFFLINE_URL); }));
+    }
+    return;
+  }
+  if (SHELL.indexOf(sameOrigin ? url.pathname : request.url) !== -1 || CDN_ORIGINS.indexOf(url.host) !== -1) {
+    event.respondWith(cacheFirst(request));
+  }
+});
+
+self.addEventListener('sync', function (event) {
+  if (event.tag === SYNC_TAG) {
+    event.waitUntil(self.OfflineQueue.flush(SYNC_URL));
+  }
+});
+
+self.addEventListener('message', function (event) {
+  const message = event.data || {};
+  if (message.type === 'logout') {
+    // the cached pages belong to the user leaving this phone
+    event.waitUntil(caches.delete(PAGES_CACHE));
+  } else if (message.type === 'prefetch') {
+    event.waitUntil(caches.open(PAGES_CACHE).then(function (cache) {
+      return Promise.all(message.urls.map(function (url) {
+        return fetch(url, { credentials: 'same-origin' }).then(function (response) {
+          if (response.ok && !response.redirected) {
+            return cache.put(url, response);
+          }
+        }).catch(function () {});
+      }));
+    }));
+  }
+});
@@ -5,4 +5,7 @@ register = template.Library()
 
 @register.filter(name='has_group')
 def has_group(user, group_name):
-    return user.groups.filter(name=group_name).exists()
+    # the navigation checks several groups, one query answers all of them
+    if not hasattr(user, '_group_names'):
+        user._group_names = set(user.groups.values_list('name', flat=True))
+    return group_name in user._group_names
@@ -0,0 +1,29 @@
+# templatetags/image_tags.py
+from django import template
+from django.utils.html import format_html
+
+register = template.Library()
+
+
+@register.simple_tag
+def avatar(user, size=48, css_class='rounded-circle'):
+    profile = getattr(user, 'profile', None)
+    if profile is None or not profile.image:
+        return format_html(
+            '<i class="fas fa-user-circle text-secondary {}" style="font-size: {}px;"></i>',
+            css_class, size,
+        )
+    if not profile.image_hash:
+        return format_html(
+            '<img src="{}" alt="{}" width="{}" height="{}" class="{}" loading="lazy" style="object-fit: cover;">',
+            profile.image.url, user.username, size, size, css_class,
+        )
+    return format_html(
+        '<picture>'
+        '<source type="image/webp" srcset="{}">'
+        '<img src="{}" srcset="{}" alt="{}" width="{}" height="{}" class="{}" loading="lazy">'
+        '</picture>',
+        profile.thumbnail_srcset(size, 'webp'),
+        profile.thumbnail_url(size), profile.thumbnail_srcset(size),
+        user.username, size, size, css_class,
+    )
@@ -1,3 +1,1348 @@
-from django.test import TestCase
+import difflib
+import gzip
+import importlib
+import json
+import os
+import re
+import shutil
+import statistics
+import tempfile
+import time
+from datetime import timedelta
+from pathlib import Path
+from unittest import mock
 
-# Create your tests here.
+from django.contrib.auth.models import User
+from django.db import DEFAULT_DB_ALIAS, DatabaseError, connections
+from django.http import HttpResponse
+from django.test import RequestFactory, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from . import (
+    assignment, dedup, escalation, images, inbox, maintenance, notifications, offline, refcache, summary, taskqueue,
+)
+from .archive import ARCHIVE_DB, archive_requests, get_service_request, is_archived
+from .audit import log_event, request_logs
+from .blobstore import get_blob_store
+from .gateway import CircuitBreaker, RateLimit
+from .models import (
+    Attachment, Blob, ClientWrite, CompletionReport, Escalation, EscalationRule, InboxCounter, InventoryOrder,
+    LogEvent, MaintenanceOccurrence, MaintenanceSchedule, PendingNotification, PurchaseOrder, Report, Section,
+    ServiceProvider, ServiceRequest, ServiceRequestLog, Task, TaskResult, TechnicianLoad, UserProfile,
+)
+from .replica import PIN_SECONDS, PIN_SESSION_KEY, REPLICA_DB, ReplicaMiddleware, ReplicaRouter, replica_reads
+
+
+# Query budgets of the main pages and API endpoints. Every page is rendered at
+# two data sizes and must run the same number of queries at both, so a template
+# that starts reading a relation per row fails here with the SQL it added.
+#
+# Wall-clock timings depend on the machine, so latencies are only compared with
+# perf_baselines.json next to this file when asked for, within PERF_TOLERANCE
+# times the baseline plus PERF_SLACK_MS:
+#
+#     PERF_CHECK=1 python manage.py test app1.tests.QueryBudgetTests
+#
+# After an intended change, rewrite the file with:
+#
+#     PERF_UPDATE_BASELINES=1 python manage.py test app1
+
+BASELINES_PATH = Path(__file__).with_name('perf_baselines.json')
+UPDATE_BASELINES = bool(os.environ.get('PERF_UPDATE_BASELINES'))
+CHECK_LATENCY = bool(os.environ.get('PERF_CHECK'))
+TOLERANCE = float(os.environ.get('PERF_TOLERANCE', 3))
+SLACK_MS = float(os.environ.get('PERF_SLACK_MS', 25))
+SMALL, LARGE = 4, 16
+REPEAT = 5
+
+BUDGETS = {
+    'home': 13,
+    'my_request': 4,
+    'my_request_supplied': 4,
+    'requests_to_me': 5,
+    'requests_to_me_supplied': 5,
+    'requests_board': 5,
+    'requests_board_api': 2,
+    'request_detail': 8,
+    'request_detail_sm': 8,
+    'print_request': 6,
+    'purchase_order_list': 3,
+    'purchase_order_list_api': 1,
+    'assign_to_user_search': 2,
+    'api_request_list': 8,
+    'api_request_batch': 5,
+    'api_request_detail': 6,
+    'api_log_list': 3,
+}
+
+
+def normalize_sql(sql):
+    """SQL with the literals taken out, so the same query at another size compares equal."""
+    sql = re.sub(r"'(?:[^']|'')*'", '?', sql)
+    sql = re.sub(r'\b\d+(\.\d+)?\b', '?', sql)
+    return re.sub(r'IN \((\?, )*\?\)', 'IN (...)', sql)
+
+
+def sql_diff(old, new, old_label, new_label):
+    return '\n'.join(difflib.unified_diff(old, new, old_label, new_label, lineterm=''))
+
+
+@override_settings(
+    # the manifest storage needs collectstatic, the cache must not leak between runs
+    STORAGES={
+        'default': {'BACKEND': 'django.core.files.storage.FileSystemStorage'},
+        'staticfiles': {'BACKEND': 'django.contrib.staticfiles.storage.StaticFilesStorage'},
+    },
+    CACHES={'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache', 'LOCATION': 'perf-tests'}},
+)
+class QueryBudgetTests(TestCase):
+    databases = {'default', 'archive'}
+    baselines = {}
+    measured = {}
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        if BASELINES_PATH.exists():
+            cls.baselines = json.loads(BASELINES_PATH.read_text(encoding='utf-8'))
+
+    @classmethod
+    def tearDownClass(cls):
+        if UPDATE_BASELINES and cls.measured:
+            baselines = {**cls.baselines, **cls.measured}
+            BASELINES_PATH.write_text(
+                json.dumps(dict(sorted(baselines.items())), indent=2, ensure_ascii=False) + '\n', encoding='utf-8'
+            )
+        super().tearDownClass()
+
+    def setUp(self):
+        from django.core.cache import cache
+        cache.clear()
+        refcache.clear_local()
+        self.manager = User.objects.create_user('manager', password='x', is_staff=True)
+        self.technician = User.objects.create_user('technician', password='x')
+        UserProfile.objects.create(user=self.manager, phone='')
+        UserProfile.objects.create(user=self.technician, phone='')
+        self.section = Section.objects.create(name='القسم')
+        self.section.manager.add(self.manager)
+        self.provider = ServiceProvider.objects.create(name='الصيانة')
+        self.provider.manager.add(self.manager, self.technician)
+        self.target = None
+        self.client.force_login(self.manager)
+
+    def seed(self, count):
+        """count more requests, each with reports, orders, photos and logs; the first one gets count more reports."""
+        for i in range(count):
+            service_request = ServiceRequest.objects.create(
+                title=f'طلب {ServiceRequest.objects.count()}', description='وصف',
+                section=self.section, service_provider=self.provider, status='in_progress',
+                created_by=self.manager, updated_by=self.manager, assigned_to=self.technician,
+            )
+            self.target = self.target or service_request
+            self.add_report(service_request)
+            log_event(service_request, LogEvent.CREATED, self.manager)
+        for i in range(count):
+            self.add_report(self.target)
+
+    def add_report(self, service_request):
+        report = Report.objects.create(title='تقرير', service_request=service_request, created_by=self.manager)
+        PurchaseOrder.objects.create(report=report, refrence_number='1', status='supplied', created_by=self.manager)
+        InventoryOrder.objects.create(report=report, refrence_number='1', created_by=self.manager)
+        completion_report = CompletionReport.objects.create(
+            title='إنجاز', description='وصف', service_request=service_request, created_by=self.manager
+        )
+        blob = Blob.objects.create(sha256=f'{Blob.objects.count():064x}', size=1, content_type='image/jpeg')
+        Attachment.objects.create(
+            service_request=service_request, completion_report=completion_report, blob=blob, kind=Attachment.AFTER,
+            name='صورة.jpg', uploaded_by=self.manager,
+        )
+        log_event(service_request, LogEvent.REPORT_CREATED, self.manager, target=report)
+        log_event(service_request, LogEvent.PURCHASE_ORDER_CREATED, self.manager, target=report.purchase_order)
+
+    def capture(self, url):
+        # the first request fills the reference and session caches
+        self.assertEqual(self.client.get(url).status_code, 200)
+        with CaptureQueriesContext(connections['default']) as queries:
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        return [normalize_sql(query['sql']) for query in queries.captured_queries]
+
+    def latency(self, url):
+        timings = []
+        for _ in range(REPEAT):
+            started = time.perf_counter()
+            self.client.get(url)
+            timings.append((time.perf_counter() - started) * 1000)
+        return statistics.median(timings)
+
+    def check(self, name, url):
+        """Same number of queries at both sizes, within the budget, and with PERF_CHECK no slower than the baseline."""
+        url = url if callable(url) else (lambda url=url: url)
+        self.seed(SMALL)
+        small = self.capture(url())
+        self.seed(LARGE - SMALL)
+        large = self.capture(url())
+        self.assertEqual(
+            len(small), len(large),
+            f'{name}: {len(small)} queries at {SMALL} rows but {len(large)} at {LARGE}\n'
+            + sql_diff(small, large, f'{SMALL} rows', f'{LARGE} rows'),
+        )
+        baseline = self.baselines.get(name, {})
+        self.assertLessEqual(
+            len(large), BUDGETS[name],
+            f'{name}: {len(large)} queries, budget {BUDGETS[name]}\n'
+            + sql_diff(baseline.get('queries', []), large, 'baseline', 'current'),
+        )
+        if not (CHECK_LATENCY or UPDATE_BASELINES):
+            return
+        elapsed = self.latency(url())
+        self.measured[name] = {'queries': large, 'ms': round(elapsed, 1)}
+        if baseline.get('ms') is not None and not UPDATE_BASELINES:
+            limit = baseline['ms'] * TOLERANCE + SLACK_MS
+            self.assertLessEqual(
+                elapsed, limit, f'{name}: {elapsed:.1f} ms, baseline {baseline["ms"]} ms, limit {limit:.1f} ms'
+            )
+
+    # --- pages ---------------------------------------------------------------
+
+    def test_home(self):
+        self.check('home', reverse('home'))
+
+    def test_my_request(self):
+        self.check('my_request', reverse('my_request'))
+
+    def test_my_request_supplied(self):
+        self.check('my_request_supplied', reverse('my_request') + '?filter=supplied')
+
+    def test_requests_to_me(self):
+        self.check('requests_to_me', reverse('requests_to_me'))
+
+    def test_requests_to_me_supplied(self):
+        self.check('requests_to_me_supplied', reverse('requests_to_me') + '?filter=supplied')
+
+    def test_requests_board(self):
+        self.check('requests_board', reverse('requests_board'))
+
+    def test_requests_board_api(self):
+        self.check('requests_board_api', reverse('requests_board_api'))
+
+    def test_request_detail(self):
+        self.check('request_detail', lambda: reverse('request_detail', args=[self.target.id]))
+
+    def test_request_detail_sm(self):
+        self.check('request_detail_sm', lambda: reverse('request_detail_sm', args=[self.target.id]))
+
+    def test_print_request(self):
+        self.check('print_request', lambda: reverse('print_request', args=[self.target.id]))
+
+    def test_purchase_order_list(self):
+        self.check('purchase_order_list', reverse('purchase_order_list'))
+
+    # --- JSON ----------------------------------------------------------------
+
+    def test_purchase_order_list_api(self):
+        self.check('purchase_order_list_api', reverse('purchase_orders_api'))
+
+    def test_assign_to_user_search(self):
+        self.check('assign_to_user_search', lambda: reverse('assign_to_user_search', args=[self.target.id]))
+
+    def test_api_request_list(self):
+        includes = 'reports,completion_reports,purchase_orders,inventory_orders,logs'
+        self.check('api_request_list', reverse('api_request_list') + f'?include={includes}')
+
+    def test_api_request_batch(self):
+        self.check('api_request_batch', lambda: reverse('api_request_batch') + '?include=reports,logs&ids=' + ','.join(
+            str(id) for id in ServiceRequest.objects.values_list('id', flat=True)
+        ))
+
+    def test_api_request_detail(self):
+        self.check(
+            'api_request_detail',
+            lambda: reverse('api_request_detail', args=[self.target.id]) + '?include=reports,purchase_orders,logs',
+        )
+
+    def test_api_log_list(self):
+        self.check('api_log_list', reverse('api_log_list') + '?fields=id,text,created_by_name')
+
+
+# --- profile images ------------------------------------------------------------
+
+class ProfileImageTests(TestCase):
+    def setUp(self):
+        root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, root, ignore_errors=True)
+        settings_override = self.settings(MEDIA_ROOT=root, MEDIA_URL='/media/')
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+        self.profile = UserProfile.objects.create(user=User.objects.create_user('technician', password='x'), phone='')
+
+    def upload(self, data):
+        from django.core.files.base import ContentFile
+
+        self.profile.image.save('avatar.png', ContentFile(data))
+        images.process_profile_image(self.profile.pk)
+        self.profile.refresh_from_db()
+
+    def photo(self):
+        from io import BytesIO
+
+        from PIL import Image
+
+        buffer = BytesIO()
+        Image.new('RGB', (300, 200), 'teal').save(buffer, 'PNG')
+        return buffer.getvalue()
+
+    def test_thumbnail_urls(self):
+        self.assertEqual(self.profile.thumbnail_url(48), '')
+        self.assertEqual(self.profile.thumbnail_srcset(48), '')
+
+        data = self.photo()
+        self.upload(data)
+        digest = images.content_hash(data)
+        self.assertEqual(self.profile.image_hash, digest)
+        self.assertEqual(self.profile.image.name, images.original_name(digest))
+
+        def url(size, ext='jpg'):
+            return '/media/' + images.thumbnail_name(digest, size, ext)
+
+        # a size between two thumbnails gets the larger one, anything above the largest gets the largest
+        self.assertEqual(self.profile.thumbnail_url(40), url(48))
+        self.assertEqual(self.profile.thumbnail_url(48), url(48))
+        self.assertEqual(self.profile.thumbnail_url(100, 'webp'), url(192, 'webp'))
+        self.assertEqual(self.profile.thumbnail_url(500), url(192))
+        self.assertEqual(self.profile.thumbnail_srcset(48), f'{url(48)} 1x, {url(96)} 2x, {url(192)} 4x')
+        self.assertEqual(self.profile.thumbnail_srcset(96, 'webp'), f"{url(96, 'webp')} 1x, {url(192, 'webp')} 2x")
+        self.assertEqual(self.profile.thumbnail_srcset(192), f'{url(192)} 1x')
+        for size in images.THUMBNAIL_SIZES:
+            for ext, _ in images.THUMBNAIL_FORMATS:
+                self.assertTrue(self.profile.image.storage.exists(images.thumbnail_name(digest, size, ext)))
+
+    def test_picker_avatar_matches_the_avatar_tag(self):
+        from django.template import Context, Template
+
+        self.upload(self.photo())
+        provider = ServiceProvider.objects.create(name='الصيانة')
+        provider.manager.add(self.profile.user)
+        service_request = ServiceRequest.objects.create(
+            title='طلب', description='وصف', section=Section.objects.create(name='القسم'), service_provider=provider,
+            created_by=self.profile.user, updated_by=self.profile.user,
+        )
+        self.client.force_login(self.profile.user)
+        user, = self.client.get(reverse('assign_to_user_search', args=[service_request.id])).json()['results']
+        tag = Template("{% load image_tags %}{% avatar user 24 %}").render(Context({'user': self.profile.user}))
+        self.assertIn(f'src="{user["avatar"]}" srcset="{user["avatar_srcset"]}"', tag)
+
+    def test_unprocessed_upload_falls_back_to_the_original(self):
+        from django.core.files.base import ContentFile
+
+        self.profile.image.save('avatar.png', ContentFile(self.photo()))
+        self.assertEqual(self.profile.thumbnail_url(48), self.profile.image.url)
+        self.assertEqual(self.profile.thumbnail_srcset(48), '')
+
+    def test_unreadable_upload_is_logged_and_left_alone(self):
+        with self.assertLogs('app1.images', 'WARNING') as logs:
+            self.upload(b'not an image')
+        self.assertIn('is not a readable image', logs.output[0])
+        self.assertEqual(self.profile.image_hash, '')
+        self.assertEqual(self.profile.thumbnail_url(48), self.profile.image.url)
+
+
+# --- reference cache -----------------------------------------------------------
+
+@override_settings(
+    CACHES={'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache', 'LOCATION': 'refcache-tests'}},
+)
+class ReferenceCacheTests(TestCase):
+    def setUp(self):
+        from django.core.cache import cache
+        cache.clear()
+        refcache.clear_local()
+
+    def test_local_hit_skips_the_shared_cache(self):
+        loader = mock.Mock(return_value=[1])
+        refcache.cached(refcache.SECTIONS, 'test', [1], loader)
+        with mock.patch.object(refcache, 'cache', wraps=refcache.cache) as shared:
+            self.assertEqual(refcache.cached(refcache.SECTIONS, 'test', [1], loader), [1])
+        self.assertEqual(shared.method_calls, [])
+        self.assertEqual(loader.call_count, 1)
+
+    def test_change_in_this_worker_misses_at_once(self):
+        loader = mock.Mock(side_effect=[[1], [2]])
+        refcache.cached(refcache.SECTIONS, 'test', [1], loader)
+        refcache.invalidate([refcache.SECTIONS])
+        self.assertEqual(refcache.cached(refcache.SECTIONS, 'test', [1], loader), [2])
+
+
+# --- WhatsApp gateway ----------------------------------------------------------
+
+@override_settings(
+    CACHES={'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache', 'LOCATION': 'gateway-tests'}},
+)
+class GatewayTests(TestCase):
+    def setUp(self):
+        from django.core.cache import cache
+        cache.clear()
+
+    def test_rate_limit_is_shared_by_processes(self):
+        # two instances stand for two worker processes
+        first, second = RateLimit(1 / 60, 2, 'test:rate'), RateLimit(1 / 60, 2, 'test:rate')
+        self.assertTrue(first.take())
+        self.assertTrue(second.take())
+        self.assertFalse(first.available())
+        self.assertFalse(second.take())
+
+    def test_burst_never_exceeds_capacity(self):
+        rate_limit = RateLimit(1 / 60, 2, 'test:rate')
+        clock = mock.Mock(wraps=time)
+        with mock.patch('app1.gateway.time', clock):
+            # a burst on both sides of where a window of capacity / rate seconds would end
+            sent = 0
+            for now in [119.5] * 5 + [120.5] * 5:
+                clock.time.return_value = now
+                sent += rate_limit.take()
+            self.assertEqual(sent, 2)
+            # refilled at rate per second
+            clock.time.return_value = 119.5 + 60
+            self.assertTrue(rate_limit.take())
+            self.assertFalse(rate_limit.take())
+
+    def test_half_open_circuit_lets_one_trial_through(self):
+        from django.core.cache import cache
+
+        first, second = CircuitBreaker(2, 60, 'test:circuit'), CircuitBreaker(2, 60, 'test:circuit')
+        first.failure()
+        self.assertTrue(second.allow())
+        first.failure()
+        self.assertEqual(second.state(), 'open')
+        self.assertFalse(second.allow())
+
+        cache.set(first.open_until_key, time.time() - 1, None)
+        self.assertEqual(first.state(), 'half_open')
+        self.assertTrue(first.allow())
+        # the others wait for the trial
+        self.assertFalse(second.allow())
+        self.assertEqual(second.state(), 'open')
+        # the failed trial opens the circuit again
+        first.failure()
+        self.assertFalse(second.allow())
+
+        cache.set(first.open_until_key, time.time() - 1, None)
+        self.assertTrue(second.allow())
+        second.success()
+        self.assertEqual(first.state(), 'closed')
+        self.assertTrue(first.allow())
+        self.assertTrue(second.allow())
+
+
+# --- attachments ---------------------------------------------------------------
+
+@override_settings(
+    CACHES={'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache', 'LOCATION': 'attachment-tests'}},
+)
+class AttachmentTests(TestCase):
+    databases = {'default', ARCHIVE_DB}
+    # a photo that gzip would shrink a lot, so compressing it would show
+    data = b'\xff\xd8\xff' + bytes(300000)
+
+    def setUp(self):
+        root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, root, ignore_errors=True)
+        settings_override = self.settings(ATTACHMENT_ROOT=root)
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+        get_blob_store.cache_clear()
+        self.addCleanup(get_blob_store.cache_clear)
+        refcache.clear_local()
+
+        user = User.objects.create_user('technician', password='x')
+        self.service_request = ServiceRequest.objects.create(
+            title='طلب', description='وصف', section=Section.objects.create(name='القسم'),
+            service_provider=ServiceProvider.objects.create(name='الصيانة'), created_by=user, updated_by=user,
+        )
+        self.client.force_login(user)
+
+    def start(self):
+        response = self.client.post(reverse('start_attachment_upload'), {
+            'service_request': self.service_request.id, 'name': 'photo.jpg', 'size': len(self.data),
+        })
+        self.assertEqual(response.status_code, 201)
+        return response.json()['url']
+
+    def patch(self, url, data, offset):
+        return self.client.generic(
+            'PATCH', url, data, content_type='application/offset+octet-stream', HTTP_UPLOAD_OFFSET=str(offset),
+        )
+
+    def upload(self):
+        response = self.patch(self.start(), self.data, 0)
+        self.assertEqual(response.status_code, 201)
+        return response.json()['url']
+
+    def test_chunks_resume_at_the_received_offset(self):
+        url = self.start()
+        self.assertEqual(self.patch(url, self.data[:1000], 0).json()['offset'], 1000)
+        # the same chunk again, e.g. after a lost answer
+        response = self.patch(url, self.data[:1000], 0)
+        self.assertEqual(response.status_code, 409)
+        self.assertEqual(response['Upload-Offset'], '1000')
+        self.assertEqual(self.patch(url, self.data[1000:], 1000).status_code, 201)
+        self.assertEqual(Attachment.objects.get().blob.size, len(self.data))
+
+    def test_chunk_lock_of_another_request_is_kept(self):
+        from django.core.cache import cache
+
+        url = self.start()
+        upload_id = url.rstrip('/').rsplit('/', 1)[1]
+        cache.set(f'attachment-upload:{upload_id}', 'other-request', 60)
+        self.assertEqual(self.patch(url, self.data[:1000], 0).status_code, 409)
+        self.assertEqual(cache.get(f'attachment-upload:{upload_id}'), 'other-request')
+
+    def test_full_file_is_not_compressed(self):
+        response = self.client.get(self.upload(), HTTP_ACCEPT_ENCODING='gzip, br')
+        self.assertEqual(response.status_code, 200)
+        self.assertFalse(response.has_header('Content-Encoding'))
+        self.assertEqual(response['Content-Length'], str(len(self.data)))
+        self.assertTrue(response['ETag'].startswith('"'))
+        self.assertEqual(b''.join(response.streaming_content), self.data)
+
+    def test_range_with_if_range_resumes(self):
+        url = self.upload()
+        etag = self.client.get(url)['ETag']
+        response = self.client.get(url, HTTP_RANGE='bytes=100-199', HTTP_IF_RANGE=etag, HTTP_ACCEPT_ENCODING='gzip, br')
+        self.assertEqual(response.status_code, 206)
+        self.assertFalse(response.has_header('Content-Encoding'))
+        self.assertEqual(response['Content-Range'], f'bytes 100-199/{len(self.data)}')
+        self.assertEqual(response['Content-Length'], '100')
+        self.assertEqual(b''.join(response.streaming_content), self.data[100:200])
+
+    def test_rolled_back_upload_leaves_a_file_for_clean_blobs(self):
+        from django.db import transaction
+
+        from .attachments import clean_blobs
+
+        url = self.start()
+        with self.assertRaises(DatabaseError):
+            with transaction.atomic():
+                self.assertEqual(self.patch(url, self.data, 0).status_code, 201)
+                raise DatabaseError('rolled back')
+        self.assertFalse(Blob.objects.exists())
+        store = get_blob_store()
+        [orphan] = store.stale_blobs(-1)
+        kept = self.upload()
+        self.assertEqual(Blob.objects.get().sha256, orphan)
+        # the next upload of the same photo reused the file, nothing is orphaned now
+        self.assertEqual(clean_blobs(), 0)
+
+        stale = time.time() - 48 * 3600
+        store.save('f' * 64, b'left over')
+        os.utime(store.path('f' * 64), (stale, stale))
+        os.utime(store.path(orphan), (stale, stale))
+        self.assertEqual(clean_blobs(dry_run=True), 1)
+        self.assertEqual(clean_blobs(), 1)
+        self.assertFalse(store.exists('f' * 64))
+        self.assertEqual(self.client.get(kept).status_code, 200)
+
+    def test_range_with_stale_if_range_sends_whole_file(self):
+        response = self.client.get(self.upload(), HTTP_RANGE='bytes=100-199', HTTP_IF_RANGE='"other"')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(b''.join(response.streaming_content), self.data)
+
+
+# --- offline writes ------------------------------------------------------------
+
+class OfflineWriteTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user('technician', password='x')
+        self.section = Section.objects.create(name='القسم')
+        self.provider = ServiceProvider.objects.create(name='الصيانة')
+
+    def create_request(self):
+        return ServiceRequest.objects.create(
+            title='طلب', description='وصف', section=self.section, service_provider=self.provider,
+            created_by=self.user, updated_by=self.user,
+        ).pk
+
+    def test_write_sent_twice_is_applied_once(self):
+        client_id = offline.parse_client_id('5f0c3b1e-8d2a-4c7e-9b1f-2a6d4e8c0f13')
+        apply = mock.Mock(side_effect=self.create_request)
+        first = offline.record(client_id, self.user, ClientWrite.REQUEST, apply)
+        second = offline.record(client_id, self.user, ClientWrite.REQUEST, apply)
+        self.assertTrue(first[1])
+        self.assertEqual(second, (first[0], False))
+        self.assertEqual(apply.call_count, 1)
+        self.assertEqual(ServiceRequest.objects.count(), 1)
+        self.assertEqual(offline.resolve_request_id(str(client_id), self.user), first[0])
+
+    def test_client_id_of_another_user_is_refused(self):
+        client_id = offline.parse_client_id('5f0c3b1e-8d2a-4c7e-9b1f-2a6d4e8c0f13')
+        offline.record(client_id, self.user, ClientWrite.REQUEST, self.create_request)
+        other = User.objects.create_user('other', password='x')
+        with self.assertRaises(offline.SyncError):
+            offline.record(client_id, other, ClientWrite.REQUEST, self.create_request)
+        self.assertEqual(ServiceRequest.objects.count(), 1)
+
+    def test_failed_write_can_be_sent_again(self):
+        client_id = offline.parse_client_id('5f0c3b1e-8d2a-4c7e-9b1f-2a6d4e8c0f13')
+        with self.assertRaises(ValueError):
+            offline.record(client_id, self.user, ClientWrite.REQUEST, mock.Mock(side_effect=ValueError))
+        object_id, created = offline.record(client_id, self.user, ClientWrite.REQUEST, self.create_request)
+        self.assertTrue(created)
+        self.assertEqual(ServiceRequest.objects.get().pk, object_id)
+
+
+# --- maintenance schedules -----------------------------------------------------
+
+@override_settings(
+    CACHES={'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache', 'LOCATION': 'maintenance-tests'}},
+)
+class MaintenanceTests(TestCase):
+    def setUp(self):
+        from django.core.cache import cache
+        from django.utils import timezone
+
+        cache.clear()
+        refcache.clear_local()
+        self.now = timezone.now()
+        user = User.objects.create_user('manager', password='x')
+        self.schedule = MaintenanceSchedule.objects.create(
+            title='فحص المكيفات', description='وصف', section=Section.objects.create(name='القسم'),
+            service_provider=ServiceProvider.objects.create(name='الصيانة'), created_by=user,
+            frequency=MaintenanceSchedule.DAILY, starts_at=self.now - timedelta(days=3, hours=1),
+        )
+
+    def test_second_run_raises_nothing(self):
+        self.assertEqual(maintenance.generate(now=self.now)[:2], (1, 1))
+        self.assertEqual(maintenance.generate(now=self.now)[:2], (0, 0))
+        service_request = ServiceRequest.objects.get()
+        self.assertEqual(ServiceRequestLog.objects.filter(service_request=service_request).count(), 1)
+        self.schedule.refresh_from_db()
+        self.assertEqual(self.schedule.last_run_at, self.now - timedelta(hours=1))
+        self.assertEqual(self.schedule.next_run_at, self.now + timedelta(hours=23))
+        self.assertEqual(inbox.reconcile(dry_run=True), {})
+
+    def test_overlapping_run_skips_the_claimed_occurrence(self):
+        maintenance.generate(now=self.now)
+        # a run that read the schedule before the first one moved it on
+        MaintenanceSchedule.objects.filter(pk=self.schedule.pk).update(
+            last_run_at=None, next_run_at=self.schedule.next_run_at
+        )
+        self.assertEqual(maintenance.generate(now=self.now)[:2], (1, 0))
+        self.assertEqual(ServiceRequest.objects.count(), 1)
+        self.assertEqual(MaintenanceOccurrence.objects.get().service_request, ServiceRequest.objects.get())
+
+
+# --- inbox counters ------------------------------------------------------------
+
+class InboxCounterTests(TestCase):
+    def setUp(self):
+        self.manager = User.objects.create_user('manager', password='x')
+        self.technician = User.objects.create_user('technician', password='x')
+        self.section = Section.objects.create(name='القسم')
+        self.provider = ServiceProvider.objects.create(name='الصيانة')
+
+    def assertCounted(self):
+        """The counters match a count from scratch, and the provider's 'all' matches count()."""
+        self.assertEqual(inbox.reconcile(dry_run=True), {})
+        counter = InboxCounter.objects.filter(
+            scope=InboxCounter.PROVIDER, owner_id=self.provider.id, assignee_id=0, bucket=inbox.ALL
+        ).first()
+        expected = ServiceRequest.objects.filter(service_provider=self.provider).count()
+        self.assertEqual(counter.count if counter else 0, expected)
+
+    def test_counters_follow_the_requests(self):
+        service_request = ServiceRequest.objects.create(
+            title='طلب', description='وصف', section=self.section, service_provider=self.provider,
+            created_by=self.manager, updated_by=self.manager,
+        )
+        self.assertCounted()
+
+        service_request.status = 'in_progress'
+        service_request.assigned_to = self.technician
+        service_request.save()
+        self.assertCounted()
+
+        report = Report.objects.create(title='تقرير', service_request=service_request, created_by=self.manager)
+        order = PurchaseOrder.objects.create(
+            report=report, refrence_number='1', status='supplied', created_by=self.manager
+        )
+        self.assertCounted()
+        order.status = 'used'
+        order.save()
+        self.assertCounted()
+        order.status = 'supplied'
+        order.save()
+        report.delete()
+        self.assertCounted()
+
+        PurchaseOrder.objects.create(
+            report=Report.objects.create(title='تقرير', service_request=service_request, created_by=self.manager),
+            refrence_number='2', status='supplied', created_by=self.manager,
+        )
+        service_request.delete()
+        self.assertCounted()
+
+
+# --- task queue ----------------------------------------------------------------
+
+@taskqueue.task(name='app1.tests.flaky', max_attempts=2)
+def flaky(fail):
+    if fail:
+        raise ValueError('gateway down')
+    return 'sent'
+
+
+class TaskQueueTests(TestCase):
+    def test_claimed_task_is_leased_to_one_worker(self):
+        flaky.delay(False)
+        [claimed] = taskqueue.claim('worker-a')
+        self.assertEqual((claimed.status, claimed.attempts, claimed.locked_by), (Task.RUNNING, 1, 'worker-a'))
+        self.assertEqual(taskqueue.claim('worker-b'), [])
+        self.assertTrue(taskqueue.run(claimed, 'worker-a'))
+        self.assertFalse(Task.objects.exists())
+        self.assertEqual(TaskResult.objects.get().result, 'sent')
+
+    def test_expired_lease_passes_to_another_worker(self):
+        from django.utils import timezone
+
+        flaky.delay(False)
+        [lost] = taskqueue.claim('worker-a')
+        Task.objects.update(locked_until=timezone.now() - timedelta(seconds=1))
+        [claimed] = taskqueue.claim('worker-b')
+        self.assertEqual(claimed.attempts, 2)
+        # the worker that overran its lease records nothing
+        taskqueue.run(lost, 'worker-a')
+        self.assertFalse(TaskResult.objects.exists())
+        taskqueue.run(claimed, 'worker-b')
+        self.assertEqual(TaskResult.objects.get().worker, 'worker-b')
+
+    def test_failed_task_backs_off_then_gives_up(self):
+        from django.utils import timezone
+
+        flaky.delay(True)
+        [claimed] = taskqueue.claim('worker-a')
+        before = timezone.now()
+        self.assertFalse(taskqueue.run(claimed, 'worker-a'))
+        task = Task.objects.get()
+        self.assertEqual((task.status, task.attempts, task.locked_by), (Task.PENDING, 1, ''))
+        self.assertIn('gateway down', task.last_error)
+        self.assertGreaterEqual(task.run_at, before + timedelta(seconds=taskqueue.RETRY_DELAY))
+        self.assertEqual(taskqueue.claim('worker-a'), [])
+
+        Task.objects.update(run_at=timezone.now())
+        [claimed] = taskqueue.claim('worker-a')
+        self.assertFalse(taskqueue.run(claimed, 'worker-a'))
+        # the second attempt was the last one
+        self.assertFalse(Task.objects.exists())
+        result = TaskResult.objects.get()
+        self.assertEqual((result.status, result.attempts), (TaskResult.FAILURE, 2))
+
+
+# --- duplicate requests --------------------------------------------------------
+
+class DedupTests(TestCase):
+    texts = ['', 'مكيف', 'المكيّف لا يعمل!!', 'إصلاح الـمكيف في الغرفة ١٢', 'Lights OUT, room 12', 'ﻻ ضوء']
+
+    def setUp(self):
+        self.user = User.objects.create_user('technician', password='x')
+        self.section = Section.objects.create(name='القسم')
+        self.provider = ServiceProvider.objects.create(name='الصيانة')
+
+    def create_request(self, title='المكيف لا يعمل', description='غرفة ١٢'):
+        return ServiceRequest.objects.create(
+            title=title, description=description, section=self.section, service_provider=self.provider,
+            created_by=self.user, updated_by=self.user,
+        )
+
+    def test_normalize_text_folds_spelling(self):
+        self.assertEqual(dedup.normalize_text('  المكيّـف، لا يعمل!! '), 'المكيف لا يعمل')
+        self.assertEqual(dedup.normalize_text('أإآٱ ى ة ١٢٣ ۴'), 'اااا ي ه 123 4')
+        self.assertEqual(dedup.normalize_text('ﻻ'), 'لا')
+        self.assertEqual(dedup.normalize_text('Room\tTWELVE'), 'room twelve')
+        self.assertEqual(dedup.normalize_text(None), '')
+
+    def test_similarity(self):
+        signature = dedup.request_signature('المكيف لا يعمل', 'في غرفة الاجتماعات الكبيرة')
+        self.assertEqual(dedup.similarity(signature, signature), 1.0)
+        close = dedup.request_signature('المكيّف لا يعمل!', 'في غرفة الاجتماعات الكبيرة')
+        self.assertEqual(dedup.similarity(signature, close), 1.0)
+        reworded = dedup.request_signature('المكيف لا يعمل', 'في غرفة الاجتماعات الصغيرة')
+        self.assertGreater(dedup.similarity(signature, reworded), 0.6)
+        other = dedup.request_signature('تسرب مياه', 'في دورة المياه بالطابق الثاني')
+        self.assertLess(dedup.similarity(signature, other), 0.2)
+        self.assertEqual(dedup.similarity(signature, b''), 0.0)
+
+    def test_exact_duplicate_within_the_window(self):
+        from django.utils import timezone
+
+        service_request = self.create_request()
+        content_hash = dedup.request_content_hash(
+            'المكيّف لا يعمل', 'غرفة 12', self.section.id, self.provider.id, self.user.id
+        )
+        self.assertEqual(dedup.find_duplicate(content_hash), service_request)
+        window = dedup.duplicate_window()
+        ServiceRequest.objects.update(created_at=timezone.now() - window + timedelta(hours=1))
+        self.assertEqual(dedup.find_duplicate(content_hash), service_request)
+        ServiceRequest.objects.update(created_at=timezone.now() - window - timedelta(hours=1))
+        self.assertIsNone(dedup.find_duplicate(content_hash))
+
+    def test_fingerprints_follow_content_changes_only(self):
+        service_request = self.create_request()
+        with mock.patch('app1.dedup.request_signature', wraps=dedup.request_signature) as signature:
+            service_request.status = 'in_progress'
+            service_request.save()
+            ServiceRequest.objects.get(pk=service_request.pk).save()
+            self.assertEqual(signature.call_count, 0)
+            service_request.title = 'تسرب مياه'
+            service_request.save()
+            self.assertEqual(signature.call_count, 1)
+        service_request.refresh_from_db()
+        self.assertEqual(service_request.content_hash, dedup.request_content_hash(
+            'تسرب مياه', 'غرفة ١٢', self.section.id, self.provider.id, self.user.id
+        ))
+
+    def test_migration_copy_matches(self):
+        migration = importlib.import_module('app1.migrations.0006_servicerequest_dedup')
+        for title in self.texts:
+            for description in self.texts:
+                self.assertEqual(
+                    migration.request_signature(title, description), dedup.request_signature(title, description)
+                )
+                self.assertEqual(
+                    migration.request_content_hash(title, description, 1, 2, 3),
+                    dedup.request_content_hash(title, description, 1, 2, 3),
+                )
+
+
+# --- structured request log ----------------------------------------------------
+
+class LegacyLogMigrationTests(TestCase):
+    migration = importlib.import_module('app1.migrations.0007_structured_request_log')
+    # the two sentences whose wording render_log takes from the status choices now
+    relabelled = {
+        'تم تعديل حالة طلب الشراء الى قيد الاعتماد': 'تم تعديل حالة طلب الشراء الى جاهز للشراء',
+        'تم تعديل حالة طلب مخزني الى تم الاستخدام': 'تم تعديل حالة طلب مخزني الى تم الاستلام والاستخدام',
+    }
+
+    def legacy_comments(self):
+        comments = list(self.migration.LEGACY_COMMENTS)
+        # the purchase order views stored this one with a trailing space
+        comments.append('تم إنشاء طلب شراء ')
+        comments += [prefix + 'technician' for prefix, _, _ in self.migration.LEGACY_PREFIXES]
+        comments += ['تم اعادة حالة الطلب الى قيد العمل: القطعة لم تركب', 'ملاحظة حرة', '']
+        return comments
+
+    def run_migration(self, function, logs):
+        rows = mock.Mock()
+        rows.using.return_value = rows
+        rows.only.return_value = rows
+        rows.iterator.return_value = logs
+        users = mock.Mock()
+        users.using.return_value.values_list.return_value = [('technician', 7)]
+        models = {'ServiceRequestLog': mock.Mock(objects=rows), 'User': mock.Mock(objects=users)}
+        apps = mock.Mock(get_model=lambda app_label, name: models[name])
+        function(apps, mock.Mock(connection=connections[DEFAULT_DB_ALIAS]))
+
+    def test_every_legacy_comment_renders_the_same(self):
+        from .audit import render_log
+
+        for comment in self.legacy_comments():
+            with self.subTest(comment=comment):
+                event, old_status, new_status, note = self.migration.parse_comment(comment)
+                log = ServiceRequestLog(event=event, old_status=old_status, new_status=new_status, note=note)
+                self.assertEqual(render_log(log), self.relabelled.get(comment, comment.strip()))
+
+    def test_backfill_and_reverse(self):
+        comments = self.legacy_comments()
+        logs = [ServiceRequestLog() for _ in comments]
+        for log, comment in zip(logs, comments):
+            log.comment = comment
+        self.run_migration(self.migration.backfill_events, logs)
+        assigned = [log for log in logs if log.event in (LogEvent.ASSIGNED, LogEvent.AUTO_ASSIGNED)]
+        self.assertEqual(len(assigned), 2)
+        for log in assigned:
+            self.assertEqual((log.note, log.target_type, log.target_id), ('technician', 1, 7))
+        for log in logs:
+            log.comment = None
+        self.run_migration(self.migration.restore_comments, logs)
+        # both approval sentences stored the same status, the reverse writes the one the view still uses
+        approval = 'تم تعديل حالة طلب الشراء الى قيد الاعتماد'
+        for log, comment in zip(logs, comments):
+            with self.subTest(comment=comment):
+                expected = self.relabelled[approval] if comment == approval else comment.strip()
+                self.assertEqual(log.comment, expected)
+
+
+# --- archive -------------------------------------------------------------------
+
+class ArchiveTests(TestCase):
+    databases = {'default', ARCHIVE_DB}
+
+    def setUp(self):
+        self.user = User.objects.create_user('manager', password='x')
+        self.service_request = ServiceRequest.objects.create(
+            title='طلب', description='وصف', section=Section.objects.create(name='القسم'),
+            service_provider=ServiceProvider.objects.create(name='الصيانة'), status='completed',
+            created_by=self.user, updated_by=self.user,
+        )
+        report = Report.objects.create(title='تقرير', service_request=self.service_request, created_by=self.user)
+        PurchaseOrder.objects.create(report=report, refrence_number='1', status='used', created_by=self.user)
+        InventoryOrder.objects.create(report=report, refrence_number='2', created_by=self.user)
+        CompletionReport.objects.create(
+            title='إنجاز', description='وصف', service_request=self.service_request, created_by=self.user
+        )
+        Attachment.objects.create(
+            service_request=self.service_request, kind=Attachment.AFTER, name='صورة.jpg', uploaded_by=self.user,
+            blob=Blob.objects.create(sha256='a' * 64, size=1, content_type='image/jpeg'),
+        )
+        log_event(self.service_request, LogEvent.CREATED, self.user)
+        log_event(self.service_request, LogEvent.REPORT_CREATED, self.user, target=report)
+        self.service_request.refresh_from_db()
+
+    def assertArchived(self):
+        pk = self.service_request.pk
+        self.assertFalse(ServiceRequest.objects.filter(pk=pk).exists())
+        self.assertFalse(Report.objects.filter(service_request=pk).exists())
+        self.assertFalse(Attachment.objects.filter(service_request=pk).exists())
+        archived = get_service_request(pk)
+        self.assertTrue(is_archived(archived))
+        return archived
+
+    def test_archived_request_reads_back(self):
+        events = [log.event for log in request_logs(self.service_request)]
+        self.assertEqual(archive_requests([self.service_request.pk]), 1)
+        archived = self.assertArchived()
+        self.assertEqual(archived.created_at, self.service_request.created_at)
+        self.assertEqual(archived.updated_at, self.service_request.updated_at)
+        self.assertEqual(archived.log_count, 2)
+        # related rows are read from the archive next to the request
+        report = archived.reports.get()
+        self.assertEqual(report.purchase_order.status, 'used')
+        self.assertEqual(report.inventory_order.refrence_number, '2')
+        self.assertEqual(archived.completionreport_set.count(), 1)
+        self.assertEqual(archived.attachments.get().blob.sha256, 'a' * 64)
+        self.assertEqual([log.event for log in request_logs(archived)], events)
+
+    def test_rerun_after_failed_delete(self):
+        with mock.patch('django.db.models.query.QuerySet.delete', side_effect=DatabaseError('disk I/O error')):
+            with self.assertRaises(DatabaseError):
+                archive_requests([self.service_request.pk])
+        # the copies are left in the archive, the request is still read from the hot tables
+        self.assertTrue(ServiceRequest.objects.using(ARCHIVE_DB).filter(pk=self.service_request.pk).exists())
+        self.assertFalse(is_archived(get_service_request(self.service_request.pk)))
+
+        self.service_request.title = 'طلب معدل'
+        self.service_request.save()
+        log_event(self.service_request, LogEvent.NOTE, self.user, note='ملاحظة')
+        self.assertEqual(archive_requests([self.service_request.pk]), 1)
+        archived = self.assertArchived()
+        self.assertEqual(archived.title, 'طلب معدل')
+        self.assertEqual(len(request_logs(archived)), 3)
+        self.assertEqual(archive_requests([self.service_request.pk]), 0)
+
+
+# --- read replica --------------------------------------------------------------
+
+@replica_reads
+def replica_view(request):
+    # the profile lookups of refcache always go to the primary, a replica query would fail here
+    refcache.user_section_ids(request.user_id)
+    return HttpResponse(ServiceRequest.objects.all().db)
+
+
+def writing_view(request):
+    Section.objects.create(name='قسم جديد')
+    return HttpResponse(ServiceRequest.objects.all().db)
+
+
+@override_settings(
+    CACHES={'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache', 'LOCATION': 'replica-tests'}},
+)
+class ReplicaRoutingTests(TestCase):
+    def setUp(self):
+        from django.core.cache import cache
+        cache.clear()
+        refcache.clear_local()
+        self.user = User.objects.create_user('manager', password='x')
+        self.session = {}
+        enabled = mock.patch('app1.replica.replica_enabled', return_value=True)
+        enabled.start()
+        self.addCleanup(enabled.stop)
+
+    def get(self, view):
+        """The database the view read ServiceRequest from, run through ReplicaMiddleware."""
+        request = RequestFactory().get('/')
+        request.session = self.session
+        request.user_id = self.user.id
+        middleware = ReplicaMiddleware(lambda request: middleware.process_view(request, view, (), {}) or view(request))
+        return middleware(request).content.decode()
+
+    def test_replica_view_reads_from_the_replica(self):
+        self.assertEqual(self.get(replica_view), REPLICA_DB)
+        self.assertEqual(self.get(writing_view), DEFAULT_DB_ALIAS)
+        # nothing leaks into the next request of the thread
+        self.assertEqual(ServiceRequest.objects.all().db, DEFAULT_DB_ALIAS)
+
+    def test_write_pins_the_session_to_the_primary(self):
+        clock = mock.Mock(wraps=time)
+        clock.time.return_value = 1000.0
+        with mock.patch('app1.replica.time', clock):
+            self.get(writing_view)
+            self.assertEqual(self.session[PIN_SESSION_KEY], 1000.0 + PIN_SECONDS)
+            clock.time.return_value = 1000.0 + PIN_SECONDS - 1
+            self.assertEqual(self.get(replica_view), DEFAULT_DB_ALIAS)
+            clock.time.return_value = 1000.0 + PIN_SECONDS + 1
+            self.assertEqual(self.get(replica_view), REPLICA_DB)
+        self.assertTrue(Section.objects.filter(name='قسم جديد').exists())
+
+    def test_router_follows_the_instance(self):
+        router = ReplicaRouter()
+        archived = ServiceRequest()
+        archived._state.db = ARCHIVE_DB
+        self.assertEqual(router.db_for_read(Report, instance=archived), ARCHIVE_DB)
+        copy = ServiceRequest()
+        copy._state.db = REPLICA_DB
+        # rows read from the replica are saved to the primary
+        self.assertEqual(router.db_for_write(ServiceRequest, instance=copy), DEFAULT_DB_ALIAS)
+        self.assertFalse(router.allow_migrate(REPLICA_DB, 'app1'))
+
+
+# --- compression ---------------------------------------------------------------
+
+@override_settings(
+    STORAGES={
+        'default': {'BACKEND': 'django.core.files.storage.FileSystemStorage'},
+        'staticfiles': {'BACKEND': 'django.contrib.staticfiles.storage.StaticFilesStorage'},
+    },
+    CACHES={'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache', 'LOCATION': 'compression-tests'}},
+)
+class CompressionTests(TestCase):
+    raw_blocks = [
+        '<pre class="log">  سطر   أول\n\n\tسطر  ثان\n</pre>',
+        '<textarea name="note">\n  ملاحظة   مع  مسافات\n\n</textarea>',
+        '<script>\n  var text = "a   b <!-- c -->";\n\n  if (a  <  b) {}\n</script>',
+        '<STYLE media="print">\n  .title   { margin: 0  4px; }\n</STYLE >',
+    ]
+
+    def setUp(self):
+        from django.core.cache import cache
+        cache.clear()
+        refcache.clear_local()
+        self.user = User.objects.create_user('manager', password='x', is_staff=True)
+        self.section = Section.objects.create(name='القسم')
+        self.provider = ServiceProvider.objects.create(name='الصيانة')
+        self.provider.manager.add(self.user)
+        self.service_request = ServiceRequest.objects.create(
+            title='المكيف لا يعمل', description='وصف ' * 400, section=self.section, service_provider=self.provider,
+            created_by=self.user, updated_by=self.user,
+        )
+        self.client.force_login(self.user)
+
+    def test_minify_keeps_raw_blocks(self):
+        from .compression import HtmlMinifyMiddleware, minify_html
+
+        blocks = '\n    '.join(self.raw_blocks)
+        html = f'<div>\n    <!-- تعليق -->\n    <p>نص   عربي  and   Latin</p>\n\n    {blocks}\n</div>'
+        minified = minify_html(html)
+        self.assertNotIn('تعليق', minified)
+        self.assertIn('<p>نص عربي and Latin</p>', minified)
+        for block in self.raw_blocks:
+            self.assertIn(block, minified)
+
+        middleware = HtmlMinifyMiddleware(lambda request: HttpResponse(html))
+        content = middleware(RequestFactory().get('/')).content
+        for block in self.raw_blocks:
+            self.assertIn(block.encode(), content)
+
+    def test_page_reflecting_input_next_to_csrf_token_is_not_compressed(self):
+        url = reverse('request_detail', args=[self.service_request.id])
+        response = self.client.get(url, HTTP_ACCEPT_ENCODING='gzip')
+        self.assertEqual(response['Content-Encoding'], 'gzip')
+        self.assertIn(b'csrfmiddlewaretoken', gzip.decompress(response.content))
+
+        for query in ({'q': 'secret guess'}, {'filter': '<b>'}, {'page': 'x' * 41}):
+            with self.subTest(query=query):
+                response = self.client.get(url, query, HTTP_ACCEPT_ENCODING='gzip')
+                self.assertFalse(response.has_header('Content-Encoding'))
+                self.assertIn(b'csrfmiddlewaretoken', response.content)
+                self.assertIn('Accept-Encoding', response['Vary'])
+
+
+# --- notification digests ------------------------------------------------------
+
+@override_settings(
+    CACHES={'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache', 'LOCATION': 'digest-tests'}},
+)
+class NotificationDigestTests(TestCase):
+    phone = '967700000001'
+
+    def setUp(self):
+        from django.core.cache import cache
+        cache.clear()
+        refcache.clear_local()
+        user = User.objects.create_user('manager', password='x')
+        UserProfile.objects.create(user=user, phone=self.phone, notification_mode='digest')
+        send_message = mock.patch('app1.notifications.send_message')
+        self.send_message = send_message.start()
+        self.addCleanup(send_message.stop)
+
+    def digests_scheduled(self):
+        return Task.objects.filter(name='app1.tasks.send_digest', args=[self.phone]).count()
+
+    def test_one_digest_per_window(self):
+        notifications.notify(self.phone, 'رسالة', '- طلب 1')
+        notifications.notify(self.phone, 'رسالة', '- طلب 1')
+        self.send_message.assert_not_called()
+        self.assertEqual(self.digests_scheduled(), 1)
+        # the worker runs from cron, possibly long after the window
+        later = time.time() + notifications.DIGEST_MINUTES * 60 * 4
+        with mock.patch('time.time', return_value=later):
+            notifications.notify(self.phone, 'رسالة', '- طلب 2')
+        self.assertEqual(self.digests_scheduled(), 1)
+
+        with mock.patch('app1.notifications.post_message') as post_message:
+            self.assertEqual(notifications.send_digest(self.phone), 3)
+        [(number, message)] = [call.args for call in post_message.call_args_list]
+        self.assertEqual(number, self.phone)
+        self.assertEqual(message.splitlines()[2:], ['- طلب 1', '- طلب 2'])
+        self.assertFalse(PendingNotification.objects.exists())
+        # the next event starts a new window
+        notifications.notify(self.phone, 'رسالة', '- طلب 3')
+        self.assertEqual(self.digests_scheduled(), 2)
+
+    def test_events_during_the_send_start_the_next_window(self):
+        notifications.notify(self.phone, 'رسالة', '- طلب 1')
+
+        def arrives_meanwhile(number, message):
+            notifications.notify(self.phone, 'رسالة', '- طلب 2')
+
+        with mock.patch('app1.notifications.post_message', side_effect=arrives_meanwhile):
+            self.assertEqual(notifications.send_digest(self.phone), 1)
+        self.assertEqual(PendingNotification.objects.get().summary, '- طلب 2')
+        self.assertEqual(self.digests_scheduled(), 2)
+        # nothing arrived during this one, no further digest is scheduled
+        with mock.patch('app1.notifications.post_message'):
+            self.assertEqual(notifications.send_digest(self.phone), 1)
+        self.assertEqual(self.digests_scheduled(), 2)
+
+    def test_stats(self):
+        notifications.notify('967700000002', 'رسالة فورية', '- طلب')
+        self.send_message.assert_called_once_with('967700000002', 'رسالة فورية')
+        for i in range(3):
+            notifications.notify(self.phone, 'رسالة', f'- طلب {i}')
+        with mock.patch('app1.notifications.post_message'):
+            notifications.send_digest(self.phone)
+        stats = notifications.stats()
+        self.assertEqual(
+            {key: stats[key] for key in ('immediate', 'buffered', 'digests', 'saved', 'pending')},
+            {'immediate': 1, 'buffered': 3, 'digests': 1, 'saved': 2, 'pending': 0},
+        )
+        self.assertEqual(stats['days'][-1]['saved'], 2)
+
+
+# --- escalation ----------------------------------------------------------------
+
+@override_settings(
+    CACHES={'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache', 'LOCATION': 'escalation-tests'}},
+)
+class EscalationTests(TestCase):
+    phone = '967700000001'
+
+    def setUp(self):
+        from django.core.cache import cache
+        cache.clear()
+        refcache.clear_local()
+        manager = User.objects.create_user('manager', password='x')
+        self.profile = UserProfile.objects.create(user=manager, phone=self.phone)
+        provider = ServiceProvider.objects.create(name='الصيانة')
+        provider.manager.add(manager)
+        for hours in (2, 5):
+            EscalationRule.objects.create(status='pending', after_hours=hours, notify=EscalationRule.PROVIDER)
+        self.service_request = ServiceRequest.objects.create(
+            title='طلب', description='وصف', section=Section.objects.create(name='القسم'), service_provider=provider,
+            created_by=manager, updated_by=manager,
+        )
+
+    def reminders(self):
+        return Task.objects.filter(name='app1.tasks.send_whatsapp', args__0=self.phone).count()
+
+    def hours(self, hours):
+        return self.service_request.status_changed_at + timedelta(hours=hours)
+
+    def test_each_threshold_fires_once_per_status_stint(self):
+        self.assertEqual(self.service_request.next_escalation_at, self.hours(2))
+        self.assertEqual(escalation.tick(now=self.hours(3)), (1, 1, 1))
+        self.assertEqual(escalation.tick(now=self.hours(3)), (0, 0, 0))
+        self.service_request.refresh_from_db()
+        self.assertEqual(self.service_request.next_escalation_at, self.hours(5))
+        self.assertEqual(escalation.tick(now=self.hours(6)), (1, 1, 1))
+        self.assertEqual(escalation.tick(now=self.hours(7)), (0, 0, 0))
+        self.assertEqual(Escalation.objects.count(), 2)
+        self.assertEqual(self.reminders(), 2)
+        self.service_request.refresh_from_db()
+        self.assertIsNone(self.service_request.next_escalation_at)
+
+    def test_status_change_reschedules(self):
+        escalation.tick(now=self.hours(3))
+        self.service_request.status = 'in_progress'
+        self.service_request.save()
+        self.assertIsNone(self.service_request.next_escalation_at)
+        self.service_request.status = 'pending'
+        self.service_request.save()
+        self.service_request.refresh_from_db()
+        # a new stint in the status, the thresholds count from its start again
+        self.assertEqual(self.service_request.next_escalation_at, self.hours(2))
+        self.assertEqual(escalation.tick(now=self.hours(3)), (1, 1, 1))
+        self.assertEqual(Escalation.objects.count(), 2)
+
+    def test_reminders_follow_the_digest_preference(self):
+        self.profile.notification_mode = 'digest'
+        self.profile.save()
+        escalation.tick(now=self.hours(6))
+        self.assertEqual(self.reminders(), 0)
+        [pending] = PendingNotification.objects.filter(phone=self.phone)
+        self.assertIn(f'/request_detail/{self.service_request.id}', pending.summary)
+
+
+# --- request summary -----------------------------------------------------------
+
+class RequestSummaryTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user('manager', password='x')
+        self.service_request = ServiceRequest.objects.create(
+            title='طلب', description='وصف', section=Section.objects.create(name='القسم'),
+            service_provider=ServiceProvider.objects.create(name='الصيانة'), created_by=self.user, updated_by=self.user,
+        )
+
+    def assertSummary(self, **expected):
+        """The summary columns match a recount, and the given ones their expected values."""
+        self.assertEqual(summary.reconcile(dry_run=True), [])
+        row = ServiceRequest.objects.values(*expected).get(pk=self.service_request.pk)
+        self.assertEqual(row, expected)
+
+    def add_report(self, order_status=None, inventory_status=None):
+        report = Report.objects.create(title='تقرير', service_request=self.service_request, created_by=self.user)
+        if order_status:
+            PurchaseOrder.objects.create(report=report, refrence_number='1', status=order_status, created_by=self.user)
+        if inventory_status:
+            InventoryOrder.objects.create(
+                report=report, refrence_number='1', status=inventory_status, created_by=self.user
+            )
+        return report
+
+    def test_summary_follows_the_request(self):
+        self.assertSummary(report_count=0, purchase_order_status='', inventory_order_status='', log_count=0)
+
+        used = self.add_report('used', 'used')
+        self.assertSummary(report_count=1, purchase_order_status='used', inventory_order_status='used')
+        approved = self.add_report('approved', 'pending')
+        self.assertSummary(report_count=2, purchase_order_status='approved', inventory_order_status='pending')
+        supplied = self.add_report('supplied')
+        self.assertSummary(report_count=3, purchase_order_status='supplied', inventory_order_status='pending')
+
+        supplied.purchase_order.status = 'used'
+        supplied.purchase_order.save()
+        self.assertSummary(purchase_order_status='approved')
+        approved.inventory_order.status = 'used'
+        approved.inventory_order.save()
+        self.assertSummary(inventory_order_status='used')
+        approved.purchase_order.delete()
+        self.assertSummary(report_count=3, purchase_order_status='used')
+        used.delete()
+        self.assertSummary(report_count=2, purchase_order_status='used', inventory_order_status='used')
+        approved.delete()
+        self.assertSummary(report_count=1, inventory_order_status='')
+
+        completion_report = CompletionReport.objects.create(
+            title='إنجاز', description='وصف', service_request=self.service_request, created_by=self.user
+        )
+        self.assertSummary(has_completion_report=True)
+        completion_report.delete()
+        self.assertSummary(has_completion_report=False)
+
+        log_event(self.service_request, LogEvent.NOTE, self.user, note='ملاحظة')
+        log = log_event(self.service_request, LogEvent.NOTE, self.user, note='ملاحظة أخرى')
+        self.assertSummary(log_count=2, last_activity_at=log.created_at)
+
+        # a stale instance saved again does not write its old summary back
+        self.service_request.title = 'طلب معدل'
+        self.service_request.save()
+        self.assertSummary(report_count=1, log_count=2)
+
+
+# --- technician load -----------------------------------------------------------
+
+class TechnicianLoadTests(TestCase):
+    def setUp(self):
+        self.manager = User.objects.create_user('manager', password='x')
+        self.first = User.objects.create_user('first', password='x')
+        self.second = User.objects.create_user('second', password='x')
+        self.section = Section.objects.create(name='القسم')
+        self.provider = ServiceProvider.objects.create(name='الصيانة')
+        self.provider.manager.add(self.first, self.second)
+
+    def create_request(self, assignee=None):
+        return ServiceRequest.objects.create(
+            title='طلب', description='وصف', section=self.section, service_provider=self.provider,
+            created_by=self.manager, updated_by=self.manager, assigned_to=assignee,
+        )
+
+    def assign(self, service_request, user):
+        service_request.assigned_to = user
+        service_request.save()
+        log_event(service_request, LogEvent.ASSIGNED, self.manager, target=user, note=user.username)
+
+    def complete(self, service_request):
+        service_request.status = 'completed'
+        service_request.save()
+
+    def loads(self):
+        return {
+            load.user_id: (load.open_count, load.completed_count, round(load.turnaround_seconds / 60))
+            for load in TechnicianLoad.objects.all()
+        }
+
+    def test_counters_match_a_rebuild(self):
+        from django.utils import timezone
+
+        kept = self.create_request(self.first)
+        moved = self.create_request(self.first)
+        self.create_request(self.second)
+        self.assign(moved, self.second)
+        done = self.create_request()
+        self.assign(done, self.first)
+        # created a day before it was assigned, two hours ago
+        ServiceRequest.objects.filter(pk=done.pk).update(created_at=timezone.now() - timedelta(days=1))
+        ServiceRequestLog.objects.filter(service_request=done).update(created_at=timezone.now() - timedelta(hours=2))
+        self.complete(done)
+        kept.delete()
+
+        live = self.loads()
+        self.assertEqual(live, {self.first.id: (0, 1, 120), self.second.id: (2, 0, 0)})
+        assignment.rebuild_loads()
+        self.assertEqual(self.loads(), live)
+
+    def test_updates_that_bypass_the_counters_are_refused(self):
+        self.create_request(self.first)
+        with self.assertRaises(TypeError):
+            ServiceRequest.objects.update(status='completed')
+        with self.assertRaises(TypeError):
+            ServiceRequest.objects.update(assigned_to=self.second)
+        self.assertEqual(self.loads(), {self.first.id: (1, 0, 0)})
+
+    def test_scores(self):
+        busy = [self.create_request(self.first) for _ in range(2)]
+        service_request = self.create_request()
+        scores = assignment.score_candidates(service_request, [self.first.id, self.second.id])
+        # two open requests, less the affinity of having done all the recent work of this section
+        self.assertAlmostEqual(scores[self.first.id], 2 * 10.0 - 5.0)
+        self.assertEqual(scores[self.second.id], 0)
+        self.assertEqual(assignment.pick_assignee(service_request), self.second)
+
+        for busy_request in busy:
+            self.complete(busy_request)
+        TechnicianLoad.objects.filter(user=self.first).update(turnaround_seconds=2 * 10 * 3600)
+        # no open work left, ten hours on average
+        scores = assignment.score_candidates(service_request, [self.first.id, self.second.id])
+        self.assertAlmostEqual(scores[self.first.id], -5.0 + 0.1 * 10)
+        self.assertEqual(assignment.pick_assignee(service_request), self.first)
@@ -2,13 +2,20 @@
 
 
 from django.urls import path
-from . import views
+from . import api, views
 
 
 urlpatterns = [
     path('', views.home, name='home'),
     path('my_request/', views.my_request, name='my_request'),
     path('requests_to_me/', views.requests_to_me, name='requests_to_me'),
+    path('requests_board/', views.requests_board, name='requests_board'),
+    path('api/board/', views.requests_board_api, name='requests_board_api'),
+    path('api/board/<int:id>/move/', views.board_move, name='board_move'),
+    # photo attachments, see app1/attachments.py
+    path('attachments/uploads/', views.start_attachment_upload, name='start_attachment_upload'),
+    path('attachments/uploads/<uuid:upload_id>/', views.attachment_upload, name='attachment_upload'),
+    path('attachments/<int:id>/', views.attachment_file, name='attachment_file'),
     path('request_detail/<int:id>/', views.request_detail, name='request_detail'),
     path('create_report/<int:id>/', views.create_report, name='create_report'),
     path('create_completion_report/<int:id>/', views.create_completion_report, name='create_completion_report'),
@@ -29,11 +36,30 @@ urlpatterns = [
     path('request_detail_sm/<int:id>/', views.request_detail_sm, name='request_detail_sm'),
     path('mark_as_completed/<int:id>/', views.mark_as_complete, name='mark_as_completed'),
     path('create_service_request/', views.create_service_request, name='create_service_request'),
+    path('add_comment/<int:id>/', views.add_comment, name='add_comment'),
     path('purchase_orders/', views.purchase_order_list, name='purchase_order_list'),
     path('api/purchase-orders/', views.purchase_order_list_api, name='purchase_orders_api'),
     path('api/update-order-status/', views.update_order_status, name='update_order_status'),
     path('print_request/<int:id>/', views.print_request, name='print_request'),
     path('assign_to_user/<int:id>/', views.assign_to_user, name='assign_to_user'),
+    path('api/assign-to-user/<int:id>/users/', views.assign_to_user_search, name='assign_to_user_search'),
+    path('api/reference-cache/stats/', views.reference_cache_stats, name='reference_cache_stats'),
+    path('api/notifications/stats/', views.notification_stats, name='notification_stats'),
+    path('api/gateway/stats/', views.gateway_stats, name='gateway_stats'),
+    # offline mobile pages, see app1/offline.py
+    path('api/sync/', views.sync_writes, name='sync_writes'),
+    path('sw.js', views.service_worker, name='service_worker'),
+    path('manifest.webmanifest', views.web_manifest, name='web_manifest'),
+    path('offline/', views.offline_page, name='offline'),
+    # versioned JSON API, see app1/api.py
+    path('api/v1/requests/', api.request_list, name='api_request_list'),
+    path('api/v1/requests/batch/', api.request_batch, name='api_request_batch'),
+    path('api/v1/requests/<int:id>/', api.request_detail, name='api_request_detail'),
+    path('api/v1/reports/', api.report_list, name='api_report_list'),
+    path('api/v1/completion-reports/', api.completion_report_list, name='api_completion_report_list'),
+    path('api/v1/purchase-orders/', api.purchase_order_list, name='api_purchase_order_list'),
+    path('api/v1/inventory-orders/', api.inventory_order_list, name='api_inventory_order_list'),
+    path('api/v1/logs/', api.log_list, name='api_log_list'),
 
 
 
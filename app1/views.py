@@ -2,45 +2,40 @@ from django.shortcuts import redirect, render
 
 from app1.forms import CompletionReportForm, InventoryOrderForm, PurchaseOrderForm, ServiceRequestLogForm
 from .models import *
+from .archive import get_service_request, is_archived
+from .assignment import auto_assign
+from .audit import log_event, request_logs
+from .dedup import find_duplicate, find_near_duplicates, request_content_hash, request_signature
+from .inbox import bucket_counts, counter_totals
+from .refcache import all_service_providers, provider_manager_phones, user_provider_ids, user_section_ids, user_sections
+from . import api, attachments, board, gateway, notifications, refcache, tasks
+from .notifications import notify, summary_line
+from .offline import (
+    CACHED_PAGES, SHELL_CDN, SHELL_STATIC, SYNC_BATCH_SIZE, SyncError, parse_client_id, record, replayed,
+    resolve_request_id,
+)
+from .projections import purchase_order_rows, request_rows
+from .replica import replica_reads
 from django.contrib import messages
+from django.contrib.admin.views.decorators import staff_member_required
 
 
-from django.db.models import Count
+from django.db.models import Count, Q
+from django.http import HttpResponse, JsonResponse
+from django.templatetags.static import static
+from django.urls import reverse
+from django.views.decorators.http import require_http_methods, require_POST, require_safe
 
+import hashlib
 import json
+import logging
+import os
 from django.db.models import Count
-import requests
-
-
-import threading
-import requests
-
-def send_message(number, message):
-    def send():
-        data = {
-            "User": "Altarfeehi",
-            "Pass": "Altarfeehi@277",
-            "Method": "Chat",
-            "To": str(number),
-            "Body": str(message)
-        }
-        try:
-            response = requests.post(
-                url="http://185.216.203.97:8070/AWE/Api/index.php",
-                data=data,
-                timeout=20  # Optional: prevent long hanging
-            )
-            print(response.json())
-        except Exception as e:
-            print(f"Message sending failed: {e}")
-    
-    threading.Thread(target=send).start()
-
-
-
 
+logger = logging.getLogger(__name__)
 
 
+@replica_reads
 def home(request):
     # Count Service Requests by status
     total_requests = ServiceRequest.objects.count()
@@ -102,14 +97,16 @@ def home(request):
 
 
 
+@replica_reads
 def my_request(request):
-    section = Section.objects.filter(manager=request.user)
+    section = user_section_ids(request.user.id)
     filter_type = request.GET.get('filter', 'all')
 
     if filter_type == 'supplied':
+        # the summary column of the request, no join to the orders, see app1.summary
         service_requests = ServiceRequest.objects.filter(
             section__in=section,
-            reports__purchase_order__status='supplied'
+            purchase_order_status='supplied'
         )
     elif filter_type == 'pending':
         service_requests = ServiceRequest.objects.filter(
@@ -127,25 +124,57 @@ def my_request(request):
             status='under_review'
         )
     else:
+        filter_type = 'all'
         service_requests = ServiceRequest.objects.filter(section__in=section)
     
-    service_requests = service_requests.order_by('-id')
+    service_requests = request_rows(service_requests).order_by('-id')
+
+    # badge counts come from the InboxCounter table, see app1.inbox
+    counts = bucket_counts(counter_totals(InboxCounter.SECTION, section))
+    filter_options = [
+        {'key': 'supplied', 'label': 'طلبات مشتريات موردة', 'icon': 'check'},
+        {'key': 'in_progress', 'label': 'قيد التنفيذ', 'icon': 'spinner'},
+        {'key': 'pending', 'label': 'طلبات في الانتظار', 'icon': 'hourglass-half'},
+        {'key': 'under_review', 'label': 'طلبات قيد المراجعة', 'icon': 'eye'},
+        {'key': 'all', 'label': 'كل الطلبات', 'icon': 'list'},
+    ]
+    for option in filter_options:
+        option['count'] = counts[option['key']]
 
     context = {
         'service_requests': service_requests,
         'filter': filter_type,  # pass the current filter to the template if needed for active styling
+        'filter_options': filter_options,
+        'total': counts[filter_type],
     }
     return render(request, 'read/my_request.html', context)
 
+
+def filter_by_assignee(service_requests, assigned_user_id):
+    if assigned_user_id == 'unassigned':
+        return service_requests.filter(assigned_to__isnull=True)
+    if assigned_user_id:
+        return service_requests.filter(assigned_to_id=assigned_user_id)
+    return service_requests
+
+
+def provider_assignees(service_providers):
+    return User.objects.filter(
+        assigned_to__service_provider__in=service_providers
+    ).distinct().order_by('username')
+
+
+@replica_reads
 def requests_to_me(request):
-    service_providers = ServiceProvider.objects.filter(manager=request.user)
+    service_providers = user_provider_ids(request.user.id)
     filter_type = request.GET.get('filter', 'all')
     assigned_user_id = request.GET.get('assigned_to', '').strip()
 
     if filter_type == 'supplied':
+        # the summary column of the request, no join to the orders, see app1.summary
         service_requests = ServiceRequest.objects.filter(
             service_provider__in=service_providers,
-            reports__purchase_order__status='supplied'
+            purchase_order_status='supplied'
         )
     elif filter_type == 'pending':
         service_requests = ServiceRequest.objects.filter(
@@ -163,14 +192,11 @@ def requests_to_me(request):
             assigned_to=request.user
         )
     else:
+        filter_type = 'all'
         service_requests = ServiceRequest.objects.filter(service_provider__in=service_providers)
 
-    if assigned_user_id == 'unassigned':
-        service_requests = service_requests.filter(assigned_to__isnull=True)
-    elif assigned_user_id:
-        service_requests = service_requests.filter(assigned_to_id=assigned_user_id)
-    
-    service_requests = service_requests.order_by('-id')
+    service_requests = filter_by_assignee(service_requests, assigned_user_id)
+    service_requests = request_rows(service_requests, with_assignee=True).order_by('-id')
 
     filter_options = [
         {'key': 'all', 'label': 'كل الطلبات', 'icon': 'list'},
@@ -180,9 +206,16 @@ def requests_to_me(request):
         {'key': 'assigned_to_me', 'label': 'طلبات مسندة إليّ', 'icon': 'user-check'},
     ]
 
-    assigned_users = User.objects.filter(
-        assigned_to__service_provider__in=service_providers
-    ).distinct().order_by('username')
+    # badge counts come from the InboxCounter table, see app1.inbox
+    totals = counter_totals(InboxCounter.PROVIDER, service_providers)
+    assignee = int(assigned_user_id) if assigned_user_id.isdigit() else assigned_user_id or None
+    counts = bucket_counts(totals, assignee)
+    if assignee in (None, request.user.id):
+        counts['assigned_to_me'] = bucket_counts(totals, request.user.id)['all']
+    for option in filter_options:
+        option['count'] = counts[option['key']]
+
+    assigned_users = provider_assignees(service_providers)
 
     context = {
         'service_requests': service_requests,
@@ -190,69 +223,311 @@ def requests_to_me(request):
         'filter_options': filter_options,
         'assigned_users': assigned_users,
         'assigned_user_id': assigned_user_id,
+        'total': counts[filter_type],
     }
     return render(request, 'read/requests_to_me.html', context)
 
 
+@replica_reads
+def requests_board(request):
+    service_providers = user_provider_ids(request.user.id)
+    assigned_user_id = request.GET.get('assigned_to', '').strip()
+    service_requests = filter_by_assignee(
+        ServiceRequest.objects.filter(service_provider__in=service_providers), assigned_user_id
+    )
+    # column totals come from the InboxCounter table, see app1.inbox
+    assignee = int(assigned_user_id) if assigned_user_id.isdigit() else assigned_user_id or None
+    counts = bucket_counts(counter_totals(InboxCounter.PROVIDER, service_providers), assignee)
+    cards = board.columns(service_requests)
+    statuses = dict(ServiceRequest._meta.get_field('status').choices)
+    columns = [
+        {'status': status, 'label': statuses[status], 'count': counts[status], **cards[status]}
+        for status in board.COLUMNS
+    ]
+    context = {
+        'columns': columns,
+        'moves': board.allowed_moves(),
+        'assigned_users': provider_assignees(service_providers),
+        'assigned_user_id': assigned_user_id,
+    }
+    return render(request, 'read/requests_board.html', context)
+
+
+@replica_reads
+def requests_board_api(request):
+    """Every column of the board, or with status and before the next cards of one column."""
+    service_providers = user_provider_ids(request.user.id)
+    service_requests = filter_by_assignee(
+        ServiceRequest.objects.filter(service_provider__in=service_providers),
+        request.GET.get('assigned_to', '').strip(),
+    )
+    status = request.GET.get('status')
+    if status is None:
+        return JsonResponse({'columns': board.columns(service_requests)})
+    if status not in board.COLUMNS:
+        return JsonResponse({'error': 'حالة غير معروفة'}, status=400)
+    before = request.GET.get('before', '')
+    return JsonResponse(board.column_page(service_requests, status, int(before) if before.isdigit() else None))
+
+
+@require_POST
+def board_move(request, id):
+    """Move a card dropped on another column through the transition path of the two statuses."""
+    service_request = ServiceRequest.objects.filter(
+        id=id, service_provider__in=user_provider_ids(request.user.id)
+    ).select_related('created_by__profile').first()
+    if service_request is None:
+        return JsonResponse({'error': 'الطلب غير موجود'}, status=404)
+    move = board.MOVES.get((service_request.status, request.POST.get('status')))
+    if move is None:
+        return JsonResponse({'error': 'لا يمكن نقل الطلب الى هذه الحالة'}, status=400)
+    if move != 'direct':
+        # the path asks for a report or a note, the board opens its form
+        return JsonResponse({'result': 'form', 'url': reverse(move, args=[service_request.id])})
+    if not move_to_under_review(service_request, request.user):
+        return JsonResponse({'error': 'حالة الطلب لا تسمح بالمراجعة'}, status=400)
+    return JsonResponse({'result': 'moved', 'status': service_request.status})
+
+
+
+# the detail pages show these relations of the request and of each of its reports
+DETAIL_REQUESTS = ServiceRequest.objects.select_related(
+    'section', 'service_provider', 'created_by', 'updated_by', 'assigned_to'
+)
+
+
+def detail_reports(service_request):
+    return service_request.reports.select_related('created_by', 'purchase_order', 'inventory_order')
+
+
+def detail_attachments(service_request):
+    return service_request.attachments.select_related('blob', 'completion_report').order_by('created_at')
+
 
 def request_detail_sm(request, id):
-    service_request = ServiceRequest.objects.get(id=id)
-    service_request_logs = ServiceRequestLog.objects.filter(service_request=service_request)
-    reports = Report.objects.filter(service_request=service_request)
-    completion_reports = CompletionReport.objects.filter(service_request=service_request)
+    # completed requests may have been moved to the archive database
+    service_request = get_service_request(id, DETAIL_REQUESTS)
+    service_request_logs = request_logs(service_request)
+    reports = detail_reports(service_request)
+    completion_reports = service_request.completionreport_set.select_related('created_by')
     context = {
         'service_request': service_request,
         'service_request_logs': service_request_logs,
         'reports': reports,
-        'completion_reports': completion_reports
+        'completion_reports': completion_reports,
+        'attachments': detail_attachments(service_request),
+        'archived': is_archived(service_request),
     }
     return render(request, 'read/request_detail_sm.html', context)
 
 def request_detail(request, id):
-    service_request = ServiceRequest.objects.get(id=id)
-    service_request_logs = ServiceRequestLog.objects.filter(service_request=service_request)
-    reports = Report.objects.filter(service_request=service_request)
-    completion_reports = CompletionReport.objects.filter(service_request=service_request)
+    # completed requests may have been moved to the archive database
+    service_request = get_service_request(id, DETAIL_REQUESTS)
+    service_request_logs = request_logs(service_request)
+    reports = detail_reports(service_request)
+    completion_reports = service_request.completionreport_set.select_related('created_by')
     context = {
         'service_request': service_request,
         'service_request_logs': service_request_logs,
         'reports': reports,
-        'completion_reports': completion_reports
+        'completion_reports': completion_reports,
+        'attachments': detail_attachments(service_request),
+        'archived': is_archived(service_request),
     }
     return render(request, 'read/request_detail.html', context)
 
 
+# --- photo attachments, see app1/attachments.py
+
+def attachment_json(attachment):
+    url = reverse('attachment_file', args=[attachment.id])
+    return {'id': attachment.id, 'name': attachment.name, 'kind': attachment.kind, 'url': url}
+
+
+def upload_error(error):
+    response = JsonResponse({'error': error.message, 'offset': error.offset}, status=error.status)
+    if error.offset is not None:
+        response['Upload-Offset'] = error.offset
+    return response
+
+
+@require_POST
+def start_attachment_upload(request):
+    """Start a resumable photo upload, its chunks are then sent with PATCH to the returned url."""
+    request_id = request.POST.get('service_request', '')
+    service_request = ServiceRequest.objects.filter(id=request_id).first() if request_id.isdigit() else None
+    if service_request is None or not attachments.can_access(request.user, service_request):
+        return JsonResponse({'error': 'الطلب غير موجود'}, status=404)
+    completion_report = None
+    report_id = request.POST.get('completion_report', '')
+    if report_id:
+        completion_report = service_request.completionreport_set.filter(id=report_id).first() if report_id.isdigit() else None
+        if completion_report is None:
+            return JsonResponse({'error': 'تقرير الإنجاز لا يخص هذا الطلب'}, status=400)
+    size = request.POST.get('size', '')
+    try:
+        upload = attachments.start_upload(
+            request.user,
+            service_request,
+            request.POST.get('name', ''),
+            int(size) if size.isdigit() else 0,
+            request.POST.get('kind', Attachment.BEFORE),
+            completion_report,
+        )
+    except attachments.UploadError as error:
+        return upload_error(error)
+    url = reverse('attachment_upload', args=[upload.id])
+    response = JsonResponse({'url': url, 'offset': 0, 'chunk_size': attachments.CHUNK_SIZE}, status=201)
+    response['Location'] = url
+    return response
+
+
+@require_http_methods(['GET', 'HEAD', 'PATCH', 'DELETE'])
+def attachment_upload(request, upload_id):
+    """GET/HEAD: the bytes received so far; PATCH: the next chunk at Upload-Offset; DELETE: cancel."""
+    upload = AttachmentUpload.objects.filter(id=upload_id, uploaded_by_id=request.user.id).first()
+    if upload is None:
+        return JsonResponse({'error': 'الرفع غير موجود أو انتهت صلاحيته'}, status=404)
+    if request.method == 'DELETE':
+        attachments.cancel_upload(upload)
+        return HttpResponse(status=204)
+    if request.method == 'PATCH':
+        offset = request.headers.get('Upload-Offset', '')
+        if not offset.isdigit():
+            return JsonResponse({'error': 'Upload-Offset مطلوب'}, status=400)
+        # the body is read from the stream in blocks, never as a whole
+        length = int(request.META.get('CONTENT_LENGTH') or 0)
+        try:
+            received, attachment = attachments.receive_chunk(upload, int(offset), request, length)
+        except attachments.UploadError as error:
+            return upload_error(error)
+        if attachment is not None:
+            return JsonResponse(attachment_json(attachment), status=201)
+    else:
+        received = attachments.received(upload)
+    response = JsonResponse({'offset': received, 'size': upload.size, 'chunk_size': attachments.CHUNK_SIZE})
+    response['Upload-Offset'] = received
+    response['Cache-Control'] = 'no-store'
+    return response
+
+
+@require_safe
+def attachment_file(request, id):
+    """The photo, or with ?size= one of its thumbnails; supports Range requests."""
+    attachment = attachments.get_attachment(id)
+    if attachment is None or not attachments.can_access(request.user, attachment.service_request):
+        return JsonResponse({'error': 'الصورة غير موجودة'}, status=404)
+    size = request.GET.get('size', '')
+    if size and (not size.isdigit() or int(size) not in attachments.THUMBNAIL_SIZES):
+        return JsonResponse({'error': 'حجم غير متاح'}, status=404)
+    return attachments.serve(request, attachment, int(size) if size else None)
+
+
+
+ASSIGNABLE_USERS_PAGE_SIZE = 20
+# the picker draws avatars at this size, see static/js/assign_to_user.js
+ASSIGNABLE_USERS_AVATAR_SIZE = 24
+
+
+def assignable_users(service_request):
+    # only the managers of the request's service provider can take the request
+    return User.objects.filter(
+        serviceprovider=service_request.service_provider_id,
+        is_active=True,
+    )
+
 
 def assign_to_user(request, id):
-    service_request = ServiceRequest.objects.get(id=id)
+    service_request = ServiceRequest.objects.select_related('assigned_to__profile').get(id=id)
     if request.method == 'POST':
         user_id = request.POST.get('user_id')
-        user = User.objects.get(id=user_id)
+        # user and phone in one query
+        user = assignable_users(service_request).select_related('profile').filter(id=user_id).first()
+        if not user:
+            messages.error(request, 'المستخدم غير موجود أو ليس من مسؤولي مزود الخدمة')
+            return redirect('assign_to_user', id=id)
         service_request.assigned_to = user
         service_request.save()
         # log
-        ServiceRequestLog.objects.create(
-            service_request=service_request,
-            comment=f'تم تعيين الطلب الى المستخدم {user.username}',
-            created_by=request.user
+        log_event(
+            service_request, LogEvent.ASSIGNED, request.user, target=user, note=user.username
         )
-        user_profile = UserProfile.objects.filter(user=user).first()
-        link_to_order  = f"بمكنك الدخول عبد الراب.التالي: https://net.sportainmentclub.com/request_detail/{id}"
-        send_message(user_profile.phone, f'تم تعيين الطلب اليك :{service_request.title} \n {link_to_order}')
+        user_profile = getattr(user, 'profile', None)
+        if user_profile:
+            link_to_order  = f"بمكنك الدخول عبد الراب.التالي: https://net.sportainmentclub.com/request_detail/{id}"
+            notify(
+                user_profile.phone, f'تم تعيين الطلب اليك :{service_request.title} \n {link_to_order}',
+                summary_line('تم تعيين الطلب اليك', service_request),
+            )
         messages.success(request, f'تم تعيين الطلب الى المستخدم {user.username}')
         return redirect('request_detail', id=id)
-    users = User.objects.all()
     context = {
         'service_request': service_request,
-        'users': users
     }
     return render(request, 'write/assign_to_user.html', context)
 
+
+@replica_reads
+def assign_to_user_search(request, id):
+    service_request = ServiceRequest.objects.only('service_provider_id').get(id=id)
+    query = request.GET.get('q', '').strip()
+    try:
+        page = max(int(request.GET.get('page', 1)), 1)
+    except ValueError:
+        page = 1
+
+    users = assignable_users(service_request)
+    if query:
+        # prefix lookups, served by the NOCASE indexes on auth_user
+        users = users.filter(
+            Q(username__istartswith=query) |
+            Q(first_name__istartswith=query) |
+            Q(last_name__istartswith=query)
+        )
+    offset = (page - 1) * ASSIGNABLE_USERS_PAGE_SIZE
+    # fetch one extra row to know whether there is a next page without a COUNT
+    users = list(
+        users.select_related('profile')
+        .only('id', 'username', 'first_name', 'last_name', 'profile__image', 'profile__image_hash')
+        .order_by('username')[offset:offset + ASSIGNABLE_USERS_PAGE_SIZE + 1]
+    )
+    has_next = len(users) > ASSIGNABLE_USERS_PAGE_SIZE
+    results = []
+    for user in users[:ASSIGNABLE_USERS_PAGE_SIZE]:
+        profile = getattr(user, 'profile', None)
+        results.append({
+            'id': user.id,
+            'username': user.username,
+            'name': user.get_full_name() or user.username,
+            'avatar': profile.thumbnail_url(ASSIGNABLE_USERS_AVATAR_SIZE) if profile else '',
+            'avatar_srcset': profile.thumbnail_srcset(ASSIGNABLE_USERS_AVATAR_SIZE) if profile else '',
+        })
+    return JsonResponse({'results': results, 'page': page, 'has_next': has_next})
+
+
+@staff_member_required
+def reference_cache_stats(request):
+    # counters of the worker that served this request
+    return JsonResponse({'pid': os.getpid(), **refcache.stats()})
+
+
+@staff_member_required
+def notification_stats(request):
+    # messages saved by digests over the last 30 days
+    return JsonResponse(notifications.stats())
+
+
+@staff_member_required
+def gateway_stats(request):
+    # WhatsApp gateway counters of the worker that served this request
+    return JsonResponse({'pid': os.getpid(), **gateway.get_client().stats()})
+
+
 def print_request(request, id):
-    service_request = ServiceRequest.objects.get(id=id)
-    service_request_logs = ServiceRequestLog.objects.filter(service_request=service_request)
-    reports = Report.objects.filter(service_request=service_request)
-    completion_report = CompletionReport.objects.filter(service_request=service_request).first()
+    service_request = get_service_request(id, DETAIL_REQUESTS)
+    service_request_logs = request_logs(service_request)
+    reports = detail_reports(service_request)
+    completion_report = service_request.completionreport_set.first()
     
     context = {
         'service_request': service_request,
@@ -282,30 +557,26 @@ def create_report(request, id):
 
                 )
                 # log
-                ServiceRequestLog.objects.create(
-                    service_request=service_request,
-                    comment='تم إنشاء تقرير جديد',
-                    created_by=request.user
+                log_event(
+                    service_request, LogEvent.REPORT_CREATED, request.user, target=report
                 )
                 messages.success(request, 'تم إنشاء تقرير بنجاح')
 
             if purchase_request_refrence:
-                PurchaseOrder.objects.create(
+                purchase_order = PurchaseOrder.objects.create(
                     report=report,
                     refrence_number=purchase_request_refrence,
                     created_by=request.user
                 )
                 report.needs_outsourcing = True
                 # log
-                ServiceRequestLog.objects.create(
-                    service_request=service_request,
-                    comment='تم إنشاء طلب شراء ',
-                    created_by=request.user
+                log_event(
+                    service_request, LogEvent.PURCHASE_ORDER_CREATED, request.user, target=purchase_order
                 )
                 messages.success(request, 'تم إنشاء طلب شراء بنجاح')
 
             if inventory_order_refrence:
-                InventoryOrder.objects.create(
+                inventory_order = InventoryOrder.objects.create(
                     report=report,
                     refrence_number=inventory_order_refrence,
                     created_by=request.user
@@ -314,10 +585,8 @@ def create_report(request, id):
 
                 report.needs_outsourcing = True
                 # log
-                ServiceRequestLog.objects.create(
-                    service_request=service_request,
-                    comment='تم إنشاء طلب مخزني',
-                    created_by=request.user
+                log_event(
+                    service_request, LogEvent.INVENTORY_ORDER_CREATED, request.user, target=inventory_order
                 )
                 messages.success(request, 'تم إنشاء طلب مخزني بنجاح')
             
@@ -341,23 +610,21 @@ def create_completion_report(request, id):
                 title='تقرير إنجاز',
                 created_by=request.user
             )    
-            CompletionReport.objects.create(
+            completion_report = CompletionReport.objects.create(
                 service_request=service_request,
                 title='تقرير إنجاز',
                 description=report_details,
                 created_by=request.user
             )
             # log
-            ServiceRequestLog.objects.create(
-                service_request=service_request,
-                comment='تم إنشاء تقرير إنجاز',
-                created_by=request.user
+            log_event(
+                service_request, LogEvent.COMPLETION_REPORT_CREATED, request.user, target=completion_report
             )
             user_to_alart_phone = service_request.created_by.profile.phone
             # message with request details
             message = f'*نظام صيانة النادي الترفيهي الرياضي* \nتم اكمال طلبك بنجاح \n عنوان طلبك كان: {service_request.title} \n تفاصيل الطلب: {service_request.description}'
             # send message
-            send_message(user_to_alart_phone, message)
+            notify(user_to_alart_phone, message, summary_line('تم اكمال طلبك', service_request))
             service_request.status = 'under_review'
             service_request.save()
             messages.success(request, 'تم إنشاء تقرير إنجاز بنجاح')
@@ -380,10 +647,8 @@ def create_report_out_source(request, id):
                 description = report_details
             )    
 
-            ServiceRequestLog.objects.create(
-                service_request=service_request,
-                comment='تم انشاء تقرير احتياج خدمة خارجية',
-                created_by=request.user
+            log_event(
+                service_request, LogEvent.OUTSOURCE_REPORT_CREATED, request.user, target=report
             )
             service_request.status = 'in_progress'
             service_request.save()
@@ -403,17 +668,15 @@ def create_completion_report_out_source(request,id):
             messages.error(request,"حصل خطاء ماء")
             return redirect('request_detail', id=id)
         
-        CompletionReport.objects.create(
+        completion_report = CompletionReport.objects.create(
                 service_request=service_request,
                 title='تقرير إنجاز لعمل خارجي',
                 description=report_details,
                 created_by=request.user
             )
         # log
-        ServiceRequestLog.objects.create(
-            service_request=service_request,
-            comment='تم إنشاء تقرير إنجاز',
-            created_by=request.user
+        log_event(
+            service_request, LogEvent.COMPLETION_REPORT_CREATED, request.user, target=completion_report
         )
         service_request.status = 'in_progress'
         service_request.save()
@@ -427,17 +690,15 @@ def create_purchase_order(request, id):
         report = Report.objects.filter(service_request=service_request).first()
         purchase_request_refrence = request.POST.get('purchase_request_refrence')
         if report:
-            PurchaseOrder.objects.create(
+            purchase_order = PurchaseOrder.objects.create(
                 report=report,
                 refrence_number=purchase_request_refrence,
                 created_by=request.user
             )
             report.needs_outsourcing = True
             # log
-            ServiceRequestLog.objects.create(
-                service_request=service_request,
-                comment='تم إنشاء طلب شراء ',
-                created_by=request.user
+            log_event(
+                service_request, LogEvent.PURCHASE_ORDER_CREATED, request.user, target=purchase_order
             )
             messages.success(request, 'تم إنشاء طلب شراء بنجاح')
             return redirect('request_detail', id=id)
@@ -452,17 +713,15 @@ def create_inventory_order(request, id):
         report = Report.objects.filter(service_request=service_request).first()
         inventory_order_refrence = request.POST.get('inventory_order_refrence')
         if report:
-            InventoryOrder.objects.create(
+            inventory_order = InventoryOrder.objects.create(
                 report=report,
                 refrence_number=inventory_order_refrence,
                 created_by=request.user
             )
             report.needs_outsourcing = True
             # log
-            ServiceRequestLog.objects.create(
-                service_request=service_request,
-                comment='تم إنشاء طلب مخزني',
-                created_by=request.user
+            log_event(
+                service_request, LogEvent.INVENTORY_ORDER_CREATED, request.user, target=inventory_order
             )
             messages.success(request, 'تم إنشاء طلب مخزني بنجاح')
             return redirect('request_detail', id=id)
@@ -483,10 +742,8 @@ def edit_completion_report(request,id):
         if form.is_valid():
             form.save()
             # log
-            ServiceRequestLog.objects.create(
-                service_request=completion_report.service_request,
-                comment='تم تعديل تقرير إنجاز',
-                created_by=request.user
+            log_event(
+                completion_report.service_request, LogEvent.COMPLETION_REPORT_EDITED, request.user, target=completion_report
             )
             messages.success(request, 'تم تعديل تقرير إنجاز بنجاح')
             return redirect('request_detail', id=completion_report.service_request.id)
@@ -499,13 +756,13 @@ def edit_completion_report(request,id):
 def purchase_order_mark_as_approved(request, id):
     
     purchase_order = PurchaseOrder.objects.get(id=id)
+    old_status = purchase_order.status
     purchase_order.status = 'approved'
     purchase_order.save()
     # log
-    ServiceRequestLog.objects.create(
-        service_request=purchase_order.report.service_request,
-        comment='تم تعديل حالة طلب الشراء الى جاهز للشراء',
-        created_by=request.user
+    log_event(
+        purchase_order.report.service_request, LogEvent.PURCHASE_ORDER_STATUS, request.user, target=purchase_order,
+        old_status=old_status, new_status=purchase_order.status
     )
     messages.success(request, 'تم تعديل حالة طلب الشراء الى جاهز للشراء')
     return redirect('request_detail', id=purchase_order.report.service_request.id)
@@ -513,13 +770,13 @@ def purchase_order_mark_as_approved(request, id):
 
 def purchase_order_mark_as_pending(request, id):
     purchase_order = PurchaseOrder.objects.get(id=id)
+    old_status = purchase_order.status
     purchase_order.status = 'approved'
     purchase_order.save()
     # log
-    ServiceRequestLog.objects.create(
-        service_request=purchase_order.report.service_request,
-        comment='تم تعديل حالة طلب الشراء الى قيد الاعتماد',
-        created_by=request.user
+    log_event(
+        purchase_order.report.service_request, LogEvent.PURCHASE_ORDER_STATUS, request.user, target=purchase_order,
+        old_status=old_status, new_status=purchase_order.status
     )
 
     messages.success(request, 'تم تعديل حالة طلب الشراء الى قيد الاعتماد')
@@ -528,13 +785,13 @@ def purchase_order_mark_as_pending(request, id):
 
 def purchase_order_mark_as_used(request, id):
     purchase_order = PurchaseOrder.objects.get(id=id)
+    old_status = purchase_order.status
     purchase_order.status = 'used'
     purchase_order.save()
     # log
-    ServiceRequestLog.objects.create(
-        service_request=purchase_order.report.service_request,
-        comment='تم تعديل حالة طلب الشراء الى تم الاستخدام',
-        created_by=request.user
+    log_event(
+        purchase_order.report.service_request, LogEvent.PURCHASE_ORDER_STATUS, request.user, target=purchase_order,
+        old_status=old_status, new_status=purchase_order.status
     )
     messages.success(request, 'تم تعديل حالة طلب الشراء الى تم الاستخدام')
     return redirect('request_detail', id=purchase_order.report.service_request.id)
@@ -544,13 +801,13 @@ def purchase_order_mark_as_used(request, id):
 
 def inventory_order_mark_as_approved(request, id):
     inventory_order = InventoryOrder.objects.get(id=id)
+    old_status = inventory_order.status
     inventory_order.status = 'used'
     inventory_order.save()
     # log
-    ServiceRequestLog.objects.create(
-        service_request=inventory_order.report.service_request,
-        comment='تم تعديل حالة طلب مخزني الى تم الاستخدام',
-        created_by=request.user
+    log_event(
+        inventory_order.report.service_request, LogEvent.INVENTORY_ORDER_STATUS, request.user, target=inventory_order,
+        old_status=old_status, new_status=inventory_order.status
     )
     messages.success(request, 'تم تعديل حالة طلب مخزني الى تم الاستخدام')
     return redirect('request_detail', id=inventory_order.report.service_request.id)
@@ -558,13 +815,13 @@ def inventory_order_mark_as_approved(request, id):
 
 def inventory_order_mark_as_pending(request, id):
     inventory_order = InventoryOrder.objects.get(id=id)
+    old_status = inventory_order.status
     inventory_order.status = 'pending'
     inventory_order.save()
     # log
-    ServiceRequestLog.objects.create(
-        service_request=inventory_order.report.service_request,
-        comment='تم تعديل حالة طلب مخزني الى قيد العمل',
-        created_by=request.user
+    log_event(
+        inventory_order.report.service_request, LogEvent.INVENTORY_ORDER_STATUS, request.user, target=inventory_order,
+        old_status=old_status, new_status=inventory_order.status
     )
     messages.success(request, 'تم تعديل حالة طلب مخزني الى قيد العمل')
     return redirect('request_detail', id=inventory_order.report.service_request.id)\
@@ -580,10 +837,8 @@ def edit_purchase_order(request, id):
         if form.is_valid():
             form.save()
             # log
-            ServiceRequestLog.objects.create(
-                service_request=purchase_order.report.service_request,
-                comment='تم تعديل طلب الشراء',
-                created_by=request.user
+            log_event(
+                purchase_order.report.service_request, LogEvent.PURCHASE_ORDER_EDITED, request.user, target=purchase_order
             )
             messages.success(request, 'تم تعديل طلب الشراء بنجاح')
             return redirect('request_detail', id=purchase_order.report.service_request.id)
@@ -602,10 +857,8 @@ def edit_inventory_order(request, id):
         if form.is_valid():
             form.save()
             # log
-            ServiceRequestLog.objects.create(
-                service_request=inventory_order.report.service_request,
-                comment='تم تعديل طلب مخزني',
-                created_by=request.user
+            log_event(
+                inventory_order.report.service_request, LogEvent.INVENTORY_ORDER_EDITED, request.user, target=inventory_order
             )
             messages.success(request, 'تم تعديل طلب مخزني بنجاح')
             return redirect('request_detail', id=inventory_order.report.service_request.id)
@@ -616,40 +869,37 @@ def edit_inventory_order(request, id):
 
 
 
-def mark_as_under_review(request, id):
-    service_request = ServiceRequest.objects.get(id=id)
+def move_to_under_review(service_request, user):
+    """in_progress -> under_review once the request has its reports, for the page and the board."""
+    report = Report.objects.filter(service_request=service_request).first()
+    completion_report = CompletionReport.objects.filter(service_request=service_request).first()
+    if not (service_request.status == 'in_progress' and report and completion_report):
+        return False
     user_to_alart_phone = service_request.created_by.profile.phone
     # message with request details
     message = f'*نظام صيانة النادي الترفيهي الرياضي* \nتم اكمال طلبك بنجاح \n عنوان طلبك كان: {service_request.title} \n تفاصيل الطلب: {service_request.description}'
+    service_request.status = 'under_review'
+    service_request.save()
     # send message
-    report = Report.objects.filter(service_request=service_request).first()
-    completion_report = CompletionReport.objects.filter(service_request=service_request).first()
+    notify(user_to_alart_phone, message, summary_line('تم اكمال طلبك', service_request))
 
-    if service_request.status == 'in_progress' and report and completion_report:
-        service_request.status = 'under_review'
-        service_request.save()
-        send_message(user_to_alart_phone, message)
+    # the order cascade runs in the background, see app1.tasks
+    tasks.mark_orders_used.delay(report.id)
+    # log
+    log_event(
+        service_request, LogEvent.STATUS_CHANGED, user,
+        old_status='in_progress', new_status='under_review'
+    )
+    return True
 
 
-        purchase_order = PurchaseOrder.objects.filter(report=report).first()
-        inventory_order = InventoryOrder.objects.filter(report=report).first()
-        if purchase_order:
-            purchase_order.status = 'used'
-            purchase_order.save()
-        if inventory_order:
-            inventory_order.status = 'used'
-            inventory_order.save()
-        # log
-        ServiceRequestLog.objects.create(
-            service_request=service_request,
-            comment='تم تعديل حالة الطلب الى قيد المراجعة',
-            created_by=request.user
-        )
+def mark_as_under_review(request, id):
+    service_request = ServiceRequest.objects.get(id=id)
+    if move_to_under_review(service_request, request.user):
         messages.success(request, 'تم تعديل حالة الطلب الى قيد المراجعة')
-        return redirect('request_detail', id=id)
     else:
         messages.error(request, 'حالة الطلب لا تسمح بالمراجعة')
-        return redirect('request_detail', id=id)
+    return redirect('request_detail', id=id)
 
 
 
@@ -661,14 +911,15 @@ def mark_as_in_progress(request, id):
         if form.is_valid():
             form.instance.service_request = service_request
             form.instance.created_by = request.user
-            form.instance.comment = 'تم اعادة حالة الطلب الى قيد العمل: ' + form.instance.comment
+            form.instance.event = LogEvent.REOPENED
+            form.instance.old_status = service_request.status
+            form.instance.new_status = 'in_progress'
             service_request.status = 'in_progress'
-            message = f'*نظام صيانة النادي الترفيهي الرياضي* \nتم اعادة الطلب الي حيث وانه هناك مشكلة \n عنوان طلبك كان: {service_request.title} \n تفاصيل الطلب: {service_request.description}\n تفاصيل المشكلة: {form.instance.comment}'
+            message = f'*نظام صيانة النادي الترفيهي الرياضي* \nتم اعادة الطلب الي حيث وانه هناك مشكلة \n عنوان طلبك كان: {service_request.title} \n تفاصيل الطلب: {service_request.description}\n تفاصيل المشكلة: {form.instance.text}'
 
-            for user in service_provider.manager.all():
-                user_to_alart_phone = user.profile.phone
+            for user_to_alart_phone in provider_manager_phones(service_provider.id):
                 # send message
-                send_message(user_to_alart_phone, message)
+                notify(user_to_alart_phone, message, summary_line('تمت اعادة الطلب بسبب مشكلة', service_request))
                 
 
             service_request.save()
@@ -684,20 +935,19 @@ def mark_as_in_progress(request, id):
 def mark_as_complete(request, id):
     service_request = ServiceRequest.objects.get(id=id)
     service_provider = service_request.service_provider
+    old_status = service_request.status
     
     service_request.status = 'completed'
     service_request.save()
     message = f'*نظام صيانة النادي الترفيهي الرياضي* \nتم استلام العمل من قبل قسم : {service_request.section.name} \n عنوان الطلب كان: {service_request.title} \n تفاصيل الطلب: {service_request.description}'
 
-    for user in service_provider.manager.all():
-        user_to_alart_phone = user.profile.phone
+    for user_to_alart_phone in provider_manager_phones(service_provider.id):
         # send message
-        send_message(user_to_alart_phone, message)
+        notify(user_to_alart_phone, message, summary_line('تم استلام العمل', service_request))
     # log
-    ServiceRequestLog.objects.create(
-        service_request=service_request,
-        comment='تم اكمال الطلب',
-        created_by=request.user
+    log_event(
+        service_request, LogEvent.COMPLETED, request.user,
+        old_status=old_status, new_status='completed'
     )
     messages.success(request, 'تم اكمال الطلب')
     return redirect(request.GET.get('next', 'home'))
@@ -707,58 +957,95 @@ def mark_as_complete(request, id):
 from django.shortcuts import render, redirect
 from django.contrib import messages
 from django.db.models import Q
-from .models import Section, ServiceProvider, ServiceRequest, ServiceRequestLog
+from .models import Section, ServiceProvider, ServiceRequest
+
+def submit_service_request(user, title, description, section_id, service_provider_id):
+    """Create a request and tell its provider's managers and assignee, for the form and the offline sync."""
+    service_request = ServiceRequest.objects.create(
+        title=title,
+        description=description,
+        section_id=section_id,
+        service_provider_id=service_provider_id,
+        created_by=user,
+        updated_by=user
+    )
+    service_provider = service_request.service_provider
+
+    message = f'*نظام صيانة النادي الترفيهي الرياضي* \nلديك طلب صيانة: {service_request.section.name} \n عنوان الطلب كان: {service_request.title} \n تفاصيل الطلب: {service_request.description}'
+
+    for user_to_alart_phone in provider_manager_phones(service_provider.id):
+        # send message
+        notify(user_to_alart_phone, message, summary_line(f'طلب صيانة جديد من {service_request.section.name}', service_request))
+    # Log creation
+    log_event(
+        service_request, LogEvent.CREATED, user, new_status=service_request.status
+    )
+
+    assignee = auto_assign(service_request, user)
+    assignee_profile = getattr(assignee, 'profile', None)
+    if assignee_profile:
+        link_to_order  = f"بمكنك الدخول عبد الراب.التالي: https://net.sportainmentclub.com/request_detail/{service_request.id}"
+        notify(
+            assignee_profile.phone, f'تم تعيين الطلب اليك :{service_request.title} \n {link_to_order}',
+            summary_line('تم تعيين الطلب اليك', service_request),
+        )
+    return service_request
+
 
 def create_service_request(request):
-    sections = Section.objects.filter(manager=request.user)
-    service_providers = ServiceProvider.objects.all()
+    sections = user_sections(request.user.id)
+    service_providers = all_service_providers()
 
     if request.method == 'POST':
         title = request.POST.get('title').strip()
         description = request.POST.get('description').strip()
         section_id = request.POST.get('section')
         service_provider_id = request.POST.get('service_provider')
+        # set by static/js/offline.js, a form sent again after a lost response finds its request
+        client_id = parse_client_id(request.POST.get('client_id'))
+        try:
+            earlier = client_id and replayed(client_id, request.user, ClientWrite.REQUEST)
+        except SyncError as e:
+            messages.error(request, str(e))
+            return redirect('create_service_request')
+        if earlier:
+            messages.info(request, 'تم إرسال هذا الطلب مسبقاً')
+            return redirect('request_detail_sm', id=earlier)
 
         if title and description and section_id and service_provider_id:
-            # Check if the request already exists
-            existing_request = ServiceRequest.objects.filter(
-                title=title,
-                description=description,
-                section_id=section_id,
-                service_provider_id=service_provider_id,
-                created_by=request.user
-            ).exists()
-
-            if existing_request:
+            # Check if the request already exists, ignoring spelling and punctuation differences
+            content_hash = request_content_hash(title, description, section_id, service_provider_id, request.user.id)
+            if find_duplicate(content_hash):
                 messages.warning(request, 'هذا الطلب موجود بالفعل')
                 return redirect('create_service_request')
 
-            # Create new request
-            service_request = ServiceRequest.objects.create(
-                title=title,
-                description=description,
-                section_id=section_id,
-                service_provider_id=service_provider_id,
-                created_by=request.user,
-                updated_by=request.user
-            )
-            service_provider = service_request.service_provider
-
-            message = f'*نظام صيانة النادي الترفيهي الرياضي* \nلديك طلب صيانة: {service_request.section.name} \n عنوان الطلب كان: {service_request.title} \n تفاصيل الطلب: {service_request.description}'
-
-            for user in service_provider.manager.all():
-                user_to_alart_phone = user.profile.phone
-                # send message
-                send_message(user_to_alart_phone, message)
-            # Log creation
-            ServiceRequestLog.objects.create(
-                service_request=service_request,
-                comment='تم إنشاء طلب جديد',
-                created_by=request.user
-            )
+            # Similar open requests for the same section need an explicit confirmation
+            if not request.POST.get('confirm_duplicate'):
+                similar_requests = find_near_duplicates(
+                    request_signature(title, description), section_id, service_provider_id
+                )
+                if similar_requests:
+                    context = {
+                        'sections': sections,
+                        'service_providers': service_providers,
+                        'similar_requests': similar_requests,
+                        'form_data': {
+                            'title': title,
+                            'description': description,
+                            'section': section_id,
+                            'service_provider': service_provider_id,
+                            'client_id': client_id or '',
+                        },
+                    }
+                    return render(request, 'write/create_service_request.html', context)
+
+            # Create new request, once per client_id
+            service_request_id = record(client_id, request.user, ClientWrite.REQUEST, lambda: submit_service_request(
+                request.user, title, description, section_id, service_provider_id
+            ).id)[0]
 
             messages.success(request, 'تم إنشاء الطلب بنجاح')
-            return redirect('request_detail_sm', id=service_request.id)
+            return redirect('request_detail_sm', id=service_request_id)
         else:
             messages.error(request, 'الرجاء ملء جميع الحقول')
             return redirect('create_service_request')
@@ -770,11 +1057,145 @@ def create_service_request(request):
     return render(request, 'write/create_service_request.html', context)
 
 
+# --- offline mobile pages, see app1/offline.py --------------------------------
+
+def write_request(user, data):
+    title = str(data.get('title') or '').strip()
+    description = str(data.get('description') or '').strip()
+    section_id = str(data.get('section') or '')
+    service_provider_id = str(data.get('service_provider') or '')
+    if not (title and description and section_id and service_provider_id):
+        raise SyncError('الرجاء ملء جميع الحقول')
+    if not section_id.isdigit() or int(section_id) not in user_section_ids(user.id):
+        raise SyncError('القسم غير متاح')
+    if not service_provider_id.isdigit() or int(service_provider_id) not in {p.id for p in all_service_providers()}:
+        raise SyncError('مزود الخدمة غير متاح')
+    duplicate = find_duplicate(request_content_hash(title, description, section_id, service_provider_id, user.id))
+    if duplicate:
+        raise SyncError(f'هذا الطلب موجود بالفعل: #{duplicate.id}')
+    # the similar-requests confirmation can't be asked offline, the request is created anyway
+    return submit_service_request(user, title, description, section_id, service_provider_id).id
+
+
+def write_comment(user, data):
+    note = str(data.get('note') or '').strip()
+    if not note:
+        raise SyncError('الرجاء كتابة الملاحظة')
+    request_id = resolve_request_id(data.get('request'), user)
+    # archived requests are read-only, they are not in the default database
+    service_request = ServiceRequest.objects.filter(api.REQUEST.visible(user), pk=request_id).first()
+    if service_request is None:
+        raise SyncError('الطلب غير موجود او مؤرشف')
+    log_event(service_request, LogEvent.NOTE, user, note=note)
+    return service_request.id
+
+
+SYNC_WRITERS = {
+    ClientWrite.REQUEST: write_request,
+    ClientWrite.COMMENT: write_comment,
+}
+
+
+def replay_write(user, write):
+    """Apply one queued write, returns its result for the client."""
+    write = write if isinstance(write, dict) else {}
+    result = {'id': str(write.get('id'))}
+    client_id = parse_client_id(write.get('id'))
+    writer = SYNC_WRITERS.get(write.get('type'))
+    if client_id is None or writer is None:
+        return {**result, 'status': 'rejected', 'error': 'عملية غير معروفة'}
+    data = write.get('data') if isinstance(write.get('data'), dict) else {}
+    try:
+        object_id, created = record(client_id, user, write['type'], lambda: writer(user, data))
+    except SyncError as e:
+        return {**result, 'status': 'rejected', 'error': str(e)}
+    except Exception:
+        # kept in the client's queue and sent again with the next batch
+        logger.exception('replaying offline write %s failed', client_id)
+        return {**result, 'status': 'error', 'error': 'تعذر تنفيذ العملية، ستتم المحاولة لاحقاً'}
+    return {
+        **result,
+        'status': 'created' if created else 'duplicate',
+        'request': object_id,
+        'url': reverse('request_detail_sm', args=[object_id]),
+    }
+
+
+@require_POST
+def sync_writes(request):
+    """Replay the writes queued offline, in order; the client sends what is left with the next call."""
+    if not request.user.is_authenticated:
+        return JsonResponse({'error': 'سجل الدخول لإرسال العمليات المحفوظة'}, status=401)
+    try:
+        writes = json.loads(request.body)['writes']
+    except (ValueError, KeyError, TypeError):
+        return JsonResponse({'error': 'invalid body'}, status=400)
+    if not isinstance(writes, list):
+        return JsonResponse({'error': 'invalid body'}, status=400)
+    return JsonResponse({'results': [replay_write(request.user, write) for write in writes[:SYNC_BATCH_SIZE]]})
+
+
+@require_POST
+def add_comment(request, id):
+    if not request.user.is_authenticated:
+        return redirect('login')
+    note = request.POST.get('note', '').strip()
+    client_id = parse_client_id(request.POST.get('client_id'))
+    try:
+        record(client_id, request.user, ClientWrite.COMMENT, lambda: write_comment(request.user, {'note': note, 'request': id}))
+    except SyncError as e:
+        messages.error(request, str(e))
+    else:
+        messages.success(request, 'تمت إضافة الملاحظة')
+    return redirect('request_detail_sm', id=id)
+
+
+def service_worker(request):
+    # served from the root so its scope covers every page
+    shell = [static(path) for path in SHELL_STATIC] + list(SHELL_CDN)
+    context = {
+        'version': hashlib.md5(json.dumps(shell).encode()).hexdigest()[:12],
+        'shell': json.dumps(shell),
+        'cdn_origins': json.dumps(sorted({url.split('/', 3)[2] for url in SHELL_CDN})),
+        'cached_pages': CACHED_PAGES,
+        # the ids in these paths are matched as \d+ by the worker
+        'page_patterns': json.dumps([
+            reverse('request_detail_sm', args=[0]), reverse('create_service_request'), reverse('home'),
+        ]),
+        'queued_posts': json.dumps({
+            reverse('create_service_request'): ClientWrite.REQUEST,
+            reverse('add_comment', args=[0]): ClientWrite.COMMENT,
+        }),
+    }
+    response = render(request, 'pwa/sw.js', context, content_type='application/javascript')
+    response['Cache-Control'] = 'no-cache'
+    return response
+
+
+def web_manifest(request):
+    return JsonResponse({
+        'name': 'إدارة الخدمات - النادي الترفيهي الرياضي',
+        'short_name': 'إدارة الخدمات',
+        'lang': 'ar',
+        'dir': 'rtl',
+        'start_url': reverse('home'),
+        'display': 'standalone',
+        'background_color': '#ffffff',
+        'theme_color': '#4e73df',
+        'icons': [{'src': static('images/logo.png'), 'sizes': '225x225', 'type': 'image/png'}],
+    }, content_type='application/manifest+json', json_dumps_params={'ensure_ascii': False})
+
+
+def offline_page(request):
+    return render(request, 'pwa/offline.html')
+
+
 
 
 
+@replica_reads
 def purchase_order_list(request):
-    orders = PurchaseOrder.objects.filter(status__in=['approved', 'supplied']).order_by('-created_at')
+    orders = purchase_order_rows(PurchaseOrder.objects.filter(status__in=['approved', 'supplied'])).order_by('-created_at')
     return render(request, 'read/purchase_orders.html', {'orders': orders})
 
 
@@ -783,16 +1204,15 @@ from django.core.serializers import serialize
 from .models import PurchaseOrder
 from django.utils.dateformat import format as date_format
 
+@replica_reads
 def purchase_order_list_api(request):
     status = request.GET.get('status', '')
     
     search = request.GET.get('search', '')
-    orders = PurchaseOrder.objects.all()
+    orders = PurchaseOrder.objects.select_related('report')
     if status:
-        print(status)
         orders = orders.filter(status__in=status.split(','))
     if search:
-        print(search)
         orders = orders.filter(refrence_number__icontains=search)
     
     # Build a list of dictionaries with needed fields
@@ -818,7 +1238,7 @@ def purchase_order_list_api(request):
             'status_display': order.get_status_display(),
             'badge_class': badge_class,
             'created_at': date_format(order.created_at, "Y-m-d H:i"),
-            'service_request_id': order.report.service_request.id,
+            'service_request_id': order.report.service_request_id,
         })
     
     
@@ -844,10 +1264,10 @@ def update_order_status(request):
     # تحديد فئة البادج بناءً على الحالة
     if new_status == 'supplied':
         badge_class = "bg-success"
-        service_providers = order.report.service_request.service_provider.manager.all()
-        for service_provider in service_providers:
-            message = f'*نظام صيانة النادي الترفيهي الرياضي* \nتم توريد الطلب الخاص بك \n عنوان الطلب كان: {order.report.service_request.title} \n تفاصيل الطلب: {order.report.service_request.description}'
-            send_message(service_provider.profile.phone, message)
+        service_request = order.report.service_request
+        message = f'*نظام صيانة النادي الترفيهي الرياضي* \nتم توريد الطلب الخاص بك \n عنوان الطلب كان: {service_request.title} \n تفاصيل الطلب: {service_request.description}'
+        for manager_phone in provider_manager_phones(service_request.service_provider_id):
+            notify(manager_phone, message, summary_line('تم توريد الطلب', service_request))
     elif new_status == 'approved':
         badge_class = "bg-warning"
     elif new_status == 'used':
@@ -0,0 +1,93 @@
+import logging
+import time
+from pathlib import Path
+
+from django.conf import settings
+from django.contrib.staticfiles.storage import staticfiles_storage
+from django.db import connections
+from django.template import engines
+from django.urls import get_resolver, reverse
+from django.utils import translation
+
+logger = logging.getLogger(__name__)
+
+
+# Passenger starts a fresh process after every deploy (tmp/restart.txt) and
+# whenever it scales up, and that process used to compile the URLconf, the
+# templates and its catalogs while the first visitor waited. passenger_wsgi.py
+# calls warmup() before handing the application to Passenger, so the worker
+# does that work before it accepts requests. Set WARMUP_ON_START = False to
+# skip it; `manage.py measure_cold_start` shows what it saves.
+
+
+def _project_templates():
+    """Names of the templates under BASE_DIR, admin and third-party apps are left cold."""
+    base_dir = Path(settings.BASE_DIR).resolve()
+    names = set()
+    for engine in engines.all():
+        for directory in getattr(engine, 'template_dirs', ()):
+            directory = Path(directory).resolve()
+            if directory.is_relative_to(base_dir) and 'site-packages' not in directory.parts:
+                names.update(path.relative_to(directory).as_posix() for path in directory.rglob('*.html'))
+    return sorted(names)
+
+
+def warm_urls():
+    resolver = get_resolver()
+    # reverse() fills the reverse dicts of every included resolver, admin's too
+    resolver.url_patterns
+    reverse('home')
+    return len(resolver.reverse_dict)
+
+
+def warm_templates():
+    names = getattr(settings, 'WARMUP_TEMPLATES', None) or _project_templates()
+    engine = engines['django']
+    for name in names:
+        # the cached loader keeps the compiled template for the life of the process
+        engine.get_template(name)
+    return len(names)
+
+
+def warm_translations():
+    with translation.override(settings.LANGUAGE_CODE):
+        translation.gettext('Home')
+    return settings.LANGUAGE_CODE
+
+
+def warm_static():
+    # the manifest storage reads staticfiles.json when it is first used
+    return staticfiles_storage.base_url
+
+
+def warm_databases():
+    # only pays off with CONN_MAX_AGE, otherwise the first request reconnects
+    for alias in settings.DATABASES:
+        connection = connections[alias]
+        connection.ensure_connection()
+        with connection.cursor() as cursor:
+            cursor.execute('SELECT 1')
+    return len(settings.DATABASES)
+
+
+STEPS = {
+    'urls': warm_urls,
+    'templates': warm_templates,
+    'translations': warm_translations,
+    'static': warm_static,
+    'databases': warm_databases,
+}
+
+
+def warmup(steps=tuple(STEPS)):
+    """Run the warmup steps, returns {step: milliseconds}; a failing step is logged and skipped."""
+    timings = {}
+    for step in steps:
+        started = time.perf_counter()
+        try:
+            STEPS[step]()
+        except Exception:
+            logger.exception('warmup step %s failed', step)
+            continue
+        timings[step] = round((time.perf_counter() - started) * 1000, 1)
+    return timings
@@ -1 +1,9 @@
-from project.wsgi import application
\ No newline at end of file
+from django.conf import settings
+
+from project.wsgi import application
+
+# compile the URLconf and templates and connect before the first request, see app1/warmup.py
+if getattr(settings, 'WARMUP_ON_START', True):
+    from app1.warmup import warmup
+
+    warmup()
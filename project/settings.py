@@ -49,11 +49,14 @@ INSTALLED_APPS = [
 
 MIDDLEWARE = [
     'django.middleware.security.SecurityMiddleware',
+    'app1.compression.CompressionMiddleware',
+    'app1.compression.HtmlMinifyMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
     'django.contrib.auth.middleware.AuthenticationMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
+    'app1.replica.ReplicaMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
 ]
 
@@ -87,8 +90,55 @@ DATABASES = {
     'default': {
         'ENGINE': 'django.db.backends.sqlite3',
         'NAME': BASE_DIR / 'db.sqlite3',
-    }
+        # kept open between requests, so the one passenger_wsgi.py warms up is reused
+        'CONN_MAX_AGE': 300,
+        'CONN_HEALTH_CHECKS': True,
+    },
+    # completed requests moved out of the hot tables by `manage.py archive_requests`
+    'archive': {
+        'ENGINE': 'django.db.backends.sqlite3',
+        'NAME': BASE_DIR / 'archive.sqlite3',
+        'CONN_MAX_AGE': 300,
+        'CONN_HEALTH_CHECKS': True,
+    },
 }
+ARCHIVE_DATABASE = 'archive'
+
+# Read-only views (@replica_reads in app1.views) are served from a replica when
+# DJANGO_REPLICA_DB names one; locally `manage.py sync_replica` keeps that SQLite
+# copy in step with db.sqlite3. Sessions that just wrote stay on the primary for
+# REPLICA_PIN_SECONDS so they read their own writes.
+REPLICA_DATABASE = 'replica'
+REPLICA_PIN_SECONDS = 10
+if os.environ.get('DJANGO_REPLICA_DB'):
+    DATABASES[REPLICA_DATABASE] = {
+        'ENGINE': 'django.db.backends.sqlite3',
+        'NAME': os.environ['DJANGO_REPLICA_DB'],
+        'TEST': {'MIRROR': 'default'},
+    }
+DATABASE_ROUTERS = ['app1.replica.ReplicaRouter']
+
+# One cache shared by every Passenger worker: Redis when REDIS_URL is set,
+# otherwise files under BASE_DIR/cache, which works the same on a single host.
+if os.environ.get('REDIS_URL'):
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+            'LOCATION': os.environ['REDIS_URL'],
+            'KEY_PREFIX': 'club_work_flow',
+        },
+    }
+else:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+            'LOCATION': BASE_DIR / 'cache',
+            'OPTIONS': {'MAX_ENTRIES': 5000},
+        },
+    }
+
+# sessions are read from the cache and only fall back to django_session on a miss
+SESSION_ENGINE = 'django.contrib.sessions.backends.cached_db'
 
 
 # Password validation
@@ -131,10 +181,64 @@ STATICFILES_DIRS = [
 ]
 STATIC_ROOT = '/home/spordjei/net.sportainmentclub.com/static'
 
+# collectstatic writes content-hashed names (so browsers can cache them for a
+# year) and .gz/.br copies next to them, see app1/storage.py. The hashed names
+# are only used in templates when DEBUG is off.
+STORAGES = {
+    'default': {
+        'BACKEND': 'django.core.files.storage.FileSystemStorage',
+    },
+    'staticfiles': {
+        'BACKEND': 'app1.storage.CompressedManifestStaticFilesStorage',
+    },
+}
+
+# HTML responses are minified and, above this size, sent with brotli or gzip,
+# see app1/compression.py for the pages kept uncompressed because of BREACH
+COMPRESS_MIN_SIZE = 1024
+HTML_MINIFY = True
+
+# background tasks of app1.taskqueue, run by `manage.py run_tasks` (on the
+# shared host from cron every minute: `manage.py run_tasks --burst`)
+TASK_QUEUE_EAGER = False
+TASK_LEASE_SECONDS = 5 * 60
+TASK_RETRY_DELAY = 30
+
+# recipients in digest mode get one WhatsApp summary per window, see app1/notifications.py
+NOTIFICATION_DIGEST_MINUTES = 15
+
+# new Passenger workers compile the URLconf and templates and connect to the
+# databases before their first request, see app1/warmup.py
+WARMUP_ON_START = True
+
+# WhatsApp gateway, see app1/gateway.py; URL and credentials come from the
+# environment, nothing is sent without them. The rate is the provider's quota,
+# shared by all processes through the cache, and the circuit opens after
+# FAILURE_THRESHOLD failed messages in a row
+WHATSAPP_GATEWAY = {
+    'URL': os.environ.get('WHATSAPP_GATEWAY_URL', ''),
+    'USER': os.environ.get('WHATSAPP_GATEWAY_USER', ''),
+    'PASSWORD': os.environ.get('WHATSAPP_GATEWAY_PASSWORD', ''),
+    'CONNECT_TIMEOUT': 3,
+    'READ_TIMEOUT': 10,
+    'RATE_PER_MINUTE': 30,
+    'BURST': 5,
+    'FAILURE_THRESHOLD': 5,
+    'RESET_SECONDS': 60,
+}
+
 
 MEDIA_URL = '/media/'
 MEDIA_ROOT = os.path.join(BASE_DIR, 'media')
 
+# photo attachments of the requests, see app1/attachments.py; the blob store
+# keeps each file once under its sha256, LocalBlobStore in MEDIA_ROOT/attachments
+ATTACHMENT_BLOB_STORE = 'app1.blobstore.LocalBlobStore'
+ATTACHMENT_MAX_SIZE = 25 * 1024 * 1024
+ATTACHMENT_CHUNK_SIZE = 1024 * 1024
+ATTACHMENT_CHUNK_TIMEOUT = 10 * 60
+ATTACHMENT_UPLOAD_EXPIRY_HOURS = 24
+
 
 # Default primary key field type
 # https://docs.djangoproject.com/en/5.0/ref/settings/#default-auto-field
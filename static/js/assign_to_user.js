@@ -0,0 +1,64 @@
+// البحث عن مسؤولي مزود الخدمة على دفعات بدلاً من تحميل كل المستخدمين
+const searchInput = document.getElementById('userSearch');
+const searchUrl = searchInput.dataset.searchUrl;
+const resultsBox = document.getElementById('userResults');
+const loadMoreBtn = document.getElementById('loadMoreUsers');
+const userIdInput = document.getElementById('user_id');
+let currentPage = 1;
+let searchTimer = null;
+
+function renderUser(user) {
+  const item = document.createElement('button');
+  item.type = 'button';
+  item.className = 'list-group-item list-group-item-action d-flex align-items-center gap-2';
+  item.setAttribute('data-no-loader', '');
+  if (String(user.id) === userIdInput.value) {
+    item.classList.add('active');
+  }
+  if (user.avatar) {
+    const img = document.createElement('img');
+    img.src = user.avatar;
+    if (user.avatar_srcset) img.srcset = user.avatar_srcset;
+    img.width = 24;
+    img.height = 24;
+    img.loading = 'lazy';
+    img.className = 'rounded-circle';
+    item.appendChild(img);
+  } else {
+    item.insertAdjacentHTML('beforeend', '<i class="fas fa-user-circle text-secondary"></i>');
+  }
+  const label = document.createElement('span');
+  label.textContent = user.name;
+  item.appendChild(label);
+  item.addEventListener('click', function () {
+    userIdInput.value = user.id;
+    resultsBox.querySelectorAll('.active').forEach(el => el.classList.remove('active'));
+    item.classList.add('active');
+  });
+  resultsBox.appendChild(item);
+}
+
+function loadUsers(page) {
+  const query = `?q=${encodeURIComponent(searchInput.value.trim())}&page=${page}`;
+  fetch(searchUrl + query)
+    .then(response => response.json())
+    .then(data => {
+      if (page === 1) {
+        resultsBox.innerHTML = '';
+        if (data.results.length === 0) {
+          resultsBox.innerHTML = '<div class="list-group-item text-muted">لا يوجد مستخدمون مطابقون</div>';
+        }
+      }
+      data.results.forEach(renderUser);
+      currentPage = data.page;
+      loadMoreBtn.classList.toggle('d-none', !data.has_next);
+    })
+    .catch(error => console.error('Error fetching users:', error));
+}
+
+searchInput.addEventListener('input', function () {
+  clearTimeout(searchTimer);
+  searchTimer = setTimeout(() => loadUsers(1), 250);
+});
+loadMoreBtn.addEventListener('click', () => loadUsers(currentPage + 1));
+document.addEventListener('DOMContentLoaded', () => loadUsers(1));
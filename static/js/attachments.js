@@ -0,0 +1,184 @@
+// Photo uploads of the request pages, see app1/attachments.py. A file is sent
+// in chunks, each a PATCH at Upload-Offset; the url of its upload is kept in
+// localStorage, so after a dropped connection, or when the same file is
+// picked again later, the upload carries on from the offset the server has.
+(function () {
+  const form = document.querySelector('[data-attachment-upload]');
+  if (!form) {
+    return;
+  }
+  const progress = document.querySelector('[data-attachment-progress]');
+  const button = form.querySelector('button[type="submit"]');
+  // attempts after a network error, waiting 1, 2, 4 ... seconds
+  const RETRIES = 5;
+
+  function csrfToken() {
+    const match = document.cookie.match(/(?:^|;\s*)csrftoken=([^;]+)/);
+    return match ? decodeURIComponent(match[1]) : '';
+  }
+
+  function call(url, options) {
+    options.credentials = 'same-origin';
+    options.headers = Object.assign({ 'X-CSRFToken': csrfToken() }, options.headers || {});
+    return fetch(url, options);
+  }
+
+  function wait(ms) {
+    return new Promise(function (resolve) {
+      setTimeout(resolve, ms);
+    });
+  }
+
+  function storageKey(file) {
+    return ['attachment-upload', form.dataset.request, file.name, file.size, file.lastModified].join(':');
+  }
+
+  function failure(response) {
+    return response.json().catch(function () {
+      return {};
+    }).then(function (data) {
+      const error = new Error(data.error || 'تعذر رفع الصورة');
+      error.fatal = true;
+      throw error;
+    });
+  }
+
+  function progressBar(file) {
+    const row = document.createElement('div');
+    row.className = 'small mb-2';
+    const name = document.createElement('div');
+    name.textContent = file.name;
+    const outer = document.createElement('div');
+    outer.className = 'progress';
+    const bar = document.createElement('div');
+    bar.className = 'progress-bar';
+    bar.setAttribute('role', 'progressbar');
+    outer.appendChild(bar);
+    row.appendChild(name);
+    row.appendChild(outer);
+    progress.appendChild(row);
+    return {
+      update: function (offset) {
+        bar.style.width = Math.round(offset * 100 / file.size) + '%';
+      },
+      done: function () {
+        bar.style.width = '100%';
+        bar.classList.add('bg-success');
+      },
+      fail: function (text) {
+        bar.classList.add('bg-danger');
+        name.textContent = file.name + ': ' + text;
+      },
+    };
+  }
+
+  // the upload this file started earlier, or a new one
+  function start(file, fields) {
+    const saved = localStorage.getItem(storageKey(file));
+    const earlier = !saved ? Promise.resolve(null) : call(saved, { method: 'GET' }).then(function (response) {
+      if (!response.ok) {
+        localStorage.removeItem(storageKey(file));
+        return null;
+      }
+      return response.json().then(function (data) {
+        return { url: saved, offset: data.offset, chunkSize: data.chunk_size };
+      });
+    });
+    return earlier.then(function (upload) {
+      if (upload) {
+        return upload;
+      }
+      const body = new URLSearchParams(fields);
+      body.set('name', file.name);
+      body.set('size', file.size);
+      return call(form.dataset.url, {
+        method: 'POST',
+        headers: { 'Content-Type': 'application/x-www-form-urlencoded' },
+        body: body,
+      }).then(function (response) {
+        if (!response.ok) {
+          return failure(response);
+        }
+        return response.json().then(function (data) {
+          localStorage.setItem(storageKey(file), data.url);
+          return { url: data.url, offset: data.offset, chunkSize: data.chunk_size };
+        });
+      });
+    });
+  }
+
+  function send(file, upload, bar, attempt) {
+    const end = Math.min(upload.offset + upload.chunkSize, file.size);
+    return call(upload.url, {
+      method: 'PATCH',
+      headers: { 'Content-Type': 'application/offset+octet-stream', 'Upload-Offset': String(upload.offset) },
+      body: file.slice(upload.offset, end),
+    }).then(function (response) {
+      if (response.status === 201) {
+        return response.json();
+      }
+      if (!response.ok && response.status !== 409) {
+        return failure(response);
+      }
+      // 409: the chunk was not at the server's offset, continue from there
+      return response.json().then(function (data) {
+        upload.offset = data.offset;
+        bar.update(upload.offset);
+        return send(file, upload, bar, 0);
+      });
+    }, function () {
+      if (attempt >= RETRIES) {
+        throw new Error('انقطع الاتصال، اختر الصورة مرة أخرى لاستكمال رفعها');
+      }
+      // part of the chunk may have arrived, ask the server where to carry on
+      return wait(1000 * Math.pow(2, attempt)).then(function () {
+        return call(upload.url, { method: 'GET' }).then(function (response) {
+          return response.json();
+        }).then(function (data) {
+          upload.offset = data.offset;
+        }).catch(function () {});
+      }).then(function () {
+        return send(file, upload, bar, attempt + 1);
+      });
+    });
+  }
+
+  form.addEventListener('submit', function (event) {
+    event.preventDefault();
+    const files = Array.from(form.querySelector('input[type="file"]').files);
+    if (!files.length) {
+      return;
+    }
+    const fields = { service_request: form.dataset.request, kind: form.elements.kind.value };
+    if (form.elements.completion_report) {
+      fields.completion_report = form.elements.completion_report.value;
+    }
+    let failed = false;
+    button.disabled = true;
+    // one file after the other, the phone's uplink is shared anyway
+    files.reduce(function (previous, file) {
+      return previous.then(function () {
+        const bar = progressBar(file);
+        return start(file, fields).then(function (upload) {
+          bar.update(upload.offset);
+          return send(file, upload, bar, 0);
+        }).then(function () {
+          localStorage.removeItem(storageKey(file));
+          bar.done();
+        }, function (error) {
+          if (error.fatal) {
+            localStorage.removeItem(storageKey(file));
+          }
+          bar.fail(error.message);
+          failed = true;
+        });
+      });
+    }, Promise.resolve()).then(function () {
+      if (failed) {
+        button.disabled = false;
+      } else {
+        window.location.reload();
+      }
+    });
+  });
+})();
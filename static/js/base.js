@@ -0,0 +1,24 @@
+// Hide loader when page is shown, including back/forward cache
+window.addEventListener('pageshow', function (event) {
+  if (event.persisted || performance.getEntriesByType("navigation")[0].type === "back_forward") {
+    document.querySelector('.loader-overlay').classList.add('hidden');
+  }
+});
+
+// Hide loader on full load
+window.addEventListener('load', function () {
+  document.querySelector('.loader-overlay').classList.add('hidden');
+});
+
+// Show loader overlay on link or form submissions
+document.addEventListener('click', function (e) {
+  const target = e.target.closest('a, button[type="submit"]');
+  if (target && !target.hasAttribute('data-no-loader') && !target.getAttribute('target')) {
+    document.querySelector('.loader-overlay').classList.remove('hidden');
+  }
+});
+
+// Show loader on unload (navigation away)
+window.addEventListener('beforeunload', function () {
+  document.querySelector('.loader-overlay').classList.remove('hidden');
+});
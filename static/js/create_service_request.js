@@ -0,0 +1,67 @@
+// جافا سكريبت لتحكم الخطوات مع تأثيرات متحركة جذابة
+document.addEventListener('DOMContentLoaded', function() {
+  const steps = document.querySelectorAll('.wizard-step');
+  const nextButtons = document.querySelectorAll('.next-step');
+  const prevButtons = document.querySelectorAll('.prev-step');
+  const progressSteps = document.querySelectorAll('.progress-step');
+  let currentStep = 0;
+
+  function showStep(step) {
+    steps.forEach((el, index) => {
+      if (index === step) {
+        el.classList.remove('d-none');
+        // إضافة تأثير الحركة مع تأخير بسيط
+        setTimeout(() => { el.classList.add('active'); }, 50);
+      } else {
+        el.classList.add('d-none');
+        el.classList.remove('active');
+      }
+    });
+    progressSteps.forEach((stepEl, index) => {
+      if (index <= step) {
+        stepEl.classList.add('active');
+      } else {
+        stepEl.classList.remove('active');
+      }
+    });
+  }
+
+  nextButtons.forEach(button => {
+    button.addEventListener('click', function() {
+      // التحقق من صحة البيانات في الخطوة الحالية
+      if (currentStep === 0) {
+        const title = document.getElementById('title').value.trim();
+        const description = document.getElementById('description').value.trim();
+        if (!title || !description) {
+          alert('يرجى تعبئة جميع الحقول في هذه الخطوة');
+          return;
+        }
+      }
+      if (currentStep === 1) {
+        const section = document.getElementById('section').value;
+        const serviceProvider = document.getElementById('service_provider').value;
+        if (!section || !serviceProvider) {
+          alert('يرجى اختيار القسم ومزود الخدمة');
+          return;
+        }
+        // إعداد بيانات المراجعة للخطوة الثالثة
+        document.getElementById('reviewTitle').innerText = document.getElementById('title').value;
+        document.getElementById('reviewDescription').innerText = document.getElementById('description').value;
+        document.getElementById('reviewSection').innerText = document.getElementById('section').selectedOptions[0].text;
+        document.getElementById('reviewServiceProvider').innerText = document.getElementById('service_provider').selectedOptions[0].text;
+      }
+      currentStep++;
+      showStep(currentStep);
+    });
+  });
+
+  prevButtons.forEach(button => {
+    button.addEventListener('click', function() {
+      currentStep--;
+      showStep(currentStep);
+    });
+  });
+
+  // عرض الخطوة الأولى عند تحميل الصفحة
+  showStep(currentStep);
+});
@@ -0,0 +1,13 @@
+// Function to preview the image
+function previewImage(input) {
+  if (input.files && input.files[0]) {
+    var reader = new FileReader();
+
+    reader.onload = function (e) {
+      $('#imagePreview').attr('src', e.target.result);
+      $('#imagePreview').show();
+    }
+
+    reader.readAsDataURL(input.files[0]);
+  }
+}
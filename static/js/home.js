@@ -0,0 +1,43 @@
+// Parse the JSON-encoded context variables.
+const canvas = document.getElementById('sectionStatusChart');
+const sections = JSON.parse(canvas.dataset.sections);
+const statusChoices = JSON.parse(canvas.dataset.statusChoices);
+const chartData = JSON.parse(canvas.dataset.chartData);
+
+// Generate datasets for each status with different colors
+const datasets = statusChoices.map(status => {
+  let color;
+  switch (status) {
+    case 'pending': color = 'rgba(255, 206, 86, 0.6)'; break;
+    case 'in_progress': color = 'rgba(54, 162, 235, 0.6)'; break;
+    case 'under_review': color = 'rgba(153, 102, 255, 0.6)'; break;
+    case 'completed': color = 'rgba(75, 192, 192, 0.6)'; break;
+    default: color = 'rgba(201, 203, 207, 0.6)';
+  }
+  return {
+    label: status,
+    data: chartData[status],
+    backgroundColor: color,
+    borderColor: color.replace('0.6', '1'),
+    borderWidth: 1
+  };
+});
+
+// Create the bar chart using Chart.js
+const ctx = canvas.getContext('2d');
+const sectionStatusChart = new Chart(ctx, {
+  type: 'bar',
+  data: {
+    labels: sections,
+    datasets: datasets
+  },
+  options: {
+    responsive: true,
+    scales: {
+      y: {
+        beginAtZero: true,
+        ticks: { stepSize:1 }
+      }
+    }
+  }
+});
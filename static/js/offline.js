@@ -0,0 +1,165 @@
+// Offline mode of the mobile pages: registers the service worker (sw.js),
+// queues the forms marked data-offline while there is no connection and sends
+// the queue once the phone is back online. See app1/offline.py.
+(function () {
+  const body = document.body;
+  const user = body.dataset.offlineUser || '';
+  const syncUrl = body.dataset.syncUrl;
+  const queue = window.OfflineQueue;
+  if (!queue || !('indexedDB' in window)) {
+    return;
+  }
+
+  // the offline page lists what is waiting and the requests readable offline; it
+  // is cached when the worker installs, so the user is taken from the queue
+  function showOfflinePage(user) {
+    const queuedList = document.getElementById('offline-queue');
+    queue.all().then(function (writes) {
+      writes.filter(function (w) { return w.user === user; }).forEach(function (write) {
+        const item = document.createElement('li');
+        item.className = 'list-group-item';
+        const label = write.type === 'request' ? 'طلب: ' + (write.data.title || '') : 'ملاحظة: ' + (write.data.note || '');
+        item.textContent = label + (write.error ? ' (' + write.error + ')' : '');
+        queuedList.appendChild(item);
+      });
+    });
+    const cachedList = document.getElementById('offline-pages');
+    if ('caches' in window) {
+      caches.open('club-pages').then(function (cache) { return cache.keys(); }).then(function (keys) {
+        keys.reverse().forEach(function (key) {
+          const item = document.createElement('a');
+          item.className = 'list-group-item list-group-item-action';
+          item.href = key.url;
+          const id = new URL(key.url).pathname.match(/\d+/);
+          item.textContent = id ? 'طلب #' + id[0] : new URL(key.url).pathname;
+          cachedList.appendChild(item);
+        });
+      });
+    }
+  }
+
+  if ('offlinePage' in body.dataset) {
+    queue.getMeta('user').then(showOfflinePage);
+    return;
+  }
+
+  function csrfToken() {
+    const match = document.cookie.match(/(?:^|;\s*)csrftoken=([^;]+)/);
+    return match ? decodeURIComponent(match[1]) : '';
+  }
+
+  function showMessage(text, kind) {
+    const container = document.querySelector('.container.mt-4') || body;
+    const alert = document.createElement('div');
+    alert.className = 'alert alert-' + (kind || 'info') + ' alert-dismissible fade show';
+    alert.setAttribute('role', 'alert');
+    alert.textContent = text;
+    const close = document.createElement('button');
+    close.type = 'button';
+    close.className = 'btn-close';
+    close.setAttribute('data-bs-dismiss', 'alert');
+    alert.appendChild(close);
+    container.prepend(alert);
+  }
+
+  function updateStatus() {
+    const status = document.getElementById('offline-status');
+    if (!status) {
+      return Promise.resolve();
+    }
+    return queue.pending(user).then(function (writes) {
+      const parts = [];
+      if (!navigator.onLine) {
+        parts.push('غير متصل');
+      }
+      if (writes.length) {
+        parts.push('بانتظار الإرسال: ' + writes.length);
+      }
+      status.textContent = parts.join(' - ');
+      status.classList.toggle('d-none', !parts.length);
+    });
+  }
+
+  function flush() {
+    if (!navigator.onLine || !user) {
+      return updateStatus();
+    }
+    return queue.flush(syncUrl, csrfToken()).then(function (results) {
+      const sent = results.filter(function (r) { return r.status === 'created'; }).length;
+      const rejected = results.filter(function (r) { return r.status === 'rejected'; });
+      if (sent) {
+        showMessage('تم إرسال ' + sent + ' من العمليات المحفوظة', 'success');
+      }
+      rejected.forEach(function (r) { showMessage(r.error, 'danger'); });
+    }).catch(function () {
+      // still no connection to the server, the queue is kept
+    }).then(updateStatus);
+  }
+
+  // every form marked data-offline posts a client_id, the server handles each id once
+  document.querySelectorAll('form[data-offline]').forEach(function (form) {
+    let input = form.querySelector('input[name="client_id"]');
+    if (!input) {
+      input = document.createElement('input');
+      input.type = 'hidden';
+      input.name = 'client_id';
+      form.appendChild(input);
+    }
+    input.value = input.value || queue.uuid();
+
+    form.addEventListener('submit', function (event) {
+      if (navigator.onLine) {
+        // a connection that drops on the way is caught by the service worker
+        return;
+      }
+      event.preventDefault();
+      const data = Object.fromEntries(new FormData(form).entries());
+      if (form.dataset.offlineRequest) {
+        data.request = form.dataset.offlineRequest;
+      }
+      queue.add(form.dataset.offline, data, csrfToken()).then(function () {
+        showMessage('لا يوجد اتصال، تم حفظ العملية وسيتم إرسالها تلقائياً عند عودة الاتصال', 'warning');
+        form.reset();
+        input.value = queue.uuid();
+        document.querySelector('.loader-overlay').classList.add('hidden');
+        return navigator.serviceWorker && navigator.serviceWorker.ready;
+      }).then(function (registration) {
+        if (registration && registration.sync) {
+          return registration.sync.register('offline-writes');
+        }
+      }).catch(function () {}).then(updateStatus);
+    });
+  });
+
+  // the queue and cached pages belong to one user, a logout clears the pages
+  document.querySelectorAll('form[action="' + body.dataset.logoutUrl + '"]').forEach(function (form) {
+    form.addEventListener('submit', function () {
+      queue.setMeta('user', '');
+      if (navigator.serviceWorker && navigator.serviceWorker.controller) {
+        navigator.serviceWorker.controller.postMessage({ type: 'logout' });
+      }
+    });
+  });
+
+  queue.getMeta('user').then(function (previous) {
+    if (previous !== user && navigator.serviceWorker && navigator.serviceWorker.controller) {
+      navigator.serviceWorker.controller.postMessage({ type: 'logout' });
+    }
+    return queue.setMeta('user', user);
+  }).then(flush);
+
+  if ('serviceWorker' in navigator) {
+    navigator.serviceWorker.register(body.dataset.serviceWorker).then(function () {
+      return navigator.serviceWorker.ready;
+    }).then(function (registration) {
+      // pages linked with data-offline-prefetch work offline before they were ever opened
+      const urls = Array.from(document.querySelectorAll('a[data-offline-prefetch]'), function (a) { return a.href; });
+      if (user && urls.length && registration.active) {
+        registration.active.postMessage({ type: 'prefetch', urls: Array.from(new Set(urls)) });
+      }
+    }).catch(function () {});
+  }
+
+  window.addEventListener('online', flush);
+  window.addEventListener('offline', updateStatus);
+})();
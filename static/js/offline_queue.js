@@ -0,0 +1,157 @@
+// IndexedDB queue of the requests and comments made while offline, used by the
+// pages (offline.js) and the service worker (sw.js). Every write keeps the id
+// it was queued under, the server replays an id only once (app1/offline.py).
+(function (scope) {
+  const DB_NAME = 'club-offline';
+  const WRITES = 'writes';
+  const META = 'meta';
+  // a write the server failed on this many times stays in the queue as failed
+  const MAX_ATTEMPTS = 5;
+  let flushing = null;
+
+  function openDb() {
+    return new Promise(function (resolve, reject) {
+      const request = indexedDB.open(DB_NAME, 1);
+      request.onupgradeneeded = function () {
+        request.result.createObjectStore(WRITES, { keyPath: 'id' });
+        request.result.createObjectStore(META);
+      };
+      request.onsuccess = function () { resolve(request.result); };
+      request.onerror = function () { reject(request.error); };
+    });
+  }
+
+  function transact(storeName, mode, action) {
+    return openDb().then(function (db) {
+      return new Promise(function (resolve, reject) {
+        const tx = db.transaction(storeName, mode);
+        const request = action(tx.objectStore(storeName));
+        tx.oncomplete = function () {
+          db.close();
+          resolve(request ? request.result : undefined);
+        };
+        tx.onerror = function () {
+          db.close();
+          reject(tx.error);
+        };
+      });
+    });
+  }
+
+  function uuid() {
+    if (scope.crypto && crypto.randomUUID) {
+      return crypto.randomUUID();
+    }
+    const bytes = crypto.getRandomValues(new Uint8Array(16));
+    bytes[6] = (bytes[6] & 0x0f) | 0x40;
+    bytes[8] = (bytes[8] & 0x3f) | 0x80;
+    const hex = Array.from(bytes, function (b) { return b.toString(16).padStart(2, '0'); }).join('');
+    return hex.slice(0, 8) + '-' + hex.slice(8, 12) + '-' + hex.slice(12, 16) + '-' + hex.slice(16, 20) + '-' + hex.slice(20);
+  }
+
+  function getMeta(key) {
+    return transact(META, 'readonly', function (store) { return store.get(key); });
+  }
+
+  function setMeta(key, value) {
+    return transact(META, 'readwrite', function (store) { return store.put(value, key); });
+  }
+
+  function all() {
+    return transact(WRITES, 'readonly', function (store) { return store.getAll(); }).then(function (writes) {
+      return writes.sort(function (a, b) { return a.queuedAt - b.queuedAt; });
+    });
+  }
+
+  function put(write) {
+    return transact(WRITES, 'readwrite', function (store) { return store.put(write); });
+  }
+
+  function remove(id) {
+    return transact(WRITES, 'readwrite', function (store) { return store.delete(id); });
+  }
+
+  // type is 'request' or 'comment', data the fields of its form
+  function add(type, data, csrfToken) {
+    return getMeta('user').then(function (user) {
+      const write = {
+        id: data.client_id || uuid(),
+        type: type,
+        data: data,
+        user: user || '',
+        csrf: csrfToken || data.csrfmiddlewaretoken || '',
+        queuedAt: Date.now(),
+        attempts: 0,
+        error: '',
+      };
+      delete write.data.csrfmiddlewaretoken;
+      return put(write).then(function () { return write; });
+    });
+  }
+
+  function pending(user) {
+    return all().then(function (writes) {
+      return writes.filter(function (write) { return write.user === user && write.attempts < MAX_ATTEMPTS; });
+    });
+  }
+
+  // Send the current user's writes to syncUrl; resolves with the server's
+  // results, rejects (keeping the queue) when the server can't be reached.
+  function flush(syncUrl, csrfToken) {
+    if (flushing) {
+      return flushing;
+    }
+    flushing = getMeta('user').then(function (user) {
+      return pending(user || '');
+    }).then(function (writes) {
+      if (!writes.length) {
+        return [];
+      }
+      const token = csrfToken || writes[writes.length - 1].csrf;
+      return fetch(syncUrl, {
+        method: 'POST',
+        credentials: 'same-origin',
+        headers: { 'Content-Type': 'application/json', 'X-CSRFToken': token },
+        body: JSON.stringify({
+          writes: writes.map(function (write) { return { id: write.id, type: write.type, data: write.data }; }),
+        }),
+      }).then(function (response) {
+        if (!response.ok) {
+          throw new Error('sync failed: ' + response.status);
+        }
+        return response.json();
+      }).then(function (body) {
+        const byId = {};
+        writes.forEach(function (write) { byId[write.id] = write; });
+        return Promise.all(body.results.map(function (result) {
+          const write = byId[result.id];
+          if (!write) {
+            return result;
+          }
+          if (result.status === 'created' || result.status === 'duplicate') {
+            return remove(write.id).then(function () { return result; });
+          }
+          // rejected writes can never succeed, they stay listed until dismissed
+          write.attempts = result.status === 'rejected' ? MAX_ATTEMPTS : write.attempts + 1;
+          write.error = result.error || '';
+          return put(write).then(function () { return result; });
+        }));
+      });
+    }).finally(function () {
+      flushing = null;
+    });
+    return flushing;
+  }
+
+  scope.OfflineQueue = {
+    MAX_ATTEMPTS: MAX_ATTEMPTS,
+    uuid: uuid,
+    add: add,
+    all: all,
+    remove: remove,
+    pending: pending,
+    flush: flush,
+    getMeta: getMeta,
+    setMeta: setMeta,
+  };
+})(self);
@@ -0,0 +1,90 @@
+document.addEventListener('DOMContentLoaded', function() {
+    const printStyles = `
+        @media print {
+            body {
+                margin: 0 !important;
+                padding: 0 !important;
+            }
+            .print-container {
+                border: 5px solid #000; /* Added thicker border for printable page */
+                padding: 30px;
+                margin: 10px auto;
+                max-width: 900px;
+                background-color: white;
+                box-shadow: 0 0 15px rgba(0, 0, 0, 0.1);
+            }
+            .document-title {
+                margin: 10px 0;
+                text-align: center;
+            }
+            p {
+                font-size: 14px !important;
+                line-height: 1.5 !important;
+                padding: 0 !important;
+            }
+
+
+            .organization-header {
+                padding: 5px 0 !important;
+                transform: scale(0.95);
+                transform-origin: top;
+            }
+
+            .org-logo img {
+                max-width: 100px !important;
+            }
+
+            .section {
+                padding: 10px !important;
+                margin-bottom: 8px !important;
+            }
+
+            .report-row {
+                gap: 8px !important;
+            }
+
+            .report-box {
+                padding: 8px !important;
+                font-size: 12px !important;
+            }
+
+            .log-timeline {
+                gap: 8px !important;
+                padding: 5px 0 !important;
+            }
+
+            .log-box {
+                width: 70px !important;
+                padding: 8px !important;
+                font-size: 10px !important;
+            }
+
+            .footer-line {
+                margin-top: 20px !important;
+            }
+            .signature-box {
+                text-align: center;
+                width: 30%;
+                padding: 10px;
+            }
+
+            .signature-box p:first-child {
+                font-weight: 700;
+                margin-bottom: 0px;
+                color: rgb(0, 0, 0);
+            }
+            /* Force A4 aspect ratio */
+            @page {
+                size: A4 portrait;
+                margin: 10mm;
+            }
+        }
+    `;
+
+    const styleSheet = document.createElement('style');
+    styleSheet.innerText = printStyles;
+    document.head.appendChild(styleSheet);
+
+    // Optional: Trigger print dialog automatically
+    window.print();
+});
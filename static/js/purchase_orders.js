@@ -0,0 +1,94 @@
+// دالة للحصول على قيمة الـ CSRF من الكوكيز
+function getCookie(name) {
+  let cookieValue = null;
+  if (document.cookie && document.cookie !== "") {
+    const cookies = document.cookie.split(';');
+    for (let i = 0; i < cookies.length; i++){
+      const cookie = cookies[i].trim();
+      if (cookie.substring(0, name.length + 1) === (name + '=')){
+         cookieValue = decodeURIComponent(cookie.substring(name.length + 1));
+         break;
+      }
+    }
+  }
+  return cookieValue;
+}
+
+// دالة تحديث حالة الطلب باستخدام Fetch API
+function updateOrderStatus(orderId, newStatus) {
+  const csrftoken = getCookie('csrftoken');
+
+  fetch('/api/update-order-status/', {
+    method: 'POST',
+    headers: {
+      'Content-Type': 'application/x-www-form-urlencoded',
+      'X-CSRFToken': csrftoken,
+    },
+    body: `id=${orderId}&status=${newStatus}`
+  })
+  .then(response => response.json())
+  .then(data => {
+    // تحديث عنصر الـ badge في الصف المحدد
+    const badgeSpan = document.getElementById(`order-status-${orderId}`);
+    if (badgeSpan) {
+      badgeSpan.className = 'badge ' + data.badge_class;
+      badgeSpan.innerText = data.status_display;
+    }
+    // إعادة تحميل الطلبات لتحديث زر الحالة بناءً على الحالة الجديدة
+    loadOrders();
+  })
+  .catch(error => console.error('Error updating order status:', error));
+}
+
+// تحميل الطلبات وتحديث الجدول بناءً على الفلتر والبحث
+function loadOrders() {
+  const status = document.getElementById('statusFilter').value;
+  const search = document.getElementById('searchInput').value;
+  const queryString = `?status=${encodeURIComponent(status)}&search=${encodeURIComponent(search)}`;
+
+  fetch('/api/purchase-orders/' + queryString)
+    .then(response => response.json())
+    .then(data => {
+      const tbody = document.getElementById('ordersTableBody');
+      tbody.innerHTML = "";
+      if (data.orders.length === 0) {
+        tbody.innerHTML = '<tr><td colspan="5" class="text-center">لا توجد أوامر شراء</td></tr>';
+      } else {
+        data.orders.forEach((order, index) => {
+          const row = document.createElement('tr');
+          row.id = `order-row-${order.id}`;
+          row.innerHTML = `
+            <td>${index + 1}</td>
+            <td>${order.refrence_number}</td>
+            <td>
+              <span id="order-status-${order.id}" class="badge ${order.badge_class}">
+                ${order.status_display}
+              </span>
+            </td>
+            <td>${order.created_at}</td>
+            <td>
+
+              ${
+                order.status === 'supplied'
+                ? `<button onclick="updateOrderStatus(${order.id}, 'approved')" class="btn btn-sm btn-outline-danger">لم وصل</button>`
+                : (order.status === 'approved'
+                  ? `<button onclick="updateOrderStatus(${order.id}, 'supplied')" class="btn btn-sm btn-outline-success">وصل</button>`
+                  : '')
+              }
+                <a href="/request_detail/${order.service_request_id}/" class="btn btn-sm btn-primary">عرض التفاصيل</a>
+
+            </td>
+          `;
+          tbody.appendChild(row);
+        });
+      }
+    })
+    .catch(error => console.error('Error fetching orders:', error));
+}
+
+// إضافة مستمعات الأحداث لتحديث الجدول بناءً على الفلتر والبحث
+document.getElementById('statusFilter').addEventListener('change', loadOrders);
+document.getElementById('searchBtn').addEventListener('click', loadOrders);
+
+// تحديث الطلبات عند تحميل الصفحة
+document.addEventListener('DOMContentLoaded', loadOrders);
@@ -0,0 +1,20 @@
+// Scroll Progress Indicator
+window.addEventListener('scroll', () => {
+  const scrollProgress = document.getElementById('scrollProgress');
+  const windowHeight = document.documentElement.scrollHeight - document.documentElement.clientHeight;
+  const scrolled = (window.scrollY / windowHeight) * 100;
+  scrollProgress.style.width = scrolled + '%';
+});
+
+// Smooth Table Row Hover
+document.querySelectorAll('tr[onclick]').forEach(row => {
+  row.addEventListener('mouseenter', () => {
+    row.style.transform = 'scale(1.01)';
+    row.style.boxShadow = '0 4px 15px rgba(0,0,0,0.2)';
+  });
+
+  row.addEventListener('mouseleave', () => {
+    row.style.transform = 'scale(1)';
+    row.style.boxShadow = 'none';
+  });
+});
@@ -0,0 +1,154 @@
+// Board of requests_board: drag a card to another column to move the request
+// through its status transition, "load more" reads the next cards of one
+// column after the id of its last card. See app1/board.py.
+(function () {
+  const board = document.getElementById('board');
+  const template = document.getElementById('board-card-template');
+  const moves = JSON.parse(document.getElementById('board-moves').textContent);
+  let dragged = null;
+
+  function csrfToken() {
+    const match = document.cookie.match(/(?:^|;\s*)csrftoken=([^;]+)/);
+    return match ? decodeURIComponent(match[1]) : '';
+  }
+
+  function showError(text) {
+    const alert = document.createElement('div');
+    alert.className = 'alert alert-danger alert-dismissible fade show';
+    alert.setAttribute('role', 'alert');
+    alert.textContent = text;
+    const close = document.createElement('button');
+    close.type = 'button';
+    close.className = 'btn-close';
+    close.setAttribute('data-bs-dismiss', 'alert');
+    alert.appendChild(close);
+    board.parentNode.insertBefore(alert, board);
+  }
+
+  function column(status) {
+    return board.querySelector('.board-column[data-status="' + status + '"]');
+  }
+
+  function addToCount(status, delta) {
+    const count = column(status).querySelector('[data-count]');
+    count.textContent = Math.max(parseInt(count.textContent, 10) + delta, 0);
+  }
+
+  function renderCard(card) {
+    const element = template.content.firstElementChild.cloneNode(true);
+    element.href = card.url;
+    element.dataset.id = card.id;
+    element.dataset.status = card.status;
+    element.querySelector('.board-card-id').textContent = '#' + card.id;
+    element.querySelector('.board-card-title').textContent = card.title;
+    element.querySelector('.board-card-description').textContent = card.description;
+    element.querySelector('[data-section]').textContent = card.section;
+    element.querySelector('[data-assignee]').textContent = card.assignee || 'غير معيّن';
+    element.querySelector('.board-card-date').textContent = card.created_at;
+    return element;
+  }
+
+  function clearDropTargets() {
+    board.querySelectorAll('.board-column').forEach(function (element) {
+      element.classList.remove('drop-allowed', 'drop-over');
+    });
+  }
+
+  board.addEventListener('dragstart', function (event) {
+    dragged = event.target.closest('.board-card');
+    if (!dragged) {
+      return;
+    }
+    dragged.classList.add('dragging');
+    event.dataTransfer.effectAllowed = 'move';
+    event.dataTransfer.setData('text/plain', dragged.dataset.id);
+    (moves[dragged.dataset.status] || []).forEach(function (status) {
+      column(status).classList.add('drop-allowed');
+    });
+  });
+
+  board.addEventListener('dragend', function () {
+    if (dragged) {
+      dragged.classList.remove('dragging');
+    }
+    dragged = null;
+    clearDropTargets();
+  });
+
+  board.addEventListener('dragover', function (event) {
+    const target = event.target.closest('.board-column.drop-allowed');
+    if (target) {
+      event.preventDefault();
+      target.classList.add('drop-over');
+    }
+  });
+
+  board.addEventListener('dragleave', function (event) {
+    const target = event.target.closest('.board-column');
+    if (target && !target.contains(event.relatedTarget)) {
+      target.classList.remove('drop-over');
+    }
+  });
+
+  board.addEventListener('drop', function (event) {
+    const target = event.target.closest('.board-column.drop-allowed');
+    if (!target || !dragged) {
+      return;
+    }
+    event.preventDefault();
+    const card = dragged;
+    const from = card.dataset.status;
+    const to = target.dataset.status;
+    clearDropTargets();
+    fetch(board.dataset.moveUrl.replace('/0/', '/' + card.dataset.id + '/'), {
+      method: 'POST',
+      credentials: 'same-origin',
+      headers: { 'Content-Type': 'application/x-www-form-urlencoded', 'X-CSRFToken': csrfToken() },
+      body: new URLSearchParams({ status: to }),
+    }).then(function (response) {
+      return response.json();
+    }).then(function (data) {
+      if (data.error) {
+        showError(data.error);
+      } else if (data.result === 'form') {
+        // the transition asks for a report or a note
+        window.location.href = data.url;
+      } else {
+        card.dataset.status = data.status;
+        target.querySelector('[data-cards]').prepend(card);
+        addToCount(from, -1);
+        addToCount(to, 1);
+      }
+    }).catch(function () {
+      showError('تعذر نقل الطلب، حاول مرة أخرى');
+    });
+  });
+
+  board.querySelectorAll('[data-load-more]').forEach(function (button) {
+    button.addEventListener('click', function () {
+      const status = button.closest('.board-column').dataset.status;
+      const params = new URLSearchParams({ status: status, before: button.dataset.cursor });
+      if (board.dataset.assignedTo) {
+        params.set('assigned_to', board.dataset.assignedTo);
+      }
+      button.disabled = true;
+      fetch(board.dataset.apiUrl + '?' + params.toString(), { credentials: 'same-origin' }).then(function (response) {
+        return response.json();
+      }).then(function (page) {
+        const cards = column(status).querySelector('[data-cards]');
+        page.cards.forEach(function (card) {
+          // a card moved here meanwhile is already shown
+          if (!cards.querySelector('[data-id="' + card.id + '"]')) {
+            cards.appendChild(renderCard(card));
+          }
+        });
+        button.dataset.cursor = page.cursor || '';
+        button.classList.toggle('d-none', !page.cursor);
+      }).catch(function () {
+        showError('تعذر تحميل المزيد من الطلبات');
+      }).finally(function () {
+        button.disabled = false;
+      });
+    });
+  });
+})();